@@ -9,74 +9,37 @@ AI-driven log anomaly detector using Isolation Forest and optional Autoencoder.
 
 Usage:
   python3 anomaly_detector.py data/normal_traffic.log data/anomalous_traffic.log
+  # Train once, score many (versioned bundle under models/<version>/, models/LATEST points at it)
+  python3 anomaly_detector.py train data/normal_traffic.log --model-dir models --threads 4
+  python3 anomaly_detector.py score data/anomalous_traffic.log --model models --chunk-rows 65536
+  tail -F access.log | python3 anomaly_detector.py stream - --model models --out flagged.csv
 Outputs:
   ./anomaly_results.csv
 """
 
 import sys
 import os
-import re
 import csv
 import math
 import json
 import base64
+import datetime
 import statistics
+import time
+from bisect import bisect_right
+from itertools import accumulate, repeat
 from typing import List, Dict, Any, Tuple, Optional
 
-# ---------------- Vault client (same pattern as PQC demo) ----------------
-class VaultClient:
-    def __init__(self):
-        self.azure_uri = os.getenv("AZURE_KEY_VAULT_URI")
-        self.hvault_addr = os.getenv("VAULT_ADDR")
-        self.hvault_token = os.getenv("VAULT_TOKEN")
-        self._azure_client = None
-        self._hvac_client = None
-
-        if self.azure_uri:
-            try:
-                from azure.identity import DefaultAzureCredential
-                from azure.keyvault.secrets import SecretClient
-                self._azure_client = SecretClient(
-                    vault_url=self.azure_uri,
-                    credential=DefaultAzureCredential()
-                )
-            except Exception:
-                self._azure_client = None
-
-        if self.hvault_addr and self.hvault_token:
-            try:
-                import hvac
-                self._hvac_client = hvac.Client(url=self.hvault_addr, token=self.hvault_token, verify=True)
-            except Exception:
-                self._hvac_client = None
-
-    def get_secret(self, name: str) -> Optional[bytes]:
-        if self._azure_client:
-            try:
-                v = self._azure_client.get_secret(name)
-                if v and v.value is not None:
-                    return v.value.encode("utf-8")
-            except Exception:
-                pass
-        if self._hvac_client:
-            try:
-                mount = os.getenv("VAULT_KV_MOUNT", "secret")
-                resp = self._hvac_client.secrets.kv.v2.read_secret_version(path=name) if hasattr(self._hvac_client.secrets, "kv") else self._hvac_client.read(f"{mount}/data/{name}")
-                if resp:
-                    data = resp["data"]["data"] if "data" in resp and "data" in resp["data"] else resp.get("data")
-                    if data and name in data:
-                        val = data[name]
-                        return val.encode("utf-8") if isinstance(val, str) else val
-            except Exception:
-                pass
-        env_val = os.getenv(name)
-        return env_val.encode("utf-8") if env_val else None
+import numpy as np
 
+# ---------------- Vault client (shared: ../common/vault_client.py) ----------------
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vault_client import VaultClient, get_vault  # noqa: E402
 
 # ---------------- Log parsing and feature engineering ----------------
-CLF_REGEX = re.compile(
-    r'(?P<ip>\S+)\s+\S+\s+\S+\s+\[(?P<ts>[^\]]+)\]\s+"(?P<method>\S+)\s+(?P<path>\S+)\s+(?P<proto>[^"]+)"\s+(?P<status>\d{3})\s+(?P<bytes>\S+)\s+"(?P<ref>[^"]*)"\s+"(?P<ua>[^"]*)"'
-)
+# Parsing is shared with scripts/ingest_logs.py (mmap + process pool, columnar batches)
+from clf_parser import ClfBatch, iter_batches, parse_line  # noqa: E402,F401
+from quantile_sketch import QuantileSketch  # noqa: E402
 
 SUSPICIOUS_TOKENS = [
     "union", "select", "drop", "sleep(", "' or '1'='1", "%27", "../", ";--", "xp_cmdshell", "<script", "benchmark(", "load_file", "outfile"
@@ -94,22 +57,17 @@ def shannon_entropy(s: str) -> float:
         ent -= p * math.log2(p)
     return ent
 
-def parse_line(line: str) -> Optional[Dict[str, Any]]:
-    m = CLF_REGEX.match(line.strip())
-    if not m:
-        return None
-    d = m.groupdict()
-    d["status"] = int(d["status"])
-    d["bytes"] = 0 if d["bytes"] == "-" else int(d["bytes"])
-    return d
+METHOD_IDS = {"GET": 0, "POST": 1, "PUT": 2, "DELETE": 3, "PATCH": 4, "HEAD": 5, "OPTIONS": 6}
+FEATURE_NAMES = ["method_id", "status", "bytes", "path_len", "query_len", "path_entropy", "ua_entropy", "suspicious"]
+ENTROPY_CHUNK_ROWS = 4096  # rows per bincount block (rows * alphabet bins)
 
 def extract_features(d: Dict[str, Any]) -> List[float]:
+    """Per-line reference implementation; extract_features_batch() reproduces it column-wise."""
     path = d.get("path", "")
     ua = d.get("ua", "")
     method = d.get("method", "")
 
-    method_map = {"GET": 0, "POST": 1, "PUT": 2, "DELETE": 3, "PATCH": 4, "HEAD": 5, "OPTIONS": 6}
-    method_id = method_map.get(method.upper(), -1)
+    method_id = METHOD_IDS.get(method.upper(), -1)
 
     suspicious = any(tok in path.lower() for tok in SUSPICIOUS_TOKENS)
     qlen = len(path.split("?", 1)[1]) if "?" in path else 0
@@ -126,20 +84,141 @@ def extract_features(d: Dict[str, Any]) -> List[float]:
     ]
     return feats
 
-def load_dataset(path: str) -> Tuple[List[List[float]], List[str]]:
-    X, raw = [], []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            parsed = parse_line(line)
-            if not parsed:
-                continue
-            X.append(extract_features(parsed))
-            raw.append(line.rstrip("\n"))
-    return X, raw
+def entropy_batch(strings: List[str]) -> np.ndarray:
+    """
+    Shannon entropy per string from byte histograms (np.bincount over row * alphabet + byte, in row blocks).
+    Byte and character histograms only agree for ASCII, so non-ASCII rows use shannon_entropy().
+    """
+    n = len(strings)
+    out = np.zeros(n, dtype=np.float64)
+    if not n:
+        return out
+    data = "".join(strings).encode("utf-8", "surrogatepass")
+    chars = np.fromiter(map(len, strings), dtype=np.int64, count=n)
+    if len(data) == int(chars.sum()):
+        lens, ascii_rows = chars, None
+    else:
+        encoded = [x.encode("utf-8", "surrogatepass") for x in strings]
+        lens = np.fromiter(map(len, encoded), dtype=np.int64, count=n)
+        ascii_rows = lens == chars
+    buf = np.frombuffer(data, dtype=np.uint8)
+    starts = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(lens, out=starts[1:])
+
+    # Compact alphabet: only byte values present in the batch get a histogram bin
+    present = np.bincount(buf, minlength=256) > 0
+    k = int(present.sum())
+    remap = (np.cumsum(present) - 1).astype(np.int64)
+
+    for i in range(0, n, ENTROPY_CHUNK_ROWS):
+        j = min(i + ENTROPY_CHUNK_ROWS, n)
+        seg = remap[buf[starts[i]:starts[j]]]
+        seg += np.repeat(np.arange(j - i, dtype=np.int64) * k, lens[i:j])
+        counts = np.bincount(seg, minlength=(j - i) * k)
+        nz = np.flatnonzero(counts)  # only the (row, byte) bins that occur
+        rows = nz // k
+        p = counts[nz] / lens[i:j][rows]
+        out[i:j] = -np.bincount(rows, weights=p * np.log2(p), minlength=j - i)
+
+    if ascii_rows is not None:
+        for k in np.flatnonzero(~ascii_rows):
+            out[k] = shannon_entropy(strings[k])
+    return out
+
+class TokenMatcher:
+    """
+    Finds SUSPICIOUS_TOKENS in many lines by scanning the joined, lower-cased text once per batch.
+    Uses a pyahocorasick automaton (single pass, all tokens) when installed; otherwise each token is
+    located with str.find sweeps (C fastsearch), skipping to the next line after a hit.
+    """
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = list(tokens)
+        self._order = {t: i for i, t in enumerate(self.tokens)}
+        try:
+            import ahocorasick
+            self._ac = ahocorasick.Automaton()
+            for t in self.tokens:
+                self._ac.add_word(t, t)
+            self._ac.make_automaton()
+        except ImportError:
+            self._ac = None
+
+    def scan(self, lines: List[str]) -> Dict[int, List[str]]:
+        """Returns {row: tokens found in lines[row].lower(), in token-list order} for rows with hits."""
+        text = "\n".join(lines).lower()
+        lengths = list(map(len, lines))
+        if len(text) != sum(lengths) + max(len(lines) - 1, 0):
+            # lower() changed some lengths (rare non-ASCII case): re-derive per-line lengths
+            lowered = [l.lower() for l in lines]
+            text = "\n".join(lowered)
+            lengths = list(map(len, lowered))
+        starts = list(accumulate(map((1).__add__, lengths), initial=0))
+
+        hits: Dict[int, List[str]] = {}
+        if self._ac is not None:
+            found: Dict[int, set] = {}
+            for end, tok in self._ac.iter(text):
+                found.setdefault(bisect_right(starts, end) - 1, set()).add(tok)
+            return {r: sorted(ts, key=self._order.__getitem__) for r, ts in found.items()}
+        for tok in self.tokens:
+            pos = text.find(tok)
+            while pos >= 0:
+                r = bisect_right(starts, pos) - 1
+                hits.setdefault(r, []).append(tok)
+                pos = text.find(tok, starts[r + 1])  # presence per line is enough
+        return hits
+
+_MATCHER: Optional[TokenMatcher] = None
+
+def extract_features_batch(batch: ClfBatch) -> Tuple[np.ndarray, List[str]]:
+    """
+    (n, 8) float32 feature matrix (FEATURE_NAMES order) plus the reason_tokens string per row, from one
+    columnar batch. Reasons are matched on the raw line (batch.raw, else the path), like main() always did.
+    """
+    global _MATCHER
+    if _MATCHER is None:
+        _MATCHER = TokenMatcher(SUSPICIOUS_TOKENS)
+    n = len(batch)
+    paths = batch.path
+    X = np.empty((n, 8), dtype=np.float32)
+    if not n:
+        return X, []
+
+    lut = {m: METHOD_IDS.get(m.upper(), -1) for m in set(batch.method)}
+    X[:, 0] = np.fromiter(map(lut.__getitem__, batch.method), dtype=np.float64, count=n)
+    X[:, 1] = np.frombuffer(batch.status, dtype=np.int32)
+    X[:, 2] = np.frombuffer(batch.bytes, dtype=np.int64)
+    plen = np.fromiter(map(len, paths), dtype=np.int64, count=n)
+    qpos = np.fromiter(map(str.find, paths, repeat("?")), dtype=np.int64, count=n)
+    X[:, 3] = plen
+    X[:, 4] = np.where(qpos >= 0, plen - qpos - 1, 0)
+    X[:, 5] = entropy_batch(paths)
+    X[:, 6] = entropy_batch(batch.ua)
+    X[:, 7] = 0.0
+
+    reasons = [""] * n
+    for r, toks in _MATCHER.scan(batch.raw if batch.raw is not None else paths).items():
+        reasons[r] = ",".join(toks)
+        low = paths[r].lower()
+        # the path is part of the line, so its tokens are a subset of the line's hits
+        X[r, 7] = 1.0 if any(t in low for t in toks) else 0.0
+    return X, reasons
+
+def load_dataset(path: str) -> Tuple[np.ndarray, List[str], List[str]]:
+    """Returns (features, raw lines, reason_tokens) for every parsed line."""
+    feats, raw, reasons = [], [], []
+    for batch in iter_batches(path, keep_raw=True):
+        X, rs = extract_features_batch(batch)
+        feats.append(X)
+        raw.extend(batch.raw)
+        reasons.extend(rs)
+    X = np.concatenate(feats) if feats else np.empty((0, 8), dtype=np.float32)
+    return X, raw, reasons
 
 
 # ---------------- Models: Isolation Forest + optional Autoencoder ----------------
-def run_isolation_forest(X_train: List[List[float]], X_test: List[List[float]]) -> List[float]:
+def fit_isolation_forest(X_train: np.ndarray):
     try:
         from sklearn.ensemble import IsolationForest
     except Exception:
@@ -154,25 +233,19 @@ def run_isolation_forest(X_train: List[List[float]], X_test: List[List[float]])
         n_jobs=-1
     )
     iso.fit(X_train)
+    return iso
+
+def isolation_forest_scores(iso, X: np.ndarray) -> np.ndarray:
     # decision_function: higher = less anomalous, lower = more anomalous
-    scores = iso.decision_function(X_test)
     # Convert to anomaly scores where higher = more anomalous
-    inv = [-s for s in scores]
-    return inv
+    return -iso.decision_function(X)
 
-def try_autoencoder_scores(X_train: List[List[float]], X_test: List[List[float]]) -> Optional[List[float]]:
-    try:
-        import torch
-        import torch.nn as nn
-        import torch.optim as optim
-        import numpy as np
-    except Exception:
-        return None
+def run_isolation_forest(X_train: np.ndarray, X_test: np.ndarray) -> List[float]:
+    return isolation_forest_scores(fit_isolation_forest(X_train), X_test).tolist()
 
-    Xtr = torch.tensor(X_train, dtype=torch.float32)
-    Xte = torch.tensor(X_test, dtype=torch.float32)
+def build_autoencoder(in_dim: int):
+    import torch.nn as nn
 
-    in_dim = Xtr.shape[1]
     bottleneck = max(2, in_dim // 2)
 
     class AE(nn.Module):
@@ -194,23 +267,154 @@ def try_autoencoder_scores(X_train: List[List[float]], X_test: List[List[float]]
             z = self.enc(x)
             return self.dec(z)
 
-    model = AE()
-    opt = optim.Adam(model.parameters(), lr=1e-3)
-    loss_fn = nn.MSELoss()
+    return AE()
 
-    model.train()
-    for epoch in range(50):  # light training for demo
-        opt.zero_grad()
-        out = model(Xtr)
-        loss = loss_fn(out, Xtr)
-        loss.backward()
-        opt.step()
+AE_BATCH_SIZE = 256
+AE_MAX_EPOCHS = 200
+AE_PATIENCE = 8          # epochs without a validation improvement before stopping
+AE_MIN_DELTA = 1e-4      # relative improvement that counts
+AE_VAL_FRACTION = 0.1
+AE_BLOCK_ROWS = 65536    # rows standardized per block by the training stream
+AE_INFER_CHUNK_ROWS = 65536
 
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)  # macOS reports bytes
+
+def fit_scaler(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-feature mean/std (float32); constant features get std 1 so they standardize to 0."""
+    std = X.std(axis=0)
+    return X.mean(axis=0).astype(np.float32), np.where(std > 0, std, 1.0).astype(np.float32)
+
+def set_torch_threads(threads: Optional[int] = None) -> None:
+    """Intra-op CPU threads for training/inference; ANOMALY_TORCH_THREADS overrides the torch default."""
+    threads = threads or int(os.getenv("ANOMALY_TORCH_THREADS", "0") or 0)
+    if threads > 0:
+        try:
+            import torch
+        except Exception:
+            return
+        torch.set_num_threads(threads)
+
+def feature_stream(X: np.ndarray, rows: np.ndarray, mean: np.ndarray, std: np.ndarray,
+                   batch_size: int, seed: int):
+    """
+    torch IterableDataset over the feature matrix (ndarray or np.memmap): blocks of row indices
+    are visited in shuffled order, standardized on the fly and cut into shuffled mini-batches,
+    so at most one standardized block is held in memory.
+    """
+    import torch
+    from torch.utils.data import IterableDataset
+
+    class FeatureStream(IterableDataset):
+        def __init__(self):
+            super().__init__()
+            self.epoch = 0
+
+        def __iter__(self):
+            rng = np.random.default_rng(seed + self.epoch)
+            self.epoch += 1
+            starts = np.arange(0, len(rows), AE_BLOCK_ROWS)
+            for s in rng.permutation(starts):
+                idx = rows[s:s + AE_BLOCK_ROWS]
+                block = torch.from_numpy(((X[idx] - mean) / std).astype(np.float32, copy=False))
+                order = torch.from_numpy(rng.permutation(len(idx)))
+                for b in range(0, len(idx), batch_size):
+                    yield block[order[b:b + batch_size]]
+
+    return FeatureStream()
+
+def train_autoencoder(X: np.ndarray, mean: Optional[np.ndarray] = None, std: Optional[np.ndarray] = None,
+                      batch_size: int = AE_BATCH_SIZE, max_epochs: int = AE_MAX_EPOCHS,
+                      patience: int = AE_PATIENCE, threads: Optional[int] = None, seed: int = 42):
+    """
+    Mini-batch Adam on standardized features with validation-loss early stopping; the best epoch's
+    weights are restored. Returns (model, report) or (None, None) when torch is not installed.
+    """
+    try:
+        import torch
+        import torch.nn as nn
+        from torch.utils.data import DataLoader
+    except Exception:
+        return None, None
+
+    t0 = time.perf_counter()
+    set_torch_threads(threads)
+    torch.manual_seed(seed)
+    if mean is None:
+        mean, std = fit_scaler(X)
+
+    perm = np.random.default_rng(seed).permutation(len(X))
+    n_val = int(len(X) * AE_VAL_FRACTION) if len(X) >= 20 else 0
+    val_rows, train_rows = np.sort(perm[:n_val]), np.sort(perm[n_val:])
+    loader = DataLoader(feature_stream(X, train_rows, mean, std, batch_size, seed), batch_size=None)
+
+    model = build_autoencoder(X.shape[1])
+    opt = torch.optim.Adam(model.parameters(), lr=1e-3)
+    loss_fn = nn.MSELoss()
+
+    best, best_state, best_epoch, stale = float("inf"), None, 0, 0
+    history = []
+    for epoch in range(1, max_epochs + 1):
+        model.train()
+        total, seen = 0.0, 0
+        for xb in loader:
+            opt.zero_grad(set_to_none=True)
+            loss = loss_fn(model(xb), xb)
+            loss.backward()
+            opt.step()
+            total += loss.item() * len(xb)
+            seen += len(xb)
+        train_loss = total / max(seen, 1)
+        model.eval()
+        # Small sets have no holdout: stop on the training loss instead
+        val_loss = float(autoencoder_scores(model, X[val_rows], mean, std).mean()) if n_val else train_loss
+        history.append((round(train_loss, 6), round(val_loss, 6)))
+        if val_loss < best * (1 - AE_MIN_DELTA):
+            best, best_epoch, stale = val_loss, epoch, 0
+            best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+        else:
+            stale += 1
+            if stale >= patience:
+                break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
     model.eval()
-    with torch.no_grad():
-        rec = model(Xte)
-        mse = ((rec - Xte) ** 2).mean(dim=1).cpu().numpy().tolist()
-    return mse
+    report = {
+        "rows": int(len(train_rows)), "val_rows": int(n_val), "batch_size": batch_size,
+        "epochs": len(history), "best_epoch": best_epoch, "best_val_loss": round(best, 6),
+        "threads": torch.get_num_threads(), "wall_s": round(time.perf_counter() - t0, 2),
+        "peak_rss_mb": peak_rss_mb(), "loss_history": history,
+    }
+    return model, report
+
+def autoencoder_scores(model, X: np.ndarray, mean: Optional[np.ndarray] = None, std: Optional[np.ndarray] = None,
+                       chunk_rows: int = AE_INFER_CHUNK_ROWS) -> np.ndarray:
+    """Per-row reconstruction MSE, computed in chunks under inference_mode (X standardized if mean/std given)."""
+    import torch
+    out = np.empty(len(X), dtype=np.float32)
+    with torch.inference_mode():
+        for i in range(0, len(X), chunk_rows):
+            chunk = X[i:i + chunk_rows]
+            if mean is not None:
+                chunk = (chunk - mean) / std
+            xb = torch.from_numpy(np.ascontiguousarray(chunk, dtype=np.float32))
+            out[i:i + len(xb)] = ((model(xb) - xb) ** 2).mean(dim=1).numpy()
+    return out
+
+def try_autoencoder_scores(X_train: np.ndarray, X_test: np.ndarray) -> Optional[List[float]]:
+    mean, std = fit_scaler(X_train)
+    model, report = train_autoencoder(X_train, mean, std)
+    if model is None:
+        return None
+    print(f"Autoencoder: {report['epochs']} epochs (best {report['best_epoch']}), "
+          f"{report['wall_s']}s, peak RSS {report['peak_rss_mb']} MB")
+    return autoencoder_scores(model, X_test, mean, std).tolist()
 
 def combine_scores(scores_a: List[float], scores_b: Optional[List[float]]) -> List[float]:
     if not scores_b:
@@ -224,15 +428,219 @@ def combine_scores(scores_a: List[float], scores_b: Optional[List[float]]) -> Li
     return [(a + b) / 2.0 for a, b in zip(za, zb)]
 
 
+# ---------------- Model bundle (train once, score many) ----------------
+BUNDLE_FORMAT = 1
+DEFAULT_MODEL_DIR = "models"
+SCORE_CHUNK_ROWS = 65536
+
+def _stats(x: np.ndarray) -> Dict[str, float]:
+    return {"mean": float(np.mean(x)), "std": float(np.std(x)) or 1.0}
+
+def train_bundle(normal_path: str, model_dir: str = DEFAULT_MODEL_DIR, threads: Optional[int] = None) -> str:
+    """
+    Fit on the normal log and write a versioned bundle: <model_dir>/<version>/{manifest.json,
+    iforest.joblib, autoencoder.pt}. The score statistics that combine_scores() and the z threshold
+    need are computed on the training set here, so scoring never depends on the candidate set.
+    Returns the bundle path; <model_dir>/LATEST points at it.
+    """
+    try:
+        import joblib  # ships with scikit-learn
+    except Exception:
+        print("scikit-learn is required for Isolation Forest. Install 'scikit-learn'.")
+        sys.exit(1)
+
+    X_train, _, _ = load_dataset(normal_path)
+    if len(X_train) < 10:
+        print("Not enough training data. Provide at least ~50 normal lines for better results.")
+
+    mean, std = fit_scaler(X_train)
+    scaler = {"mean": mean.tolist(), "std": std.tolist()}
+    iso = fit_isolation_forest(X_train)
+    if_train = isolation_forest_scores(iso, X_train)
+    z = {"iforest": _stats(if_train)}
+    combined = if_train
+
+    ae, ae_report = train_autoencoder(X_train, mean, std, threads=threads)
+    if ae is not None:
+        print(f"Autoencoder: {ae_report['epochs']} epochs (best {ae_report['best_epoch']}, "
+              f"val_loss {ae_report['best_val_loss']}), {ae_report['wall_s']}s on {ae_report['threads']} threads, "
+              f"peak RSS {ae_report['peak_rss_mb']} MB")
+        ae_train = autoencoder_scores(ae, X_train, mean, std)
+        z["autoencoder"] = _stats(ae_train)
+        combined = ((if_train - z["iforest"]["mean"]) / z["iforest"]["std"]
+                    + (ae_train - z["autoencoder"]["mean"]) / z["autoencoder"]["std"]) / 2.0
+    z["combined"] = _stats(combined)
+    # Reference distribution for quantile thresholds in streaming mode (stream_scorer.py)
+    reference = QuantileSketch(seed=42)
+    reference.update(combined)
+
+    version = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    path = os.path.join(model_dir, version)
+    os.makedirs(path, exist_ok=False)
+    joblib.dump(iso, os.path.join(path, "iforest.joblib"))
+    if ae is not None:
+        import torch
+        torch.save(ae.state_dict(), os.path.join(path, "autoencoder.pt"))
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "created": datetime.datetime.utcnow().isoformat() + "Z",
+        "features": FEATURE_NAMES,
+        "train": {"path": os.path.abspath(normal_path), "bytes": os.path.getsize(normal_path), "rows": int(len(X_train))},
+        "scaler": scaler,
+        "score_stats": z,
+        "reference_sketch": reference.to_dict(),
+        "autoencoder": {"in_dim": int(X_train.shape[1]), "file": "autoencoder.pt",
+                        "training": ae_report} if ae is not None else None,
+    }
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    with open(os.path.join(model_dir, "LATEST.tmp"), "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(os.path.join(model_dir, "LATEST.tmp"), os.path.join(model_dir, "LATEST"))
+    return path
+
+class ModelBundle:
+    """Reads the manifest eagerly; IF / AE (and sklearn / torch) load on first score()."""
+
+    def __init__(self, path: str = DEFAULT_MODEL_DIR):
+        if os.path.exists(os.path.join(path, "LATEST")) and not os.path.exists(os.path.join(path, "manifest.json")):
+            with open(os.path.join(path, "LATEST"), encoding="utf-8") as f:
+                path = os.path.join(path, f.read().strip())
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != BUNDLE_FORMAT or self.manifest.get("features") != FEATURE_NAMES:
+            raise ValueError(f"Incompatible model bundle at {path} (retrain with this version).")
+        self.path = path
+        self.version = self.manifest["version"]
+        self._iso = None
+        self._ae = None
+        self._ae_loaded = False
+        self._mean = np.asarray(self.manifest["scaler"]["mean"], dtype=np.float32)
+        self._std = np.asarray(self.manifest["scaler"]["std"], dtype=np.float32)
+
+    @property
+    def iforest(self):
+        if self._iso is None:
+            import joblib
+            self._iso = joblib.load(os.path.join(self.path, "iforest.joblib"))
+        return self._iso
+
+    @property
+    def autoencoder(self):
+        if not self._ae_loaded:
+            self._ae_loaded = True
+            spec = self.manifest.get("autoencoder")
+            if spec:
+                try:
+                    import torch
+                except Exception:
+                    print("Bundle has an autoencoder but torch is not installed; scoring with Isolation Forest only.")
+                    return None
+                model = build_autoencoder(spec["in_dim"])
+                weights = os.path.join(self.path, spec["file"])
+                try:
+                    state = torch.load(weights, map_location="cpu", weights_only=True)
+                except TypeError:  # torch < 1.13
+                    state = torch.load(weights, map_location="cpu")
+                model.load_state_dict(state)
+                model.eval()
+                self._ae = model
+        return self._ae
+
+    def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(combined anomaly score, z-score vs. the training distribution) for one chunk."""
+        z = self.manifest["score_stats"]
+        s = isolation_forest_scores(self.iforest, X)
+        ae = self.autoencoder
+        if ae is not None and "autoencoder" in z:
+            mse = autoencoder_scores(ae, X, self._mean, self._std)
+            s = ((s - z["iforest"]["mean"]) / z["iforest"]["std"]
+                 + (mse - z["autoencoder"]["mean"]) / z["autoencoder"]["std"]) / 2.0
+        return s, (s - z["combined"]["mean"]) / z["combined"]["std"]
+
+def load_threshold_z(vault: "VaultClient") -> float:
+    # Threshold configuration (no plaintext): pull from vault or env; default to 1.5 std dev
+    thr_bytes = vault.get_secret("ANOMALY_THRESHOLD_Z")
+    if thr_bytes:
+        try:
+            return float(thr_bytes.decode("utf-8"))
+        except Exception:
+            return 1.5
+    return 1.5
+
+def score_file(bundle: ModelBundle, candidate_path: str, out_path: str, threshold_z: float,
+               chunk_rows: int = SCORE_CHUNK_ROWS) -> Tuple[int, int]:
+    """Streams parsed batches through the bundle in chunk_rows slices; returns (lines, flagged)."""
+    total = flagged = 0
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["line", "anomaly_score", "zscore", "flag", "reason_tokens"])
+        for batch in iter_batches(candidate_path, keep_raw=True):
+            X, reasons = extract_features_batch(batch)
+            for i in range(0, len(X), chunk_rows):
+                scores, zs = bundle.score(X[i:i + chunk_rows])
+                flags = zs >= threshold_z
+                w.writerows([ln, f"{s:.6f}", f"{z:.3f}", int(fl), r] for ln, s, z, fl, r in
+                            zip(batch.raw[i:i + chunk_rows], scores, zs, flags, reasons[i:i + chunk_rows]))
+                total += len(scores)
+                flagged += int(flags.sum())
+    return total, flagged
+
+
 # ---------------- Main ----------------
+def cli(argv: List[str]) -> None:
+    import argparse
+    ap = argparse.ArgumentParser(prog="anomaly_detector.py")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    t = sub.add_parser("train", help="Fit on a normal log and save a versioned model bundle")
+    t.add_argument("normal_log")
+    t.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    t.add_argument("--threads", type=int, help="torch CPU threads (default: ANOMALY_TORCH_THREADS or torch's own)")
+    sc = sub.add_parser("score", help="Score a candidate log with a saved bundle (no retraining)")
+    sc.add_argument("candidate_log")
+    sc.add_argument("--model", default=DEFAULT_MODEL_DIR, help="Bundle dir, or a model dir with LATEST")
+    sc.add_argument("--out", default="anomaly_results.csv")
+    sc.add_argument("--chunk-rows", type=int, default=SCORE_CHUNK_ROWS)
+    sc.add_argument("--threads", type=int, help="torch CPU threads for autoencoder inference")
+    import stream_scorer
+    st = sub.add_parser("stream", help="Score a live log (file or stdin) in micro-batches with quantile thresholds")
+    stream_scorer.add_stream_args(st)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "train":
+        path = train_bundle(args.normal_log, args.model_dir, args.threads)
+        print(f"Saved model bundle to {path}")
+        return
+    if args.cmd == "stream":
+        stream_scorer.run_stream(args)
+        return
+
+    bundle = ModelBundle(args.model)
+    if bundle.manifest.get("autoencoder"):
+        set_torch_threads(args.threads)
+    threshold_z = load_threshold_z(get_vault())
+    total, flagged = score_file(bundle, args.candidate_log, args.out, threshold_z, args.chunk_rows)
+    if total == 0:
+        print("No candidate lines parsed; check log format.")
+        sys.exit(1)
+    print(f"Wrote results to {args.out}")
+    print(f"Flagged {flagged} of {total} lines as anomalous (threshold_z={threshold_z}, model={bundle.version}).")
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in ("train", "score", "stream"):
+        return cli(sys.argv[1:])
     if len(sys.argv) != 3:
         print("Usage: python3 anomaly_detector.py <normal_log> <candidate_log>")
+        print("       python3 anomaly_detector.py train <normal_log> [--model-dir models]")
+        print("       python3 anomaly_detector.py score <candidate_log> [--model models] [--out anomaly_results.csv]")
+        print("       python3 anomaly_detector.py stream <access_log|-> [--model models] [--quantile 0.995]")
         sys.exit(1)
 
+    # One-shot mode: fit on normal, score candidate, z-scores relative to the candidate set
     normal_path, candidate_path = sys.argv[1], sys.argv[2]
-    X_train, _ = load_dataset(normal_path)
-    X_test, raw_lines = load_dataset(candidate_path)
+    X_train, _, _ = load_dataset(normal_path)
+    X_test, raw_lines, reasons = load_dataset(candidate_path)
 
     if len(X_train) < 10:
         print("Not enough training data. Provide at least ~50 normal lines for better results.")
@@ -244,16 +652,7 @@ def main():
     ae_scores = try_autoencoder_scores(X_train, X_test)
     scores = combine_scores(if_scores, ae_scores)
 
-    # Threshold configuration (no plaintext): pull from vault or env; default to 1.5 std dev
-    vault = VaultClient()
-    thr_bytes = vault.get_secret("ANOMALY_THRESHOLD_Z")
-    if thr_bytes:
-        try:
-            threshold_z = float(thr_bytes.decode("utf-8"))
-        except Exception:
-            threshold_z = 1.5
-    else:
-        threshold_z = 1.5
+    threshold_z = load_threshold_z(get_vault())
 
     # Convert to z-scores for flagging
     mu = statistics.mean(scores)
@@ -261,12 +660,7 @@ def main():
     zscores = [(s - mu) / sd for s in scores]
     flags = [1 if z >= threshold_z else 0 for z in zscores]
 
-    # Heuristics: reasons
-    reasons = []
-    for line in raw_lines:
-        l = line.lower()
-        hits = [tok for tok in SUSPICIOUS_TOKENS if tok in l]
-        reasons.append(",".join(hits) if hits else "")
+    # Heuristics: reasons (matched during feature extraction, same pass as the suspicious flag)
 
     out_path = "anomaly_results.csv"
     with open(out_path, "w", newline="", encoding="utf-8") as f:
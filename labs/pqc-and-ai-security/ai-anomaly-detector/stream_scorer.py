@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming anomaly scoring for live access logs (frozen model bundle from `anomaly_detector.py train`).
+
+- Follows a log file (rotation/truncation safe) or reads stdin; lines are scored in micro-batches
+  that close at --batch-lines or --max-latency-ms after their first line, whichever comes first
+- Thresholds come from a fixed reference score distribution (quantile sketch saved at train time),
+  so a line's flag never depends on the other lines in its batch
+- A background thread re-baselines: every score (flagged or not) feeds rolling window sketches that are
+  merged with the training reference every --rebaseline-s, and the threshold is swapped atomically.
+  Feeding only unflagged scores would censor the tail and walk the threshold down on steady traffic
+- Flagged lines go to CSV (or stdout) and optionally to an HTTP sink as JSON
+- Latency (first line read -> flagged lines written) is tracked per micro-batch; p50/p99/max are
+  reported as a JSON stats line on stderr every --stats-interval and on exit
+
+Usage:
+  python3 anomaly_detector.py stream /var/log/nginx/access.log --model models --out flagged.csv
+  tail -F access.log | python3 stream_scorer.py - --model models --quantile 0.999 --sink-url https://siem/ingest
+Env / vault:
+  ANOMALY_THRESHOLD_QUANTILE (default 0.995)
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import queue
+import threading
+import datetime
+from collections import deque
+from typing import Deque, List, Optional
+
+import numpy as np
+
+import anomaly_detector as ad
+from clf_parser import parse_bytes
+from quantile_sketch import QuantileSketch
+
+DEFAULT_QUANTILE = 0.995
+LATENCY_WINDOW = 4096  # micro-batches kept for latency percentiles
+_EOF = None
+
+
+# ---------------- Input readers (thread -> bounded queue) ----------------
+def follow(path: str, out: "queue.Queue", stop: threading.Event, from_start: bool = False,
+           poll_interval: float = 0.2) -> None:
+    """Tail path like `tail -F`: reopen on rotation (inode change), rewind on truncation."""
+    f, ino, partial = None, None, b""
+    while not stop.is_set():
+        if f is None:
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                stop.wait(poll_interval)
+                continue
+            ino = os.fstat(f.fileno()).st_ino
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            from_start = True  # files that appear after a rotation are read from the top
+        chunk = f.read(1 << 20)
+        if chunk:
+            lines = (partial + chunk).split(b"\n")
+            partial = lines.pop()
+            for ln in lines:
+                out.put((time.monotonic(), ln))
+            continue
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_ino != ino:
+            f.close()
+            f, partial = None, b""
+        elif st.st_size < f.tell():
+            f.seek(0)
+            partial = b""
+        else:
+            stop.wait(poll_interval)
+    if f:
+        f.close()
+
+
+def read_stdin(out: "queue.Queue", stop: threading.Event) -> None:
+    for ln in sys.stdin.buffer:
+        if stop.is_set():
+            break
+        out.put((time.monotonic(), ln.rstrip(b"\r\n")))
+    out.put(_EOF)
+
+
+# ---------------- Thresholds ----------------
+class Rebaseliner(threading.Thread):
+    """
+    Holds the current score threshold. Scoring calls offer() with every score of a batch (never blocks;
+    drops when behind); every interval rebaseline() rotates the current window into a deque of recent
+    windows and sets threshold = quantile(reference + windows).
+    """
+
+    def __init__(self, reference: Optional[QuantileSketch], quantile: float, fallback: float,
+                 interval: float, windows: int, stop: threading.Event):
+        super().__init__(daemon=True)
+        self.reference = reference
+        self.quantile = quantile
+        self.interval = interval
+        self.threshold = reference.quantile(quantile) if reference is not None and reference.n else fallback
+        self.rebaselines = 0
+        self.dropped = 0
+        self._inbox: "queue.Queue" = queue.Queue(maxsize=256)
+        self._window = QuantileSketch()
+        self._history: Deque[QuantileSketch] = deque(maxlen=windows)
+        self._stop_event = stop  # not _stop: that name is Thread internals (join() calls it)
+
+    def offer(self, scores: np.ndarray) -> None:
+        if self.interval <= 0 or not len(scores):
+            return
+        try:
+            self._inbox.put_nowait(scores)
+        except queue.Full:
+            self.dropped += 1
+
+    def run(self) -> None:
+        if self.interval <= 0:
+            return
+        next_rotation = time.monotonic() + self.interval
+        while not self._stop_event.is_set():
+            # The deadline is checked on every pass, so steady traffic can't starve the rotation
+            try:
+                self._window.update(self._inbox.get(timeout=max(0.0, min(1.0, next_rotation - time.monotonic()))))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if now >= next_rotation:
+                while next_rotation <= now:  # after a stall, skip missed rotations instead of bursting
+                    next_rotation += self.interval
+                self.rebaseline()
+
+    def rebaseline(self) -> None:
+        while True:  # scores offered before the rotation belong to the closing window
+            try:
+                self._window.update(self._inbox.get_nowait())
+            except queue.Empty:
+                break
+        if self._window.n:
+            self._history.append(self._window)
+            self._window = QuantileSketch()
+        merged = self.reference.copy() if self.reference is not None else QuantileSketch()
+        for w in self._history:
+            merged.merge(w)
+        if merged.n:
+            self.threshold = merged.quantile(self.quantile)  # single attribute swap
+            self.rebaselines += 1
+
+
+# ---------------- Sinks ----------------
+class FlagSink:
+    COLUMNS = ["time", "line", "anomaly_score", "percentile", "threshold", "reason_tokens"]
+
+    def __init__(self, out_path: str, sink_url: Optional[str] = None, sink_token: Optional[str] = None):
+        self._fh = sys.stdout if out_path == "-" else open(out_path, "a", newline="", encoding="utf-8")
+        self._csv = csv.writer(self._fh)
+        if self._fh is not sys.stdout and self._fh.tell() == 0:
+            self._csv.writerow(self.COLUMNS)
+        self._session = None
+        self.sink_url = sink_url
+        self.sink_errors = 0
+        if sink_url:
+            import requests
+            self._session = requests.Session()
+            if sink_token:
+                self._session.headers["Authorization"] = f"Bearer {sink_token}"
+
+    def emit(self, rows: List[list]) -> None:
+        if not rows:
+            return
+        self._csv.writerows(rows)
+        self._fh.flush()
+        if self._session is not None:
+            try:
+                r = self._session.post(self.sink_url, json=[dict(zip(self.COLUMNS, row)) for row in rows], timeout=10)
+                if r.status_code >= 300:
+                    self.sink_errors += 1
+            except Exception:
+                self.sink_errors += 1
+
+    def close(self) -> None:
+        if self._fh is not sys.stdout:
+            self._fh.close()
+
+
+# ---------------- Scoring loop ----------------
+class StreamScorer:
+    def __init__(self, bundle: "ad.ModelBundle", rebaseliner: Rebaseliner, sink: FlagSink,
+                 batch_lines: int, max_latency: float):
+        self.bundle = bundle
+        self.rebaseliner = rebaseliner
+        self.sink = sink
+        self.batch_lines = batch_lines
+        self.max_latency = max_latency
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {"lines": 0, "parsed": 0, "flagged": 0, "batches": 0}
+
+    def process(self, lines: List[bytes]) -> None:
+        batch = parse_bytes(b"\n".join(lines), keep_raw=True)
+        self.stats["lines"] += len(lines)
+        if not len(batch):
+            return
+        X, reasons = ad.extract_features_batch(batch)
+        scores, _ = self.bundle.score(X)
+        thr = self.rebaseliner.threshold
+        flags = scores >= thr
+        ref = self.rebaseliner.reference
+        pct = ref.rank(scores[flags]) if ref is not None and flags.any() else np.full(int(flags.sum()), np.nan)
+        now = datetime.datetime.utcnow().isoformat() + "Z"
+        idx = np.flatnonzero(flags)
+        self.sink.emit([[now, batch.raw[i], f"{scores[i]:.6f}", f"{p:.5f}", f"{thr:.6f}", reasons[i]]
+                        for i, p in zip(idx, pct)])
+        self.rebaseliner.offer(scores)
+        self.stats["parsed"] += len(batch)
+        self.stats["flagged"] += len(idx)
+
+    def run(self, q: "queue.Queue", stop: threading.Event) -> None:
+        while not stop.is_set():
+            try:
+                item = q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _EOF:
+                break
+            t_first, line = item
+            lines = [line]
+            deadline = t_first + self.max_latency
+            eof = False
+            while len(lines) < self.batch_lines:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = q.get_nowait() if remaining <= 0 else q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _EOF:
+                    eof = True
+                    break
+                lines.append(item[1])
+            self.process(lines)
+            self.latencies.append(time.monotonic() - t_first)
+            self.stats["batches"] += 1
+            if eof:
+                break
+
+    def report(self) -> dict:
+        lat = np.asarray(self.latencies) * 1000.0
+        return {
+            **self.stats,
+            "latency_ms": {"p50": round(float(np.percentile(lat, 50)), 2), "p99": round(float(np.percentile(lat, 99)), 2),
+                           "max": round(float(lat.max()), 2)} if len(lat) else None,
+            "threshold": self.rebaseliner.threshold,
+            "rebaselines": self.rebaseliner.rebaselines,
+            "rebaseline_dropped": self.rebaseliner.dropped,
+            "sink_errors": self.sink.sink_errors,
+            "model": self.bundle.version,
+        }
+
+
+def load_quantile(vault: "ad.VaultClient") -> float:
+    raw = vault.get_secret("ANOMALY_THRESHOLD_QUANTILE")
+    try:
+        return float(raw.decode("utf-8")) if raw else DEFAULT_QUANTILE
+    except ValueError:
+        return DEFAULT_QUANTILE
+
+
+def add_stream_args(ap) -> None:
+    ap.add_argument("source", help="Access log to follow, or - for stdin")
+    ap.add_argument("--model", default=ad.DEFAULT_MODEL_DIR, help="Bundle dir, or a model dir with LATEST")
+    ap.add_argument("--out", default="flagged_stream.csv", help="CSV of flagged lines (appended), - for stdout")
+    ap.add_argument("--sink-url", help="Also POST flagged lines as JSON to this URL")
+    ap.add_argument("--quantile", type=float, help=f"Flag scores above this reference quantile (default {DEFAULT_QUANTILE})")
+    ap.add_argument("--batch-lines", type=int, default=512)
+    ap.add_argument("--max-latency-ms", type=float, default=200.0, help="Close a micro-batch this long after its first line")
+    ap.add_argument("--queue-lines", type=int, default=65536, help="Reader -> scorer queue bound (backpressure)")
+    ap.add_argument("--rebaseline-s", type=float, default=300.0, help="Threshold refresh interval; 0 disables")
+    ap.add_argument("--windows", type=int, default=12, help="Rolling windows merged with the training reference")
+    ap.add_argument("--from-start", action="store_true", help="Read an existing file from the beginning")
+    ap.add_argument("--stats-interval", type=float, default=30.0)
+
+
+def run_stream(args) -> None:
+    vault = ad.get_vault()
+    bundle = ad.ModelBundle(args.model)
+    sketch = bundle.manifest.get("reference_sketch")
+    reference = QuantileSketch.from_dict(sketch) if sketch else None
+    quantile = args.quantile if args.quantile is not None else load_quantile(vault)
+    # Bundles without a sketch fall back to the z threshold over the training score stats
+    zs = bundle.manifest["score_stats"]["combined"]
+    fallback = zs["mean"] + ad.load_threshold_z(vault) * zs["std"]
+
+    stop = threading.Event()
+    q: "queue.Queue" = queue.Queue(maxsize=args.queue_lines)
+    rebaseliner = Rebaseliner(reference, quantile, fallback, args.rebaseline_s, args.windows, stop)
+    rebaseliner.start()
+    token = vault.get_secret("ANOMALY_SINK_TOKEN") if args.sink_url else None
+    sink = FlagSink(args.out, args.sink_url, token.decode("utf-8") if token else None)
+    scorer = StreamScorer(bundle, rebaseliner, sink, args.batch_lines, args.max_latency_ms / 1000.0)
+
+    if args.source == "-":
+        reader = threading.Thread(target=read_stdin, args=(q, stop), daemon=True)
+    else:
+        reader = threading.Thread(target=follow, args=(args.source, q, stop, args.from_start), daemon=True)
+    reader.start()
+
+    def stats_loop():
+        while not stop.wait(args.stats_interval):
+            print(json.dumps(scorer.report()), file=sys.stderr, flush=True)
+    threading.Thread(target=stats_loop, daemon=True).start()
+
+    print(f"Streaming {args.source} with model {bundle.version} "
+          f"(quantile={quantile}, threshold={rebaseliner.threshold:.6f})", file=sys.stderr, flush=True)
+    try:
+        scorer.run(q, stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        sink.close()
+        print(json.dumps(scorer.report()), file=sys.stderr, flush=True)
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(prog="stream_scorer.py")
+    add_stream_args(ap)
+    run_stream(ap.parse_args())
+
+
+if __name__ == "__main__":
+    main()
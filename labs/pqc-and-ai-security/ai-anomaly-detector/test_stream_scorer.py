@@ -0,0 +1,61 @@
+"""Rebaseliner stability on stationary scores (run: python3 -m pytest test_stream_scorer.py)."""
+
+import threading
+import time
+
+import numpy as np
+
+from stream_scorer import QuantileSketch, Rebaseliner  # stream_scorer puts ../common on sys.path
+
+QUANTILE = 0.995
+
+
+def _rebaseliner(rng: np.random.Generator) -> Rebaseliner:
+    reference = QuantileSketch(seed=1)
+    reference.update(rng.standard_normal(200_000))
+    return Rebaseliner(reference, QUANTILE, fallback=0.0, interval=60.0, windows=12, stop=threading.Event())
+
+
+def test_threshold_stays_put_on_stationary_scores():
+    rng = np.random.default_rng(7)
+    rb = _rebaseliner(rng)
+    start = rb.threshold
+    flag_rates = []
+    for _ in range(30):
+        scores = rng.standard_normal(50_000)
+        flag_rates.append(float((scores >= rb.threshold).mean()))
+        rb.offer(scores)
+        rb.rebaseline()
+    assert rb.rebaselines == 30
+    assert abs(rb.threshold - start) < 0.05, (start, rb.threshold)
+    assert abs(np.mean(flag_rates[-10:]) - (1 - QUANTILE)) < 0.002, flag_rates[-10:]
+
+
+def test_threshold_follows_a_shifted_distribution():
+    rng = np.random.default_rng(11)
+    rb = _rebaseliner(rng)
+    start = rb.threshold
+    for _ in range(12):
+        rb.offer(rng.standard_normal(50_000) + 1.0)
+        rb.rebaseline()
+    assert rb.threshold > start + 0.3
+
+
+def test_background_thread_rebaselines_under_continuous_offers():
+    rng = np.random.default_rng(3)
+    stop = threading.Event()
+    reference = QuantileSketch(seed=1)
+    reference.update(rng.standard_normal(200_000))
+    rb = Rebaseliner(reference, QUANTILE, fallback=0.0, interval=0.3, windows=12, stop=stop)
+    start = rb.threshold
+    rb.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:  # an offer every 50 ms: the inbox is never idle for 1 s
+            rb.offer(rng.standard_normal(5_000) + 2.0)
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        rb.join(timeout=5)
+    assert rb.rebaselines >= 3, rb.rebaselines
+    assert rb.threshold > start + 0.3, (start, rb.threshold)
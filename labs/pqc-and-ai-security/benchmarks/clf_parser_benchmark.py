@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+clf_parser_benchmark.py
+Lines/s for common/clf_parser.py against the original per-line parser, on a generated access log.
+
+- Generates --gb of Common Log Format traffic (default 5 GB; reused if --path already has that size)
+- legacy:   text-mode readline + str regex + datetime.utcnow() per line (what both scripts used to do),
+            timed over the first --baseline-mb and reported as a rate
+- parallel: iter_batches() over the whole file with --workers processes
+- Both parse the same leading window and their row counts are compared before timing the full run
+
+Usage:
+  python3 clf_parser_benchmark.py --gb 5 --workers 8
+  python3 clf_parser_benchmark.py --gb 0.5 --path /tmp/access.log --keep
+"""
+
+import argparse, datetime, json, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from clf_parser import CLF_REGEX, iter_batches  # noqa: E402
+
+PATHS = ("/index.html", "/products?page=%d", "/api/v1/items/%d", "/search?q=shoes+%d", "/static/app.%d.js",
+         "/search?q=1%%27%%20or%%20%%271%%27%%3D%%271&p=%d", "/../../etc/passwd?%d")
+AGENTS = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64)", "curl/8.0", "python-requests/2.31",
+          "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36")
+METHODS = ("GET", "GET", "GET", "POST", "PUT", "DELETE")
+
+
+def generate(path: str, size: int) -> None:
+    block = []
+    for i in range(20000):
+        p = PATHS[i % len(PATHS)]
+        block.append('10.%d.%d.%d - - [10/Jul/2025:%02d:%02d:%02d -0400] "%s %s HTTP/1.1" %d %s "-" "%s"\n' % (
+            i % 250, i // 250 % 250, i % 13, i // 3600 % 24, i // 60 % 60, i % 60, METHODS[i % len(METHODS)],
+            p % i if "%d" in p else p, (200, 200, 404, 401, 500)[i % 5], "-" if i % 97 == 0 else 100 + i % 9000,
+            AGENTS[i % len(AGENTS)]))
+    data = "".join(block).encode()
+    with open(path, "wb") as f:
+        written = 0
+        while written < size:
+            f.write(data)
+            written += len(data)
+
+
+def legacy(path: str, limit: int) -> dict:
+    rows = lines = 0
+    t0 = time.perf_counter()
+    with open(path, "r", encoding="utf-8") as f:
+        read = 0
+        for line in f:
+            read += len(line)
+            lines += 1
+            m = CLF_REGEX.match(line.strip())
+            if m:
+                d = m.groupdict()
+                d["status"] = int(d["status"])
+                d["bytes"] = 0 if d["bytes"] == "-" else int(d["bytes"])
+                d["@ingest_time"] = datetime.datetime.utcnow().isoformat() + "Z"
+                rows += 1
+            if read >= limit:
+                break
+    elapsed = time.perf_counter() - t0
+    return {"bytes": read, "lines": lines, "rows": rows, "elapsed_s": round(elapsed, 2),
+            "lines_per_s": round(lines / elapsed), "mb_per_s": round(read / elapsed / 1e6, 1)}
+
+
+def parallel(path: str, workers: int, end=None) -> dict:
+    rows = lines = 0
+    t0 = time.perf_counter()
+    for batch in iter_batches(path, workers=workers, end=end):
+        rows += len(batch)
+        lines += batch.line_count
+    elapsed = time.perf_counter() - t0
+    size = end or os.path.getsize(path)
+    return {"bytes": size, "lines": lines, "rows": rows, "elapsed_s": round(elapsed, 2),
+            "lines_per_s": round(lines / elapsed), "mb_per_s": round(size / elapsed / 1e6, 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--gb", type=float, default=5.0)
+    ap.add_argument("--path", help="Log file to generate/reuse (default: temp file)")
+    ap.add_argument("--keep", action="store_true", help="Keep the generated file")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--baseline-mb", type=int, default=256, help="Legacy parser is timed on this prefix")
+    args = ap.parse_args()
+
+    size = int(args.gb * (1 << 30))
+    path = args.path or os.path.join(tempfile.gettempdir(), "clf_benchmark_access.log")
+    try:
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            t0 = time.perf_counter()
+            generate(path, size)
+            print(f"generated {os.path.getsize(path) / 1e9:.2f} GB in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+        base = legacy(path, args.baseline_mb << 20)
+        check = parallel(path, args.workers, end=base["bytes"])
+        full = parallel(path, args.workers)
+    finally:
+        if not args.keep and not args.path:
+            os.remove(path)
+
+    print(json.dumps({
+        "file_bytes": full["bytes"], "workers": args.workers, "legacy": base, "parallel": full,
+        "rows_match_on_prefix": check["rows"] == base["rows"],
+        "speedup": round(full["lines_per_s"] / base["lines_per_s"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sql_ingest_benchmark.py
+Rows/s for the SQL backend of scripts/ingest_logs.py, using SQLite as a local stand-in for Azure SQL.
+
+- baseline: one execute per line, single commit at the end (the original ingest_sql loop)
+- bulk:     executemany in --chunk-rows chunks, commit per chunk
+- merge:    bulk + temp-table stage and merge on line_key; run twice to show the re-run inserts 0 rows
+- parallel: bulk over --parallel byte ranges / connections (SQLite serializes writers, so this mostly
+            measures parse parallelism; against Azure SQL the inserts overlap too)
+
+In-process SQLite has no network, so --rtt-ms adds a sleep per statement round trip (execute, and
+executemany as one array-bound call like pyodbc fast_executemany) to model a remote server.
+
+Usage:
+  python3 sql_ingest_benchmark.py --lines 200000 --chunk-rows 5000 --parallel 4 --rtt-ms 0.5
+"""
+
+import argparse, json, os, sys, sqlite3, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+import ingest_logs  # noqa: E402
+from ingest_logs import SQL_DIALECTS, ingest_sql_bulk, parse_line, sql_ensure_table  # noqa: E402
+
+RTT_S = 0.0
+
+
+class RemoteCursor:
+    """sqlite3 cursor that pays one simulated round trip per execute / executemany call."""
+
+    def __init__(self, cursor):
+        self._cur = cursor
+
+    def execute(self, *a):
+        time.sleep(RTT_S)
+        return self._cur.execute(*a)
+
+    def executemany(self, *a):
+        time.sleep(RTT_S)
+        return self._cur.executemany(*a)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class RemoteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return RemoteCursor(self._conn.cursor())
+
+    def commit(self):
+        time.sleep(RTT_S)
+        self._conn.commit()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def remote_connect(target: dict):
+    return RemoteConnection(sqlite3.connect(target["database"], timeout=300))
+
+LINE = ('10.%d.%d.%d - - [10/Jul/2025:13:%02d:%02d -0400] "GET /app/item?id=%d HTTP/1.1" %d %d '
+        '"https://example.com/" "Mozilla/5.0 (X11; Linux x86_64)"\n')
+
+
+def generate(path: str, lines: int) -> None:
+    with open(path, "w") as f:
+        for i in range(lines):
+            f.write(LINE % (i % 250, i // 250 % 250, i % 7, i // 60 % 60, i % 60, i,
+                            (200, 404, 500)[i % 3], 100 + i % 5000))
+
+
+def baseline(target: dict, log_path: str) -> dict:
+    sql_ensure_table(target)
+    t0 = time.monotonic()
+    conn = remote_connect(target)
+    cur = conn.cursor()
+    rows = 0
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            doc = parse_line(line)
+            if not doc:
+                continue
+            cur.execute(SQL_DIALECTS["sqlite"]["insert"],
+                        (doc["ip"], doc["ts"], doc["method"], doc["path"], doc["proto"], doc["status"],
+                         doc["bytes"], doc["ref"], doc["ua"], None, "now"))
+            rows += 1
+    conn.commit()
+    conn.close()
+    elapsed = time.monotonic() - t0
+    return {"rows": rows, "elapsed_s": round(elapsed, 2), "rows_per_s": round(rows / elapsed, 1)}
+
+
+def count(db: str) -> int:
+    conn = sqlite3.connect(db)
+    n = conn.execute("SELECT COUNT(*) FROM HttpAccessLog").fetchone()[0]
+    conn.close()
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=200000)
+    ap.add_argument("--chunk-rows", type=int, default=5000)
+    ap.add_argument("--parallel", type=int, default=4)
+    ap.add_argument("--rtt-ms", type=float, default=0.5, help="Simulated round trip per statement")
+    args = ap.parse_args()
+
+    global RTT_S
+    RTT_S = args.rtt_ms / 1000.0
+    ingest_logs.sql_connect = remote_connect  # worker processes are forked and inherit this
+
+    results = {}
+    with tempfile.TemporaryDirectory() as d:
+        log_path = os.path.join(d, "access.log")
+        generate(log_path, args.lines)
+
+        def target(name):
+            return {"dialect": "sqlite", "database": os.path.join(d, f"{name}.db")}
+
+        results["baseline"] = baseline(target("baseline"), log_path)
+        results["bulk"] = ingest_sql_bulk(target("bulk"), log_path, args.chunk_rows)
+        results["merge"] = ingest_sql_bulk(target("merge"), log_path, args.chunk_rows, merge=True)
+        results["merge_rerun"] = ingest_sql_bulk(target("merge"), log_path, args.chunk_rows, merge=True)
+        results["merge_rerun"]["table_rows"] = count(target("merge")["database"])
+        results["parallel"] = ingest_sql_bulk(target("parallel"), log_path, args.chunk_rows, parallel=args.parallel)
+
+    base = results["baseline"]["rows_per_s"]
+    for r in results.values():
+        r["speedup"] = round(r["rows_per_s"] / base, 2) if base else None
+    print(json.dumps({"lines": args.lines, "chunk_rows": args.chunk_rows, "rtt_ms": args.rtt_ms,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
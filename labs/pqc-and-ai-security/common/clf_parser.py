@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+clf_parser.py
+Shared Common Log Format parser for scripts/ingest_logs.py and ai-anomaly-detector/anomaly_detector.py.
+
+- The file is mmap'd and split into newline-aligned byte ranges
+- Ranges are parsed in a process pool: one decode and one regex findall() per range, columns built
+  with zip/compress (no per-line Python work); small files are parsed in-process
+- Timestamps go through a per-minute cache: "10/Jul/2025:13:55:36 -0400" costs one dict lookup + add
+- Results are columnar batches (one list/array per field) in file order, not one dict per line
+
+Usage (library):
+  from clf_parser import iter_batches
+  for batch in iter_batches("access.log", workers=8):
+      batch.path, batch.status, batch.epoch, ...
+"""
+
+import os, re, gc, mmap, datetime
+from itertools import accumulate, compress
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Text regex, kept for single-line callers
+CLF_REGEX = re.compile(
+    r'(?P<ip>\S+)\s+\S+\s+\S+\s+\[(?P<ts>[^\]]+)\]\s+"(?P<method>\S+)\s+(?P<path>\S+)\s+(?P<proto>[^"]+)"\s+(?P<status>\d{3})\s+(?P<bytes>\S+)\s+"(?P<ref>[^"]*)"\s+"(?P<ua>[^"]*)"'
+)
+
+# Same grammar wrapped so that it matches every line (re.M): group 1 is the whole line and the field
+# groups are empty when the line is not CLF. One findall() per range therefore returns one tuple per
+# line, and line numbers / byte offsets follow from the tuple index. Fields cannot span a newline;
+# bytes keeps only the leading digits ("-" -> empty -> 0).
+CLF_LINES = re.compile(
+    r'^(?P<line>(?:[ \t]*(?P<ip>[^\s]+)[ \t]+[^\s]+[ \t]+[^\s]+[ \t]+\[(?P<ts>[^\]\n]+)\][ \t]+"(?P<method>[^\s]+)[ \t]+'
+    r'(?P<path>[^\s]+)[ \t]+(?P<proto>[^"\n]+)"[ \t]+(?P<status>\d{3})[ \t]+(?P<bytes>\d*)[^\s]*[ \t]+'
+    r'"(?P<ref>[^"\n]*)"[ \t]+"(?P<ua>[^"\n]*)")?[^\n]*)',
+    re.M,
+)
+
+STR_FIELDS = ("ip", "ts", "method", "path", "proto", "ref", "ua")
+CHUNK_BYTES = 32 << 20
+_MONTHS = {m: i for i, m in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    m = CLF_REGEX.match(line.strip())
+    if not m:
+        return None
+    d = m.groupdict()
+    d["status"] = int(d["status"])
+    d["bytes"] = 0 if d["bytes"] == "-" else int(d["bytes"])
+    return d
+
+
+class TimestampCache:
+    """CLF timestamp -> UTC epoch seconds, parsing each distinct (minute, offset) only once."""
+
+    def __init__(self):
+        self._minutes: Dict[str, float] = {}
+
+    def epoch(self, ts: str) -> float:
+        # dd/Mon/yyyy:HH:MM:SS +zzzz
+        key = ts[:17] + ts[20:]
+        base = self._minutes.get(key)
+        if base is None:
+            try:
+                day, mon, rest = ts[:17].split("/")
+                year, hh, mm = rest.split(":")
+                tz = ts[21:26]
+                off = (int(tz[1:3]) * 60 + int(tz[3:5])) * (-1 if tz[:1] == "-" else 1)
+                dt = datetime.datetime(int(year), _MONTHS[mon], int(day), int(hh), int(mm),
+                                       tzinfo=datetime.timezone(datetime.timedelta(minutes=off)))
+                base = dt.timestamp()
+            except (ValueError, KeyError, IndexError):
+                base = float("nan")
+            self._minutes[key] = base
+        try:
+            return base + int(ts[18:20])
+        except ValueError:
+            return float("nan")
+
+
+class ClfBatch:
+    """
+    Columnar parse result for one byte range [start, end). String fields are lists of str;
+    status/bytes/epoch/offset/line are array.array (np.frombuffer() views them without copying).
+    offset = file byte offset of each matched line; line = line index relative to start.
+    """
+
+    def __init__(self, start: int, end: int):
+        self.start, self.end = start, end
+        self.ip: List[str] = []
+        self.ts: List[str] = []
+        self.method: List[str] = []
+        self.path: List[str] = []
+        self.proto: List[str] = []
+        self.ref: List[str] = []
+        self.ua: List[str] = []
+        self.status = array("i")
+        self.bytes = array("q")
+        self.epoch = array("d")
+        self.offset = array("q")
+        self.line = array("q")
+        self.raw: Optional[List[str]] = None
+        self.line_count = 0  # lines in the range, matched or not
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        d = {f: getattr(self, f)[i] for f in STR_FIELDS}
+        d["status"] = self.status[i]
+        d["bytes"] = self.bytes[i]
+        return d
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Dict per line in the parse_line() shape, for row-oriented consumers."""
+        cols = [getattr(self, f) for f in STR_FIELDS]
+        for i, vals in enumerate(zip(*cols)):
+            d = dict(zip(STR_FIELDS, vals))
+            d["status"] = self.status[i]
+            d["bytes"] = self.bytes[i]
+            yield d
+
+
+def split_ranges(path: str, chunk_bytes: int = CHUNK_BYTES, start: int = 0,
+                 end: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Newline-aligned byte ranges of ~chunk_bytes covering [start, end) (start must be a line start)."""
+    size = os.path.getsize(path)
+    end = size if end is None else min(end, size)
+    if end <= start:
+        return []
+    bounds = [start]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start + chunk_bytes
+        while pos < end:
+            nl = mm.find(b"\n", pos, end)
+            if nl < 0:
+                break
+            bounds.append(nl + 1)
+            pos = nl + 1 + chunk_bytes
+    if bounds[-1] < end:
+        bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def parse_range(path: str, start: int, end: int, keep_raw: bool = False) -> ClfBatch:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        buf = mm[start:end]
+    return parse_bytes(buf, start, keep_raw)
+
+
+def parse_bytes(buf: bytes, start: int = 0, keep_raw: bool = False) -> ClfBatch:
+    """Parse newline-separated lines already in memory (offsets are reported relative to start)."""
+    # findall() allocates a tuple per line; pausing the cyclic GC avoids repeated full-heap passes
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _parse_bytes(buf, start, keep_raw)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _parse_bytes(buf: bytes, start: int, keep_raw: bool) -> ClfBatch:
+    b = ClfBatch(start, start + len(buf))
+    # One decode per range; str findall measured faster than bytes findall + per-column decodes
+    rows = CLF_LINES.findall(buf.decode("utf-8", "replace"))
+    if buf.endswith(b"\n") or not buf:
+        rows.pop()  # empty match after the final newline
+    b.line_count = len(rows)
+    if not rows:
+        return b
+    line, ip, ts, method, path_, proto, status, nbytes, ref, ua = zip(*rows)
+    if "" in status:  # some lines are not CLF: keep only the matched ones
+        def pick(col):
+            return list(compress(col, status))
+    else:
+        pick = list
+
+    b.ip, b.ts, b.method, b.path, b.proto, b.ref, b.ua = map(pick, (ip, ts, method, path_, proto, ref, ua))
+    b.status = array("i", map(int, pick(status)))
+    # "0" prefix turns the empty "-" case into a valid literal, so int() stays in C
+    b.bytes = array("q", map(int, ("0" + "\n0".join(pick(nbytes))).split("\n")))
+    tc = TimestampCache()
+    lut = {t: tc.epoch(t) for t in set(b.ts)}
+    b.epoch = array("d", map(lut.__getitem__, b.ts))
+    # Byte lengths from the undecoded buffer (decode errors change character counts, not line counts)
+    b.offset = array("q", pick(accumulate(map((1).__add__, map(len, buf.split(b"\n"))), initial=start)))
+    b.line = array("q", pick(range(len(rows))))
+    if keep_raw:
+        b.raw = [r.strip() for r in pick(line)]
+    return b
+
+
+def _parse_job(job):
+    return parse_range(*job)
+
+
+def iter_batches(path: str, workers: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES,
+                 keep_raw: bool = False, start: int = 0, end: Optional[int] = None) -> Iterator[ClfBatch]:
+    """
+    Yield ClfBatch objects in file order. workers=None uses every CPU; a single range or workers=1
+    parses in-process. At most 2 * workers ranges are in flight, so memory stays bounded on huge files.
+    """
+    ranges = split_ranges(path, chunk_bytes, start, end)
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1:
+        for s, e in ranges:
+            yield parse_range(path, s, e, keep_raw)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        todo = iter(ranges)
+        for s, e in todo:
+            pending.append(pool.submit(_parse_job, (path, s, e, keep_raw)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            batch = pending.popleft().result()
+            nxt = next(todo, None)
+            if nxt:
+                pending.append(pool.submit(_parse_job, (path, nxt[0], nxt[1], keep_raw)))
+            yield batch
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fake_vault_server.py
+Local stand-in for HashiCorp Vault's KV v2 read API, for exercising vault_client.py without a real vault.
+
+- GET /v1/<mount>/data/<name> with X-Vault-Token -> {"data": {"data": {<name>: value}}}; 403 on a bad token, 404 if unknown
+- GET /_stats -> per-secret request counts (to check caching / prefetch behaviour)
+- Optional --latency-ms per request, to make prefetch concurrency visible
+
+Usage:
+  python3 fake_vault_server.py --port 8200 --token dev-token --secret HKDF_SALT=c2FsdA== --secret ANOMALY_THRESHOLD_Z=2.0
+  VAULT_ADDR=http://127.0.0.1:8200 VAULT_TOKEN=dev-token python3 ../pqc-demo/pqc_key_exchange.py
+Library:
+  with FakeVault({"HKDF_SALT": "..."}) as fv:  # sets nothing globally; use fv.addr / fv.token
+      ...
+"""
+
+import argparse, json, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+class FakeVault:
+    def __init__(self, secrets: Dict[str, str], token: str = "dev-token", mount: str = "secret",
+                 host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+        self.secrets, self.token, self.mount, self.latency = dict(secrets), token, mount, latency_ms / 1000.0
+        self.requests: Counter = Counter()
+        fv = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: Dict) -> None:
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/_stats":
+                    return self._send(200, dict(fv.requests))
+                prefix = f"/v1/{fv.mount}/data/"
+                if not self.path.startswith(prefix):
+                    return self._send(404, {"errors": []})
+                name = self.path[len(prefix):].split("?")[0]
+                fv.requests[name] += 1
+                if fv.latency:
+                    time.sleep(fv.latency)
+                if self.headers.get("X-Vault-Token") != fv.token:
+                    return self._send(403, {"errors": ["permission denied"]})
+                if name not in fv.secrets:
+                    return self._send(404, {"errors": []})
+                self._send(200, {"data": {"data": {name: fv.secrets[name]}, "metadata": {"version": 1}}})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.addr = f"http://{host}:{self.server.server_address[1]}"
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FakeVault":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeVault":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8200)
+    ap.add_argument("--token", default="dev-token")
+    ap.add_argument("--mount", default="secret")
+    ap.add_argument("--secret", action="append", default=[], metavar="NAME=VALUE")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    args = ap.parse_args()
+    secrets = dict(s.split("=", 1) for s in args.secret)
+    fv = FakeVault(secrets, args.token, args.mount, args.host, args.port, args.latency_ms)
+    print(f"Fake vault on {fv.addr} (mount '{args.mount}', {len(secrets)} secrets). Ctrl+C to stop.")
+    try:
+        fv.server.serve_forever()
+    except KeyboardInterrupt:
+        fv.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
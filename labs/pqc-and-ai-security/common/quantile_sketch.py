@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+quantile_sketch.py
+Mergeable KLL-style quantile sketch for anomaly score distributions.
+
+- Fixed memory (~3k values for k=1024) regardless of how many scores are added
+- Level h holds items of weight 2^h; when the sketch is over budget the lowest over-full level is
+  sorted and every other item (random offset) is promoted; rank error is ~0.1-0.2% for k=1024,
+  which keeps tail thresholds (q=0.99+) usable
+- Sketches merge (training reference + rolling windows) and serialize to plain JSON lists,
+  so they can live in a model bundle manifest
+
+Usage (library):
+  sk = QuantileSketch(); sk.update(scores)
+  threshold = sk.quantile(0.995); pct = sk.rank(new_scores)
+"""
+
+import math, random
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class QuantileSketch:
+    def __init__(self, k: int = 1024, seed: Optional[int] = None):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = random.Random(seed)
+
+    def _capacity(self, h: int) -> int:
+        return max(2, int(math.ceil(self.k * (2.0 / 3.0) ** (len(self.levels) - h - 1))))
+
+    def _compress(self) -> None:
+        # Compact only while the sketch as a whole is over budget, lowest over-full level first
+        while sum(map(len, self.levels)) > sum(map(self._capacity, range(len(self.levels)))):
+            h = next(i for i, lvl in enumerate(self.levels) if len(lvl) > self._capacity(i))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            lvl = np.sort(self.levels[h])
+            keep = lvl[:0]
+            if len(lvl) % 2:  # odd: one random item stays behind at this level
+                i = self._rng.randrange(len(lvl))
+                keep, lvl = lvl[i:i + 1], np.delete(lvl, i)
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], lvl[self._rng.randrange(2)::2]])
+
+    def update(self, values) -> None:
+        v = np.asarray(values, dtype=np.float64).ravel()
+        v = v[np.isfinite(v)]
+        if not len(v):
+            return
+        self.levels[0] = np.concatenate([self.levels[0], v])
+        self.n += len(v)
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, lvl in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], lvl])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def copy(self) -> "QuantileSketch":
+        c = QuantileSketch(self.k)
+        c.n = self.n
+        c.levels = [lvl.copy() for lvl in self.levels]
+        return c
+
+    def _weighted(self):
+        vals = np.concatenate(self.levels)
+        w = np.concatenate([np.full(len(lvl), 2.0 ** h) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(vals, kind="stable")
+        return vals[order], np.cumsum(w[order])
+
+    def quantile(self, q: float) -> float:
+        vals, cw = self._weighted()
+        if not len(vals):
+            return float("nan")
+        i = int(np.searchsorted(cw, q * cw[-1], side="left"))
+        return float(vals[min(i, len(vals) - 1)])
+
+    def rank(self, x) -> np.ndarray:
+        """Fraction of the reference weight <= x (vectorized)."""
+        vals, cw = self._weighted()
+        x = np.asarray(x, dtype=np.float64)
+        if not len(vals):
+            return np.full(x.shape, np.nan)
+        i = np.searchsorted(vals, x, side="right")
+        return np.where(i > 0, cw[np.maximum(i - 1, 0)] / cw[-1], 0.0)
+
+    def to_dict(self) -> Dict:
+        return {"k": self.k, "n": self.n, "levels": [lvl.tolist() for lvl in self.levels]}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "QuantileSketch":
+        sk = cls(d.get("k", 1024))
+        sk.n = int(d.get("n", 0))
+        sk.levels = [np.asarray(lvl, dtype=np.float64) for lvl in d.get("levels", [[]])] or [np.empty(0)]
+        return sk
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+vault_client.py
+Shared secret resolution for pqc-demo/pqc_key_exchange.py, ai-anomaly-detector/ and scripts/ingest_logs.py.
+
+- Priority order:
+    1) Azure Key Vault via DefaultAzureCredential (AZURE_KEY_VAULT_URI)
+    2) HashiCorp Vault KV v2 (VAULT_ADDR + VAULT_TOKEN, mount VAULT_KV_MOUNT, default "secret");
+       hvac when installed, otherwise one plain HTTPS GET against the KV v2 API
+    3) Environment variable with the same name as the secret (local dev)
+- SDKs are imported on the first lookup that needs them, and one credential/client is shared per process
+- Per-process TTL cache (VAULT_CACHE_TTL seconds, default 300); misses are cached too
+- Optional encrypted on-disk cache for short-lived CLI runs: VAULT_DISK_CACHE=<path> plus
+  VAULT_DISK_CACHE_KEY=<base64 32 bytes> (AES-GCM via 'cryptography'; file mode 0600). Only vault
+  hits are written, never env values.
+- prefetch([...]) resolves a declared list of secrets concurrently
+
+Usage (library):
+  from vault_client import get_vault
+  vault = get_vault()
+  vault.prefetch(["HKDF_SALT", "ANOMALY_THRESHOLD_Z"])
+  salt = vault.get_secret("HKDF_SALT")      # bytes or None
+  endpoint = vault.get("COSMOS_ENDPOINT")   # str or None
+"""
+
+import os, json, time, base64, atexit, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_TTL = 300.0
+PREFETCH_WORKERS = 8
+HTTP_TIMEOUT = 10
+
+_MISS = object()
+
+
+class VaultClient:
+    def __init__(self, ttl: Optional[float] = None, disk_cache: Optional[str] = None,
+                 disk_cache_key: Optional[bytes] = None):
+        self.azure_uri = os.getenv("AZURE_KEY_VAULT_URI")  # e.g., "https://my-kv.vault.azure.net/"
+        self.hvault_addr = os.getenv("VAULT_ADDR")         # e.g., "https://vault.internal:8200"
+        self.hvault_token = os.getenv("VAULT_TOKEN")       # never hardcode; injected securely
+        self.kv_mount = os.getenv("VAULT_KV_MOUNT", "secret")
+        self.ttl = float(os.getenv("VAULT_CACHE_TTL", DEFAULT_TTL)) if ttl is None else ttl
+
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[float, Optional[bytes]]] = {}  # name -> (monotonic expiry, value)
+        self._azure_client = _MISS
+        self._hvac_client = _MISS
+        self.stats = {"hits": 0, "misses": 0, "azure": 0, "hashicorp": 0, "env": 0, "disk": 0}
+
+        self._disk_path = disk_cache or os.getenv("VAULT_DISK_CACHE")
+        key = disk_cache_key or _b64(os.getenv("VAULT_DISK_CACHE_KEY"))
+        self._disk_aead = _aesgcm(key) if self._disk_path and key else None
+        self._disk: Optional[Dict[str, Tuple[float, str]]] = None  # name -> (wall-clock expiry, b64 value)
+        self._disk_dirty = False
+        if self._disk_aead is not None:
+            atexit.register(self.flush)
+
+    # ---- backends (lazy) ----
+    def _azure(self):
+        if self._azure_client is _MISS:
+            with self._lock:
+                if self._azure_client is _MISS:
+                    client = None
+                    if self.azure_uri:
+                        try:
+                            from azure.identity import DefaultAzureCredential
+                            from azure.keyvault.secrets import SecretClient
+                            client = SecretClient(vault_url=self.azure_uri, credential=DefaultAzureCredential())
+                        except Exception:
+                            client = None  # missing SDK or not configured
+                    self._azure_client = client
+        return self._azure_client
+
+    def _hvac(self):
+        if self._hvac_client is _MISS:
+            with self._lock:
+                if self._hvac_client is _MISS:
+                    client = None
+                    if self.hvault_addr and self.hvault_token:
+                        try:
+                            import hvac
+                            client = hvac.Client(url=self.hvault_addr, token=self.hvault_token, verify=True)
+                        except ImportError:
+                            client = "http"  # no SDK: talk to the KV v2 HTTP API directly
+                        except Exception:
+                            client = None
+                    self._hvac_client = client
+        return self._hvac_client
+
+    def _from_azure(self, name: str) -> Optional[bytes]:
+        client = self._azure()
+        if client is None:
+            return None
+        try:
+            v = client.get_secret(name)
+            if v and v.value is not None:
+                return v.value.encode("utf-8")
+        except Exception:
+            pass
+        return None
+
+    def _from_hashicorp(self, name: str) -> Optional[bytes]:
+        client = self._hvac()
+        if client is None:
+            return None
+        try:
+            if client == "http":
+                data = self._kv2_http(name)
+            else:
+                resp = client.secrets.kv.v2.read_secret_version(path=name, mount_point=self.kv_mount)
+                data = (resp or {}).get("data", {}).get("data")
+        except Exception:
+            return None
+        # Convention: secret at <mount>/data/<name> with a key named <name> (or "value")
+        val = (data or {}).get(name, (data or {}).get("value"))
+        return val.encode("utf-8") if isinstance(val, str) else None
+
+    def _kv2_http(self, name: str) -> Optional[Dict]:
+        import urllib.error
+        import urllib.request
+        from urllib.parse import quote
+        url = f"{self.hvault_addr.rstrip('/')}/v1/{quote(self.kv_mount)}/data/{quote(name)}"
+        req = urllib.request.Request(url, headers={"X-Vault-Token": self.hvault_token})
+        if os.getenv("VAULT_NAMESPACE"):
+            req.add_header("X-Vault-Namespace", os.environ["VAULT_NAMESPACE"])
+        try:
+            with urllib.request.urlopen(req, timeout=HTTP_TIMEOUT) as r:
+                return json.load(r).get("data", {}).get("data")
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    # ---- encrypted disk cache ----
+    def _disk_load(self) -> Dict[str, Tuple[float, str]]:
+        if self._disk is None:
+            self._disk = {}
+            try:
+                with open(self._disk_path, "rb") as f:
+                    blob = f.read()
+                entries = json.loads(self._disk_aead.decrypt(blob[:12], blob[12:], b"vault-cache-v1"))
+                now = time.time()
+                self._disk = {k: (exp, v) for k, (exp, v) in entries.items() if exp > now}
+            except Exception:
+                pass  # missing, expired key, or tampered: start empty
+        return self._disk
+
+    def flush(self) -> None:
+        """Writes the disk cache if anything changed (also runs at exit)."""
+        with self._lock:
+            if self._disk_aead is None or not self._disk_dirty:
+                return
+            nonce = os.urandom(12)
+            blob = nonce + self._disk_aead.encrypt(nonce, json.dumps(self._disk).encode(), b"vault-cache-v1")
+            tmp = self._disk_path + ".tmp"
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, self._disk_path)
+            self._disk_dirty = False
+
+    # ---- lookups ----
+    def _resolve(self, name: str) -> Optional[bytes]:
+        if self._disk_aead is not None:
+            with self._lock:
+                hit = self._disk_load().get(name)
+            if hit:
+                self.stats["disk"] += 1
+                return base64.b64decode(hit[1])
+        for backend, fetch in (("azure", self._from_azure), ("hashicorp", self._from_hashicorp)):
+            val = fetch(name)
+            if val is not None:
+                self.stats[backend] += 1
+                if self._disk_aead is not None:
+                    with self._lock:
+                        self._disk_load()[name] = (time.time() + self.ttl, base64.b64encode(val).decode())
+                        self._disk_dirty = True
+                return val
+        env_val = os.getenv(name)
+        if env_val:
+            self.stats["env"] += 1
+            return env_val.encode("utf-8")
+        return None
+
+    def get_secret(self, name: str) -> Optional[bytes]:
+        now = time.monotonic()
+        hit = self._cache.get(name)
+        if hit and hit[0] > now:
+            self.stats["hits"] += 1
+            return hit[1]
+        self.stats["misses"] += 1
+        val = self._resolve(name)
+        self._cache[name] = (now + self.ttl, val)
+        return val
+
+    def get(self, name: str) -> Optional[str]:
+        val = self.get_secret(name)
+        return val.decode("utf-8") if val is not None else None
+
+    def prefetch(self, names: Iterable[str], max_workers: int = PREFETCH_WORKERS) -> Dict[str, bool]:
+        """Resolves names concurrently into the cache; returns which were found."""
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(names))) as pool:
+            found = dict(zip(names, (v is not None for v in pool.map(self.get_secret, names))))
+        self.flush()
+        return found
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        if name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(name, None)
+
+
+def _b64(val: Optional[str]) -> Optional[bytes]:
+    try:
+        return base64.b64decode(val) if val else None
+    except Exception:
+        return None
+
+
+def _aesgcm(key: bytes):
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        return AESGCM(key)
+    except Exception:
+        return None  # no 'cryptography' or bad key length: disk cache stays off
+
+
+_shared: Optional[VaultClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_vault() -> VaultClient:
+    """Process-wide client, so every caller shares one credential and one cache."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = VaultClient()
+    return _shared
@@ -5,84 +5,39 @@ PQC Lattice KEM (Kyber) key exchange demo with optional hybrid AES-GCM encryptio
 - No plaintext secrets in code.
 - Secrets (like HKDF salt) are read from a vault (Azure Key Vault or HashiCorp Vault) or env vars.
 - If Kyber isn't installed, the script exits with a clear message.
+- --benchmark runs N key exchanges per scheme across a process pool (Kyber512/768/1024, an X25519
+  baseline and hybrid X25519+Kyber), timing keygen / encaps / decaps / HKDF separately, and emits
+  JSON percentiles and throughput for capacity planning.
+- --encrypt-file / --decrypt-file protect multi-GB archives: Kyber encapsulation to a recipient key,
+  HKDF-derived key and per-chunk nonces, AES-GCM over fixed-size chunks (index + final flag in the AAD)
+  on a thread pool, verified chunk by chunk on decrypt without buffering the file.
 
 Usage:
   python3 pqc_key_exchange.py --message "hello quantum-safe world"
+  python3 pqc_key_exchange.py --benchmark --exchanges 5000 --workers 8 --out kem_benchmark.json
+  python3 pqc_key_exchange.py --benchmark --schemes kyber768,x25519,x25519+kyber768
+  python3 pqc_key_exchange.py --encrypt-file logs.tar archive.pqc --threads 8   # PQC_ARCHIVE_PUBLIC_KEY
+  python3 pqc_key_exchange.py --decrypt-file archive.pqc logs.tar               # PQC_ARCHIVE_SECRET_KEY
 """
 
 import argparse
 import base64
+import importlib
+import json
+import math
 import os
+import platform
 import sys
 import hmac
 import hashlib
-from typing import Optional
+import time
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
-# ---------- Vault integration (no plaintext credentials) ----------
-class VaultClient:
-    """
-    Priority order:
-      1) Azure Key Vault via managed identity / DefaultAzureCredential (if AZURE_KEY_VAULT_URI is set)
-      2) HashiCorp Vault via hvac (if VAULT_ADDR and VAULT_TOKEN are set in environment)
-      3) Environment variable with the same name as the secret (for local dev)
-    """
-    def __init__(self):
-        self.azure_uri = os.getenv("AZURE_KEY_VAULT_URI")  # e.g., "https://my-kv.vault.azure.net/"
-        self.hvault_addr = os.getenv("VAULT_ADDR")         # e.g., "https://vault.internal:8200"
-        self.hvault_token = os.getenv("VAULT_TOKEN")       # never hardcode; injected securely
-
-        self._azure_client = None
-        self._hvac_client = None
-
-        # Lazy init
-        if self.azure_uri:
-            try:
-                from azure.identity import DefaultAzureCredential
-                from azure.keyvault.secrets import SecretClient
-                self._azure_client = SecretClient(
-                    vault_url=self.azure_uri,
-                    credential=DefaultAzureCredential()
-                )
-            except Exception:
-                self._azure_client = None  # missing SDK or not configured
-
-        if self.hvault_addr and self.hvault_token:
-            try:
-                import hvac
-                self._hvac_client = hvac.Client(url=self.hvault_addr, token=self.hvault_token, verify=True)
-            except Exception:
-                self._hvac_client = None
-
-    def get_secret(self, name: str) -> Optional[bytes]:
-        # 1) Azure KV
-        if self._azure_client:
-            try:
-                v = self._azure_client.get_secret(name)
-                if v and v.value is not None:
-                    return v.value.encode("utf-8")
-            except Exception:
-                pass
-        # 2) HashiCorp Vault (KV v2 recommended; using logical.read for simplicity)
-        if self._hvac_client:
-            try:
-                # Expected path convention: secret/data/<name>
-                # If you use a different mount, set env VAR "VAULT_KV_MOUNT" and adapt this path in your environment.
-                mount = os.getenv("VAULT_KV_MOUNT", "secret")
-                path = f"{mount}/data/{name}"
-                resp = self._hvac_client.secrets.kv.v2.read_secret_version(path=name) if hasattr(self._hvac_client.secrets, "kv") else self._hvac_client.read(path)
-                if resp:
-                    data = resp["data"]["data"] if "data" in resp and "data" in resp["data"] else resp.get("data")
-                    if data and name in data:
-                        val = data[name]
-                        if isinstance(val, str):
-                            return val.encode("utf-8")
-            except Exception:
-                pass
-        # 3) Environment variable fallback (for local dev only)
-        env_val = os.getenv(name)
-        if env_val:
-            return env_val.encode("utf-8")
-        return None
+# ---------- Vault integration (no plaintext credentials; shared: ../common/vault_client.py) ----------
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vault_client import VaultClient, get_vault  # noqa: E402
 
 
 # ---------- HKDF (RFC 5869) minimal implementation (no external deps) ----------
@@ -119,22 +74,34 @@ def try_encrypt_with_aesgcm(key: bytes, plaintext: bytes, aad: bytes = b"pqc-ai-
 
 
 # ---------- Kyber (PQC) ----------
+KYBER_VARIANTS = ("kyber512", "kyber768", "kyber1024")
+
+def load_kem(variant: str) -> Optional[Tuple[Callable, Callable, Callable]]:
+    """(generate_keypair, encapsulate, decapsulate) for a pqcrypto Kyber variant, or None if not installed."""
+    # Newer pqcrypto releases ship the standardized names (ml_kem_768); some builds use encrypt/decrypt
+    for modname in (f"pqcrypto.kem.{variant}", f"pqcrypto.kem.ml_kem_{variant[len('kyber'):]}"):
+        try:
+            mod = importlib.import_module(modname)
+        except Exception:
+            continue
+        enc = getattr(mod, "encapsulate", None) or getattr(mod, "encrypt", None)
+        dec = getattr(mod, "decapsulate", None) or getattr(mod, "decrypt", None)
+        if enc and dec:
+            return mod.generate_keypair, enc, dec
+    return None
+
 def kyber_demo(message: bytes, vault: VaultClient):
     # Load a salt from vault (recommended) or generate ephemeral if missing (salt is not secret but should be centrally controlled in prod).
     salt = vault.get_secret("HKDF_SALT") or os.urandom(32)
     context = b"kyber512-handshake"
 
     # Import Kyber KEM
-    try:
-        try:
-            from pqcrypto.kem.kyber512 import generate_keypair, encapsulate, decapsulate
-        except Exception:
-            # Some builds name these differently
-            from pqcrypto.kem.kyber512 import generate_keypair, encrypt as encapsulate, decrypt as decapsulate
-    except Exception as e:
+    kem = load_kem("kyber512")
+    if kem is None:
         print("Kyber KEM library not found. Install 'pqcrypto' and re-run.")
         print("Example: pip install pqcrypto")
         sys.exit(1)
+    generate_keypair, encapsulate, decapsulate = kem
 
     # Server generates keypair
     pk, sk = generate_keypair()  # public key, secret key (bytes)
@@ -172,12 +139,402 @@ def kyber_demo(message: bytes, vault: VaultClient):
     }
 
 
+# ---------- Hybrid combiner ----------
+def hybrid_combine(ss_classical: bytes, ss_pq: bytes, transcript: bytes, salt: bytes, info: bytes,
+                   length: int = 32) -> bytes:
+    """
+    X25519 + KEM session key: HKDF over both shared secrets, with the info string bound to a hash
+    of the public transcript (X25519 public keys + KEM ciphertext). The key stays secure as long as
+    either component is unbroken.
+    """
+    return hkdf(ikm=ss_classical + ss_pq, salt=salt, info=info + hashlib.sha256(transcript).digest(), length=length)
+
+
+# ---------- KEM benchmark engine ----------
+PHASES = ("keygen", "encaps", "decaps", "hkdf", "total")
+DEFAULT_SCHEMES = ("x25519",) + KYBER_VARIANTS + tuple(f"x25519+{v}" for v in KYBER_VARIANTS)
+BENCH_WARMUP = 5      # untimed exchanges per job (imports, allocator, CPU caches)
+JOBS_PER_WORKER = 4   # smaller jobs keep the pool balanced when workers run at different speeds
+
+def load_x25519():
+    try:
+        from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+        from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+    except Exception:
+        return None
+
+    def keygen():
+        sk = X25519PrivateKey.generate()
+        pk = sk.public_key()
+        return sk, pk, pk.public_bytes(Encoding.Raw, PublicFormat.Raw)
+    return keygen
+
+def scheme_unavailable(scheme: str) -> Optional[str]:
+    """Reason a scheme cannot run in this environment, or None."""
+    parts = scheme.split("+")
+    kems = [p for p in parts if p != "x25519"]
+    if not (parts == ["x25519"] or (parts[-1] in KYBER_VARIANTS and parts[:-1] in ([], ["x25519"]))):
+        return "schemes are x25519, a Kyber variant, or x25519+<kyber variant>"
+    if "x25519" in parts and load_x25519() is None:
+        return "x25519 requires 'cryptography'"
+    if kems and load_kem(kems[0]) is None:
+        return f"{kems[0]} not provided by the installed pqcrypto"
+    return None
+
+def _bench_job(job) -> Dict:
+    """Runs n exchanges of one scheme in a worker process; returns per-phase timings in ns."""
+    scheme, n, salt = job
+    parts = scheme.split("+")
+    x_keygen = load_x25519() if "x25519" in parts else None
+    kem = load_kem(parts[-1]) if parts[-1] != "x25519" else None
+    info = scheme.encode() + b"-handshake"
+    clock = time.perf_counter_ns
+    times = {p: [] for p in PHASES}
+    sizes = {}
+
+    for i in range(n + BENCH_WARMUP):
+        t0 = clock()
+        # Responder: long-term/ephemeral keypair(s) published to the initiator
+        if x_keygen:
+            x_sk, x_pk, x_pub = x_keygen()
+        if kem:
+            pk, sk = kem[0]()
+        t1 = clock()
+        # Initiator: X25519 ephemeral DH and/or KEM encapsulation to the responder's keys
+        if x_keygen:
+            e_sk, e_pk, e_pub = x_keygen()
+            x_ss_i = e_sk.exchange(x_pk)
+        if kem:
+            ct, ss_i = kem[1](pk)
+        t2 = clock()
+        # Responder: recover the same secrets
+        if x_keygen:
+            x_ss_r = x_sk.exchange(e_pk)
+        if kem:
+            ss_r = kem[2](sk, ct)
+        t3 = clock()
+        if x_keygen and kem:
+            key = hybrid_combine(x_ss_r, ss_r, x_pub + e_pub + ct, salt, info)
+            ok = x_ss_i == x_ss_r and ss_i == ss_r
+        elif kem:
+            key = hkdf(ikm=ss_r, salt=salt, info=info)
+            ok = ss_i == ss_r
+        else:
+            key = hkdf(ikm=x_ss_r, salt=salt, info=info)
+            ok = x_ss_i == x_ss_r
+        t4 = clock()
+        if not ok:
+            raise RuntimeError(f"{scheme}: shared secrets do not match")
+        if i < BENCH_WARMUP:
+            continue
+        for p, dt in zip(PHASES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t4 - t0)):
+            times[p].append(dt)
+    if kem:
+        sizes = {"kem_public_key": len(pk), "kem_ciphertext": len(ct)}
+    if x_keygen:
+        sizes["x25519_public_key"] = len(x_pub)
+    sizes["session_key"] = len(key)
+    return {"times": times, "sizes": sizes}
+
+def _percentiles(ns: List[int]) -> Dict[str, float]:
+    """Nearest-rank percentiles in microseconds."""
+    v = sorted(ns)
+    if not v:
+        return {}
+    def pct(q):
+        return round(v[min(len(v) - 1, max(0, math.ceil(q * len(v)) - 1))] / 1000.0, 2)
+    return {"mean": round(sum(v) / len(v) / 1000.0, 2), "p50": pct(0.50), "p90": pct(0.90),
+            "p99": pct(0.99), "p999": pct(0.999), "max": round(v[-1] / 1000.0, 2)}
+
+def run_benchmark(schemes: List[str], exchanges: int, workers: int, salt: bytes) -> Dict:
+    """
+    Each scheme's exchanges are split into jobs across one shared process pool; wall time per scheme
+    gives pool throughput, and the per-phase latency distribution is merged across workers.
+    """
+    results = {}
+    jobs_per_scheme = max(1, min(exchanges, workers * JOBS_PER_WORKER))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for scheme in schemes:
+            reason = scheme_unavailable(scheme)
+            if reason:
+                results[scheme] = {"available": False, "reason": reason}
+                continue
+            counts = [exchanges // jobs_per_scheme + (1 if i < exchanges % jobs_per_scheme else 0)
+                      for i in range(jobs_per_scheme)]
+            t0 = time.perf_counter()
+            parts = list(pool.map(_bench_job, [(scheme, c, salt) for c in counts if c]))
+            wall = time.perf_counter() - t0
+            merged = {p: [t for r in parts for t in r["times"][p]] for p in PHASES}
+            mean_total_s = sum(merged["total"]) / len(merged["total"]) / 1e9
+            results[scheme] = {
+                "available": True,
+                "exchanges": exchanges,
+                "wall_s": round(wall, 3),
+                # Pool throughput includes dispatch and warmup; per_worker is 1 / mean exchange latency
+                "exchanges_per_s": round(exchanges / wall, 1),
+                "exchanges_per_s_per_worker": round(1.0 / mean_total_s, 1),
+                "latency_us": {p: _percentiles(merged[p]) for p in PHASES},
+                "sizes_bytes": parts[0]["sizes"],
+            }
+    return results
+
+def benchmark_report(schemes: List[str], exchanges: int, workers: int, vault: VaultClient) -> Dict:
+    salt = vault.get_secret("HKDF_SALT") or os.urandom(32)
+    try:
+        from importlib.metadata import version
+        pqcrypto_version = version("pqcrypto")
+    except Exception:
+        pqcrypto_version = None
+    return {
+        "generated": datetime.datetime.utcnow().isoformat() + "Z",
+        "host": {"platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+                 "python": platform.python_version(), "pqcrypto": pqcrypto_version},
+        "workers": workers,
+        "exchanges_per_scheme": exchanges,
+        "phases": list(PHASES),
+        "schemes": run_benchmark(schemes, exchanges, workers, salt),
+    }
+
+
+# ---------- Streaming AES-GCM for large files (KEM + HKDF, chunked) ----------
+# Layout: header | frame 0 | frame 1 | ... ; each frame is AES-GCM(chunk) = len(chunk) + 16 bytes.
+# Every chunk but the last is exactly chunk_size; the last one may be short (or empty).
+# Header: magic | u8 name length | KEM name | u16 KEM ciphertext length | KEM ciphertext | 32B salt | u32 chunk_size
+# AAD per chunk: sha256(header) | u64 chunk index | u8 final flag, so reordering, truncation at a chunk
+# boundary, appending, and header swaps all fail authentication.
+STREAM_MAGIC = b"PQCAGCM1"
+STREAM_CHUNK_BYTES = 1 << 20
+STREAM_KEM = "kyber768"
+GCM_TAG_BYTES = 16
+
+class ChunkCipher:
+    """AES-256-GCM over numbered chunks; key and per-chunk nonces come from HKDF over the KEM secret."""
+
+    def __init__(self, shared_secret: bytes, salt: bytes, header: bytes):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self._prk = hkdf_extract(salt, shared_secret)
+        self._aead = AESGCM(hkdf_expand(self._prk, b"pqc-archive aes-256-gcm key", 32))
+        self._header_digest = hashlib.sha256(header).digest()
+
+    def _nonce_aad(self, index: int, final: bool) -> Tuple[bytes, bytes]:
+        idx = index.to_bytes(8, "big")
+        return (hkdf_expand(self._prk, b"pqc-archive nonce" + idx, 12),
+                self._header_digest + idx + (b"\x01" if final else b"\x00"))
+
+    def encrypt(self, index: int, final: bool, data) -> bytes:
+        nonce, aad = self._nonce_aad(index, final)
+        return self._aead.encrypt(nonce, data, aad)
+
+    def decrypt(self, index: int, final: bool, data) -> bytes:
+        from cryptography.exceptions import InvalidTag
+        nonce, aad = self._nonce_aad(index, final)
+        try:
+            return self._aead.decrypt(nonce, data, aad)
+        except InvalidTag:
+            raise ValueError(f"chunk {index} failed authentication (tampered, reordered or truncated input)") from None
+
+def _pack_header(kem_name: str, kem_ct: bytes, salt: bytes, chunk_size: int) -> bytes:
+    name = kem_name.encode("ascii")
+    return (STREAM_MAGIC + bytes([len(name)]) + name + len(kem_ct).to_bytes(2, "big") + kem_ct
+            + salt + chunk_size.to_bytes(4, "big"))
+
+def _read_exact(f, n: int) -> bytes:
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError("truncated header")
+    return data
+
+def _read_header(f) -> Tuple[bytes, str, bytes, bytes, int]:
+    magic = _read_exact(f, len(STREAM_MAGIC))
+    if magic != STREAM_MAGIC:
+        raise ValueError("not a PQC AES-GCM stream (bad magic)")
+    name = _read_exact(f, _read_exact(f, 1)[0])
+    kem_ct = _read_exact(f, int.from_bytes(_read_exact(f, 2), "big"))
+    salt = _read_exact(f, 32)
+    chunk_size = int.from_bytes(_read_exact(f, 4), "big")
+    return _pack_header(name.decode("ascii"), kem_ct, salt, chunk_size), name.decode("ascii"), kem_ct, salt, chunk_size
+
+def _readinto_full(f, view: memoryview) -> int:
+    """readinto() until the view is full or EOF (pipes may return short reads)."""
+    got = 0
+    while got < len(view):
+        n = f.readinto(view[got:])
+        if not n:
+            break
+        got += n
+    return got
+
+def _iter_chunks(f, size: int, ring: List[bytearray]):
+    """
+    Yields (index, view, final) over reusable buffers, reading one chunk ahead so the last chunk
+    is known when it is yielded. A view stays valid until len(ring) - 1 further chunks were read.
+    """
+    index = 0
+    view = memoryview(ring[0])[:_readinto_full(f, memoryview(ring[0])[:size])]
+    while True:
+        if len(view) < size:  # short read: this is the last chunk (possibly empty)
+            yield index, view, True
+            return
+        nbuf = memoryview(ring[(index + 1) % len(ring)])[:size]
+        n = _readinto_full(f, nbuf)
+        yield index, view, n == 0
+        if n == 0:
+            return
+        index += 1
+        view = nbuf[:n]
+
+def _pipeline(src, dst, size: int, threads: int, work) -> int:
+    """
+    Reads chunks of size bytes with readinto into a ring of buffers, runs work(index, final, view)
+    on a thread pool (AES-GCM releases the GIL), and writes results in order. Returns chunks processed.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    depth = max(1, threads) * 2
+    ring = [bytearray(size) for _ in range(depth + 2)]
+    pending = deque()
+    count = 0
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as pool:
+        for index, view, final in _iter_chunks(src, size, ring):
+            pending.append(pool.submit(work, index, final, view))
+            if len(pending) >= depth:
+                dst.write(pending.popleft().result())
+            count += 1
+        while pending:
+            dst.write(pending.popleft().result())
+    return count
+
+def _open_out(path: str):
+    return sys.stdout.buffer if path == "-" else open(path + ".partial", "wb")
+
+def _finish_out(path: str, fh, ok: bool) -> None:
+    if fh is sys.stdout.buffer:
+        fh.flush()
+        return
+    fh.close()
+    if ok:
+        os.replace(path + ".partial", path)
+    else:
+        os.remove(path + ".partial")
+
+def _archive_key(vault: VaultClient, name: str, path: Optional[str]) -> bytes:
+    """KEM key from a file (raw or base64) or a base64 vault secret."""
+    if path:
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            return base64.b64decode(raw, validate=True)
+        except Exception:
+            return raw
+    val = vault.get_secret(name)
+    if not val:
+        print(f"{name} not found in vault/env; pass a key file or run --gen-archive-keys.")
+        sys.exit(1)
+    return base64.b64decode(val)
+
+def _require_aesgcm() -> None:
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM  # noqa: F401
+    except Exception:
+        print("File mode needs AES-GCM. Install 'cryptography'.")
+        sys.exit(1)
+
+def _require_kem(kem_name: str):
+    kem = load_kem(kem_name)
+    if kem is None:
+        print(f"{kem_name} KEM not available. Install 'pqcrypto' and re-run.")
+        sys.exit(1)
+    return kem
+
+def encrypt_stream(src, dst, public_key: bytes, kem_name: str = STREAM_KEM,
+                   chunk_size: int = STREAM_CHUNK_BYTES, threads: int = 4) -> Dict:
+    """Encapsulate to the recipient's KEM public key and encrypt src into dst chunk by chunk."""
+    _, encapsulate, _ = _require_kem(kem_name)
+    kem_ct, ss = encapsulate(public_key)
+    salt = os.urandom(32)
+    header = _pack_header(kem_name, kem_ct, salt, chunk_size)
+    cipher = ChunkCipher(ss, salt, header)
+    dst.write(header)
+    t0 = time.perf_counter()
+    chunks = _pipeline(src, dst, chunk_size, threads, cipher.encrypt)
+    return {"chunks": chunks, "kem": kem_name, "chunk_size": chunk_size, "elapsed_s": round(time.perf_counter() - t0, 3)}
+
+def decrypt_stream(src, dst, secret_key: bytes, threads: int = 4) -> Dict:
+    """Verify and decrypt chunk by chunk; raises ValueError on the first chunk that fails authentication."""
+    header, kem_name, kem_ct, salt, chunk_size = _read_header(src)
+    _, _, decapsulate = _require_kem(kem_name)
+    cipher = ChunkCipher(decapsulate(secret_key, kem_ct), salt, header)
+    t0 = time.perf_counter()
+    chunks = _pipeline(src, dst, chunk_size + GCM_TAG_BYTES, threads, cipher.decrypt)
+    return {"chunks": chunks, "kem": kem_name, "chunk_size": chunk_size, "elapsed_s": round(time.perf_counter() - t0, 3)}
+
+def run_file_mode(args, vault: VaultClient) -> None:
+    _require_aesgcm()
+    src_path, dst_path = args.encrypt_file or args.decrypt_file
+    src = sys.stdin.buffer if src_path == "-" else open(src_path, "rb")
+    dst = _open_out(dst_path)
+    ok = False
+    try:
+        if args.encrypt_file:
+            pk = _archive_key(vault, "PQC_ARCHIVE_PUBLIC_KEY", args.public_key)
+            stats = encrypt_stream(src, dst, pk, args.kem, args.chunk_mb << 20, args.threads)
+        else:
+            sk = _archive_key(vault, "PQC_ARCHIVE_SECRET_KEY", args.secret_key)
+            stats = decrypt_stream(src, dst, sk, args.threads)
+        ok = True
+    except ValueError as e:
+        print(f"Decryption failed: {e}" if args.decrypt_file else f"Encryption failed: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+        _finish_out(dst_path, dst, ok)
+    print(json.dumps({"mode": "encrypt" if args.encrypt_file else "decrypt", **stats}), file=sys.stderr)
+
+def gen_archive_keys(kem_name: str) -> None:
+    """Prints a base64 keypair for PQC_ARCHIVE_PUBLIC_KEY / PQC_ARCHIVE_SECRET_KEY (store both in the vault)."""
+    generate_keypair, _, _ = _require_kem(kem_name)
+    pk, sk = generate_keypair()
+    print(json.dumps({"kem": kem_name, "PQC_ARCHIVE_PUBLIC_KEY": base64.b64encode(pk).decode(),
+                      "PQC_ARCHIVE_SECRET_KEY": base64.b64encode(sk).decode()}))
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--message", default="hello quantum-safe world", help="Plaintext to protect after KEM")
+    parser.add_argument("--benchmark", action="store_true", help="Run the KEM throughput benchmark instead of the demo")
+    parser.add_argument("--exchanges", type=int, default=1000, help="Key exchanges per scheme")
+    parser.add_argument("--schemes", default=",".join(DEFAULT_SCHEMES), help="Comma-separated schemes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", help="Write the benchmark JSON here instead of stdout")
+    files = parser.add_mutually_exclusive_group()
+    files.add_argument("--encrypt-file", nargs=2, metavar=("IN", "OUT"), help="Encrypt IN to OUT (- for stdin/stdout)")
+    files.add_argument("--decrypt-file", nargs=2, metavar=("IN", "OUT"), help="Verify and decrypt IN to OUT")
+    files.add_argument("--gen-archive-keys", action="store_true", help="Print a KEM keypair (base64) to store in the vault")
+    parser.add_argument("--public-key", help="Recipient KEM public key file (default: PQC_ARCHIVE_PUBLIC_KEY secret)")
+    parser.add_argument("--secret-key", help="KEM secret key file (default: PQC_ARCHIVE_SECRET_KEY secret)")
+    parser.add_argument("--kem", default=STREAM_KEM, choices=KYBER_VARIANTS)
+    parser.add_argument("--chunk-mb", type=int, default=STREAM_CHUNK_BYTES >> 20)
+    parser.add_argument("--threads", type=int, default=min(8, os.cpu_count() or 1), help="AES-GCM worker threads")
     args = parser.parse_args()
 
-    vault = VaultClient()
+    vault = get_vault()
+    if args.gen_archive_keys:
+        gen_archive_keys(args.kem)
+        return
+    if args.encrypt_file or args.decrypt_file:
+        run_file_mode(args, vault)
+        return
+    if args.benchmark:
+        schemes = [s.strip() for s in args.schemes.split(",") if s.strip()]
+        report = benchmark_report(schemes, args.exchanges, args.workers, vault)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Wrote benchmark results to {args.out}")
+        else:
+            print(json.dumps(report, indent=2))
+        return
     _ = kyber_demo(args.message.encode("utf-8"), vault)
 
 
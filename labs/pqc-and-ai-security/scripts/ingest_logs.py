@@ -14,49 +14,48 @@ Expected Key Vault secrets (or env vars as fallback):
 
 Usage:
   python3 ingest_logs.py ./data/anomalous_traffic.log
+  # Cosmos bulk mode: async bounded-concurrency upserts, transactional batches per partition key,
+  # 429 retry-after backoff, RU/throughput report, resumable from a line-offset checkpoint
+  # (a chunk with failed docs stops the run with exit 2 and is retried by the next --resume)
+  python3 ingest_logs.py ./access.log --bulk --concurrency 64 --resume
+  # SQL bulk mode: fast_executemany in chunks (commit per chunk), optional temp-table + MERGE for
+  # idempotent re-runs, --parallel byte ranges over separate connections (--sqlite DB: local stand-in)
+  TARGET_BACKEND=sql python3 ingest_logs.py ./access.log --bulk --chunk-rows 10000 --merge --parallel 4
 """
 
-import os, sys, re, json, datetime
-from typing import Optional, Dict, Any
+import os, sys, json, time, asyncio, argparse, datetime
+from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple
 
-# ---------------- Vault client ----------------
-class VaultClient:
-    def __init__(self):
-        self.azure_uri = os.getenv("AZURE_KEY_VAULT_URI")
-        self._client = None
-        if self.azure_uri:
-            try:
-                from azure.identity import DefaultAzureCredential
-                from azure.keyvault.secrets import SecretClient
-                self._client = SecretClient(vault_url=self.azure_uri, credential=DefaultAzureCredential())
-            except Exception:
-                self._client = None
-
-    def get(self, name: str) -> Optional[str]:
-        if self._client:
-            try:
-                v = self._client.get_secret(name)
-                if v and v.value:
-                    return v.value
-            except Exception:
-                pass
-        return os.getenv(name)
-
-# ---------------- Common Log Format parser ----------------
-CLF_REGEX = re.compile(
-    r'(?P<ip>\S+)\s+\S+\s+\S+\s+\[(?P<ts>[^\]]+)\]\s+"(?P<method>\S+)\s+(?P<path>\S+)\s+(?P<proto>[^"]+)"\s+(?P<status>\d{3})\s+(?P<bytes>\S+)\s+"(?P<ref>[^"]*)"\s+"(?P<ua>[^"]*)"'
-)
+# ---------------- Vault client (shared: ../common/vault_client.py) ----------------
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from vault_client import VaultClient, get_vault  # noqa: E402
+
+BACKEND_SECRETS = {
+    "cosmos": ("COSMOS_ENDPOINT", "COSMOS_DB_NAME", "COSMOS_CONTAINER_NAME"),
+    "sql": ("SQL_SERVER", "SQL_DATABASE"),
+}
+
+# ---------------- Common Log Format parser (shared: ../common/clf_parser.py) ----------------
+from clf_parser import ClfBatch, iter_batches, parse_line as parse_clf_line, split_ranges  # noqa: E402
 
 def parse_line(line: str) -> Optional[Dict[str, Any]]:
-    m = CLF_REGEX.match(line.strip())
-    if not m:
-        return None
-    d = m.groupdict()
-    d["status"] = int(d["status"])
-    d["bytes"] = 0 if d["bytes"] == "-" else int(d["bytes"])
-    d["@ingest_time"] = datetime.datetime.utcnow().isoformat() + "Z"
+    d = parse_clf_line(line)
+    if d:
+        d["@ingest_time"] = datetime.datetime.utcnow().isoformat() + "Z"
     return d
 
+def batch_docs(batch: ClfBatch, i: int, j: int, ingest_time: str) -> List[Dict[str, Any]]:
+    """Cosmos documents for rows [i, j) of a parsed batch."""
+    docs = []
+    for k in range(i, j):
+        doc = batch.row(k)
+        doc["@ingest_time"] = ingest_time
+        # Use IP as partition key for demo. In production, choose a stable/high-cardinality key.
+        doc["id"] = f"{doc['ip']}:{doc['ts']}"
+        docs.append(doc)
+    return docs
+
 # ---------------- Cosmos DB (AAD) ----------------
 def ingest_cosmos(vault: VaultClient, log_path: str):
     endpoint = vault.get("COSMOS_ENDPOINT")  # e.g., https://<acct>.documents.azure.com:443/
@@ -78,13 +77,8 @@ def ingest_cosmos(vault: VaultClient, log_path: str):
     db = client.get_database_client(db_name)
     container = db.get_container_client(container_name)
 
-    with open(log_path, "r", encoding="utf-8") as f:
-        for line in f:
-            doc = parse_line(line)
-            if not doc: 
-                continue
-            # Use IP as partition key for demo. In production, choose a stable/high-cardinality key.
-            doc["id"] = f"{doc['ip']}:{doc['ts']}"
+    for batch in iter_batches(log_path):
+        for doc in batch_docs(batch, 0, len(batch), datetime.datetime.utcnow().isoformat() + "Z"):
             try:
                 container.upsert_item(doc, partition_key=doc["ip"])
             except Exception as e:
@@ -92,8 +86,214 @@ def ingest_cosmos(vault: VaultClient, log_path: str):
 
     print(f"Ingested logs to Cosmos container '{container_name}'.")
 
+# ---------------- Cosmos DB bulk mode (azure.cosmos.aio) ----------------
+COSMOS_BATCH_MAX_OPS = 100  # transactional batch limit (single partition key, 2 MB)
+
+def load_checkpoint(path: str, log_path: str) -> Tuple[int, int]:
+    """Returns (line, byte) offset to resume from; (0, 0) if no matching checkpoint exists."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            ck = json.load(f)
+        if ck.get("log") == os.path.abspath(log_path):
+            return int(ck["line"]), int(ck["byte"])
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    return 0, 0
+
+def save_checkpoint(path: str, log_path: str, line: int, byte: int) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"log": os.path.abspath(log_path), "line": line, "byte": byte,
+                   "updated": datetime.datetime.utcnow().isoformat() + "Z"}, f)
+    os.replace(tmp, path)
+
+def read_line_chunks(log_path: str, start_line: int, start_byte: int, chunk_lines: int):
+    """Yields (docs, end_line, end_byte) per chunk of parsed lines; offsets point just past the chunk."""
+    line = start_line
+    for batch in iter_batches(log_path, start=start_byte):
+        now = datetime.datetime.utcnow().isoformat() + "Z"
+        n = len(batch)
+        for i in range(0, max(n, 1), chunk_lines):
+            j = min(i + chunk_lines, n)
+            if j < n:
+                end_line, end_byte = line + batch.line[j], batch.offset[j]
+            else:
+                end_line, end_byte = line + batch.line_count, batch.end
+            yield batch_docs(batch, i, j, now), end_line, end_byte
+        line += batch.line_count
+
+class CosmosBulkWriter:
+    """
+    Bounded-concurrency async writer. Docs sharing a partition key go out as transactional batches
+    (<= 100 ops); singletons use upsert_item. 429s pause every worker for the server's retry-after.
+    """
+
+    def __init__(self, container, concurrency: int, max_retries: int = 10):
+        self.container = container
+        self.sem = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.pause_until = 0.0
+        self.stats = {"docs": 0, "failed": 0, "ru": 0.0, "throttled": 0, "batches": 0, "upserts": 0}
+        self.batch_supported = hasattr(container, "execute_item_batch")
+
+    def _charge(self, headers, *_):
+        try:
+            self.stats["ru"] += float(headers.get("x-ms-request-charge", 0))
+        except (TypeError, ValueError):
+            pass
+
+    async def _with_retry(self, op, n_docs: int):
+        from azure.cosmos.exceptions import CosmosHttpResponseError
+        for attempt in range(self.max_retries):
+            wait = self.pause_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                async with self.sem:
+                    await op()
+                self.stats["docs"] += n_docs
+                return
+            except CosmosHttpResponseError as e:
+                if e.status_code not in (408, 429, 503):
+                    print(f"Failed to upsert {n_docs} doc(s): {e.status_code} {str(e.message)[:200]}")
+                    break
+                self.stats["throttled"] += 1
+                hdrs = getattr(e, "headers", None) or {}
+                retry_ms = float(hdrs.get("x-ms-retry-after-ms") or 0) or min(100 * 2 ** attempt, 5000)
+                # RU-aware: one throttle slows down every worker, not only the one that hit it
+                self.pause_until = max(self.pause_until, time.monotonic() + retry_ms / 1000.0)
+            except Exception as e:
+                print(f"Failed to upsert {n_docs} doc(s): {e}")
+                break
+        self.stats["failed"] += n_docs
+
+    def _ops(self, pk: str, docs: List[Dict[str, Any]]):
+        if len(docs) == 1 or not self.batch_supported:
+            for d in docs:
+                self.stats["upserts"] += 1
+                yield (lambda d=d: self.container.upsert_item(d, response_hook=self._charge)), 1
+            return
+        for i in range(0, len(docs), COSMOS_BATCH_MAX_OPS):
+            part = docs[i:i + COSMOS_BATCH_MAX_OPS]
+            ops = [("upsert", (d,)) for d in part]
+            self.stats["batches"] += 1
+            yield (lambda ops=ops: self.container.execute_item_batch(
+                batch_operations=ops, partition_key=pk, response_hook=self._charge)), len(part)
+
+    async def write(self, docs: List[Dict[str, Any]]) -> None:
+        by_pk = defaultdict(list)
+        for d in docs:
+            by_pk[d["ip"]].append(d)
+        await asyncio.gather(*(self._with_retry(op, n) for pk, group in by_pk.items() for op, n in self._ops(pk, group)))
+
+async def _ingest_cosmos_bulk(endpoint: str, db_name: str, container_name: str, log_path: str,
+                              concurrency: int, chunk_lines: int, checkpoint: str, resume: bool) -> dict:
+    from azure.identity.aio import DefaultAzureCredential
+    from azure.cosmos.aio import CosmosClient
+
+    start_line, start_byte = load_checkpoint(checkpoint, log_path) if resume else (0, 0)
+    if start_line:
+        print(f"Resuming at line {start_line} (byte {start_byte}) from {checkpoint}")
+    t0 = time.monotonic()
+    async with DefaultAzureCredential() as cred, CosmosClient(url=endpoint, credential=cred) as client:
+        container = client.get_database_client(db_name).get_container_client(container_name)
+        writer = CosmosBulkWriter(container, concurrency)
+        line, stopped_at = start_line, None
+        for docs, end_line, end_byte in read_line_chunks(log_path, start_line, start_byte, chunk_lines):
+            failed = writer.stats["failed"]
+            await writer.write(docs)
+            if writer.stats["failed"] > failed:
+                # Keep the checkpoint at the start of this chunk so --resume retries it (upserts by id are idempotent)
+                stopped_at = line
+                print(f"Stopping: {writer.stats['failed'] - failed} doc(s) in lines {line}-{end_line} failed; "
+                      f"checkpoint stays at line {line}")
+                break
+            line = end_line
+            # Only advance past a chunk once every doc in it is written
+            save_checkpoint(checkpoint, log_path, end_line, end_byte)
+    elapsed = time.monotonic() - t0
+    st = writer.stats
+    return {**st, "ru": round(st["ru"], 1), "lines": line - start_line, "stopped_at_line": stopped_at,
+            "elapsed_s": round(elapsed, 2),
+            "docs_per_s": round(st["docs"] / elapsed, 1) if elapsed else None,
+            "ru_per_s": round(st["ru"] / elapsed, 1) if elapsed else None}
+
+def ingest_cosmos_bulk(vault: VaultClient, log_path: str, concurrency: int = 32, chunk_lines: int = 5000,
+                       checkpoint: Optional[str] = None, resume: bool = False):
+    endpoint = vault.get("COSMOS_ENDPOINT")
+    db_name = vault.get("COSMOS_DB_NAME")
+    container_name = vault.get("COSMOS_CONTAINER_NAME")
+    if not all([endpoint, db_name, container_name]):
+        print("Missing Cosmos config (COSMOS_ENDPOINT/DB_NAME/CONTAINER_NAME).")
+        sys.exit(1)
+    try:
+        import azure.cosmos.aio  # noqa: F401
+        import azure.identity.aio  # noqa: F401
+        import aiohttp  # noqa: F401  (transport used by the aio clients)
+    except Exception:
+        print("Please install azure-identity, azure-cosmos and aiohttp for --bulk.")
+        sys.exit(1)
+
+    checkpoint = checkpoint or f"{log_path}.cosmos.ckpt"
+    report = asyncio.run(_ingest_cosmos_bulk(endpoint, db_name, container_name, log_path,
+                                             concurrency, chunk_lines, checkpoint, resume))
+    print(f"Ingested logs to Cosmos container '{container_name}' (bulk): {json.dumps(report)}")
+    if report["failed"]:
+        sys.exit(2)
+
 # ---------------- Azure SQL (AAD token) ----------------
-def ingest_sql(vault: VaultClient, log_path: str):
+SQL_COLUMNS = ("ip", "ts", "method", "path", "proto", "status", "bytes", "ref", "ua", "line_key", "ingest_time")
+_SQL_COLS = ", ".join(SQL_COLUMNS)
+_SQL_PARAMS = ", ".join("?" * len(SQL_COLUMNS))
+
+# Statements per target; "sqlite" is a local stand-in for benchmarking the bulk path without Azure.
+SQL_DIALECTS = {
+    "mssql": {
+        "ddl": [
+            """IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='HttpAccessLog' AND xtype='U')
+               CREATE TABLE HttpAccessLog (
+                   id INT IDENTITY(1,1) PRIMARY KEY,
+                   ip NVARCHAR(64), ts NVARCHAR(64), method NVARCHAR(16), path NVARCHAR(2048),
+                   proto NVARCHAR(32), status INT, bytes BIGINT, ref NVARCHAR(2048), ua NVARCHAR(1024),
+                   ingest_time DATETIME2
+               )""",
+            # line_key = sha1(file name, byte offset, line): stable across re-runs, used by --merge
+            "IF COL_LENGTH('HttpAccessLog', 'line_key') IS NULL ALTER TABLE HttpAccessLog ADD line_key VARBINARY(20) NULL",
+            """IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='IX_HttpAccessLog_line_key')
+               CREATE INDEX IX_HttpAccessLog_line_key ON HttpAccessLog(line_key)""",
+        ],
+        "stage": f"SELECT TOP 0 {_SQL_COLS} INTO #HttpAccessLogStage FROM HttpAccessLog",
+        "insert": f"INSERT INTO HttpAccessLog ({_SQL_COLS}) VALUES ({_SQL_PARAMS})",
+        "insert_stage": f"INSERT INTO #HttpAccessLogStage ({_SQL_COLS}) VALUES ({_SQL_PARAMS})",
+        "merge": f"""MERGE HttpAccessLog WITH (HOLDLOCK) AS t
+                     USING #HttpAccessLogStage AS s ON t.line_key = s.line_key
+                     WHEN NOT MATCHED THEN INSERT ({_SQL_COLS}) VALUES ({", ".join("s." + c for c in SQL_COLUMNS)});""",
+        "clear_stage": "TRUNCATE TABLE #HttpAccessLogStage",
+    },
+    "sqlite": {
+        "ddl": [
+            """CREATE TABLE IF NOT EXISTS HttpAccessLog (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   ip TEXT, ts TEXT, method TEXT, path TEXT, proto TEXT, status INTEGER, bytes INTEGER,
+                   ref TEXT, ua TEXT, line_key BLOB, ingest_time TEXT
+               )""",
+            "CREATE INDEX IF NOT EXISTS IX_HttpAccessLog_line_key ON HttpAccessLog(line_key)",
+        ],
+        "stage": f"CREATE TEMP TABLE IF NOT EXISTS HttpAccessLogStage AS SELECT {_SQL_COLS} FROM HttpAccessLog WHERE 0",
+        "insert": f"INSERT INTO HttpAccessLog ({_SQL_COLS}) VALUES ({_SQL_PARAMS})",
+        "insert_stage": f"INSERT INTO temp.HttpAccessLogStage ({_SQL_COLS}) VALUES ({_SQL_PARAMS})",
+        "merge": f"""INSERT INTO HttpAccessLog ({_SQL_COLS})
+                     SELECT {_SQL_COLS} FROM temp.HttpAccessLogStage s
+                     WHERE NOT EXISTS (SELECT 1 FROM HttpAccessLog t WHERE t.line_key = s.line_key)""",
+        "clear_stage": "DELETE FROM temp.HttpAccessLogStage",
+    },
+}
+
+def sql_target(vault: VaultClient, sqlite_path: Optional[str] = None) -> Dict[str, Any]:
+    """Connection description that can be pickled into --parallel worker processes."""
+    if sqlite_path:
+        return {"dialect": "sqlite", "database": sqlite_path}
+
     server = vault.get("SQL_SERVER")   # e.g., myserver.database.windows.net
     database = vault.get("SQL_DATABASE")
     if not all([server, database]):
@@ -101,7 +301,7 @@ def ingest_sql(vault: VaultClient, log_path: str):
         sys.exit(1)
 
     try:
-        import pyodbc
+        import pyodbc  # noqa: F401
         from azure.identity import DefaultAzureCredential
     except Exception:
         print("Please install pyodbc and azure-identity.")
@@ -110,7 +310,6 @@ def ingest_sql(vault: VaultClient, log_path: str):
     # Get AAD access token
     cred = DefaultAzureCredential()
     token = cred.get_token("https://database.windows.net/.default")
-    access_token = token.token.encode("utf-16-le")
 
     # ODBC connection using access token (no password)
     conn_str = (
@@ -119,36 +318,112 @@ def ingest_sql(vault: VaultClient, log_path: str):
         f"Database={database};"
         "Encrypt=yes;TrustServerCertificate=no;Connection Timeout=30;"
     )
-    conn = pyodbc.connect(conn_str, attrs_before={1256: access_token})  # 1256 = SQL_COPT_SS_ACCESS_TOKEN
-    cursor = conn.cursor()
+    return {"dialect": "mssql", "conn_str": conn_str, "token": token.token.encode("utf-16-le")}
 
-    cursor.execute("""
-        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='HttpAccessLog' AND xtype='U')
-        CREATE TABLE HttpAccessLog (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            ip NVARCHAR(64),
-            ts NVARCHAR(64),
-            method NVARCHAR(16),
-            path NVARCHAR(2048),
-            proto NVARCHAR(32),
-            status INT,
-            bytes BIGINT,
-            ref NVARCHAR(2048),
-            ua NVARCHAR(1024),
-            ingest_time DATETIME2
-        )
-    """)
+def sql_connect(target: Dict[str, Any]):
+    if target["dialect"] == "sqlite":
+        import sqlite3
+        return sqlite3.connect(target["database"], timeout=300)
+    import pyodbc
+    return pyodbc.connect(target["conn_str"], attrs_before={1256: target["token"]})  # 1256 = SQL_COPT_SS_ACCESS_TOKEN
+
+def sql_ensure_table(target: Dict[str, Any]) -> None:
+    conn = sql_connect(target)
+    cursor = conn.cursor()
+    for stmt in SQL_DIALECTS[target["dialect"]]["ddl"]:
+        cursor.execute(stmt)
     conn.commit()
+    cursor.close()
+    conn.close()
+
+def iter_sql_rows(log_path: str, start: int, end: int, chunk_rows: int):
+    """Yields lists of row tuples (without ingest_time) for lines in [start, end)."""
+    import hashlib
+    name = os.path.basename(log_path)
+    rows = []
+    # Already running one process per range under --parallel: parse in-process here
+    for batch in iter_batches(log_path, workers=1, keep_raw=True, start=start, end=end):
+        for i, (ip, ts, method, path, proto, ref, ua) in enumerate(
+                zip(batch.ip, batch.ts, batch.method, batch.path, batch.proto, batch.ref, batch.ua)):
+            key = hashlib.sha1(f"{name}:{batch.offset[i]}:{batch.raw[i]}".encode()).digest()
+            rows.append((ip, ts, method, path, proto, batch.status[i], batch.bytes[i], ref, ua, key))
+            if len(rows) >= chunk_rows:
+                yield rows
+                rows = []
+    if rows:
+        yield rows
+
+def sql_bulk_load(target: Dict[str, Any], log_path: str, start: int, end: int,
+                  chunk_rows: int = 5000, merge: bool = False) -> Dict[str, int]:
+    """
+    Insert lines in [start, end) with executemany (pyodbc fast_executemany) and one commit per chunk.
+    merge=True stages each chunk in a temp table and merges on line_key, so re-runs insert nothing twice.
+    """
+    sql = SQL_DIALECTS[target["dialect"]]
+    conn = sql_connect(target)
+    cursor = conn.cursor()
+    if hasattr(cursor, "fast_executemany"):
+        cursor.fast_executemany = True  # array-bound parameters: one round trip per chunk
+    if merge:
+        cursor.execute(sql["stage"])
+    stats = {"rows": 0, "inserted": 0, "chunks": 0}
+    for rows in iter_sql_rows(log_path, start, end, chunk_rows):
+        now = datetime.datetime.utcnow().isoformat(sep=" ")
+        params = [r + (now,) for r in rows]
+        if merge:
+            cursor.executemany(sql["insert_stage"], params)
+            cursor.execute(sql["merge"])
+            stats["inserted"] += max(cursor.rowcount, 0)
+            cursor.execute(sql["clear_stage"])
+        else:
+            cursor.executemany(sql["insert"], params)
+            stats["inserted"] += len(rows)
+        conn.commit()
+        stats["rows"] += len(rows)
+        stats["chunks"] += 1
+    cursor.close()
+    conn.close()
+    return stats
 
-    with open(log_path, "r", encoding="utf-8") as f:
-        for line in f:
-            doc = parse_line(line)
-            if not doc: 
-                continue
-            cursor.execute("""
-                INSERT INTO HttpAccessLog (ip, ts, method, path, proto, status, bytes, ref, ua, ingest_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, SYSUTCDATETIME())
-            """, (doc["ip"], doc["ts"], doc["method"], doc["path"], doc["proto"], doc["status"], doc["bytes"], doc["ref"], doc["ua"]))
+def _sql_bulk_worker(job):
+    return sql_bulk_load(*job)
+
+def ingest_sql_bulk(target: Dict[str, Any], log_path: str, chunk_rows: int = 5000, merge: bool = False,
+                    parallel: int = 1) -> Dict[str, Any]:
+    """Bulk path; --parallel N loads newline-aligned byte ranges over N separate connections."""
+    sql_ensure_table(target)
+    t0 = time.monotonic()
+    ranges = split_ranges(log_path, -(-os.path.getsize(log_path) // max(parallel, 1)) or 1)
+    jobs = [(target, log_path, s, e, chunk_rows, merge) for s, e in ranges]
+    if len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            results = list(pool.map(_sql_bulk_worker, jobs))
+    else:
+        results = [_sql_bulk_worker(j) for j in jobs]
+    elapsed = time.monotonic() - t0
+    report = {k: sum(r[k] for r in results) for k in ("rows", "inserted", "chunks")}
+    report.update({"workers": len(jobs), "merge": merge, "elapsed_s": round(elapsed, 2),
+                   "rows_per_s": round(report["rows"] / elapsed, 1) if elapsed else None})
+    return report
+
+def ingest_sql(vault: VaultClient, log_path: str, bulk: bool = False, chunk_rows: int = 5000,
+               merge: bool = False, parallel: int = 1, sqlite_path: Optional[str] = None):
+    target = sql_target(vault, sqlite_path)
+    if bulk or merge or parallel > 1:
+        report = ingest_sql_bulk(target, log_path, chunk_rows, merge, parallel)
+        print(f"Ingested logs to SQL table 'HttpAccessLog' (bulk): {json.dumps(report)}")
+        return
+
+    sql_ensure_table(target)
+    conn = sql_connect(target)
+    cursor = conn.cursor()
+    for batch in iter_batches(log_path):
+        now = datetime.datetime.utcnow().isoformat(sep=" ")
+        for doc in batch.rows():
+            cursor.execute(SQL_DIALECTS[target["dialect"]]["insert"],
+                           (doc["ip"], doc["ts"], doc["method"], doc["path"], doc["proto"], doc["status"],
+                            doc["bytes"], doc["ref"], doc["ua"], None, now))
     conn.commit()
     cursor.close()
     conn.close()
@@ -156,18 +431,30 @@ def ingest_sql(vault: VaultClient, log_path: str):
 
 # ---------------- Main ----------------
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python3 ingest_logs.py <logfile>")
-        sys.exit(1)
+    ap = argparse.ArgumentParser(description="Ingest Common Log Format files into Cosmos DB or Azure SQL.")
+    ap.add_argument("logfile")
+    ap.add_argument("--bulk", action="store_true", help="Cosmos: async bulk mode (azure.cosmos.aio)")
+    ap.add_argument("--concurrency", type=int, default=32, help="Cosmos bulk: max in-flight requests")
+    ap.add_argument("--chunk-lines", type=int, default=5000, help="Cosmos bulk: parsed lines per checkpointed chunk")
+    ap.add_argument("--checkpoint", help="Cosmos bulk: checkpoint file (default: <logfile>.cosmos.ckpt)")
+    ap.add_argument("--resume", action="store_true", help="Cosmos bulk: continue from the checkpoint")
+    ap.add_argument("--chunk-rows", type=int, default=5000, help="SQL bulk: rows per executemany + commit")
+    ap.add_argument("--merge", action="store_true", help="SQL bulk: stage in a temp table and MERGE (idempotent)")
+    ap.add_argument("--parallel", type=int, default=1, help="SQL bulk: byte ranges loaded over N connections")
+    ap.add_argument("--sqlite", metavar="DB", help="SQL: local SQLite stand-in instead of Azure SQL")
+    args = ap.parse_args()
 
     target = os.getenv("TARGET_BACKEND", "cosmos").lower()
-    vault = VaultClient()
-    log_file = sys.argv[1]
+    vault = get_vault()
+    vault.prefetch(BACKEND_SECRETS.get(target, ()))  # one concurrent round of vault lookups up front
+    log_file = args.logfile
 
-    if target == "cosmos":
+    if target == "cosmos" and args.bulk:
+        ingest_cosmos_bulk(vault, log_file, args.concurrency, args.chunk_lines, args.checkpoint, args.resume)
+    elif target == "cosmos":
         ingest_cosmos(vault, log_file)
     elif target == "sql":
-        ingest_sql(vault, log_file)
+        ingest_sql(vault, log_file, args.bulk, args.chunk_rows, args.merge, args.parallel, args.sqlite)
     else:
         print("Unsupported TARGET_BACKEND. Use 'cosmos' or 'sql'.")
         sys.exit(1)
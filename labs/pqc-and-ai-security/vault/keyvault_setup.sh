@@ -15,6 +15,7 @@ set -euo pipefail
 #   COSMOS_CONTAINER_NAME
 #   SQL_SERVER
 #   SQL_DATABASE
+#   PQC_ARCHIVE_PUBLIC_KEY / PQC_ARCHIVE_SECRET_KEY  # base64, from pqc_key_exchange.py --gen-archive-keys
 
 : "${KV_NAME:?Set KV_NAME}"
 : "${RG:?Set RG}"
@@ -41,8 +42,8 @@ if [[ -n "${ANOMALY_THRESHOLD_Z:-}" ]]; then
   az keyvault secret set --vault-name "$KV_NAME" --name "ANOMALY_THRESHOLD_Z" --value "$ANOMALY_THRESHOLD_Z" >/dev/null
 fi
 
-# Optional connection metadata (not passwords)
-for NAME in COSMOS_ENDPOINT COSMOS_DB_NAME COSMOS_CONTAINER_NAME SQL_SERVER SQL_DATABASE; do
+# Optional connection metadata (not passwords) and the archive KEM keypair
+for NAME in COSMOS_ENDPOINT COSMOS_DB_NAME COSMOS_CONTAINER_NAME SQL_SERVER SQL_DATABASE PQC_ARCHIVE_PUBLIC_KEY PQC_ARCHIVE_SECRET_KEY; do
   VAL="${!NAME:-}"
   if [[ -n "$VAL" ]]; then
     az keyvault secret set --vault-name "$KV_NAME" --name "$NAME" --value "$VAL" >/dev/null
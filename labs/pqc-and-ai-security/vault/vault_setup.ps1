@@ -4,7 +4,8 @@ Pre-reqs: Az.Accounts, Az.KeyVault modules. Login with Connect-AzAccount or mana
 Inputs (set in session):
   $KV_NAME, $RG, $LOC
 Optional secrets:
-  $HKDF_SALT, $ANOMALY_THRESHOLD_Z, $COSMOS_ENDPOINT, $COSMOS_DB_NAME, $COSMOS_CONTAINER_NAME, $SQL_SERVER, $SQL_DATABASE
+  $HKDF_SALT, $ANOMALY_THRESHOLD_Z, $COSMOS_ENDPOINT, $COSMOS_DB_NAME, $COSMOS_CONTAINER_NAME, $SQL_SERVER, $SQL_DATABASE,
+  $PQC_ARCHIVE_PUBLIC_KEY, $PQC_ARCHIVE_SECRET_KEY (base64, from pqc_key_exchange.py --gen-archive-keys)
 #>
 
 param()
@@ -40,8 +41,8 @@ if ($env:ANOMALY_THRESHOLD_Z) {
   az keyvault secret set --vault-name $KV_NAME --name "ANOMALY_THRESHOLD_Z" --value $env:ANOMALY_THRESHOLD_Z | Out-Null
 }
 
-# Optional non-secret connection metadata
-$names = @("COSMOS_ENDPOINT","COSMOS_DB_NAME","COSMOS_CONTAINER_NAME","SQL_SERVER","SQL_DATABASE")
+# Optional non-secret connection metadata and the archive KEM keypair
+$names = @("COSMOS_ENDPOINT","COSMOS_DB_NAME","COSMOS_CONTAINER_NAME","SQL_SERVER","SQL_DATABASE","PQC_ARCHIVE_PUBLIC_KEY","PQC_ARCHIVE_SECRET_KEY")
 foreach ($n in $names) {
   $v = [Environment]::GetEnvironmentVariable($n)
   if ($v) {
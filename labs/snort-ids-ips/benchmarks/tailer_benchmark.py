@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tailer_benchmark.py
+Throughput benchmark for scripts/snort_tailer.py (single core, single process).
+
+- A writer thread appends Snort3 alert_json lines in bursts and rotates the file (rename + recreate)
+  part-way through, so the measured rate includes rotation handling.
+- The tailer must deliver every alert; the run fails if any line is lost or the rate is below --target.
+
+Usage:
+  python3 tailer_benchmark.py --alerts 500000 --target 50000
+  python3 tailer_benchmark.py --poll            # force the polling fallback
+Exit codes: 0 ok, 2 below target or lines lost
+"""
+
+import argparse, json, os, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+from snort_tailer import MultiTailer  # noqa: E402
+
+ALERT = ('{"timestamp":"07/10-13:55:36.%06d","pkt_num":%d,"proto":"TCP","pkt_gen":"raw","pkt_len":60,'
+         '"dir":"C2S","src_ap":"10.0.0.%d:%d","dst_ap":"10.0.1.5:443","rule":"1:1000001:3",'
+         '"action":"allow","msg":"BRUTE-FORCE SSH login attempt","class":"attempted-admin","priority":2}\n')
+
+
+def build_bursts(total: int, burst: int):
+    """Pre-render the alert text so the timed section measures the tailer, not string formatting."""
+    out = []
+    for start in range(0, total, burst):
+        n = min(burst, total - start)
+        text = "".join(ALERT % (i % 1000000, i, i % 250, 1024 + i % 60000) for i in range(start, start + n))
+        out.append((text.encode(), n))
+    return out
+
+
+def writer(path: str, bursts, rotate_at: int):
+    written = 0
+    f = open(path, "ab")
+    for data, n in bursts:
+        f.write(data)
+        f.flush()
+        written += n
+        if rotate_at and written >= rotate_at:
+            f.close()
+            os.rename(path, path + ".1")
+            f = open(path, "ab")
+            rotate_at = 0
+    f.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--alerts", type=int, default=500000)
+    ap.add_argument("--burst", type=int, default=2000, help="Lines per writer flush")
+    ap.add_argument("--target", type=float, default=50000.0, help="Required alerts/s")
+    ap.add_argument("--poll", action="store_true", help="Disable inotify")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "alert_json.txt")
+        open(path, "w").close()
+        tailer = MultiTailer([path], from_end=False, use_inotify=not args.poll, poll_interval=0.05)
+        bursts = build_bursts(args.alerts, args.burst)
+        wt = threading.Thread(target=writer, args=(path, bursts, args.alerts // 2), daemon=True)
+
+        seen = 0
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        wt.start()
+        deadline = t0 + max(30.0, args.alerts / 5000.0)
+        while seen < args.alerts and time.perf_counter() < deadline:
+            seen += len(tailer.poll_once(0.05))
+        elapsed = time.perf_counter() - t0
+        cpu = time.process_time() - cpu0
+        wt.join()
+        stats = dict(tailer.stats)
+        tailer.close()
+
+    rate = seen / elapsed if elapsed else 0.0
+    ok = seen == args.alerts and rate >= args.target
+    print(json.dumps({
+        "alerts": args.alerts, "delivered": seen, "elapsed_s": round(elapsed, 3),
+        "cpu_s": round(cpu, 3), "alerts_per_s": round(rate), "target_per_s": args.target,
+        "tailer": stats, "status": "ok" if ok else "fail",
+    }))
+    sys.exit(0 if ok else 2)
+
+
+if __name__ == "__main__":
+    main()
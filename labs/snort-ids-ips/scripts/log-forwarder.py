@@ -3,6 +3,9 @@
 Secure Snort -> SIEM forwarder (Splunk HEC + Azure Logs Ingestion API via DCR).
 - No plaintext secrets. Pull tokens from Azure Key Vault (managed identity) or env.
 - Resilient tailer with backoff, file rotation handling, and JSON normalization.
+  Tailing is event-driven (inotify, polling fallback) and rotation/truncation safe; see snort_tailer.py.
+  Normalization detects Snort3 / Barnyard2 / Suricata EVE per file and emits pre-serialized events;
+  see snort_normalizer.py (SNORT_DIALECT=snort3|barnyard2|suricata-eve|legacy pins the dialect).
 
 Env (choose based on your environment):
   SPLUNK_HEC_URL=https://splunk.example.com:8088/services/collector
@@ -20,14 +23,38 @@ Key Vault (optional; recommended):
   KEYVAULT_URI=https://<your-kv-name>.vault.azure.net/
   SECRETS: splunk-hec-token
 
+Sender pools (optional; see snort_sinks.py):
+  SINK_WORKERS=2            # fixed sender threads per sink, each with a keep-alive session
+  SINK_QUEUE_BATCHES=64     # bounded queue per sink between the spool reader and the senders
+  SPLUNK_BATCH_BYTES=1048576  # uncompressed byte budget per HEC POST (match max_content_length)
+  DCR_BATCH_BYTES=1048576     # uncompressed byte budget per DCR POST (API limit: 1 MB per call)
+  BATCH_EVENTS=10000, BATCH_LINGER_S=5
+  SINK_GZIP=1, GZIP_LEVEL=6   # Content-Encoding: gzip; 413 responses split the batch and resend
+
+Spool (write-ahead, per-sink replay; see snort_spool.py):
+  SPOOL_DIR=/var/spool/snort-forwarder
+  SPOOL_MAX_BYTES=1073741824  # disk cap, oldest segments evicted first
+  SPOOL_SEGMENT_BYTES=16777216
+  SPOOL_FSYNC=0               # 1 = fsync every append
+  STATS_INTERVAL_S=60         # JSON metrics line (spool depth, evictions, sender counters)
+
 Run:
   python3 log-forwarder.py /var/log/snort/alert_json.log
+  python3 log-forwarder.py "/var/log/snort/*.json" /var/log/suricata/eve.json   # many files / globs
 """
 
-import os, sys, time, json, re, hashlib, threading
-from datetime import datetime, timezone
+import os, sys, time, json, hashlib, logging, threading
 from typing import Optional
 
+from snort_sinks import (AzureDcrSink, CachedToken, SplunkHecSink, BATCH_BYTES, BATCH_EVENTS, BATCH_LINGER,
+                         DEFAULT_QUEUE_BATCHES, DEFAULT_WORKERS, GZIP_LEVEL)
+from snort_normalizer import Normalizer
+from snort_spool import Spool, MAX_BYTES as SPOOL_MAX_BYTES, SEGMENT_BYTES
+from snort_tailer import MultiTailer
+
+CHECKPOINT_INTERVAL = 1.0  # seconds between tailer position checkpoints (at-least-once on restart)
+log = logging.getLogger("snort-forwarder")
+
 # Optional Azure dependencies for prod use; wrap imports
 AZURE_AVAILABLE = True
 try:
@@ -38,143 +65,122 @@ except Exception:
     AZURE_AVAILABLE = False
     import requests
 
-LINE_RE = re.compile(r'^\s*\{.*\}\s*$')  # expect JSON per line (use Barnyard2 json_output or Snort3 JSON)
-
 def get_env(name: str, default: Optional[str] = None) -> Optional[str]:
     v = os.getenv(name, default)
     return v.strip() if isinstance(v, str) else v
 
+_credential = None
+_credential_lock = threading.Lock()
+
+def get_credential():
+    """One DefaultAzureCredential per process (it caches tokens internally)."""
+    global _credential
+    if not AZURE_AVAILABLE:
+        return None
+    with _credential_lock:
+        if _credential is None:
+            _credential = DefaultAzureCredential(exclude_shared_token_cache_credential=True)
+        return _credential
+
 def load_secret_from_keyvault(secret_name: str) -> Optional[str]:
     kv_uri = get_env("KEYVAULT_URI")
     if not kv_uri or not AZURE_AVAILABLE:
         return None
     try:
-        cred = DefaultAzureCredential(exclude_shared_token_cache_credential=True)
-        client = SecretClient(vault_url=kv_uri, credential=cred)
+        client = SecretClient(vault_url=kv_uri, credential=get_credential())
         return client.get_secret(secret_name).value
     except Exception:
         return None
 
-def normalized_event(raw_line: str) -> dict:
-    try:
-        evt = json.loads(raw_line)
-    except Exception:
-        # Best effort parse: fallback to fast log conversion
-        evt = {"raw": raw_line}
-
-    # Normalize likely keys
-    now = datetime.now(timezone.utc).isoformat()
-    sig = evt.get("signature") or evt.get("sig") or evt.get("alert", {}).get("signature")
-    sid = evt.get("sid") or evt.get("alert", {}).get("signature_id")
-    rev = evt.get("rev") or evt.get("alert", {}).get("rev")
-    src = evt.get("src_ip") or evt.get("src") or evt.get("source", {}).get("ip")
-    dst = evt.get("dest_ip") or evt.get("dst") or evt.get("destination", {}).get("ip")
-    sport = evt.get("src_port") or evt.get("sp") or evt.get("source", {}).get("port")
-    dport = evt.get("dest_port") or evt.get("dp") or evt.get("destination", {}).get("port")
-    proto = evt.get("proto") or evt.get("protocol")
-    sev = evt.get("severity") or evt.get("alert", {}).get("severity")
-
-    return {
-        "time": now,
-        "msg": evt.get("msg") or evt.get("alert", {}).get("category") or "snort alert",
-        "signature": sig,
-        "sid": sid,
-        "rev": rev,
-        "src": src,
-        "dst": dst,
-        "sport": sport,
-        "dport": dport,
-        "proto": proto,
-        "severity": sev,
-        "raw": evt
-    }
-
-def send_splunk(events):
-    url = get_env("SPLUNK_HEC_URL")
-    token = get_env("SPLUNK_HEC_TOKEN") or load_secret_from_keyvault("splunk-hec-token")
-    if not url or not token:
-        return
-    headers = {"Authorization": f"Splunk {token}"}
-    payload = []
-    index = get_env("SPLUNK_INDEX", "ids")
-    sourcetype = get_env("SPLUNK_SOURCETYPE", "snort:json")
-    for e in events:
-        payload.append({"event": e, "sourcetype": sourcetype, "index": index})
-    backoff = 1
-    for _ in range(5):
+def get_azure_token_fetcher(scope="https://monitor.azure.com/.default"):
+    """Returns a fetch() for CachedToken: full AccessToken (with expires_on) from one shared credential."""
+    def fetch():
+        cred = get_credential()
+        if cred is None:
+            return None
         try:
-            r = requests.post(url, headers=headers, json=payload, timeout=10)
-            if r.status_code < 300:
-                return
+            return cred.get_token(scope)
         except Exception:
-            pass
-        time.sleep(backoff)
-        backoff = min(backoff * 2, 30)
+            return None
+    return fetch
+
+def build_sinks(spool: Spool) -> list:
+    """One bounded sender pool per configured sink; unconfigured sinks are skipped."""
+    kw = {
+        "workers": int(get_env("SINK_WORKERS", str(DEFAULT_WORKERS))),
+        "queue_batches": int(get_env("SINK_QUEUE_BATCHES", str(DEFAULT_QUEUE_BATCHES))),
+        "batch_events": int(get_env("BATCH_EVENTS", str(BATCH_EVENTS))),
+        "linger": float(get_env("BATCH_LINGER_S", str(BATCH_LINGER))),
+        "gzip_level": int(get_env("GZIP_LEVEL", str(GZIP_LEVEL))) if get_env("SINK_GZIP", "1") == "1" else None,
+    }
+    sinks = []
 
-def get_azure_access_token(scope="https://monitor.azure.com/.default"):
-    if not AZURE_AVAILABLE:
-        return None
-    try:
-        cred = DefaultAzureCredential(exclude_shared_token_cache_credential=True)
-        token = cred.get_token(scope)
-        return token.token
-    except Exception:
-        return None
+    url = get_env("SPLUNK_HEC_URL")
+    if url:
+        token = CachedToken(lambda: get_env("SPLUNK_HEC_TOKEN") or load_secret_from_keyvault("splunk-hec-token"))
+        sinks.append(SplunkHecSink(spool, url, token,
+                                   index=get_env("SPLUNK_INDEX", "ids"),
+                                   sourcetype=get_env("SPLUNK_SOURCETYPE", "snort:json"),
+                                   batch_bytes=int(get_env("SPLUNK_BATCH_BYTES", str(BATCH_BYTES))), **kw))
 
-def send_azure(events):
     # Azure Logs Ingestion API (DCR)
     dce = get_env("DCE_INGEST_URI")
     dcr_rule_id = get_env("DCR_RULE_ID")
-    if not dce or not dcr_rule_id:
-        return
-    token = get_azure_access_token()
-    if not token:
-        return
-    url = f"{dce}/dataCollectionRules/{dcr_rule_id}/streams/Custom-Logs?api-version=2023-01-01"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    # Azure expects array of objects matching the DCR transform; we send { RawData: json-string }
-    payload = [{"RawData": json.dumps(e)} for e in events]
-    backoff = 1
-    for _ in range(5):
-        try:
-            r = requests.post(url, headers=headers, json=payload, timeout=10)
-            if r.status_code < 300:
-                return
-        except Exception:
-            pass
-        time.sleep(backoff)
-        backoff = min(backoff * 2, 30)
-
-def tail_file(path):
-    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-        f.seek(0, os.SEEK_END)
-        while True:
-            line = f.readline()
-            if not line:
-                time.sleep(0.2)
-                continue
-            if not LINE_RE.match(line):
-                continue
-            yield line.strip()
+    if dce and dcr_rule_id and AZURE_AVAILABLE:
+        sinks.append(AzureDcrSink(spool, dce, dcr_rule_id, CachedToken(get_azure_token_fetcher()),
+                                  batch_bytes=int(get_env("DCR_BATCH_BYTES", str(BATCH_BYTES))), **kw))
+    return sinks
+
+def report_stats(spool: Spool, tailer: MultiTailer, normalizer: Normalizer, sinks: list, interval: float,
+                 stop: threading.Event):
+    """Periodic JSON metrics line (spool depth per sink, evictions, sender counters)."""
+    while not stop.wait(interval):
+        log.info(json.dumps({"spool": spool.stats(), "tailer": tailer.stats, "normalizer": normalizer.stats,
+                             "dialects": {p: d.name for p, d in normalizer.streams.items()},
+                             "sinks": {s.name: s.stats for s in sinks}}))
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s %(message)s")
     if len(sys.argv) < 2:
-        print("Usage: log-forwarder.py <snort_json_alert_file>", file=sys.stderr)
+        print("Usage: log-forwarder.py <snort_json_alert_file|glob> [...]", file=sys.stderr)
         sys.exit(1)
 
-    srcfile = sys.argv[1]
-    batch, last_send = [], time.time()
-    for line in tail_file(srcfile):
-        evt = normalized_event(line)
-        batch.append(evt)
-
-        if len(batch) >= 50 or (time.time() - last_send) > 5:
-            # parallel sends but failure tolerant
-            to_send = batch[:]
-            batch.clear()
-            last_send = time.time()
-            threading.Thread(target=send_splunk, args=(to_send,), daemon=True).start()
-            threading.Thread(target=send_azure, args=(to_send,), daemon=True).start()
+    spool = Spool(get_env("SPOOL_DIR", "/var/spool/snort-forwarder"),
+                  max_bytes=int(get_env("SPOOL_MAX_BYTES", str(SPOOL_MAX_BYTES))),
+                  segment_bytes=int(get_env("SPOOL_SEGMENT_BYTES", str(SEGMENT_BYTES))),
+                  fsync=get_env("SPOOL_FSYNC", "0") == "1")
+    sinks = build_sinks(spool)
+    if not sinks:
+        print("No sink configured (SPLUNK_HEC_URL and/or DCE_INGEST_URI + DCR_RULE_ID).", file=sys.stderr)
+        sys.exit(1)
+
+    # Expects JSON per line (Barnyard2 json_output, Snort3 alert_json or Suricata EVE).
+    # Resume from the last checkpoint so a restart neither skips nor re-reads the whole file.
+    tailer = MultiTailer(sys.argv[1:], resume=spool.load_positions())
+    normalizer = Normalizer(get_env("SNORT_DIALECT"))
+    stop = threading.Event()
+    threading.Thread(target=report_stats, daemon=True,
+                     args=(spool, tailer, normalizer, sinks, float(get_env("STATS_INTERVAL_S", "60")), stop)).start()
+    last_checkpoint = 0.0
+    try:
+        for groups in tailer.file_batches():
+            # Dialect is detected per source file; events are serialized once here and senders
+            # batch the spooled bytes without re-encoding them
+            for path, lines in groups:
+                spool.append(normalizer.normalize_batch(path, lines))
+            now = time.monotonic()
+            if now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                spool.save_positions(tailer.positions())
+                last_checkpoint = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        spool.save_positions(tailer.positions())
+        tailer.close()
+        for sink in sinks:
+            sink.close(timeout=30)
+        spool.close()
 
 if __name__ == "__main__":
     main()
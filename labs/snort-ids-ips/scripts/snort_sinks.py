@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+snort_sinks.py
+Bounded sender pools for log-forwarder.py (Splunk HEC + Azure Logs Ingestion via DCR).
+
+- One fixed-size worker pool per sink instead of a new thread per flush
+- Keep-alive requests.Session per worker (TLS handshake once, not once per batch)
+- Tokens cached until near expiry (AAD) or for a TTL (static HEC token / Key Vault secret)
+- Batches are read straight from the spool (snort_spool.py) as pre-serialized records and
+  acknowledged per sink only after delivery; a bounded queue per sink keeps the dispatcher
+  from reading ahead of the senders
+- Batches target a per-sink byte budget on the encoded payload (not a fixed event count): the
+  dispatcher sizes spool reads by the observed encoded/raw expansion of this sink's format (HEC
+  envelope, DCR string escaping), the budget is checked on the encoded size before anything is
+  compressed, and only then is the payload gzipped (Content-Encoding: gzip). Batches are split in
+  halves and resent when still over budget or when the endpoint answers 413 Payload Too Large
+- stats: compression ratio plus histograms of uncompressed batch bytes and events per POST
+"""
+
+import abc, bisect, json, logging, queue, threading, time, zlib
+from typing import Callable, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from snort_normalizer import json_string
+from snort_spool import Spool
+
+log = logging.getLogger("snort-forwarder")
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_BATCHES = 64
+BATCH_BYTES = 1 << 20         # uncompressed payload budget per POST (DCR limit: 1 MB per call)
+BATCH_EVENTS = 10000          # safety cap on events per POST
+BATCH_LINGER = 5.0            # flush a partial batch 5 seconds after the first pending event
+READ_MARGIN = 0.95            # spool reads aim this far under the encoded budget (record sizes vary)
+GZIP_LEVEL = 6
+RETRYABLE_4XX = (401, 408, 429)
+SIZE_BUCKETS = (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20, 4 << 20)
+EVENT_BUCKETS = (1, 10, 50, 100, 500, 1000, 5000, 10000)
+_TOO_LARGE = "too_large"
+TOKEN_REFRESH_SKEW = 300      # refresh AAD tokens 5 minutes before expiry
+STATIC_TOKEN_TTL = 3600       # re-read HEC token from env/Key Vault hourly (picks up rotations)
+_STOP = object()
+
+
+class CachedToken:
+    """
+    Caches the result of fetch(). fetch() may return an azure AccessToken (token, expires_on),
+    a plain string (cached for static_ttl seconds) or None (not cached, retried next call).
+    """
+
+    def __init__(self, fetch: Callable[[], object], static_ttl: float = STATIC_TOKEN_TTL,
+                 skew: float = TOKEN_REFRESH_SKEW):
+        self._fetch = fetch
+        self._static_ttl = static_ttl
+        self._skew = skew
+        self._lock = threading.Lock()
+        self._value: Optional[str] = None
+        self._expires = 0.0
+
+    def get(self) -> Optional[str]:
+        if self._value and time.time() < self._expires:
+            return self._value
+        with self._lock:
+            if self._value and time.time() < self._expires:
+                return self._value
+            tok = self._fetch()
+            if tok is None:
+                return None
+            if hasattr(tok, "token"):
+                self._value = tok.token
+                self._expires = float(getattr(tok, "expires_on", 0)) - self._skew
+            else:
+                self._value = str(tok)
+                self._expires = time.time() + self._static_ttl
+            return self._value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._value, self._expires = None, 0.0
+
+
+class Sink(abc.ABC):
+    """
+    Fixed pool of sender threads for one destination.
+
+    A dispatcher thread reads batches of pre-serialized records straight from the spool at this
+    sink's cursor (up to batch_bytes / batch_events) and feeds a bounded queue; workers send them
+    and acknowledge offsets back to the spool in order. A batch is only acknowledged after a 2xx,
+    so an outage or a restart replays from the last acknowledged offset instead of dropping data.
+    """
+
+    name = "sink"
+    url: str
+    token: CachedToken
+    expansion = 1.2               # initial encoded/raw bytes guess; replaced by observed batches
+
+    def __init__(self, spool: Spool, workers: int = DEFAULT_WORKERS, queue_batches: int = DEFAULT_QUEUE_BATCHES,
+                 batch_bytes: int = BATCH_BYTES, batch_events: int = BATCH_EVENTS, linger: float = BATCH_LINGER,
+                 gzip_level: Optional[int] = GZIP_LEVEL, timeout: float = 10.0):
+        self.spool = spool
+        self.batch_bytes = batch_bytes
+        self.batch_events = batch_events
+        self.linger = linger
+        self.gzip_level = gzip_level  # None disables compression
+        self.timeout = timeout
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_batches)
+        self.stats = {"batches_sent": 0, "events_sent": 0, "events_rejected": 0, "retries": 0, "splits": 0,
+                      "encode_expansion": self.expansion, "bytes_raw": 0, "bytes_sent": 0, "compression_ratio": None,
+                      "batch_bytes_hist": dict.fromkeys(_bucket_labels(SIZE_BUCKETS), 0),
+                      "batch_events_hist": dict.fromkeys(_bucket_labels(EVENT_BUCKETS), 0)}
+        self._stats_lock = threading.Lock()
+        self._closing = threading.Event()
+        self._ack_lock = threading.Lock()
+        self._acked = spool.register(self.name)
+        self._done: Dict[int, int] = {}
+        self._threads = [threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        self._threads.append(threading.Thread(target=self._dispatch, name=f"{self.name}-dispatch", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Stop sending; anything not yet acknowledged is replayed from the spool on next start."""
+        self._closing.set()
+        for _ in range(len(self._threads) - 1):
+            try:
+                self.queue.put(_STOP, timeout=1)
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(timeout)
+
+    # -- dispatcher ----------------------------------------------------------
+    def _dispatch(self) -> None:
+        offset, first_seen = self._acked, None
+        while not self._closing.is_set():
+            records, start, nxt = self.spool.read(offset, self.batch_events, self._read_bytes())
+            if start != offset:
+                self._skip_to(start)  # evicted or corrupt range: never acknowledged, just skipped
+            if not records:
+                offset = start
+                self.spool.wait(offset, timeout=1.0)
+                continue
+            # Full when a limit stopped the read (more data is already waiting); otherwise linger
+            if nxt >= self.spool.write_offset and len(records) < self.batch_events:
+                first_seen = first_seen or time.monotonic()
+                remaining = self.linger - (time.monotonic() - first_seen)
+                if remaining > 0:
+                    offset = start
+                    self.spool.wait(nxt, timeout=remaining)
+                    continue
+            first_seen = None
+            while not self._closing.is_set():
+                try:
+                    self.queue.put((start, nxt, records), timeout=1.0)
+                    break
+                except queue.Full:
+                    continue
+            offset = nxt
+
+    def _read_bytes(self) -> int:
+        """Raw spool bytes whose encoding should still fit batch_bytes."""
+        return max(1, int(self.batch_bytes * READ_MARGIN / self.expansion))
+
+    def _observe(self, records: List[bytes], encoded: int) -> None:
+        """Track encoded/raw expansion; rises at once, decays slowly, so reads stay conservative."""
+        raw = sum(map(len, records))
+        if not raw:
+            return
+        ratio = encoded / raw
+        self.expansion = max(ratio, 0.9 * self.expansion + 0.1 * ratio)
+        with self._stats_lock:
+            self.stats["encode_expansion"] = round(self.expansion, 3)
+
+    def _skip_to(self, offset: int) -> None:
+        with self._ack_lock:
+            if offset > self._acked:
+                self._acked = offset
+                self._done = {k: v for k, v in self._done.items() if k >= offset}
+        self.spool.ack(self.name, offset)
+
+    def _complete(self, start: int, end: int) -> None:
+        """Acknowledge contiguously: out-of-order completions wait for the batches before them."""
+        with self._ack_lock:
+            if start < self._acked:
+                return
+            self._done[start] = end
+            advanced = False
+            while self._acked in self._done:
+                self._acked = self._done.pop(self._acked)
+                advanced = True
+            acked = self._acked
+        if advanced:
+            self.spool.ack(self.name, acked)
+
+    # -- workers -------------------------------------------------------------
+    def _bump(self, key: str, n=1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _record_sent(self, events: int, raw: int, sent: int) -> None:
+        with self._stats_lock:
+            st = self.stats
+            st["batches_sent"] += 1
+            st["events_sent"] += events
+            st["bytes_raw"] += raw
+            st["bytes_sent"] += sent
+            st["compression_ratio"] = round(st["bytes_raw"] / st["bytes_sent"], 2) if st["bytes_sent"] else None
+            st["batch_bytes_hist"][_bucket(SIZE_BUCKETS, raw)] += 1
+            st["batch_events_hist"][_bucket(EVENT_BUCKETS, events)] += 1
+
+    def _worker(self) -> None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        try:
+            while True:
+                item = self.queue.get()
+                if item is _STOP:
+                    return
+                start, end, records = item
+                try:
+                    done = self._deliver(session, records)
+                except Exception as e:  # never let one bad batch kill the pool
+                    log.warning("%s: batch failed: %s", self.name, e)
+                    done = None
+                if done is None:  # shutting down: leave it unacknowledged for replay
+                    continue
+                self._complete(start, end)
+        finally:
+            session.close()
+
+    def _body(self, pieces: List[bytes]) -> bytes:
+        """Joins (or gzips) encoded pieces; only called once the batch is known to fit the budget."""
+        if self.gzip_level is None:
+            return b"".join(pieces)
+        gz = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+        out = [c for c in map(gz.compress, pieces) if c]
+        out.append(gz.flush())
+        return b"".join(out)
+
+    def _deliver(self, session: requests.Session, records: List[bytes]) -> Optional[bool]:
+        """
+        True once every record was delivered or permanently rejected, None if the sink is shutting
+        down. Over-budget or 413'd batches are split in halves; a single record that is still too
+        large is rejected.
+        """
+        pieces = list(self.iter_encode(records))
+        raw = sum(map(len, pieces))
+        self._observe(records, raw)
+        status = None  # not attempted (over budget) until _post() says otherwise
+        if raw <= self.batch_bytes or len(records) == 1:
+            body = self._body(pieces)
+            status = self._post(session, body)
+            if status is True:
+                self._record_sent(len(records), raw, len(body))
+                return True
+            if status is None:
+                return None
+        if len(records) > 1 and (status is None or status == _TOO_LARGE):
+            self._bump("splits")
+            mid = len(records) // 2
+            if self._deliver(session, records[:mid]) is None:
+                return None
+            return self._deliver(session, records[mid:])
+        self._bump("events_rejected", len(records))
+        return True
+
+    def _post(self, session: requests.Session, body: bytes):
+        """
+        POST with retries: True on 2xx, _TOO_LARGE on 413, False if the sink permanently rejects
+        the batch (other non-retryable 4xx), None if the sink is shutting down. Transient failures
+        are retried with capped backoff indefinitely; the spool absorbs the backlog meanwhile.
+        """
+        backoff = 1.0
+        while not self._closing.is_set():
+            token = self.token.get()
+            delay = backoff
+            if token:
+                headers = self.headers(token)
+                if self.gzip_level is not None:
+                    headers["Content-Encoding"] = "gzip"
+                try:
+                    r = session.post(self.url, headers=headers, data=body, timeout=self.timeout)
+                    if r.status_code < 300:
+                        return True
+                    if r.status_code == 413:
+                        return _TOO_LARGE
+                    if r.status_code == 401:
+                        self.token.invalidate()
+                    elif r.status_code < 500 and r.status_code not in RETRYABLE_4XX:
+                        log.warning("%s: batch rejected [%s]: %s", self.name, r.status_code, r.text[:200])
+                        return False
+                    retry_after = r.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        delay = float(retry_after)
+                except requests.RequestException:
+                    pass
+            self._bump("retries")
+            self._closing.wait(delay)
+            backoff = min(backoff * 2, 30)
+        return None
+
+    @abc.abstractmethod
+    def iter_encode(self, records: List[bytes]) -> Iterator[bytes]:
+        ...
+
+    @abc.abstractmethod
+    def headers(self, token: str) -> dict:
+        ...
+
+
+def _bucket_labels(bounds) -> List[str]:
+    return [f"<={b}" for b in bounds] + [f">{bounds[-1]}"]
+
+
+def _bucket(bounds, value: int) -> str:
+    i = bisect.bisect_left(bounds, value)
+    return f"<={bounds[i]}" if i < len(bounds) else f">{bounds[-1]}"
+
+
+class SplunkHecSink(Sink):
+    name = "splunk"
+
+    def __init__(self, spool: Spool, url: str, token: CachedToken, index: str = "ids",
+                 sourcetype: str = "snort:json", **kw):
+        self.url, self.token = url, token
+        # HEC batch format: concatenated event objects; the metadata suffix is rendered once
+        self._prefix = b'{"event":'
+        self._suffix = (',' + json.dumps({"sourcetype": sourcetype, "index": index})[1:] + "\n").encode()
+        super().__init__(spool, **kw)
+
+    def iter_encode(self, records):
+        prefix, suffix = self._prefix, self._suffix
+        for r in records:
+            yield prefix + r + suffix
+
+    def headers(self, token):
+        return {"Authorization": f"Splunk {token}", "Content-Type": "application/json"}
+
+
+class AzureDcrSink(Sink):
+    name = "azure"
+
+    def __init__(self, spool: Spool, dce: str, dcr_rule_id: str, token: CachedToken,
+                 stream: str = "Custom-Logs", **kw):
+        self.url = f"{dce}/dataCollectionRules/{dcr_rule_id}/streams/{stream}?api-version=2023-01-01"
+        self.token = token
+        super().__init__(spool, **kw)
+
+    def iter_encode(self, records):
+        # Azure expects array of objects matching the DCR transform; we send { RawData: json-string }
+        sep = b'[{"RawData":'
+        for r in records:
+            yield sep + json_string(r) + b"}"
+            sep = b',{"RawData":'
+        yield b"]"
+
+    def headers(self, token):
+        return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+snort_spool.py
+Segment-based write-ahead spool between the tailer and the sink sender pools.
+
+- Append-only segment files (seg-<base offset>.log); every record is framed as
+  <u32 length><u32 crc32><payload>, payload = one pre-serialized event
+- Records are addressed by a global byte offset; each sink keeps its own acknowledged offset
+  under cursors/<sink>.ack, so sinks replay independently after an outage or a restart
+- Torn tail records (crash mid-write) are truncated on open; CRC mismatches are skipped and counted
+- Disk cap with oldest-first eviction (cursors behind an evicted segment jump forward and the loss is
+  counted per sink); segments acknowledged by every sink are deleted eagerly
+- Tailer file positions are checkpointed next to the segments (tailer.pos) so a restart resumes
+  where the last durable append ended instead of at EOF
+"""
+
+import bisect, json, os, struct, threading, time, zlib
+from typing import Dict, List, Optional, Tuple
+
+SEGMENT_BYTES = 16 << 20
+MAX_BYTES = 1 << 30
+CURSOR_PERSIST_INTERVAL = 1.0
+_REC = struct.Struct("<II")
+_SEG_PREFIX, _SEG_SUFFIX = "seg-", ".log"
+
+
+def _atomic_write(path: str, data: bytes, fsync: bool) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _parse(buf: bytes, pos: int = 0) -> Tuple[List[bytes], int, bool]:
+    """Parse complete records from buf. Returns (payloads, bytes consumed, crc_error)."""
+    out, n = [], len(buf)
+    while pos + _REC.size <= n:
+        ln, crc = _REC.unpack_from(buf, pos)
+        end = pos + _REC.size + ln
+        if end > n:
+            break
+        payload = buf[pos + _REC.size:end]
+        if zlib.crc32(payload) != crc:
+            return out, pos, True
+        out.append(payload)
+        pos = end
+    return out, pos, False
+
+
+class Spool:
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES, segment_bytes: int = SEGMENT_BYTES,
+                 fsync: bool = False):
+        self.dir = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._read_fds: Dict[int, int] = {}
+        self.cursors: Dict[str, int] = {}
+        self._cursor_saved: Dict[str, float] = {}
+        self.stats_counters = {"appended_records": 0, "appended_bytes": 0, "evicted_bytes": 0,
+                               "evicted_segments": 0, "crc_errors": 0, "recovered_truncations": 0}
+        self.lost_bytes: Dict[str, int] = {}
+        os.makedirs(os.path.join(directory, "cursors"), exist_ok=True)
+
+        self.segments: List[int] = sorted(
+            int(fn[len(_SEG_PREFIX):-len(_SEG_SUFFIX)]) for fn in os.listdir(directory)
+            if fn.startswith(_SEG_PREFIX) and fn.endswith(_SEG_SUFFIX))
+        if not self.segments:
+            self.segments = [0]
+            open(self._seg_path(0), "ab").close()
+        self.write_offset = self.segments[-1] + self._recover(self.segments[-1])
+        self._fh = open(self._seg_path(self.segments[-1]), "ab")
+
+        for fn in os.listdir(os.path.join(directory, "cursors")):
+            if fn.endswith(".ack"):
+                with open(os.path.join(directory, "cursors", fn)) as f:
+                    self.cursors[fn[:-4]] = int(f.read().strip() or 0)
+
+    # -- files ---------------------------------------------------------------
+    def _seg_path(self, base: int) -> str:
+        return os.path.join(self.dir, f"{_SEG_PREFIX}{base:020d}{_SEG_SUFFIX}")
+
+    def _recover(self, base: int) -> int:
+        """Validate the active segment and truncate a torn/corrupt tail; returns its valid size."""
+        path = self._seg_path(base)
+        with open(path, "rb") as f:
+            data = f.read()
+        _, valid, _ = _parse(data)
+        if valid < len(data):
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+            self.stats_counters["recovered_truncations"] += 1
+        return valid
+
+    def _read_fd(self, base: int) -> int:
+        fd = self._read_fds.get(base)
+        if fd is None:
+            fd = self._read_fds[base] = os.open(self._seg_path(base), os.O_RDONLY)
+        return fd
+
+    def _seg_end(self, idx: int) -> int:
+        return self.segments[idx + 1] if idx + 1 < len(self.segments) else self.write_offset
+
+    def _drop_oldest(self) -> None:
+        base = self.segments.pop(0)
+        fd = self._read_fds.pop(base, None)
+        if fd is not None:
+            os.close(fd)
+        try:
+            os.remove(self._seg_path(base))
+        except FileNotFoundError:
+            pass
+
+    # -- producer ------------------------------------------------------------
+    def append(self, records: List[bytes]) -> int:
+        """Append pre-serialized records (fsync'd when fsync=True); returns the new write offset."""
+        if not records:
+            return self.write_offset
+        frame = b"".join(_REC.pack(len(r), zlib.crc32(r)) + r for r in records)
+        with self._cond:
+            self._fh.write(frame)
+            self._fh.flush()
+            if self.fsync:
+                os.fsync(self._fh.fileno())
+            self.write_offset += len(frame)
+            self.stats_counters["appended_records"] += len(records)
+            self.stats_counters["appended_bytes"] += len(frame)
+            if self.write_offset - self.segments[-1] >= self.segment_bytes:
+                self._roll()
+            self._enforce_cap()
+            self._cond.notify_all()
+            return self.write_offset
+
+    def _roll(self) -> None:
+        self._fh.close()
+        self.segments.append(self.write_offset)
+        self._fh = open(self._seg_path(self.write_offset), "ab")
+
+    def _enforce_cap(self) -> None:
+        # Oldest-first eviction; the active segment is never evicted.
+        while len(self.segments) > 1 and self.write_offset - self.segments[0] > self.max_bytes:
+            nxt = self.segments[1]
+            for name, off in self.cursors.items():
+                if off < nxt:
+                    self.lost_bytes[name] = self.lost_bytes.get(name, 0) + nxt - max(off, self.segments[0])
+                    self.cursors[name] = nxt
+                    self._persist_cursor(name, force=True)
+            self.stats_counters["evicted_bytes"] += nxt - self.segments[0]
+            self.stats_counters["evicted_segments"] += 1
+            self._drop_oldest()
+
+    def _collect_acked(self) -> None:
+        if not self.cursors:
+            return
+        low = min(self.cursors.values())
+        while len(self.segments) > 1 and self.segments[1] <= low:
+            self._drop_oldest()
+
+    # -- consumers -----------------------------------------------------------
+    def register(self, name: str) -> int:
+        """Return the sink's acknowledged offset (new sinks start at the oldest retained record)."""
+        with self._cond:
+            off = self.cursors.get(name, self.segments[0])
+            self.cursors[name] = min(max(off, self.segments[0]), self.write_offset)
+            self._persist_cursor(name, force=True)
+            return self.cursors[name]
+
+    def read(self, offset: int, max_records: int, max_bytes: int = 1 << 20) -> Tuple[List[bytes], int, int]:
+        """
+        Read up to max_records / ~max_bytes starting at offset. Returns (payloads, start, next); start
+        is greater than offset when the requested range was evicted or skipped as corrupt.
+        """
+        out: List[bytes] = []
+        nbytes = 0
+        with self._cond:
+            start = pos = max(offset, self.segments[0])
+            while len(out) < max_records and nbytes < max_bytes and pos < self.write_offset:
+                idx = bisect.bisect_right(self.segments, pos) - 1
+                base, end = self.segments[idx], self._seg_end(idx)
+                fd = self._read_fd(base)
+                buf = os.pread(fd, min(end - pos, max(max_bytes - nbytes, _REC.size)), pos - base)
+                recs, used, bad = _parse(buf)
+                if not recs and not bad:
+                    ln, _ = _REC.unpack_from(buf, 0)  # one record larger than the read window
+                    if pos + _REC.size + ln > end:
+                        bad = True  # length field points past the segment: corrupt
+                    else:
+                        recs, used, bad = _parse(os.pread(fd, _REC.size + ln, pos - base))
+                room = max_records - len(out)
+                if len(recs) > room:
+                    recs, bad = recs[:room], False
+                    used = sum(_REC.size + len(r) for r in recs)
+                out.extend(recs)
+                nbytes += used
+                pos += used
+                if bad:
+                    self.stats_counters["crc_errors"] += 1
+                    if out:
+                        break  # return the good prefix; the next read skips the corrupt tail
+                    start = pos = end
+            return out, start, pos
+
+    def wait(self, offset: int, timeout: float) -> bool:
+        """Block until data exists beyond offset (or timeout)."""
+        with self._cond:
+            if self.write_offset > offset:
+                return True
+            self._cond.wait(timeout)
+            return self.write_offset > offset
+
+    def ack(self, name: str, offset: int) -> None:
+        with self._cond:
+            if offset <= self.cursors.get(name, -1):
+                return
+            self.cursors[name] = offset
+            self._persist_cursor(name)
+            self._collect_acked()
+
+    def _persist_cursor(self, name: str, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._cursor_saved.get(name, 0.0) < CURSOR_PERSIST_INTERVAL:
+            return
+        self._cursor_saved[name] = now
+        _atomic_write(os.path.join(self.dir, "cursors", f"{name}.ack"), str(self.cursors[name]).encode(), self.fsync)
+
+    # -- tailer checkpoint ---------------------------------------------------
+    def save_positions(self, positions: dict) -> None:
+        _atomic_write(os.path.join(self.dir, "tailer.pos"), json.dumps(positions).encode(), self.fsync)
+
+    def load_positions(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.dir, "tailer.pos"), "rb") as f:
+                return json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    # -- metrics / lifecycle -------------------------------------------------
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "segments": len(self.segments),
+                "bytes": self.write_offset - self.segments[0],
+                "max_bytes": self.max_bytes,
+                "write_offset": self.write_offset,
+                **self.stats_counters,
+                "sinks": {name: {"acked_offset": off, "depth_bytes": self.write_offset - off,
+                                 "lost_bytes": self.lost_bytes.get(name, 0)}
+                          for name, off in self.cursors.items()},
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            for name in self.cursors:
+                self._persist_cursor(name, force=True)
+            self._fh.close()
+            for fd in self._read_fds.values():
+                os.close(fd)
+            self._read_fds.clear()
+            self._cond.notify_all()
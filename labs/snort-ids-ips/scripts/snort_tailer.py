@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+snort_tailer.py
+Event-driven, rotation-safe multi-file tailer used by log-forwarder.py.
+
+- inotify (libc via ctypes, no extra dependency) with a stat-polling fallback on hosts without it
+- Tracks (st_dev, st_ino) and size per path: rotation drains the old handle and reopens the new file,
+  truncation (copytruncate) rewinds to offset 0
+- Watches many files and glob patterns per process; new matches are picked up on directory events
+- Large buffered os.read() chunks are split on b"\\n"; JSON alerts are selected with a first/last byte
+  check instead of a per-line regex
+
+Usage (stand-alone, prints alert lines):
+  python3 snort_tailer.py "/var/log/snort/*.json" /var/log/suricata/eve.json
+"""
+
+import ctypes, ctypes.util, fnmatch, glob, os, select, struct, sys, time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+READ_CHUNK = 1 << 20          # 1 MiB per os.read(); lines are split in bulk
+POLL_INTERVAL = 0.5           # seconds between stat sweeps when inotify is unavailable
+RESCAN_INTERVAL = 10.0        # safety re-glob/stat even when inotify is active
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x002, 0x004, 0x008
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x040, 0x080, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW = 0x400, 0x800, 0x4000
+IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+DIR_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT_HDR = struct.Struct("iIII")
+
+
+def is_json_alert(line: bytes) -> bool:
+    """Cheap replacement for the old LINE_RE (^\\s*\\{.*\\}\\s*$) full-line regex."""
+    if line[:1] == b"{" and line[-1:] == b"}":
+        return True
+    s = line.strip()
+    return s[:1] == b"{" and s[-1:] == b"}"
+
+
+class _Inotify:
+    """Minimal inotify binding: directory watches, returns the set of (dir, name) touched."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is Linux-only")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd_dirs: Dict[int, str] = {}
+        self._dir_wds: Dict[str, int] = {}
+
+    def watch_dir(self, path: str) -> None:
+        if path in self._dir_wds:
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), DIR_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self._wd_dirs[wd] = path
+        self._dir_wds[path] = wd
+
+    def read_events(self, timeout: float) -> Optional[set]:
+        """Block up to timeout; returns touched (dir, name) pairs, or None on queue overflow."""
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return set()
+        touched, overflow = set(), False
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            pos = 0
+            while pos < len(buf):
+                wd, mask, _cookie, ln = _EVENT_HDR.unpack_from(buf, pos)
+                pos += _EVENT_HDR.size
+                name = buf[pos:pos + ln].rstrip(b"\0").decode("utf-8", "surrogateescape")
+                pos += ln
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                d = self._wd_dirs.get(wd)
+                if d is not None:
+                    touched.add((d, name))
+            if len(buf) < 64 * 1024:
+                break
+        return None if overflow else touched
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _TailedFile:
+    __slots__ = ("path", "fd", "dev", "ino", "offset", "partial", "orphaned")
+
+    def __init__(self, path: str, from_end: bool, resume: Optional[dict] = None):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+        st = os.fstat(self.fd)
+        self.dev, self.ino = st.st_dev, st.st_ino
+        if resume and (resume.get("dev"), resume.get("ino")) == (st.st_dev, st.st_ino) \
+                and 0 <= resume.get("offset", -1) <= st.st_size:
+            self.offset = os.lseek(self.fd, resume["offset"], os.SEEK_SET)  # same file: continue
+        elif resume:
+            self.offset = 0  # rotated or truncated while we were down: the new file is all unread
+        else:
+            self.offset = os.lseek(self.fd, 0, os.SEEK_END) if from_end else 0
+        self.partial = b""
+        self.orphaned = False  # path now points elsewhere / is gone; drain then close
+
+    def read_lines(self) -> List[bytes]:
+        """Read everything available in large chunks and split into complete lines."""
+        chunks = []
+        while True:
+            data = os.read(self.fd, READ_CHUNK)
+            if not data:
+                break
+            chunks.append(data)
+            self.offset += len(data)
+            if len(data) < READ_CHUNK:
+                break
+        if not chunks:
+            return []
+        data = self.partial + b"".join(chunks) if self.partial else b"".join(chunks)
+        lines = data.split(b"\n")
+        self.partial = lines.pop()
+        return lines
+
+    def rewind(self) -> None:
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        self.offset, self.partial = 0, b""
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class MultiTailer:
+    """
+    Tail many files/globs. batches() yields lists of raw alert lines (bytes, no trailing newline).
+
+    from_end=True mirrors the old tail_file() behaviour for files present at startup; files that
+    appear later (post-rotation or new glob matches) are always read from offset 0. resume is a
+    positions() checkpoint: files whose (dev, inode) still match continue from the saved offset.
+    """
+
+    def __init__(self, patterns: List[str], from_end: bool = True, use_inotify: bool = True,
+                 poll_interval: float = POLL_INTERVAL, json_only: bool = True,
+                 resume: Optional[Dict[str, dict]] = None):
+        self.patterns = [os.path.abspath(p) for p in patterns]
+        self._resume = resume or {}
+        self.poll_interval = poll_interval
+        self.json_only = json_only
+        self.files: Dict[str, _TailedFile] = {}
+        self.draining: List[_TailedFile] = []
+        self._stopped = False
+        self.stats = {"lines": 0, "bytes": 0, "rotations": 0, "truncations": 0, "mode": "poll"}
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify()
+                self.stats["mode"] = "inotify"
+            except (OSError, AttributeError):
+                self._inotify = None
+        self._scan(from_end=from_end)
+        self._resume = {}
+
+    # -- discovery / rotation ------------------------------------------------
+    def _expand(self) -> List[str]:
+        out = []
+        for p in self.patterns:
+            if glob.has_magic(p):
+                out.extend(x for x in glob.glob(p) if os.path.isfile(x))
+            elif os.path.isfile(p):
+                out.append(p)
+        return out
+
+    def _watch_dirs(self) -> None:
+        if not self._inotify:
+            return
+        for p in self.patterns:
+            d = os.path.dirname(p)
+            if glob.has_magic(d):
+                dirs = [x for x in glob.glob(d) if os.path.isdir(x)]
+            else:
+                dirs = [d] if os.path.isdir(d) else []
+            for x in dirs:
+                try:
+                    self._inotify.watch_dir(x)
+                except OSError:
+                    pass
+
+    def _open(self, path: str, from_end: bool) -> None:
+        try:
+            self.files[path] = _TailedFile(path, from_end, self._resume.get(path))
+        except OSError:
+            pass
+
+    def _check(self, tf: _TailedFile) -> None:
+        """Detect rotation (inode change / unlink) and truncation for one tracked path."""
+        try:
+            st = os.stat(tf.path)
+        except FileNotFoundError:
+            if not tf.orphaned:
+                tf.orphaned = True
+                self.draining.append(tf)
+                del self.files[tf.path]
+                self.stats["rotations"] += 1
+            return
+        if (st.st_dev, st.st_ino) != (tf.dev, tf.ino):
+            tf.orphaned = True
+            self.draining.append(tf)
+            del self.files[tf.path]  # if the reopen fails, the next scan retries it as a new path
+            self.stats["rotations"] += 1
+            self._open(tf.path, from_end=False)
+        elif st.st_size < tf.offset:
+            tf.rewind()
+            self.stats["truncations"] += 1
+
+    def _scan(self, from_end: bool = False) -> None:
+        self._watch_dirs()
+        for path in self._expand():
+            if path not in self.files:
+                self._open(path, from_end)
+        for tf in list(self.files.values()):
+            self._check(tf)
+
+    # -- reading -------------------------------------------------------------
+    def _collect(self, tf: _TailedFile, out: List[Tuple[str, List[bytes]]], final: bool = False) -> None:
+        try:
+            lines = tf.read_lines()
+        except OSError:
+            lines = []
+        if final and tf.partial:
+            lines.append(tf.partial)  # writer is gone; last line had no newline
+        if not lines:
+            return
+        self.stats["bytes"] += sum(map(len, lines)) + len(lines)
+        if self.json_only:
+            lines = [l for l in lines if is_json_alert(l)]
+        if lines:
+            self.stats["lines"] += len(lines)
+            out.append((tf.path, lines))
+
+    def _drain_orphans(self, out: List[Tuple[str, List[bytes]]]) -> None:
+        for tf in self.draining:
+            self._collect(tf, out, final=True)
+            tf.close()
+        self.draining = []
+
+    def poll_once(self, timeout: float) -> List[bytes]:
+        """Wait for activity (inotify) or sleep (polling), then return newly available lines."""
+        groups = self.poll_files(timeout)
+        if len(groups) == 1:
+            return groups[0][1]
+        return [l for _, lines in groups for l in lines]
+
+    def poll_files(self, timeout: float) -> List[Tuple[str, List[bytes]]]:
+        """Like poll_once() but keeps lines grouped per source path, e.g. for per-stream decoding."""
+        out: List[Tuple[str, List[bytes]]] = []
+        # Orphans are drained before anything else so rotated-away lines keep their order.
+        self._drain_orphans(out)
+        targets = list(self.files.values())
+        for tf in targets:
+            self._collect(tf, out)
+        if out:
+            return out
+
+        if self._inotify:
+            touched = self._inotify.read_events(timeout)
+            if touched is None:
+                self._scan()  # event queue overflowed: re-glob and re-stat everything
+            else:
+                rescan = False
+                for d, n in touched:
+                    path = os.path.join(d, n)
+                    tf = self.files.get(path)
+                    if tf:
+                        self._check(tf)
+                    elif any(fnmatch.fnmatch(path, p) for p in self.patterns):
+                        rescan = True  # new file matching a pattern (create / move-in)
+                if rescan:
+                    self._scan()
+        else:
+            time.sleep(timeout)
+            self._scan()
+        self._drain_orphans(out)
+        for tf in list(self.files.values()):
+            self._collect(tf, out)
+        return out
+
+    def positions(self) -> Dict[str, dict]:
+        """Checkpoint of fully consumed bytes per file (a pending partial line is re-read on resume)."""
+        return {p: {"dev": tf.dev, "ino": tf.ino, "offset": tf.offset - len(tf.partial)}
+                for p, tf in self.files.items()}
+
+    def file_batches(self) -> Iterator[List[Tuple[str, List[bytes]]]]:
+        """Yields [(path, lines), ...] groups whenever new alerts are available."""
+        last_rescan = time.monotonic()
+        timeout = RESCAN_INTERVAL if self._inotify else self.poll_interval
+        while not self._stopped:
+            groups = self.poll_files(timeout)
+            now = time.monotonic()
+            if now - last_rescan >= RESCAN_INTERVAL:
+                self._scan()
+                last_rescan = now
+            if groups:
+                yield groups
+
+    def batches(self) -> Iterator[List[bytes]]:
+        for groups in self.file_batches():
+            yield [l for _, lines in groups for l in lines]
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def close(self) -> None:
+        self.stop()
+        for tf in list(self.files.values()) + self.draining:
+            tf.close()
+        self.files.clear()
+        self.draining = []
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: snort_tailer.py <file-or-glob> [...]", file=sys.stderr)
+        sys.exit(1)
+    tailer = MultiTailer(sys.argv[1:])
+    out = sys.stdout.buffer
+    try:
+        for batch in tailer.batches():
+            out.write(b"\n".join(batch) + b"\n")
+            out.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tailer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,8 @@ velocity > 0 (lag is growing), it computes:
     minutes_to_breach = (rpo_threshold - current_lag) / lag_velocity
 
 The result is pushed as a custom metric alongside the current lag metric.
+Metric points are collected for the whole run and posted as multi-series
+payloads (one token, one HTTP session, concurrent requests).
 
 Authentication
 --------------
@@ -43,9 +45,33 @@ Required (always):
 Optional:
     ASR_STATE_FILE        - Path to lag history JSON (default: /tmp/asr-lag-state.json)
     MONITOR_RG            - Resource group for custom metrics scope (default: ASR_VAULT_RG)
+    ASR_ENUM_WORKERS      - Concurrent container/item list calls (default: 16)
+    ASR_CALL_TIMEOUT      - Per-request timeout for ASR list calls, seconds (default: 60)
+    ASR_FABRIC_TIMEOUT    - Per-fabric enumeration budget, seconds (default: 300)
+    ASR_POLL_INTERVAL     - Daemon poll interval, seconds (default: 900)
+    ASR_HISTORY_DIR       - Daemon history dir (default: /tmp/asr-lag-history)
+    ASR_FORECAST_METHOD   - Enable the fleet forecaster with this method (default: off)
+    ASR_RECORD_CSV        - Append lag samples to this CSV for backtesting
 
 Usage:
     python3 asr-replication-health-monitor.py [--dry-run] [--verbose]
+        [--workers 16] [--call-timeout 60] [--fabric-timeout 300]
+    python3 asr-replication-health-monitor.py --daemon [--interval 900] [--history-dir DIR]
+    python3 asr-replication-health-monitor.py --forecast theil-sen [--warn-probability 0.5]
+        [--record lag-history.csv]
+
+Daemon mode keeps per-VM lag history in fixed-size ring buffers with running
+regression sums (O(1) per sample), persisted as an append-only binary sample
+log plus periodic snapshots. The cron JSON state file is imported on first
+start.
+
+--forecast {ols,wls,theil-sen,holt} replaces the single-VM linear predictor
+with the fleet-wide engine in rpo_forecast.py (requires numpy): all VMs are
+fitted at once with per-tier windows, and each result carries a prediction
+interval for minutes-to-breach and a breachProbability. Warnings are raised
+when breachProbability >= --warn-probability, which stops noisy VMs from
+flapping between OK and WARNING. --record appends every sample to a CSV that
+rpo_forecast.py backtest can replay to compare methods.
 
 Cross-references:
     kql/asr-replication-health.kql
@@ -57,12 +83,19 @@ Author: Frances Saunders
 """
 
 import argparse
+import csv
 import json
 import logging
 import os
+import queue
+import signal
+import struct
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
+from array import array
 from pathlib import Path
 from typing import Optional
 
@@ -194,65 +227,432 @@ def predict_minutes_to_breach(samples: list, rpo_threshold: float) -> Optional[f
 
 
 # ---------------------------------------------------------------------------
-# Azure Monitor custom metrics push
+# Daemon mode: ring-buffer lag history with O(1) regression updates
 # ---------------------------------------------------------------------------
 
-def push_custom_metric(
-    credential,
-    subscription_id: str,
-    resource_group: str,
-    region: str,
-    metric_name: str,
-    vm_name: str,
-    tier: str,
-    value: float,
-    dry_run: bool = False,
-) -> None:
+RING_RESUM_EVERY = 1024           # full recompute of the running sums, bounds float drift
+SNAPSHOT_EVERY_CYCLES = 12        # compact the sample log into a snapshot this often
+SNAPSHOT_MAX_LOG_BYTES = 8 << 20  # ... or once the log grows past this
+HISTORY_MAGIC = b"ASRLAG1\n"
+_REC_NAME = struct.Struct("<cIH")     # b"N", vm id, name length (utf-8 name follows)
+_REC_SAMPLE = struct.Struct("<cIdd")  # b"S", vm id, epoch seconds, lag minutes
+
+
+class LagRing:
+    """
+    Fixed-capacity ring of (epoch seconds, lag minutes) samples for one VM,
+    with running least-squares sums so each push updates the slope in O(1).
+    x is measured from a per-ring origin to keep the sums well conditioned.
+    """
+
+    __slots__ = ("ts", "lag", "head", "n", "origin", "sx", "sy", "sxx", "sxy", "updates")
+
+    def __init__(self, capacity: int = PREDICTOR_WINDOW):
+        self.ts = array("d", bytes(8 * capacity))
+        self.lag = array("d", bytes(8 * capacity))
+        self.head = 0          # next slot to write
+        self.n = 0
+        self.origin = None
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.updates = 0
+
+    def push(self, ts: float, lag: float) -> None:
+        cap = len(self.ts)
+        if self.origin is None:
+            self.origin = ts
+        if self.n == cap:  # evict the oldest sample from the sums
+            x0, y0 = self.ts[self.head] - self.origin, self.lag[self.head]
+            self.sx -= x0
+            self.sy -= y0
+            self.sxx -= x0 * x0
+            self.sxy -= x0 * y0
+        else:
+            self.n += 1
+        self.ts[self.head] = ts
+        self.lag[self.head] = lag
+        self.head = (self.head + 1) % cap
+        x = ts - self.origin
+        self.sx += x
+        self.sy += lag
+        self.sxx += x * x
+        self.sxy += x * lag
+        self.updates += 1
+        if self.updates % RING_RESUM_EVERY == 0:
+            self._resum()
+
+    def _resum(self) -> None:
+        samples = self.samples()
+        self.origin = samples[0][0]
+        xs = [t - self.origin for t, _ in samples]
+        self.sx, self.sy = sum(xs), sum(y for _, y in samples)
+        self.sxx = sum(x * x for x in xs)
+        self.sxy = sum(x * y for x, (_, y) in zip(xs, samples))
+
+    def samples(self) -> list:
+        """(ts, lag) pairs, oldest first."""
+        cap = len(self.ts)
+        start = (self.head - self.n) % cap
+        return [(self.ts[(start + i) % cap], self.lag[(start + i) % cap]) for i in range(self.n)]
+
+    def series(self) -> tuple:
+        """(timestamps, lags) lists, oldest first."""
+        samples = self.samples()
+        return [t for t, _ in samples], [y for _, y in samples]
+
+    def predict_minutes_to_breach(self, rpo_threshold: float) -> Optional[float]:
+        """Same contract as predict_minutes_to_breach(), from the running sums."""
+        n = self.n
+        if n < 2:
+            return None
+        den = n * self.sxx - self.sx * self.sx
+        if den <= 1e-9 * n * self.sxx:
+            return None  # all samples at (nearly) the same timestamp
+
+        # slope in lag_minutes per second; convert to lag_minutes per minute
+        lag_velocity_per_minute = (n * self.sxy - self.sx * self.sy) / den * 60.0
+        if lag_velocity_per_minute <= 0:
+            return None  # lag not growing
+
+        current_lag = self.lag[(self.head - 1) % len(self.lag)]
+        if current_lag >= rpo_threshold:
+            return 0.0  # already breached
+        return round((rpo_threshold - current_lag) / lag_velocity_per_minute, 1)
+
+
+class RingLagHistory:
+    """
+    Per-VM LagRing store persisted as <dir>/snapshot.bin plus an append-only
+    <dir>/samples.log of fixed-size binary records (one write + fsync per
+    cycle). Restart = read snapshot, replay log. compact() rewrites the
+    snapshot and truncates the log. A JSON state file from cron mode is
+    imported on first start.
+    """
+
+    def __init__(self, directory: str, capacity: int = PREDICTOR_WINDOW, import_json: Optional[str] = None):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.dir / "snapshot.bin"
+        self.log_path = self.dir / "samples.log"
+        self.capacity = capacity
+        self.rings: dict = {}
+        self.ids: dict = {}
+        self._pending = bytearray()
+        started = time.monotonic()
+        replayed = self._load()
+        if not self.rings and import_json and os.path.exists(import_json):
+            self._import_json(import_json)
+            self.compact()
+            log.info(f"Imported lag history for {len(self.rings)} VMs from {import_json}")
+        self._log = open(self.log_path, "ab")
+        log.info(f"Lag history: {len(self.rings)} VMs, {replayed} log records replayed "
+                 f"in {time.monotonic() - started:.2f}s ({self.dir})")
+
+    def _ring(self, vm_name: str) -> LagRing:
+        ring = self.rings.get(vm_name)
+        if ring is None:
+            ring = self.rings[vm_name] = LagRing(self.capacity)
+            vm_id = self.ids[vm_name] = len(self.ids)
+            name = vm_name.encode("utf-8")
+            self._pending += _REC_NAME.pack(b"N", vm_id, len(name)) + name
+        return ring
+
+    def observe(self, vm_name: str, lag_minutes: float, rpo_threshold: float,
+                ts: Optional[float] = None) -> tuple:
+        """Record a sample; returns (minutes_to_breach, samples_in_history)."""
+        ts = time.time() if ts is None else ts
+        ring = self._ring(vm_name)
+        ring.push(ts, lag_minutes)
+        self._pending += _REC_SAMPLE.pack(b"S", self.ids[vm_name], ts, lag_minutes)
+        return ring.predict_minutes_to_breach(rpo_threshold), ring.n
+
+    def commit(self) -> None:
+        """Append this cycle's records to the log (single write + fsync)."""
+        if self._pending:
+            self._log.write(self._pending)
+            self._log.flush()
+            os.fsync(self._log.fileno())
+            self._pending.clear()
+
+    def log_bytes(self) -> int:
+        return self._log.tell()
+
+    def series(self, vm_names: list) -> dict:
+        """{vm: (timestamps, lags)} for the forecaster."""
+        return {name: self.rings[name].series() for name in vm_names if name in self.rings}
+
+    def compact(self) -> None:
+        """Write a snapshot of every ring (tmp + rename), then truncate the log."""
+        buf = bytearray(HISTORY_MAGIC)
+        buf += struct.pack("<I", len(self.rings))
+        for vm_name, ring in self.rings.items():
+            name = vm_name.encode("utf-8")
+            samples = ring.samples()
+            buf += struct.pack("<IHH", self.ids[vm_name], len(name), len(samples)) + name
+            buf += array("d", [t for t, _ in samples]).tobytes() + array("d", [y for _, y in samples]).tobytes()
+        tmp = self.snapshot_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(buf)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        if getattr(self, "_log", None):
+            self._log.truncate(0)
+            self._log.seek(0)
+        else:
+            open(self.log_path, "wb").close()
+        self._pending.clear()  # everything observed so far is in the snapshot
+
+    def _load(self) -> int:
+        by_id = {}
+        if self.snapshot_path.exists():
+            data = self.snapshot_path.read_bytes()
+            if data[:len(HISTORY_MAGIC)] == HISTORY_MAGIC:
+                pos = len(HISTORY_MAGIC)
+                (count,) = struct.unpack_from("<I", data, pos)
+                pos += 4
+                for _ in range(count):
+                    vm_id, name_len, n = struct.unpack_from("<IHH", data, pos)
+                    pos += 8
+                    vm_name = data[pos:pos + name_len].decode("utf-8")
+                    pos += name_len
+                    ts = array("d", data[pos:pos + 8 * n])
+                    lag = array("d", data[pos + 8 * n:pos + 16 * n])
+                    pos += 16 * n
+                    ring = self.rings[vm_name] = LagRing(self.capacity)
+                    for t, y in zip(ts, lag):
+                        ring.push(t, y)
+                    self.ids[vm_name] = vm_id
+                    by_id[vm_id] = vm_name
+            else:
+                log.warning(f"Ignoring unrecognised snapshot {self.snapshot_path}")
+
+        replayed = 0
+        if self.log_path.exists():
+            data = self.log_path.read_bytes()
+            pos = 0
+            while pos < len(data):
+                kind = data[pos:pos + 1]
+                if kind == b"N" and pos + _REC_NAME.size <= len(data):
+                    _, vm_id, name_len = _REC_NAME.unpack_from(data, pos)
+                    end = pos + _REC_NAME.size + name_len
+                    if end > len(data):
+                        break
+                    vm_name = data[pos + _REC_NAME.size:end].decode("utf-8")
+                    by_id[vm_id] = vm_name
+                    self.ids[vm_name] = vm_id
+                    self.rings.setdefault(vm_name, LagRing(self.capacity))
+                    pos = end
+                elif kind == b"S" and pos + _REC_SAMPLE.size <= len(data):
+                    _, vm_id, t, y = _REC_SAMPLE.unpack_from(data, pos)
+                    if vm_id in by_id:
+                        self.rings[by_id[vm_id]].push(t, y)
+                    pos += _REC_SAMPLE.size
+                    replayed += 1
+                else:
+                    break
+            if pos < len(data):  # torn write from a crash: drop the partial record
+                log.warning(f"Truncating {len(data) - pos} trailing bytes of {self.log_path}")
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(pos)
+        return replayed
+
+    def _import_json(self, state_file: str) -> None:
+        for vm_name, entries in load_lag_state(state_file).items():
+            for s in entries:
+                try:
+                    self.observe(vm_name, float(s["lag_minutes"]), DEFAULT_RPO_MINUTES,
+                                 datetime.fromisoformat(s["ts"]).timestamp())
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+    def close(self) -> None:
+        self.commit()
+        self._log.close()
+
+
+class JsonLagHistory:
+    """Cron mode: the JSON state file (ISO timestamps, last 2*window samples per VM)."""
+
+    def __init__(self, state_file: str):
+        self.state_file = state_file
+        self.state = load_lag_state(state_file)
+
+    def observe(self, vm_name: str, lag_minutes: float, rpo_threshold: float) -> tuple:
+        samples = update_vm_lag_history(self.state, vm_name, lag_minutes)
+        return predict_minutes_to_breach(samples, rpo_threshold), len(samples)
+
+    def series(self, vm_names: list) -> dict:
+        """{vm: (timestamps, lags)} for the forecaster."""
+        out = {}
+        for name in vm_names:
+            ts, lags = [], []
+            for s in self.state.get(name, []):
+                try:
+                    ts.append(datetime.fromisoformat(s["ts"]).timestamp())
+                    lags.append(float(s["lag_minutes"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            out[name] = (ts, lags)
+        return out
+
+    def commit(self) -> None:
+        save_lag_state(self.state_file, self.state)
+
+
+# ---------------------------------------------------------------------------
+# Azure Monitor custom metrics (batched)
+# ---------------------------------------------------------------------------
+
+# Conservative per-request limits, well inside the custom metrics API caps
+METRICS_MAX_SERIES_PER_POST = 500
+METRICS_MAX_PAYLOAD_BYTES = 60 * 1024
+METRICS_CONCURRENCY = 8
+METRICS_RETRIES = 2
+TOKEN_REFRESH_MARGIN = 300  # seconds before expiry to refresh the cached token
+
+
+class MetricsEmitter:
     """
-    Push a single custom metric data point to Azure Monitor.
+    Collects every data point of a run and submits them as multi-series
+    payloads (one per metric name and size-bounded slice) over one HTTP
+    session. The monitoring token is fetched once and refreshed only near
+    expiry. Throttled / 5xx posts are retried; a payload that still fails is
+    split and each series is posted on its own, so one bad series does not
+    drop the rest.
+
     Custom metrics endpoint: {region}.monitoring.azure.com
     Scope: the Recovery Services vault resource group.
     """
-    if dry_run:
-        log.info(f"  [DryRun] Would push metric {metric_name}={value:.1f} for {vm_name}")
-        return
-
-    endpoint = (
-        f"https://{region}.monitoring.azure.com"
-        f"/subscriptions/{subscription_id}"
-        f"/resourceGroups/{resource_group}"
-        f"/providers/microsoft.insights/metrics"
-    )
-
-    token = credential.get_token("https://monitoring.azure.com/.default").token
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
 
-    payload = {
-        "time": datetime.now(timezone.utc).isoformat(),
-        "data": {
-            "baseData": {
-                "metric": metric_name,
-                "namespace": METRIC_NAMESPACE,
-                "dimNames": ["VMName", "Tier"],
-                "series": [{
-                    "dimValues": [vm_name, tier],
-                    "sum": value,
-                    "count": 1,
-                    "min": value,
-                    "max": value,
-                }]
+    def __init__(self, credential, subscription_id: str, resource_group: str, region: str,
+                 dry_run: bool = False, concurrency: int = METRICS_CONCURRENCY):
+        self.credential = credential
+        self.dry_run = dry_run
+        self.concurrency = max(1, concurrency)
+        self.endpoint = (
+            f"https://{region}.monitoring.azure.com"
+            f"/subscriptions/{subscription_id}"
+            f"/resourceGroups/{resource_group}"
+            f"/providers/microsoft.insights/metrics"
+        )
+        # metric -> (VMName, Tier) -> [sum, count, min, max]
+        self._points: dict = {}
+        self._token = None
+        self._token_lock = threading.Lock()
+        self._session = None
+        self.stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats() -> dict:
+        return {"points": 0, "series": 0, "requests": 0, "fallbackSeries": 0,
+                "failedSeries": 0, "tokenFetches": 0}
+
+    def add(self, metric_name: str, vm_name: str, tier: str, value: float) -> None:
+        """Record one data point; repeated points for a series are aggregated."""
+        series = self._points.setdefault(metric_name, {})
+        agg = series.get((vm_name, tier))
+        if agg is None:
+            series[(vm_name, tier)] = [value, 1, value, value]
+        else:
+            agg[0] += value
+            agg[1] += 1
+            agg[2] = min(agg[2], value)
+            agg[3] = max(agg[3], value)
+        self.stats["points"] += 1
+
+    def _get_token(self) -> str:
+        with self._token_lock:
+            if self._token is None or self._token.expires_on - time.time() < TOKEN_REFRESH_MARGIN:
+                self._token = self.credential.get_token("https://monitoring.azure.com/.default")
+                self.stats["tokenFetches"] += 1
+            return self._token.token
+
+    def _payload(self, metric_name: str, when: str, series: list) -> dict:
+        return {
+            "time": when,
+            "data": {
+                "baseData": {
+                    "metric": metric_name,
+                    "namespace": METRIC_NAMESPACE,
+                    "dimNames": ["VMName", "Tier"],
+                    "series": series,
+                }
             }
         }
-    }
 
-    resp = requests.post(endpoint, headers=headers, json=payload, timeout=15)
-    if resp.status_code not in (200, 202):
-        log.warning(f"  Metric push failed [{resp.status_code}]: {resp.text[:200]}")
-    else:
-        log.debug(f"  Metric pushed: {metric_name}={value:.1f} for {vm_name}")
+    def _batches(self, when: str):
+        """Yield (metric_name, series list) slices within the count and byte limits."""
+        for metric_name, points in self._points.items():
+            envelope = len(json.dumps(self._payload(metric_name, when, [])))
+            batch, size = [], envelope
+            for (vm_name, tier), (total, count, lo, hi) in points.items():
+                s = {"dimValues": [vm_name, tier], "sum": total, "count": count, "min": lo, "max": hi}
+                s_size = len(json.dumps(s)) + 2
+                if batch and (len(batch) >= METRICS_MAX_SERIES_PER_POST
+                              or size + s_size > METRICS_MAX_PAYLOAD_BYTES):
+                    yield metric_name, batch
+                    batch, size = [], envelope
+                batch.append(s)
+                size += s_size
+            if batch:
+                yield metric_name, batch
+
+    def _post(self, payload: dict) -> tuple:
+        """POST with retries on 429 / 5xx (honouring Retry-After). Returns (status, text)."""
+        for attempt in range(METRICS_RETRIES + 1):
+            headers = {"Authorization": f"Bearer {self._get_token()}", "Content-Type": "application/json"}
+            try:
+                resp = self._session.post(self.endpoint, headers=headers, json=payload, timeout=15)
+                status, text = resp.status_code, resp.text[:200]
+            except requests.RequestException as e:
+                status, text, resp = 0, str(e), None
+            self.stats["requests"] += 1
+            if status in (200, 202):
+                return status, text
+            if status not in (0, 429, 500, 502, 503, 504) or attempt == METRICS_RETRIES:
+                return status, text
+            retry_after = resp.headers.get("Retry-After") if resp is not None else None
+            time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt)
+        return status, text
+
+    def _submit(self, metric_name: str, when: str, series: list) -> int:
+        """Post one multi-series payload; on failure fall back to one post per series. Returns failures."""
+        status, text = self._post(self._payload(metric_name, when, series))
+        if status in (200, 202):
+            log.debug(f"  Metric pushed: {metric_name} x{len(series)} series")
+            return 0
+        if len(series) == 1:
+            log.warning(f"  Metric push failed [{status}] {metric_name} for {series[0]['dimValues'][0]}: {text}")
+            return 1
+        log.warning(f"  Metric batch failed [{status}] {metric_name} x{len(series)}: {text}; "
+                    f"retrying series individually")
+        self.stats["fallbackSeries"] += len(series)
+        return sum(self._submit(metric_name, when, [s]) for s in series)
+
+    def flush(self) -> dict:
+        """Submit everything collected so far (concurrently) and reset. Returns this flush's stats."""
+        when = datetime.now(timezone.utc).isoformat()
+        batches = list(self._batches(when))
+        self.stats["series"] += sum(len(b) for _, b in batches)
+        self._points = {}
+        stats, self.stats = self.stats, self._new_stats()
+        if self.dry_run:
+            for metric_name, series in batches:
+                log.info(f"  [DryRun] Would push {metric_name} with {len(series)} series in one request")
+            return stats
+        if not batches:
+            return stats
+
+        if self._session is None:
+            self._session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+            self._session.mount("https://", adapter)
+        self.stats = stats  # posts below count into this flush
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+            failed = sum(pool.map(lambda b: self._submit(b[0], when, b[1]), batches))
+        stats["failedSeries"] += failed
+        self.stats = self._new_stats()
+        return stats
 # ---------------------------------------------------------------------------
 # ASR item polling
 # ---------------------------------------------------------------------------
@@ -301,14 +701,439 @@ def get_health_state(item) -> str:
         return "Unknown"
 
 
+# ---------------------------------------------------------------------------
+# Concurrent fabric / container / protected item enumeration
+# ---------------------------------------------------------------------------
+
+def _call_kwargs(call_timeout: float) -> dict:
+    """Per-request timeouts understood by azure-core (retry budget + socket timeouts)."""
+    return {
+        "timeout": call_timeout,
+        "connection_timeout": min(call_timeout, 10),
+        "read_timeout": call_timeout,
+    }
+
+
+class _DaemonPool:
+    """
+    Minimal bounded worker pool on daemon threads. Unlike ThreadPoolExecutor,
+    a call stuck past its fabric's deadline cannot hold the process open at
+    exit; close() drops queued work.
+    """
+
+    def __init__(self, workers: int):
+        self._tasks: "queue.Queue" = queue.Queue()
+        self._closed = threading.Event()
+        self._workers = max(1, workers)
+        for i in range(self._workers):
+            threading.Thread(target=self._run, name=f"asr-enum-{i}", daemon=True).start()
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            fn, args = self._tasks.get()
+            if self._closed.is_set():
+                return
+            fn(*args)
+
+    def submit(self, fn, *args) -> None:
+        self._tasks.put((fn, args))
+
+    def close(self) -> None:
+        self._closed.set()
+        for _ in range(self._workers):
+            self._tasks.put((None, ()))  # wake idle workers so they exit
+
+
+class FabricStats:
+    """Enumeration bookkeeping for one fabric (thread-safe counters)."""
+
+    def __init__(self, name: str, deadline: float):
+        self.name = name
+        self.started = time.monotonic()
+        self.deadline = deadline
+        self.finished: Optional[float] = None
+        self.pending = 1          # the container listing itself
+        self.containers = 0
+        self.pages = 0
+        self.items = 0
+        self.errors = 0
+        self.status = "running"   # running | ok | partial | timeout | error
+        self.lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        end = self.finished or time.monotonic()
+        return {
+            "fabric": self.name,
+            "status": self.status,
+            "containers": self.containers,
+            "pages": self.pages,
+            "items": self.items,
+            "errors": self.errors,
+            "latencySeconds": round(end - self.started, 2),
+        }
+
+
+def enumerate_protected_items(client, vault_rg: str, vault_name: str, fabrics: list,
+                              stats: dict, workers: int = 16, call_timeout: float = 60.0,
+                              fabric_timeout: float = 300.0):
+    """
+    Yield (fabric_name, item) for every protected item, as pages arrive.
+
+    Container listings and per-container item listings run on a bounded
+    thread pool; each page of items is handed to the caller immediately, so
+    evaluation overlaps with enumeration. Every SDK call gets per-request
+    timeouts, and a fabric that has not finished within fabric_timeout is
+    marked as timed out and skipped for this cycle instead of stalling it.
+
+    Per-fabric enumeration stats (FabricStats) are filled into `stats`.
+    """
+    kwargs = _call_kwargs(call_timeout)
+    events: "queue.Queue" = queue.Queue()
+    now = time.monotonic()
+    stats.update({f.name: FabricStats(f.name, now + fabric_timeout) for f in fabrics})
+
+    def list_items(fs: FabricStats, container_name: str):
+        try:
+            pager = client.replication_protected_items.list_by_replication_protection_containers(
+                vault_rg, vault_name, fs.name, container_name, **kwargs
+            )
+            for page in pager.by_page():
+                events.put(("page", fs, list(page)))
+        except Exception as e:
+            events.put(("error", fs, f"protected items in {container_name}: {e}"))
+        events.put(("done", fs, None))
+
+    def list_containers(fs: FabricStats):
+        try:
+            containers = list(client.replication_protection_containers.list(
+                vault_rg, vault_name, fs.name, **kwargs
+            ))
+        except Exception as e:
+            events.put(("error", fs, f"containers: {e}"))
+            containers = []
+        with fs.lock:
+            fs.containers = len(containers)
+            fs.pending += len(containers)
+        for container in containers:
+            pool.submit(list_items, fs, container.name)
+        events.put(("done", fs, None))
+
+    pool = _DaemonPool(workers)
+    try:
+        for fs in stats.values():
+            pool.submit(list_containers, fs)
+
+        running = set(stats)
+        while running:
+            next_deadline = min(stats[n].deadline for n in running)
+            try:
+                kind, fs, payload = events.get(timeout=max(0.0, next_deadline - time.monotonic()))
+            except queue.Empty:
+                kind, fs, payload = None, None, None
+
+            if fs is not None and fs.name in running:
+                if kind == "page":
+                    fs.pages += 1
+                    fs.items += len(payload)
+                    for item in payload:
+                        yield fs.name, item
+                elif kind == "error":
+                    fs.errors += 1
+                    log.warning(f"Failed to list {payload} (fabric {fs.name})")
+                elif kind == "done":
+                    with fs.lock:
+                        fs.pending -= 1
+                        finished = fs.pending == 0
+                    if finished:
+                        fs.finished = time.monotonic()
+                        fs.status = "ok" if not fs.errors else ("partial" if fs.items else "error")
+                        running.discard(fs.name)
+
+            for name in [n for n in running if stats[n].deadline <= time.monotonic()]:
+                fs = stats[name]
+                fs.finished = time.monotonic()
+                fs.status = "timeout"
+                running.discard(name)
+                log.warning(f"Fabric {name} enumeration timed out after {fabric_timeout:.0f}s "
+                            f"({fs.items} items seen); skipping the rest this cycle")
+    finally:
+        # Timed-out calls finish in the background (bounded by the per-call timeouts)
+        pool.close()
+
+
+# ---------------------------------------------------------------------------
+# Per-item evaluation
+# ---------------------------------------------------------------------------
+
+def evaluate_item(item, history) -> Optional[dict]:
+    """
+    Compute lag, update the predictor history (JsonLagHistory or
+    RingLagHistory) and classify one protected item. Returns the result
+    record, or None if lag is unavailable.
+    """
+    vm_name     = item.name
+    tier        = get_vm_tier(item)
+    health      = get_health_state(item)
+    lag         = get_lag_minutes(item)
+    rpo_thresh  = TIER_RPO_MINUTES.get(tier, DEFAULT_RPO_MINUTES)
+
+    if lag is None:
+        log.warning(f"  {vm_name}: lag unavailable (no recovery point data)")
+        return None
+
+    # Update lag history and predict breach
+    mins_to_breach, n_samples = history.observe(vm_name, lag, rpo_thresh)
+    rpo_breached     = lag >= rpo_thresh
+    breach_warning   = (mins_to_breach is not None and 0 < mins_to_breach <= 30)
+
+    return {
+        "vmName":           vm_name,
+        "tier":             tier,
+        "healthState":      health,
+        "lagMinutes":       lag,
+        "rpoThreshMinutes": rpo_thresh,
+        "rpoBreached":      rpo_breached,
+        "minutesToBreach":  mins_to_breach,
+        "breachWarning":    breach_warning,
+        "samplesInHistory": n_samples,
+    }
+
+
+def log_result(result: dict) -> None:
+    vm_name, tier, lag = result["vmName"], result["tier"], result["lagMinutes"]
+    if result["rpoBreached"]:
+        log.warning(f"  RPO BREACH  | {vm_name} ({tier}) lag={lag:.1f}m threshold={result['rpoThreshMinutes']}m")
+    elif result["breachWarning"]:
+        detail = f"breach in ~{result['minutesToBreach']:.0f}m" if result["minutesToBreach"] is not None else ""
+        if "breachProbability" in result:
+            detail += f" (p={result['breachProbability']:.2f}, " \
+                      f"{_fmt_minutes(result['minutesToBreachLow'])}-{_fmt_minutes(result['minutesToBreachHigh'])}m)"
+        log.warning(f"  RPO WARNING | {vm_name} ({tier}) lag={lag:.1f}m | {detail}")
+    else:
+        log.info(f"  OK          | {vm_name} ({tier}) lag={lag:.1f}m health={result['healthState']}")
+
+
+def _fmt_minutes(v: Optional[float]) -> str:
+    if v is None:
+        return "?"
+    return "inf" if v == float("inf") else f"{v:.0f}"
+
+
+# ---------------------------------------------------------------------------
+# Fleet forecaster (rpo_forecast.py, optional numpy)
+# ---------------------------------------------------------------------------
+
+def load_forecaster(method: Optional[str]):
+    """Import rpo_forecast from this directory; None if disabled or numpy is missing."""
+    if not method:
+        return None
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        log.warning("--forecast needs numpy (pip install numpy); using the linear predictor")
+        return None
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import rpo_forecast
+    if method not in rpo_forecast.METHODS:
+        log.error(f"Unknown forecast method '{method}' (choose from {', '.join(rpo_forecast.METHODS)})")
+        sys.exit(2)
+    return rpo_forecast
+
+
+def apply_forecast(results: list, history, forecaster, method: str, warn_probability: float) -> None:
+    """Re-score every result with the fleet forecaster (in place)."""
+    series = history.series([r["vmName"] for r in results])
+    histories = {r["vmName"]: (r["tier"],) + series[r["vmName"]] for r in results if r["vmName"] in series}
+    started = time.monotonic()
+    forecasts = forecaster.forecast_histories(histories, method)
+    log.debug(f"Forecast ({method}) for {len(forecasts)} VMs in {time.monotonic() - started:.3f}s")
+    for r in results:
+        fc = forecasts.get(r["vmName"])
+        if fc is None:
+            continue
+        r["minutesToBreach"]     = fc["minutesToBreach"]
+        r["minutesToBreachLow"]  = fc["minutesToBreachLow"]
+        r["minutesToBreachHigh"] = fc["minutesToBreachHigh"]
+        r["breachProbability"]   = fc["breachProbability"]
+        r["breachWarning"]       = not r["rpoBreached"] and fc["breachProbability"] >= warn_probability
+
+
+class SampleRecorder:
+    """Appends vm,tier,ts,lag_minutes rows for rpo_forecast.py backtest."""
+
+    def __init__(self, path: str):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._f = open(path, "a", newline="")
+        self._w = csv.writer(self._f)
+        if new:
+            self._w.writerow(["vm", "tier", "ts", "lag_minutes"])
+
+    def write(self, results: list, ts: float) -> None:
+        self._w.writerows((r["vmName"], r["tier"], f"{ts:.0f}", r["lagMinutes"]) for r in results)
+        self._f.flush()
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
 
+def run_cycle(client, metrics: MetricsEmitter, history, args, vault_rg: str, vault_name: str,
+              forecaster=None, recorder: Optional[SampleRecorder] = None) -> dict:
+    """One poll: enumerate, evaluate, forecast, push metrics, persist history. Returns the cycle summary."""
+    results = []
+    breach_count = 0
+    warning_count = 0  # predictor warnings
+
+    # -- Enumerate all fabric / container / protected items ------------------
+    try:
+        fabrics = list(client.replication_fabrics.list(vault_rg, vault_name,
+                                                       **_call_kwargs(args.call_timeout)))
+    except Exception as e:
+        log.error(f"Failed to list ASR fabrics: {e}")
+        raise
+
+    # Containers and items are listed concurrently; items are evaluated as pages arrive
+    fabric_stats = {}
+    enum_started = time.monotonic()
+    for fabric_name, item in enumerate_protected_items(client, vault_rg, vault_name, fabrics, fabric_stats,
+                                                       args.workers, args.call_timeout, args.fabric_timeout):
+        result = evaluate_item(item, history)
+        if result is None:
+            continue
+        results.append(result)
+        # Queue metrics; they are posted in batches once enumeration is done
+        metrics.add("ReplicationLagMinutes", result["vmName"], result["tier"], result["lagMinutes"])
+        if forecaster is None:
+            log_result(result)
+    enum_seconds = time.monotonic() - enum_started
+
+    # -- Fleet forecast (all VMs at once) -----------------------------------
+    if forecaster is not None:
+        apply_forecast(results, history, forecaster, args.forecast, args.warn_probability)
+        for result in results:
+            log_result(result)
+            metrics.add("RPOBreachProbability", result["vmName"], result["tier"],
+                        result.get("breachProbability", 0.0))
+    for result in results:
+        if result["rpoBreached"]:
+            breach_count += 1
+        elif result["breachWarning"]:
+            warning_count += 1
+        mtb = result["minutesToBreach"]
+        if mtb is not None and mtb != float("inf"):
+            metrics.add("MinutesToRPOBreach", result["vmName"], result["tier"], mtb)
+    if recorder is not None:
+        recorder.write(results, time.time())
+
+    # -- Push metrics to Azure Monitor ---------------------------------------
+    metric_stats = metrics.flush()
+
+    # -- Persist lag state for next run --------------------------------------
+    history.commit()
+
+    return {
+        "results": results,
+        "breaches": breach_count,
+        "warnings": warning_count,
+        "fabrics": fabric_stats,
+        "enumSeconds": enum_seconds,
+        "metrics": metric_stats,
+    }
+
+
+def print_summary(cycle: dict, args, history_location: str) -> None:
+    print("")
+    print("=" * 55)
+    print(" ASR REPLICATION HEALTH SUMMARY")
+    print("=" * 55)
+    print(f" Total VMs monitored : {len(cycle['results'])}")
+    print(f" RPO breaches        : {cycle['breaches']}")
+    if args.forecast and cycle["results"] and "breachProbability" in cycle["results"][0]:
+        print(f" Breach warnings     : {cycle['warnings']}  ({args.forecast}, p >= {args.warn_probability})")
+    else:
+        print(f" Breach warnings     : {cycle['warnings']}  (predicted < 30 min)")
+    print(f" State file          : {history_location}")
+    print(f" Enumeration         : {cycle['enumSeconds']:.1f}s across {len(cycle['fabrics'])} fabric(s), "
+          f"{args.workers} workers")
+    print(f" Metrics             : {cycle['metrics']['series']} series in {cycle['metrics']['requests']} "
+          f"request(s), {cycle['metrics']['failedSeries']} failed")
+    for fs in sorted(cycle["fabrics"].values(), key=lambda f: f.name):
+        d = fs.to_dict()
+        print(f"   {d['fabric']:<24} {d['status']:<8} {d['latencySeconds']:>7.1f}s "
+              f"containers={d['containers']} items={d['items']} pages={d['pages']}")
+    print("=" * 55)
+
+
+def run_daemon(client, metrics: MetricsEmitter, args, vault_rg: str, vault_name: str, state_file: str,
+               forecaster=None, recorder: Optional[SampleRecorder] = None) -> None:
+    """
+    Poll every --interval seconds (fixed rate; overrunning cycles skip the
+    missed ticks) until SIGTERM/SIGINT. History lives in RingLagHistory and
+    is compacted every SNAPSHOT_EVERY_CYCLES cycles and on shutdown.
+    """
+    # The forecaster's per-tier windows need up to 2*PREDICTOR_WINDOW samples per VM
+    capacity = PREDICTOR_WINDOW * 2 if forecaster is not None else PREDICTOR_WINDOW
+    history = RingLagHistory(args.history_dir, capacity, import_json=state_file)
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+
+    log.info(f"Daemon mode: polling every {args.interval:.0f}s (history: {args.history_dir})")
+    cycles = 0
+    next_run = time.monotonic()
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            cycle = run_cycle(client, metrics, history, args, vault_rg, vault_name, forecaster, recorder)
+            cycles += 1
+            log.info(f"Cycle {cycles}: {len(cycle['results'])} VMs, {cycle['breaches']} breach(es), "
+                     f"{cycle['warnings']} warning(s), enum {cycle['enumSeconds']:.1f}s, "
+                     f"{cycle['metrics']['series']} series / {cycle['metrics']['requests']} request(s), "
+                     f"cycle {time.monotonic() - started:.1f}s")
+            if cycles % SNAPSHOT_EVERY_CYCLES == 0 or history.log_bytes() > SNAPSHOT_MAX_LOG_BYTES:
+                history.compact()
+        except Exception as e:
+            log.error(f"Cycle failed: {e}")
+
+        next_run += args.interval
+        now = time.monotonic()
+        if next_run <= now:
+            skipped = int((now - next_run) // args.interval) + 1
+            log.warning(f"Cycle overran the {args.interval:.0f}s interval; skipping {skipped} tick(s)")
+            next_run += skipped * args.interval
+        stop.wait(next_run - now)
+
+    history.commit()
+    history.compact()
+    history.close()
+    log.info("Daemon stopped; lag history snapshot written.")
+
+
 def main():
     parser = argparse.ArgumentParser(description="ASR Replication Health Monitor with RPO Breach Predictor")
     parser.add_argument("--dry-run", action="store_true", help="Collect metrics but do not push to Azure Monitor")
     parser.add_argument("--verbose", action="store_true", help="Enable DEBUG logging")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ASR_ENUM_WORKERS", "16")),
+                        help="Concurrent container/item listing calls (default 16)")
+    parser.add_argument("--call-timeout", type=float, default=float(os.environ.get("ASR_CALL_TIMEOUT", "60")),
+                        help="Per-request timeout in seconds for ASR list calls (default 60)")
+    parser.add_argument("--fabric-timeout", type=float, default=float(os.environ.get("ASR_FABRIC_TIMEOUT", "300")),
+                        help="Give up on a fabric's enumeration after this many seconds (default 300)")
+    parser.add_argument("--metrics-concurrency", type=int, default=METRICS_CONCURRENCY,
+                        help="Concurrent custom-metric POSTs (default 8)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Run continuously with in-memory ring-buffer history instead of one cron pass")
+    parser.add_argument("--interval", type=float, default=float(os.environ.get("ASR_POLL_INTERVAL", "900")),
+                        help="Daemon poll interval in seconds (default 900)")
+    parser.add_argument("--history-dir", default=os.environ.get("ASR_HISTORY_DIR", "/tmp/asr-lag-history"),
+                        help="Daemon snapshot + append-only sample log directory")
+    parser.add_argument("--forecast", default=os.environ.get("ASR_FORECAST_METHOD") or None,
+                        metavar="{ols,wls,theil-sen,holt}",
+                        help="Use the fleet forecaster (rpo_forecast.py, needs numpy) with this method")
+    parser.add_argument("--warn-probability", type=float, default=0.5,
+                        help="With --forecast, warn when breach probability within 30 min >= this (default 0.5)")
+    parser.add_argument("--record", default=os.environ.get("ASR_RECORD_CSV"),
+                        help="Append vm,tier,ts,lag_minutes samples to this CSV (for rpo_forecast.py backtest)")
     args = parser.parse_args()
 
     if args.verbose:
@@ -328,104 +1153,31 @@ def main():
 
     credential = DefaultAzureCredential()
     client     = SiteRecoveryManagementClient(credential, subscription)
+    metrics    = MetricsEmitter(credential, subscription, monitor_rg, region, args.dry_run,
+                                args.metrics_concurrency)
 
-    # -- Load lag history ----------------------------------------------------
-    state = load_lag_state(state_file)
+    forecaster = load_forecaster(args.forecast)
+    recorder   = SampleRecorder(args.record) if args.record else None
 
-    results = []
-    breach_count = 0
-    warning_count = 0  # predictor warnings
+    if args.daemon:
+        run_daemon(client, metrics, args, vault_rg, vault_name, state_file, forecaster, recorder)
+        return
+
+    # -- Load lag history ----------------------------------------------------
+    history = JsonLagHistory(state_file)
 
-    # -- Enumerate all fabric / container / protected items ------------------
     try:
-        fabrics = list(client.replication_fabrics.list(vault_rg, vault_name))
-    except Exception as e:
-        log.error(f"Failed to list ASR fabrics: {e}")
+        cycle = run_cycle(client, metrics, history, args, vault_rg, vault_name, forecaster, recorder)
+    except Exception:
+        log.exception("Cycle failed")
         sys.exit(1)
 
-    for fabric in fabrics:
-        fabric_name = fabric.name
-        try:
-            containers = list(client.replication_protection_containers.list(
-                vault_rg, vault_name, fabric_name
-            ))
-        except Exception as e:
-            log.warning(f"Failed to list containers in fabric {fabric_name}: {e}")
-            continue
-
-        for container in containers:
-            container_name = container.name
-            try:
-                items = list(client.replication_protected_items.list_by_replication_protection_containers(
-                    vault_rg, vault_name, fabric_name, container_name
-                ))
-            except Exception as e:
-                log.warning(f"Failed to list protected items in {container_name}: {e}")
-                continue
-
-            for item in items:
-                vm_name     = item.name
-                tier        = get_vm_tier(item)
-                health      = get_health_state(item)
-                lag         = get_lag_minutes(item)
-                rpo_thresh  = TIER_RPO_MINUTES.get(tier, DEFAULT_RPO_MINUTES)
-
-                if lag is None:
-                    log.warning(f"  {vm_name}: lag unavailable (no recovery point data)")
-                    continue
-
-                # Update lag history and predict breach
-                samples          = update_vm_lag_history(state, vm_name, lag)
-                mins_to_breach   = predict_minutes_to_breach(samples, rpo_thresh)
-                rpo_breached     = lag >= rpo_thresh
-                breach_warning   = (mins_to_breach is not None and 0 < mins_to_breach <= 30)
-
-                if rpo_breached:
-                    breach_count += 1
-                    log.warning(f"  RPO BREACH  | {vm_name} ({tier}) lag={lag:.1f}m threshold={rpo_thresh}m")
-                elif breach_warning:
-                    warning_count += 1
-                    log.warning(f"  RPO WARNING | {vm_name} ({tier}) lag={lag:.1f}m | breach in ~{mins_to_breach:.0f}m")
-                else:
-                    log.info(f"  OK          | {vm_name} ({tier}) lag={lag:.1f}m health={health}")
-
-                # Push metrics to Azure Monitor
-                push_custom_metric(credential, subscription, monitor_rg, region,
-                                   "ReplicationLagMinutes", vm_name, tier, lag, args.dry_run)
-
-                if mins_to_breach is not None:
-                    push_custom_metric(credential, subscription, monitor_rg, region,
-                                       "MinutesToRPOBreach", vm_name, tier, mins_to_breach, args.dry_run)
-
-                results.append({
-                    "vmName":           vm_name,
-                    "tier":             tier,
-                    "healthState":      health,
-                    "lagMinutes":       lag,
-                    "rpoThreshMinutes": rpo_thresh,
-                    "rpoBreached":      rpo_breached,
-                    "minutesToBreach":  mins_to_breach,
-                    "breachWarning":    breach_warning,
-                    "samplesInHistory": len(samples),
-                })
-
-    # -- Persist lag state for next run --------------------------------------
-    save_lag_state(state_file, state)
-
     # -- Summary -------------------------------------------------------------
-    print("")
-    print("=" * 55)
-    print(" ASR REPLICATION HEALTH SUMMARY")
-    print("=" * 55)
-    print(f" Total VMs monitored : {len(results)}")
-    print(f" RPO breaches        : {breach_count}")
-    print(f" Breach warnings     : {warning_count}  (predicted < 30 min)")
-    print(f" State file          : {state_file}")
-    print("=" * 55)
+    print_summary(cycle, args, state_file)
 
     # Exit non-zero on breach for alerting integration
-    if breach_count > 0:
-        log.error(f"{breach_count} RPO breach(es) detected.")
+    if cycle["breaches"] > 0:
+        log.error(f"{cycle['breaches']} RPO breach(es) detected.")
         sys.exit(1)
 
 
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+rpo_forecast.py
+
+Fleet-wide RPO breach forecasting for asr-replication-health-monitor.py.
+All VMs are fitted at once as NumPy arrays (one row per VM, right-aligned
+sample windows, NaN where a VM has fewer samples), so a 5,000-VM vault costs
+a handful of array operations instead of a Python loop per VM.
+
+Methods
+-------
+    ols        ordinary least squares (what the monitor's predictor does)
+    wls        exponentially weighted least squares (recent samples count more)
+    theil-sen  median of pairwise slopes; robust to one-off lag spikes
+    holt       Holt linear (level + trend) smoothing over irregular intervals
+
+Each method yields a current level, a lag velocity (minutes of lag per
+minute), a residual scale and a velocity standard error. From those:
+    minutes_to_breach      point estimate (rpo - level) / velocity
+    interval_low/high      prediction interval for minutes_to_breach (--z)
+    breach_probability     P(lag >= rpo within the alert horizon), Gaussian
+                           predictive distribution
+For theil-sen and holt the velocity standard error uses the OLS formula
+with the method's own residual scale.
+
+Tier windows: the number of recent samples used per VM depends on its tier
+(TIER_WINDOWS), so Tier1 reacts faster and Tier3 is smoother.
+
+Backtest harness
+----------------
+Replays recorded lag histories and reports, per method, breach events
+detected, lead time (time between the start of the alarm run and the
+breach) and false alarms (alarm onsets with no breach within
+--false-alarm-horizon minutes), alongside the monitor's current rule
+(5-sample OLS, warn when 0 < minutes_to_breach <= 30).
+
+Inputs: CSV with columns vm,tier,ts,lag_minutes (ts ISO-8601 or epoch
+seconds; e.g. recorded with the monitor's --record flag), the monitor's
+JSON state file, or --synthetic N to generate a fleet with drift episodes.
+
+Usage:
+    python3 rpo_forecast.py backtest --csv lag-history.csv --horizon 30 --probability 0.5
+    python3 rpo_forecast.py backtest --synthetic 500 --days 7 --methods wls,theil-sen,holt
+    python3 rpo_forecast.py forecast --state /tmp/asr-lag-state.json --method theil-sen
+
+Lab: labs/bcdr-ir-plan
+"""
+
+import argparse
+import csv
+import json
+import math
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    print(f"Missing dependency: {e}")
+    print("Install: pip install numpy")
+    sys.exit(1)
+
+# ---------------------------------------------------------------------------
+# Defaults (kept in step with asr-replication-health-monitor.py)
+# ---------------------------------------------------------------------------
+TIER_RPO_MINUTES = {
+    "Tier1": 240,
+    "Tier2": 720,
+    "Tier3": 1440,
+}
+DEFAULT_RPO_MINUTES = 1440
+
+# Samples per VM used for the fit, by tier
+TIER_WINDOWS = {"Tier1": 6, "Tier2": 8, "Tier3": 10}
+DEFAULT_WINDOW = 10
+LEGACY_WINDOW = 5
+
+METHODS = ("ols", "wls", "theil-sen", "holt")
+WLS_HALF_LIFE = 3.0      # samples
+HOLT_ALPHA = 0.5
+HOLT_BETA = 0.3
+ALERT_HORIZON = 30.0     # minutes; matches the monitor's warning window
+Z_90 = 1.645
+
+
+# ---------------------------------------------------------------------------
+# Window matrices
+# ---------------------------------------------------------------------------
+
+def window_for(tier: str) -> int:
+    return TIER_WINDOWS.get(tier, DEFAULT_WINDOW)
+
+
+def build_matrix(series: List[Tuple[np.ndarray, np.ndarray]], windows: np.ndarray,
+                 width: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Right-align each VM's last windows[i] samples into (n, width) arrays of
+    epoch seconds and lag minutes; missing cells are NaN.
+    """
+    width = int(width or (windows.max() if len(windows) else 1))
+    t = np.full((len(series), width), np.nan)
+    y = np.full((len(series), width), np.nan)
+    for i, (ts, lag) in enumerate(series):
+        k = min(len(ts), int(windows[i]), width)
+        if k:
+            t[i, width - k:] = ts[-k:]
+            y[i, width - k:] = lag[-k:]
+    return t, y
+
+
+# ---------------------------------------------------------------------------
+# Fits: each returns (level, velocity, sigma, se_velocity) per row
+# ---------------------------------------------------------------------------
+
+def _weighted_fit(x: np.ndarray, y: np.ndarray, w: np.ndarray):
+    """Weighted least squares per row; x in minutes relative to the last sample."""
+    w = np.where(np.isnan(y), 0.0, w)
+    x0 = np.nan_to_num(x)
+    y0 = np.nan_to_num(y)
+    sw = w.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = (w * x0).sum(axis=1) / sw
+        my = (w * y0).sum(axis=1) / sw
+        dx = np.where(w > 0, x0 - mx[:, None], 0.0)
+        sxx = (w * dx * dx).sum(axis=1)
+        slope = (w * dx * (y0 - my[:, None])).sum(axis=1) / sxx
+        level = my - slope * mx
+        resid = np.where(w > 0, y0 - (level[:, None] + slope[:, None] * x0), 0.0)
+        n_eff = sw ** 2 / (w * w).sum(axis=1)
+        sigma = np.sqrt((w * resid * resid).sum(axis=1) / sw * n_eff / np.maximum(n_eff - 2, 1e-9))
+        se = sigma * np.sqrt((w * w * dx * dx).sum(axis=1)) / sxx
+    return level, slope, sigma, se, sxx
+
+
+def fit_ols(x, y):
+    level, slope, sigma, se, _ = _weighted_fit(x, y, np.ones_like(x))
+    return level, slope, sigma, se
+
+
+def fit_wls(x, y, half_life: float = WLS_HALF_LIFE):
+    age = (x.shape[1] - 1) - np.arange(x.shape[1])  # 0 for the newest column
+    w = np.broadcast_to(0.5 ** (age / half_life), x.shape).copy()
+    level, slope, sigma, se, _ = _weighted_fit(x, y, w)
+    return level, slope, sigma, se
+
+
+def fit_theil_sen(x, y):
+    """Median of pairwise slopes, median intercept; MAD residual scale."""
+    dx = x[:, None, :] - x[:, :, None]           # [i, a, b] = x_b - x_a
+    dy = y[:, None, :] - y[:, :, None]
+    upper = np.triu(np.ones(x.shape[1], dtype=bool), k=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pair = np.where(upper & (dx > 0), dy / dx, np.nan)
+        flat = pair.reshape(len(x), -1)
+        ok = ~np.all(np.isnan(flat), axis=1)
+        slope = np.full(len(x), np.nan)
+        slope[ok] = np.nanmedian(flat[ok], axis=1)
+        level = np.full(len(x), np.nan)
+        level[ok] = np.nanmedian((y - slope[:, None] * x)[ok], axis=1)
+        resid = y - (level[:, None] + slope[:, None] * x)
+        mad = np.full(len(x), np.nan)
+        mad[ok] = np.nanmedian(np.abs(resid[ok]), axis=1)
+        sigma = 1.4826 * mad
+        n = (~np.isnan(y)).sum(axis=1)
+        sxx = np.nansum((x - np.nanmean(x, axis=1, keepdims=True)) ** 2, axis=1)
+        se = sigma / np.sqrt(sxx) * np.sqrt(np.maximum(n, 3) / np.maximum(n - 2, 1))
+    return level, slope, sigma, se
+
+
+def fit_holt(x, y, alpha: float = HOLT_ALPHA, beta: float = HOLT_BETA):
+    """Holt linear smoothing over irregular intervals (trend per minute), one column at a time."""
+    n, width = x.shape
+    level = np.full(n, np.nan)
+    trend = np.zeros(n)
+    last_x = np.full(n, np.nan)
+    err_sq = np.zeros(n)
+    err_n = np.zeros(n)
+    for k in range(width):
+        xk, yk = x[:, k], y[:, k]
+        have = ~np.isnan(yk)
+        first = have & np.isnan(level)
+        level[first] = yk[first]
+        last_x[first] = xk[first]
+        upd = have & ~first
+        if not upd.any():
+            continue
+        dt = np.maximum(xk[upd] - last_x[upd], 1e-6)
+        pred = level[upd] + trend[upd] * dt
+        new_level = alpha * yk[upd] + (1 - alpha) * pred
+        # Before the first trend estimate the one-step error is not meaningful
+        seen = err_n[upd] > 0
+        e = np.where(seen | (trend[upd] != 0), yk[upd] - pred, 0.0)
+        trend[upd] = np.where(err_n[upd] == 0, (yk[upd] - level[upd]) / dt,
+                              beta * (new_level - level[upd]) / dt + (1 - beta) * trend[upd])
+        level[upd] = np.where(err_n[upd] == 0, yk[upd], new_level)
+        err_sq[upd] += e * e
+        err_n[upd] += 1
+        last_x[upd] = xk[upd]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.sqrt(err_sq / np.maximum(err_n - 1, 1))
+        sxx = np.nansum((x - np.nanmean(x, axis=1, keepdims=True)) ** 2, axis=1)
+        se = sigma / np.sqrt(sxx)
+    trend[err_n == 0] = np.nan
+    return level, trend, sigma, se
+
+
+FITS = {"ols": fit_ols, "wls": fit_wls, "theil-sen": fit_theil_sen, "holt": fit_holt}
+
+
+# ---------------------------------------------------------------------------
+# Forecast
+# ---------------------------------------------------------------------------
+
+def _norm_sf(z: np.ndarray) -> np.ndarray:
+    """Upper-tail standard normal probability (Abramowitz-Stegun 7.1.26, |err| < 1.5e-7)."""
+    a = np.abs(z) / math.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * a)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erfc = poly * np.exp(-a * a)
+    return np.where(z >= 0, 0.5 * erfc, 1.0 - 0.5 * erfc)
+
+
+def forecast_fleet(t: np.ndarray, y: np.ndarray, rpo: np.ndarray, method: str = "wls",
+                   horizon: float = ALERT_HORIZON, z: float = Z_90) -> Dict[str, np.ndarray]:
+    """
+    Fit every row of (t, y) with `method` and project to the RPO threshold.
+    Rows with fewer than 2 samples get NaN estimates and probability from
+    the current lag only (1.0 if already breached, else 0.0).
+    """
+    last_t = np.nanmax(np.where(np.isnan(y), np.nan, t), axis=1, initial=-np.inf) \
+        if t.size else np.zeros(0)
+    x = (t - last_t[:, None]) / 60.0                       # minutes, <= 0
+    x = np.where(np.isnan(y), np.nan, x)
+    level, velocity, sigma, se = FITS[method](x, y)
+    n = (~np.isnan(y)).sum(axis=1)
+    current = y[np.arange(len(y)), np.maximum(y.shape[1] - 1, 0)] if y.size else np.zeros(0)
+
+    usable = (n >= 2) & np.isfinite(velocity) & np.isfinite(level)
+    sigma = np.where(np.isfinite(sigma), sigma, 0.0)
+    se = np.where(np.isfinite(se), se, 0.0)
+    breached = current >= rpo
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growing = usable & (velocity > 0)
+        mtb = np.where(growing, np.maximum((rpo - level) / velocity, 0.0), np.nan)
+        v_hi = velocity + z * se
+        v_lo = velocity - z * se
+        low = np.where(usable & (v_hi > 0), np.maximum((rpo - (level + z * sigma)) / v_hi, 0.0), np.nan)
+        high = np.where(usable & (v_lo > 0), np.maximum((rpo - (level - z * sigma)) / v_lo, 0.0), np.inf)
+        high = np.where(usable, high, np.nan)
+        mean_h = level + velocity * horizon
+        sd_h = np.sqrt(sigma ** 2 + (horizon * se) ** 2)
+        prob = np.where(sd_h > 0, _norm_sf((rpo - mean_h) / sd_h), (mean_h >= rpo).astype(float))
+        prob = np.where(usable, prob, 0.0)
+
+    mtb = np.where(breached, 0.0, mtb)
+    low = np.where(breached, 0.0, low)
+    high = np.where(breached, 0.0, high)
+    prob = np.where(breached, 1.0, prob)
+    return {
+        "level": level,
+        "velocity": velocity,
+        "sigma": sigma,
+        "minutes_to_breach": mtb,
+        "interval_low": low,
+        "interval_high": high,
+        "breach_probability": prob,
+        "samples": n,
+    }
+
+
+def forecast_histories(histories: Dict[str, Tuple[str, np.ndarray, np.ndarray]], method: str = "wls",
+                       horizon: float = ALERT_HORIZON, z: float = Z_90) -> Dict[str, dict]:
+    """{vm: (tier, ts, lag)} -> {vm: forecast record} using per-tier windows."""
+    names = list(histories)
+    tiers = [histories[n][0] for n in names]
+    windows = np.array([window_for(tr) for tr in tiers])
+    t, y = build_matrix([(histories[n][1], histories[n][2]) for n in names], windows)
+    rpo = np.array([TIER_RPO_MINUTES.get(tr, DEFAULT_RPO_MINUTES) for tr in tiers], dtype=float)
+    fc = forecast_fleet(t, y, rpo, method, horizon, z)
+    out = {}
+    for i, name in enumerate(names):
+        out[name] = {
+            "tier": tiers[i],
+            "minutesToBreach": _round(fc["minutes_to_breach"][i]),
+            "minutesToBreachLow": _round(fc["interval_low"][i]),
+            "minutesToBreachHigh": _round(fc["interval_high"][i]),
+            "breachProbability": round(float(fc["breach_probability"][i]), 4),
+            "lagVelocity": _round(fc["velocity"][i], 4),
+            "samples": int(fc["samples"][i]),
+        }
+    return out
+
+
+def _round(v: float, nd: int = 1) -> Optional[float]:
+    v = float(v)
+    if math.isnan(v):
+        return None
+    return v if math.isinf(v) else round(v, nd)
+
+
+# ---------------------------------------------------------------------------
+# History loaders
+# ---------------------------------------------------------------------------
+
+def _epoch(ts: str) -> float:
+    try:
+        return float(ts)
+    except ValueError:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+
+
+def _finish(rows: Dict[str, list], tiers: Dict[str, str]) -> Dict[str, Tuple[str, np.ndarray, np.ndarray]]:
+    out = {}
+    for vm, samples in rows.items():
+        samples.sort()
+        arr = np.array(samples, dtype=float).reshape(-1, 2)
+        out[vm] = (tiers.get(vm, "Unknown"), arr[:, 0], arr[:, 1])
+    return out
+
+
+def load_csv(path: str) -> Dict[str, Tuple[str, np.ndarray, np.ndarray]]:
+    rows, tiers = {}, {}
+    with open(path, newline="") as f:
+        for r in csv.DictReader(f):
+            vm = r["vm"]
+            tiers[vm] = r.get("tier") or tiers.get(vm, "Unknown")
+            rows.setdefault(vm, []).append((_epoch(r["ts"]), float(r["lag_minutes"])))
+    return _finish(rows, tiers)
+
+
+def load_state_json(path: str, tiers: Optional[Dict[str, str]] = None) -> Dict[str, Tuple[str, np.ndarray, np.ndarray]]:
+    """The monitor's JSON state file ({vm: [{ts, lag_minutes[, tier]}]})."""
+    with open(path) as f:
+        state = json.load(f)
+    rows, tier_map = {}, dict(tiers or {})
+    for vm, entries in state.items():
+        for s in entries:
+            try:
+                rows.setdefault(vm, []).append((_epoch(s["ts"]), float(s["lag_minutes"])))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if "tier" in s:
+                tier_map[vm] = s["tier"]
+    return _finish(rows, tier_map)
+
+
+def synthetic_fleet(vms: int, days: float, interval_min: float = 15.0,
+                    seed: int = 7) -> Dict[str, Tuple[str, np.ndarray, np.ndarray]]:
+    """
+    Lag random walks around a healthy baseline, with occasional drift
+    episodes (replication stalls: lag grows ~1 min/min plus noise) that may
+    or may not reach the tier RPO before recovering; plus isolated spikes.
+    """
+    rng = np.random.default_rng(seed)
+    steps = int(days * 24 * 60 / interval_min)
+    t0 = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+    out = {}
+    tier_names = list(TIER_RPO_MINUTES)
+    for v in range(vms):
+        tier = tier_names[v % len(tier_names)]
+        rpo = TIER_RPO_MINUTES[tier]
+        ts = t0 + (np.arange(steps) * interval_min + rng.uniform(0, interval_min)) * 60.0
+        base = rng.uniform(5, 0.15 * rpo)
+        lag = np.empty(steps)
+        cur = base
+        stall = 0
+        for k in range(steps):
+            if stall == 0 and rng.random() < 0.004:
+                stall = int(rng.integers(4, int(1.6 * rpo / interval_min) + 5))
+            if stall:
+                cur += interval_min * rng.uniform(0.6, 1.0) + rng.normal(0, 4)
+                stall -= 1
+                if stall == 0:
+                    cur = base
+            else:
+                cur = max(1.0, base + rng.normal(0, 0.05 * rpo))
+            spike = rng.uniform(0.3, 0.7) * rpo if rng.random() < 0.01 else 0.0
+            lag[k] = max(cur + spike, 0.0)
+        out[f"vm-{v:05d}"] = (tier, ts, lag)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Backtest harness
+# ---------------------------------------------------------------------------
+
+def replay_alarms(histories: Dict[str, Tuple[str, np.ndarray, np.ndarray]], method: str,
+                  horizon: float, probability: float, legacy: bool = False):
+    """
+    Replay every VM's history step by step (vectorized across VMs) and
+    return (names, ts, lag, rpo, alarm) as padded (n, L) arrays.
+    legacy=True applies the monitor's rule: 5-sample OLS, 0 < mtb <= horizon.
+    """
+    names = list(histories)
+    n = len(names)
+    length = max((len(h[1]) for h in histories.values()), default=0)
+    ts = np.full((n, length), np.nan)
+    lag = np.full((n, length), np.nan)
+    for i, name in enumerate(names):
+        k = len(histories[name][1])
+        ts[i, :k] = histories[name][1]
+        lag[i, :k] = histories[name][2]
+    tiers = [histories[nm][0] for nm in names]
+    rpo = np.array([TIER_RPO_MINUTES.get(tr, DEFAULT_RPO_MINUTES) for tr in tiers], dtype=float)
+    windows = np.full(n, LEGACY_WINDOW) if legacy else np.array([window_for(tr) for tr in tiers])
+    width = int(windows.max()) if n else 1
+    cols = np.arange(width) - (width - 1)                     # relative column offsets, newest last
+    keep = cols[None, :] > -windows[:, None]                  # per-tier window mask
+
+    alarm = np.zeros((n, length), dtype=bool)
+    rows = np.arange(n)[:, None]
+    for k in range(length):
+        idx = k + cols
+        valid = (idx >= 0)[None, :] & keep
+        tw = np.where(valid, ts[rows, np.clip(idx, 0, None)], np.nan)
+        yw = np.where(valid, lag[rows, np.clip(idx, 0, None)], np.nan)
+        alive = ~np.isnan(lag[:, k])
+        fc = forecast_fleet(tw, yw, rpo, "ols" if legacy else method, horizon)
+        if legacy:
+            mtb = fc["minutes_to_breach"]
+            alarm[:, k] = alive & (mtb > 0) & (mtb <= horizon)
+        else:
+            alarm[:, k] = alive & (lag[:, k] < rpo) & (fc["breach_probability"] >= probability)
+    return names, ts, lag, rpo, alarm
+
+
+def score_alarms(ts, lag, rpo, alarm, false_alarm_horizon: float) -> dict:
+    """Lead time per breach onset and false alarm onsets, summed over the fleet."""
+    leads, missed, false_alarms, onsets = [], 0, 0, 0
+    vm_days = 0.0
+    for i in range(len(ts)):
+        k_max = int((~np.isnan(lag[i])).sum())
+        if k_max == 0:
+            continue
+        t, y, a = ts[i, :k_max], lag[i, :k_max], alarm[i, :k_max]
+        vm_days += (t[-1] - t[0]) / 86400.0
+        breached = y >= rpo[i]
+        breach_onsets = np.flatnonzero(breached & ~np.concatenate([[False], breached[:-1]]))
+        for b in breach_onsets:
+            j = b
+            while j > 0 and a[j - 1] and not breached[j - 1]:
+                j -= 1
+            if j == b:
+                missed += 1
+                leads.append(0.0)
+            else:
+                leads.append((t[b] - t[j]) / 60.0)
+        alarm_onsets = np.flatnonzero(a & ~np.concatenate([[False], a[:-1]]))
+        onsets += len(alarm_onsets)
+        onset_times = t[breach_onsets]
+        for o in alarm_onsets:
+            upcoming = onset_times[(onset_times > t[o]) & (onset_times <= t[o] + false_alarm_horizon * 60.0)]
+            if not len(upcoming):
+                false_alarms += 1
+    leads_arr = np.array(leads)
+    return {
+        "breachEvents": len(leads),
+        "warnedBeforeBreach": len(leads) - missed,
+        "missed": missed,
+        "leadMinutesMedian": _round(np.median(leads_arr)) if len(leads) else None,
+        "leadMinutesP10": _round(np.percentile(leads_arr, 10)) if len(leads) else None,
+        "alarmOnsets": onsets,
+        "falseAlarms": false_alarms,
+        "falseAlarmRate": round(false_alarms / onsets, 4) if onsets else 0.0,
+        "falseAlarmsPerVmDay": round(false_alarms / vm_days, 4) if vm_days else 0.0,
+    }
+
+
+def backtest(histories, methods: List[str], horizon: float, probability: float,
+             false_alarm_horizon: float) -> dict:
+    report = {"vms": len(histories), "horizonMinutes": horizon, "alarmProbability": probability,
+              "falseAlarmHorizonMinutes": false_alarm_horizon, "methods": {}}
+    runs = [("legacy-ols5", None, True)] + [(m, m, False) for m in methods]
+    for label, method, legacy in runs:
+        _, ts, lag, rpo, alarm = replay_alarms(histories, method, horizon, probability, legacy)
+        report["methods"][label] = score_alarms(ts, lag, rpo, alarm, false_alarm_horizon)
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def _load(args) -> Dict[str, Tuple[str, np.ndarray, np.ndarray]]:
+    if getattr(args, "synthetic", None):
+        return synthetic_fleet(args.synthetic, args.days)
+    if args.csv:
+        return load_csv(args.csv)
+    if args.state:
+        return load_state_json(args.state)
+    print("Provide --csv, --state or --synthetic N")
+    sys.exit(2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet-wide RPO breach forecasting and backtesting")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("forecast", "backtest"):
+        p = sub.add_parser(name)
+        p.add_argument("--csv", help="Recorded history: vm,tier,ts,lag_minutes")
+        p.add_argument("--state", help="Monitor JSON state file")
+        p.add_argument("--horizon", type=float, default=ALERT_HORIZON, help="Alert horizon in minutes")
+    fc = sub.choices["forecast"]
+    fc.add_argument("--method", choices=METHODS, default="wls")
+    fc.add_argument("--z", type=float, default=Z_90, help="Interval width in standard errors (1.645 = 90%%)")
+    bt = sub.choices["backtest"]
+    bt.add_argument("--synthetic", type=int, help="Generate N synthetic VMs instead of loading history")
+    bt.add_argument("--days", type=float, default=7.0)
+    bt.add_argument("--methods", default=",".join(METHODS))
+    bt.add_argument("--probability", type=float, default=0.5, help="Alarm when breach_probability >= this")
+    bt.add_argument("--false-alarm-horizon", type=float, default=120.0,
+                    help="An alarm onset with no breach within this many minutes is a false alarm")
+    args = parser.parse_args()
+
+    histories = _load(args)
+    if args.cmd == "forecast":
+        print(json.dumps(forecast_histories(histories, args.method, args.horizon, args.z), indent=2))
+        return
+    methods = [m.strip() for m in args.methods.split(",") if m.strip()]
+    unknown = [m for m in methods if m not in METHODS]
+    if unknown:
+        print(f"Unknown method(s): {', '.join(unknown)} (choose from {', '.join(METHODS)})")
+        sys.exit(2)
+    print(json.dumps(backtest(histories, methods, args.horizon, args.probability,
+                              args.false_alarm_horizon), indent=2))
+
+
+if __name__ == "__main__":
+    main()
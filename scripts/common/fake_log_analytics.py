@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fake_log_analytics.py
+Local stand-in for the Log Analytics /v1/workspaces/<id>/query API, for exercising la_query.py and its callers.
+
+- Synthetic ThreatIntelligenceIndicator-style rows spread evenly over --days, filtered by the request
+  "timespan" (start/end) and by a "TimeGenerated > datetime(...)" clause in the KQL
+- Result limits like the real API: more than --max-rows rows -> truncated table plus a PartialError
+- "summarize count(), max(TimeGenerated)" and "avg(LagMin)" queries answer with one aggregate row
+  (connector-health-check.py / log-lag-monitor.py)
+- Optional throttling: more than --rate requests per second -> 429 with Retry-After
+- GET /_stats -> request count, throttled, truncated and rows returned
+
+Usage:
+  python3 fake_log_analytics.py --port 8090 --rows 2000000 --days 7 --max-rows 500000
+  LA_ENDPOINT=http://127.0.0.1:8090 AZ_TOKEN=dev python3 ../integration/splunk-risk-list-sync.py ...
+Library:
+  with FakeLogAnalytics(rows=100000, max_rows=20000) as la:   # la.url
+      ...
+"""
+
+import argparse, bisect, json, re, threading, time
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+COLUMNS = [("TimeGenerated", "datetime"), ("IndicatorType", "string"), ("IndicatorValue", "string"),
+           ("SourceSystem", "string"), ("Active", "bool"), ("ExpirationDateTime", "datetime"),
+           ("ConfidenceScore", "int")]
+TYPES = ("ip", "domain", "url", "filehash")
+
+
+def _parse(ts: str) -> float:
+    ts = ts.strip().replace("Z", "+00:00")
+    if "." in ts:
+        head, _, frac = ts.partition(".")
+        digits = "".join(c for c in frac if c.isdigit())
+        ts = f"{head}.{digits[:6]}{frac[len(digits):]}"
+    dt = datetime.fromisoformat(ts)
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _iso(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f") + "0Z"
+
+
+class FakeLogAnalytics:
+    def __init__(self, rows: int = 100000, days: float = 7, max_rows: int = 500000, rate: float = 0,
+                 latency_ms: float = 0, host: str = "127.0.0.1", port: int = 0):
+        self.max_rows, self.rate, self.latency = max_rows, rate, latency_ms / 1000.0
+        now = time.time()
+        start = now - days * 86400
+        step = (now - start) / max(rows, 1)
+        self.times = [start + i * step for i in range(rows)]
+        self.stats: Counter = Counter()
+        self._recent = deque()
+        self._lock = threading.Lock()
+        fla = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except ConnectionError:  # client stopped reading a slice past its row_limit
+                    pass
+
+            def _send(self, code: int, data: bytes, headers: Optional[dict] = None) -> None:
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/_stats":
+                    return self._send(200, json.dumps(dict(fla.stats)).encode())
+                self._send(404, b"{}")
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not re.match(r"^/v1/workspaces/[^/]+/query$", self.path):
+                    return self._send(404, b'{"error":{"code":"PathNotFound"}}')
+                with fla._lock:
+                    fla.stats["requests"] += 1
+                    now = time.monotonic()
+                    while fla._recent and now - fla._recent[0] > 1.0:
+                        fla._recent.popleft()
+                    if fla.rate and len(fla._recent) >= fla.rate:
+                        fla.stats["throttled"] += 1
+                        return self._send(429, b'{"error":{"code":"TooManyRequests"}}', {"Retry-After": "1"})
+                    fla._recent.append(now)
+                if fla.latency:
+                    time.sleep(fla.latency)
+                self._send(200, fla.answer(body.get("query", ""), body.get("timespan")))
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread: Optional[threading.Thread] = None
+
+    def _window(self, kql: str, timespan: Optional[str]):
+        lo, hi = float("-inf"), float("inf")
+        if timespan and "/" in timespan:
+            a, b = timespan.split("/", 1)
+            lo, hi = _parse(a), _parse(b)
+        m = re.search(r"TimeGenerated\s*>\s*datetime\(([^)]+)\)", kql)
+        if m:
+            lo = max(lo, _parse(m.group(1)) + 1e-6)
+        m = re.search(r"TimeGenerated\s*>\s*ago\((\d+)m\)", kql)
+        if m:
+            lo = max(lo, time.time() - int(m.group(1)) * 60)
+        return bisect.bisect_left(self.times, lo), bisect.bisect_left(self.times, hi)
+
+    def answer(self, kql: str, timespan: Optional[str]) -> bytes:
+        i, j = self._window(kql, timespan)
+        if "summarize count(), max(TimeGenerated)" in kql:
+            cols, rows = [("count_", "long"), ("max_TimeGenerated", "datetime")], []
+            if j > i:
+                rows = [[j - i, _iso(self.times[j - 1])]]
+            return self._table(cols, rows)
+        if "avg(LagMin)" in kql:
+            cols = [("avg_LagMin", "real"), ("max_LagMin", "long"), ("min_LagMin", "long")]
+            return self._table(cols, [[2.5, 9, 0]] if j > i else [])
+
+        truncated = j - i > self.max_rows
+        j = min(j, i + self.max_rows)
+        rows = [[_iso(self.times[k]), TYPES[k % 4], f"ioc-{k}.example", "fake", k % 50 != 0,
+                 _iso(self.times[k] + 30 * 86400), k % 100]
+                for k in range(i, j)]
+        with self._lock:
+            self.stats["rows"] += len(rows)
+            self.stats["truncated"] += int(truncated)
+        err = {"code": "PartialError", "message": "There were some errors when processing your query.",
+               "details": [{"code": "EngineError", "message": "Query result set has exceeded the internal limit"}]}
+        return self._table(COLUMNS, rows, err if truncated else None)
+
+    @staticmethod
+    def _table(cols, rows, error=None) -> bytes:
+        doc = {"tables": [{"name": "PrimaryResult", "columns": [{"name": n, "type": t} for n, t in cols],
+                           "rows": rows}]}
+        if error:
+            doc["error"] = error
+        return json.dumps(doc, separators=(",", ":")).encode()
+
+    def start(self) -> "FakeLogAnalytics":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeLogAnalytics":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--days", type=float, default=7)
+    ap.add_argument("--max-rows", type=int, default=500000)
+    ap.add_argument("--rate", type=float, default=0, help="Max requests per second before 429 (0 = unlimited)")
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    args = ap.parse_args()
+    fla = FakeLogAnalytics(args.rows, args.days, args.max_rows, args.rate, args.latency_ms, args.host, args.port)
+    print(f"Fake Log Analytics on {fla.url} ({args.rows} rows over {args.days} days). Ctrl+C to stop.")
+    try:
+        fla.server.serve_forever()
+    except KeyboardInterrupt:
+        fla.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
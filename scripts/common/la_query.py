@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+la_query.py
+Shared Log Analytics (Azure Monitor Logs) query client for scripts/integration and scripts/observability.
+
+- stream(kql, start, end): splits the time range into slices (passed as the API "timespan", so the
+  KQL itself needs no time filter), runs them concurrently, and yields rows as tuples slice by slice
+- Adaptive slicing: a slice that hits the API result limits (PartialError, row limit, 413/504/timeout)
+  is bisected and retried, down to --min-slice; only complete slices are yielded, so results are never
+  silently truncated (a slice that still truncates at min_slice is counted in stats["truncated"])
+- Rate budget: one token bucket (requests/minute) shared by all workers; 429 Retry-After pauses everyone
+- Incremental parsing: responses are read with stream=True and decoded row by row (ijson when installed,
+  otherwise a raw_decode scanner), never materialising the whole JSON document or a dict per row
+- Per-slice buffering (not row-by-row streaming): a slice's rows are held until its response ends,
+  because a trailing "error" (PartialError) can still invalidate them. A slice stops being read at
+  row_limit rows (default DEFAULT_ROW_LIMIT) and is bisected, so memory is bounded by
+  row_limit x concurrency rows; lower row_limit or slice_size to lower it
+- Rows share one Schema (column names + index); use schema.getter("A", "B") for fast field access
+- Token: explicit, env AZ_TOKEN, or DefaultAzureCredential (azure-identity) if installed
+- LA_ENDPOINT overrides https://api.loganalytics.io (e.g. fake_log_analytics.py for local tests)
+
+Usage (library):
+  sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "common"))
+  from la_query import LAQueryClient
+  client = LAQueryClient(workspace_id, concurrency=4, per_minute=60)
+  rows = client.stream("ThreatIntelligenceIndicator | project TimeGenerated, ...", start, end)
+  get = rows.schema.getter("IndicatorValue", "IndicatorType")
+  for row in rows:
+      value, itype = get(row)
+  schema, result = client.query("Heartbeat | summarize count()")   # small/aggregate queries
+"""
+
+import codecs, json, os, threading, time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+
+LA_ENDPOINT = os.getenv("LA_ENDPOINT", "https://api.loganalytics.io")
+LA_SCOPE = "https://api.loganalytics.io/.default"
+LA_MAX_ROWS = 500000          # API result set limit (records)
+DEFAULT_ROW_LIMIT = 100000    # rows buffered per slice before it is bisected instead (<= LA_MAX_ROWS)
+DEFAULT_SLICE = timedelta(hours=6)
+DEFAULT_MIN_SLICE = timedelta(minutes=1)
+CHUNK_BYTES = 1 << 16
+SPLIT_STATUS = (413, 504)
+RETRY_STATUS = (429, 500, 502, 503)
+SPLIT_CODES = ("PartialError", "ResponsePayloadTooLarge", "QueryExecutionTimeout", "GatewayTimeout")
+
+_DEC = json.JSONDecoder()
+_WS = " \t\r\n,"
+
+
+class LAQueryError(Exception):
+    pass
+
+
+class Schema:
+    """Column names shared by every row of a query."""
+
+    def __init__(self, names: Sequence[str]):
+        self.names = tuple(names)
+        self.index: Dict[str, int] = {n: i for i, n in enumerate(self.names)}
+
+    def getter(self, *names: str):
+        """itemgetter over the named columns (a tuple for several names)."""
+        return itemgetter(*(self.index[n] for n in names))
+
+    def as_dict(self, row: tuple) -> Dict:
+        return dict(zip(self.names, row))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Schema) and other.names == self.names
+
+    def __repr__(self) -> str:
+        return f"Schema{self.names}"
+
+
+# ---- incremental response parsing ----
+class _ScanParser:
+    """
+    Streams the first table of a /query response: columns, then rows one at a time via raw_decode.
+    The tail after the rows array is re-wrapped as '{"tables":[{"rows":[]' + tail to read "error".
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._dec = codecs.getincrementaldecoder("utf-8")()
+        self.buf, self.pos, self.nbytes = "", 0, 0
+        self.columns: Optional[List[str]] = None
+        self.error: Optional[Dict] = None
+
+    def _more(self) -> bool:
+        for chunk in self._chunks:
+            if chunk:
+                self.nbytes += len(chunk)
+                self.buf = self.buf[self.pos:] + self._dec.decode(chunk)
+                self.pos = 0
+                return True
+        return False
+
+    def _seek(self, token: str) -> bool:
+        while True:
+            i = self.buf.find(token, self.pos)
+            if i >= 0:
+                self.pos = i + len(token)
+                return True
+            self.pos = max(self.pos, len(self.buf) - len(token))
+            if not self._more():
+                return False
+
+    def _skip(self, chars: str = _WS) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in chars:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def _value(self):
+        self._skip(_WS + ":")
+        while True:
+            try:
+                obj, end = _DEC.raw_decode(self.buf, self.pos)
+                self.pos = end
+                return obj
+            except json.JSONDecodeError:
+                if not self._more():
+                    raise
+
+    def rows(self) -> Iterator[tuple]:
+        if not self._seek('"columns"'):
+            self.columns = []
+            return
+        self.columns = [c["name"] for c in self._value()]
+        if not self._seek('"rows"') or self._skip(_WS + ":") != "[":
+            raise LAQueryError("unexpected response layout (rows before columns)")
+        self.pos += 1
+        while True:
+            c = self._skip()
+            if c == "]":
+                self.pos += 1
+                break
+            if not c:
+                raise LAQueryError("response ended inside the rows array")
+            yield tuple(self._value())
+        while self._more():
+            pass
+        tail = self.buf[self.pos:] + self._dec.decode(b"", final=True)
+        try:
+            self.error = json.loads('{"tables":[{"rows":[]' + tail).get("error")
+        except json.JSONDecodeError:
+            self.error = None
+
+
+class _IjsonParser:
+    """Same interface as _ScanParser, driven by ijson events (faster C backend when installed)."""
+
+    def __init__(self, raw, ijson):
+        self._raw, self._ijson = raw, ijson
+        self.columns: Optional[List[str]] = None
+        self.error: Optional[Dict] = None
+        self.nbytes = 0
+
+    def rows(self) -> Iterator[tuple]:
+        table, row, err = -1, None, None
+        self.columns = []
+        for prefix, event, value in self._ijson.parse(self._raw, use_float=True):
+            if prefix == "tables.item" and event == "start_map":
+                table += 1
+            elif table == 0 and prefix == "tables.item.columns.item.name":
+                self.columns.append(value)
+            elif table == 0 and prefix == "tables.item.rows.item":
+                if event == "start_array":
+                    row = []
+                elif event == "end_array":
+                    yield tuple(row)
+            elif table == 0 and prefix == "tables.item.rows.item.item":
+                row.append(value)
+            elif prefix == "error" and event == "start_map":
+                err = self._ijson.ObjectBuilder()
+                err.event(event, value)
+            elif err is not None and prefix.startswith("error"):
+                err.event(event, value)
+        self.error = err.value if err is not None else None
+
+
+def _parser(resp: requests.Response):
+    try:
+        import ijson
+        resp.raw.decode_content = True
+        return _IjsonParser(resp.raw, ijson)
+    except ImportError:
+        return _ScanParser(resp.iter_content(CHUNK_BYTES))
+
+
+# ---- rate budget ----
+class RateBudget:
+    """Token bucket shared by all workers: per_minute requests, bursting to `burst`."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.burst = burst or max(1.0, per_minute / 6.0)
+        self.tokens = self.burst
+        self.last = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                wait_s = self.paused_until - now
+                if wait_s <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_s = max(wait_s, (1 - self.tokens) / self.rate)
+            time.sleep(wait_s)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+# ---- client ----
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class LAQueryClient:
+    def __init__(self, workspace_id: str, token: Optional[str] = None, endpoint: Optional[str] = None,
+                 concurrency: int = 4, per_minute: float = 60, timeout: float = 120,
+                 row_limit: int = DEFAULT_ROW_LIMIT, retries: int = 4):
+        self.url = f"{(endpoint or LA_ENDPOINT).rstrip('/')}/v1/workspaces/{workspace_id}/query"
+        self._token = token or os.getenv("AZ_TOKEN")
+        self._credential = None
+        self.concurrency = max(1, concurrency)
+        self.budget = RateBudget(per_minute)
+        self.timeout, self.row_limit, self.retries = timeout, min(row_limit, LA_MAX_ROWS), retries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "slices": 0, "splits": 0, "truncated": 0, "rows": 0, "bytes": 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _headers(self) -> Dict[str, str]:
+        h = {"Content-Type": "application/json", "Accept-Encoding": "gzip"}
+        token = self._token
+        if token is None:
+            try:
+                if self._credential is None:
+                    from azure.identity import DefaultAzureCredential
+                    self._credential = DefaultAzureCredential()
+                token = self._credential.get_token(LA_SCOPE).token  # SDK caches until expiry
+            except ImportError:
+                token = ""
+                self._token = ""
+        if token:
+            h["Authorization"] = f"Bearer {token}"
+        return h
+
+    def _session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = requests.Session()
+        return s
+
+    def _fetch(self, kql: str, timespan: Optional[str]) -> Tuple[str, Optional[Schema], List[tuple]]:
+        """
+        One request -> ("ok" | "split", schema, rows). Retries throttling and transient errors.
+        Rows are buffered (at most row_limit) until the response ends and its trailing error is known.
+        """
+        body = {"query": kql}
+        if timespan:
+            body["timespan"] = timespan
+        for attempt in range(1, self.retries + 1):
+            self.budget.acquire()
+            self._count("requests")
+            try:
+                resp = self._session().post(self.url, headers=self._headers(), json=body,
+                                            timeout=self.timeout, stream=True)
+            except requests.exceptions.Timeout:
+                return "split", None, []
+            except requests.exceptions.ConnectionError:
+                if attempt == self.retries:
+                    raise
+                self._count("retries")
+                time.sleep(2 ** attempt)
+                continue
+            with resp:
+                if resp.status_code in SPLIT_STATUS:
+                    return "split", None, []
+                if resp.status_code in RETRY_STATUS and attempt < self.retries:
+                    self._count("retries")
+                    delay = float(resp.headers.get("Retry-After") or 2 ** attempt)
+                    if resp.status_code == 429:
+                        self.budget.pause(delay)
+                    else:
+                        time.sleep(delay)
+                    continue
+                if resp.status_code != 200:
+                    try:
+                        err = resp.json().get("error", {})
+                    except ValueError:
+                        err = {}
+                    if err.get("code") in SPLIT_CODES:
+                        return "split", None, []
+                    raise LAQueryError(f"HTTP {resp.status_code}: {err.get('message') or resp.text[:300]}")
+                parser = _parser(resp)
+                rows = list(islice(parser.rows(), self.row_limit))
+                self._count("bytes", parser.nbytes or int(resp.headers.get("Content-Length") or 0))
+                if len(rows) >= self.row_limit:   # will be bisected anyway: stop reading this slice
+                    return "split", Schema(parser.columns or ()), rows
+            code = (parser.error or {}).get("code")
+            if code in SPLIT_CODES or len(rows) >= self.row_limit:
+                return "split", Schema(parser.columns or ()), rows
+            if parser.error:
+                raise LAQueryError(f"{code}: {parser.error.get('message', '')}")
+            return "ok", Schema(parser.columns or ()), rows
+        raise LAQueryError(f"gave up after {self.retries} attempts")
+
+    def query(self, kql: str, timespan: Optional[str] = None) -> Tuple[Schema, List[tuple]]:
+        """Single request (aggregates, small results). Raises if the result was truncated."""
+        status, schema, rows = self._fetch(kql, timespan)
+        if status != "ok":
+            raise LAQueryError("result exceeded the API limits; use stream() with a time range")
+        self._count("rows", len(rows))
+        return schema, rows
+
+    def query_many(self, kqls: Sequence[str], timespan: Optional[str] = None) -> List[Tuple[Schema, List[tuple]]]:
+        """Runs independent queries concurrently within the rate budget; results in input order."""
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, max(1, len(kqls)))) as pool:
+            return list(pool.map(lambda q: self.query(q, timespan), kqls))
+
+    def stream(self, kql: str, start: datetime, end: datetime, slice_size: timedelta = DEFAULT_SLICE,
+               min_slice: timedelta = DEFAULT_MIN_SLICE) -> "QueryStream":
+        """Row-level query over [start, end) in concurrent, adaptively bisected time slices."""
+        return QueryStream(self, kql, start, end, slice_size, min_slice)
+
+
+class QueryStream:
+    """
+    Iterable of row tuples. Slices complete out of order; rows within a slice keep the API's order and
+    are yielded once the whole slice has been read (see "Per-slice buffering" above).
+    .schema is known once the first slice arrives (reading it primes the stream).
+    """
+
+    _EMPTY = object()
+
+    def __init__(self, client: LAQueryClient, kql: str, start: datetime, end: datetime,
+                 slice_size: timedelta, min_slice: timedelta):
+        self.client, self.kql = client, kql
+        self.start, self.end = start, end
+        self.slice_size, self.min_slice = slice_size, min_slice
+        self._schema: Optional[Schema] = None
+        self._gen = self._run()
+        self._peek = self._EMPTY
+
+    @property
+    def schema(self) -> Schema:
+        if self._schema is None and self._peek is self._EMPTY:
+            self._peek = next(self._gen, None)
+        return self._schema or Schema(())
+
+    def __iter__(self) -> Iterator[tuple]:
+        if self._peek is not self._EMPTY:
+            peek, self._peek = self._peek, None
+            if peek is None:
+                return
+            yield peek
+        yield from self._gen
+
+    def _slices(self) -> deque:
+        out, t = deque(), self.start
+        while t < self.end:
+            out.append((t, min(t + self.slice_size, self.end)))
+            t += self.slice_size
+        return out
+
+    def _run(self) -> Iterator[tuple]:
+        c = self.client
+        pending = self._slices()
+        running = {}
+        with ThreadPoolExecutor(max_workers=c.concurrency) as pool:
+            while pending or running:
+                while pending and len(running) < c.concurrency:
+                    s, e = pending.popleft()
+                    running[pool.submit(c._fetch, self.kql, f"{_iso(s)}/{_iso(e)}")] = (s, e)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    s, e = running.pop(fut)
+                    status, schema, rows = fut.result()
+                    if status == "split" and e - s > self.min_slice:
+                        mid = s + (e - s) / 2
+                        pending.extendleft([(mid, e), (s, mid)])
+                        c._count("splits")
+                        continue
+                    if status == "split":
+                        c._count("truncated")
+                        if schema is None:
+                            raise LAQueryError(f"slice {_iso(s)}/{_iso(e)} still fails at the minimum slice size")
+                    c._count("slices")
+                    if self._schema is None and schema.names:
+                        self._schema = schema
+                    elif schema.names and schema != self._schema:
+                        raise LAQueryError(f"schema changed between slices: {schema} != {self._schema}")
+                    c._count("rows", len(rows))
+                    yield from rows
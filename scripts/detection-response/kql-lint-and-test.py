@@ -8,21 +8,48 @@ Features
 - Static lint: basic syntax hygiene (balanced brackets, banned operators, project-away check),
   required fields (e.g., TimeGenerated) by rule type, TODO/FIXME detection.
 - Unit "tests": optional YAML file mapping KQL paths to expected properties (e.g., must reference certain tables/columns).
-  NOTE: This does not execute KQL; it validates structure and conventions for CI gating.
+- Execution tests (--execute): a test entry's "run" case(s) execute the query locally (kql_exec.py, NumPy columnar
+  tables loaded from JSON/CSV fixtures; no workspace needed) and assert on the result rows. Per-case execution
+  time is reported in ms; max_ms fails a case that gets slower. A failing case fails the file.
+- Lint runs on a tokenized query (kql_lint.py): strings, verbatim strings and // comments are not code, every rule
+  runs in one pass over the tokens, and each issue is reported with its rule id and line/col
+  ({"rule", "line", "col", "message"}; line/col are null for file-level findings).
+- Lint cache (--cache, default .kql-lint-cache.json): results are keyed by the file content hash plus that file's
+  test definition, and the whole cache is dropped when the rule set (kql_lint.py) changes. Unchanged files are
+  not re-linted; the report's "cache" block has hits, misses, hit rate and the lint time saved.
+- Files that miss the cache are linted across a process pool (--workers, default CPU count).
+- --changed-since <git-ref>: only lint .kql files that differ from <ref> (git diff, plus untracked files).
+
+Tests YAML
+  siem/detections/lateral-movement.kql:
+    contains_table: [SecurityEvent]
+    contains_columns: [EventID, LogonType]
+    forbid_regex: ["\\|\\s*take\\s+\\d+"]
+    run:                                   # one case or a list of cases; paths relative to the YAML file
+      - name: twelve network logons in 5m
+        fixtures: [fixtures/security-event.json]
+        now: 2024-05-01T12:00:00Z          # pins ago()/now()
+        expect_columns: [Account, IpAddress, TimeGenerated, Attempts]
+        expect_count: 1
+        expect_rows: [{IpAddress: 10.0.0.5, Attempts: 12}]   # subset of columns; any row order unless ordered: true
+        max_ms: 250
 
 Usage
   python kql-lint-and-test.py --rules-dir ./detections --tests ./tests/kql-tests.yml --out-json kql-report.json
+  python kql-lint-and-test.py --rules-dir ./detections --changed-since origin/main --cache .cache/kql-lint.json
+  python kql-lint-and-test.py --rules-dir ../../labs --tests ./tests/kql-tests.yml --execute   # lab detections
+  python3 -m pytest tests/                                   # same cases, plus executor checks
 """
 
-import argparse, json, os, re, sys
-from typing import List, Dict, Any
+import argparse, hashlib, json, os, subprocess, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+import kql_lint
+from kql_lint import KqlLinter
 
-BANNED_PATTERNS = [
-    (re.compile(r"\bcontains\b(?!\s*cs)"), "Prefer 'contains_cs' or 'has' where possible."),
-    (re.compile(r"\bisnotnull\s*\(\s*\)"), "Use 'isnotempty()' / 'isnotnull(Column)' correctly."),
-    (re.compile(r"where\s+true\b", re.I), "Avoid no-op filters."),
-]
-REQUIRED_TIME_FIELD = "TimeGenerated"
+POOL_MIN_FILES = 64   # below this, process start-up costs more than it saves
+CACHE_FORMAT = 1
 
 def read_file(path: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
@@ -36,27 +63,17 @@ def list_kql_files(root: str) -> List[str]:
                 out.append(os.path.join(d, fn))
     return sorted(out)
 
-def check_balanced(text: str) -> List[str]:
-    pairs = {"(": ")", "[": "]", "{": "}"}
-    stack = []
-    errs = []
-    for i, ch in enumerate(text):
-        if ch in pairs:
-            stack.append((ch, i))
-        elif ch in pairs.values():
-            if not stack:
-                errs.append(f"Unmatched closing '{ch}' at pos {i}")
-            else:
-                op, _ = stack.pop()
-                if pairs[op] != ch:
-                    errs.append(f"Mismatched '{op}' vs '{ch}'")
-    if stack:
-        errs.append(f"Unclosed delimiters: {''.join([c for c,_ in stack])}")
-    return errs
+def git(*args, cwd: str) -> str:
+    r = subprocess.run(["git", *args], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if r.returncode != 0:
+        raise RuntimeError(r.stderr.strip())
+    return r.stdout
 
-def has_required_time(text: str) -> bool:
-    # Heuristic: detections that use time windowing should reference TimeGenerated.
-    return REQUIRED_TIME_FIELD.lower() in text.lower()
+def list_changed_kql_files(root: str, ref: str) -> List[str]:
+    """.kql files under root that were added/modified since ref (committed or not), plus untracked ones."""
+    changed = git("diff", "--name-only", "--diff-filter=ACMR", "--relative", ref, "--", ".", cwd=root).splitlines()
+    changed += git("ls-files", "--others", "--exclude-standard", "--", ".", cwd=root).splitlines()
+    return sorted({os.path.join(root, p) for p in changed if p.lower().endswith(".kql")})
 
 def load_tests(path: str) -> Dict[str, Any]:
     if not path:
@@ -65,64 +82,175 @@ def load_tests(path: str) -> Dict[str, Any]:
     with open(path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f) or {}
 
-def apply_tests(kql_text: str, tests: Dict[str, Any]) -> List[str]:
-    """Apply simple test assertions described in YAML (contains_table, contains_columns, forbid_regex)."""
-    errors = []
-    contains_table = tests.get("contains_table") or []
-    for t in contains_table:
-        if re.search(rf"\b{re.escape(t)}\b", kql_text, re.I) is None:
-            errors.append(f"Expected reference to table '{t}'")
-    contains_columns = tests.get("contains_columns") or []
-    for c in contains_columns:
-        if re.search(rf"\b{re.escape(c)}\b", kql_text, re.I) is None:
-            errors.append(f"Expected reference to column '{c}'")
-    forbid_regex = tests.get("forbid_regex") or []
-    for pattern in forbid_regex:
-        if re.search(pattern, kql_text, re.I):
-            errors.append(f"Matched forbidden pattern: {pattern}")
-    return errors
+def ruleset_version() -> str:
+    """Changes whenever the lint engine or its rule tables change."""
+    with open(kql_lint.__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def cache_key(data: bytes, tdef: Optional[Dict[str, Any]]) -> str:
+    h = hashlib.sha256(data)
+    if isinstance(tdef, dict):
+        tdef = {k: v for k, v in tdef.items() if k != "run"}   # execution cases don't affect lint results
+    if tdef:
+        h.update(b"\0" + json.dumps(tdef, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+class LintCache:
+    """{key: {"issues": [...], "seconds": lint time}} persisted as JSON; invalidated wholesale on a rule-set change."""
+
+    def __init__(self, path: Optional[str], version: str):
+        self.path, self.version = path, version
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.used = set()
+        self.hits = self.misses = 0
+        self.saved = 0.0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    doc = json.load(f)
+                if doc.get("format") == CACHE_FORMAT and doc.get("ruleset") == version:
+                    self.entries = doc.get("entries") or {}
+            except (OSError, ValueError):
+                pass  # unreadable cache = cold cache
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        e = self.entries.get(key)
+        if e is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.saved += e.get("seconds", 0.0)
+        self.used.add(key)
+        return e["issues"]
+
+    def put(self, key: str, issues: List[Dict[str, Any]], seconds: float) -> None:
+        self.entries[key] = {"issues": issues, "seconds": round(seconds, 6)}
+        self.used.add(key)
+
+    def save(self, prune: bool) -> None:
+        """prune=True (full run) drops entries no current file uses, so the cache tracks the tree."""
+        if not self.path:
+            return
+        entries = {k: v for k, v in self.entries.items() if k in self.used} if prune else self.entries
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": CACHE_FORMAT, "ruleset": self.version, "entries": entries}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"path": self.path, "hits": self.hits, "misses": self.misses,
+                "hitRate": round(self.hits / total, 4) if total else None, "timeSavedSeconds": round(self.saved, 3)}
+
+_LINTER: Optional[KqlLinter] = None
+
+def _init_worker(test_map: Dict[str, Any]) -> None:
+    global _LINTER
+    _LINTER = KqlLinter(test_map)
+
+def _lint_one(job: Tuple[str, str]) -> Tuple[List[Dict[str, Any]], float]:
+    rel, text = job
+    started = time.perf_counter()
+    issues = [i.as_dict() for i in _LINTER.lint(text, rel)]
+    return issues, time.perf_counter() - started
+
+def lint_many(jobs: List[Tuple[str, str]], test_map: Dict[str, Any], workers: int) -> List[Tuple[List[Dict], float]]:
+    """Lints (rel, text) jobs, in a process pool when there are enough of them; results keep job order."""
+    if workers <= 1 or len(jobs) < POOL_MIN_FILES:
+        _init_worker(test_map)
+        return [_lint_one(j) for j in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(test_map,)) as pool:
+        return list(pool.map(_lint_one, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+def run_cases(text: str, tdef: Any, base_dir: str, fixture_cache: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Executes a test entry's "run" case(s) against their fixtures; execution results are never cached."""
+    cases = tdef.get("run") if isinstance(tdef, dict) else None
+    if not cases:
+        return []
+    import kql_exec  # optional dependency (numpy)
+    if isinstance(cases, dict):
+        cases = [cases]
+    return [kql_exec.run_case(text, case, base_dir, fixture_cache) for case in cases]
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--rules-dir", required=True)
     ap.add_argument("--tests", help="YAML file with per-rule tests; keys are relative KQL paths")
     ap.add_argument("--out-json", default="kql-report.json")
+    ap.add_argument("--cache", default=".kql-lint-cache.json", help="Lint cache file (persist it between CI runs)")
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Lint processes for cache misses")
+    ap.add_argument("--changed-since", metavar="GIT_REF", help="Only lint .kql files changed since this ref")
+    ap.add_argument("--execute", action="store_true", help="Run the tests' 'run' cases against their fixtures")
     args = ap.parse_args()
 
+    started = time.perf_counter()
     test_map = load_tests(args.tests)
-    results = []
-    fail_count = 0
-
-    for path in list_kql_files(args.rules_dir):
-        rel = os.path.relpath(path, args.rules_dir)
-        text = read_file(path)
-        issues = []
-
-        issues.extend(check_balanced(text))
-        for rx, msg in BANNED_PATTERNS:
-            if rx.search(text):
-                issues.append(f"Banned/anti-pattern: {msg}")
-        if "datatable" not in text.lower() and not has_required_time(text):
-            issues.append(f"Missing recommended field '{REQUIRED_TIME_FIELD}'")
-
-        # TODO/FIXME
-        if re.search(r"\b(TODO|FIXME)\b", text):
-            issues.append("Contains TODO/FIXME comments")
-
-        # Custom tests
-        tdef = test_map.get(rel) if isinstance(test_map, dict) else None
-        if tdef:
-            issues.extend(apply_tests(text, tdef))
-
-        status = "pass" if not issues else "fail"
-        if status == "fail":
+    if not isinstance(test_map, dict):
+        test_map = {}
+    try:
+        paths = list_changed_kql_files(args.rules_dir, args.changed_since) if args.changed_since \
+            else list_kql_files(args.rules_dir)
+    except RuntimeError as e:
+        print(f"git diff against '{args.changed_since}' failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    cache = LintCache(None if args.no_cache else args.cache, ruleset_version())
+
+    results: List[Dict[str, Any]] = []
+    pending: Dict[str, Tuple[str, str, List[int]]] = {}   # cache key -> (rel, text, results indexes)
+    for path in paths:
+        rel = os.path.relpath(path, args.rules_dir).replace(os.sep, "/")
+        with open(path, "rb") as f:
+            data = f.read()
+        key = cache_key(data, test_map.get(rel))
+        issues = cache.get(key)
+        results.append({"file": rel, "issues": issues})
+        if issues is None:
+            if key in pending:   # identical content (copied/vendored rules) is linted once
+                pending[key][2].append(len(results) - 1)
+            else:
+                pending[key] = (rel, data.decode("utf-8"), [len(results) - 1])
+
+    lint_seconds = 0.0
+    fresh = lint_many([(rel, text) for rel, text, _ in pending.values()], test_map, args.workers)
+    for (key, (_, _, idxs)), (issues, secs) in zip(pending.items(), fresh):
+        for idx in idxs:
+            results[idx]["issues"] = issues
+        cache.put(key, issues, secs)
+        lint_seconds += secs
+    cache.save(prune=not args.changed_since)
+
+    fail_count = executed = exec_failed = 0
+    fixture_cache: Dict[str, Any] = {}
+    base_dir = os.path.dirname(os.path.abspath(args.tests)) if args.tests else "."
+    items = []
+    for r in results:
+        item = {"file": r["file"], "status": "pass" if not r["issues"] else "fail", "issues": r["issues"]}
+        if args.execute:
+            text = read_file(os.path.join(args.rules_dir, r["file"]))
+            cases = run_cases(text, test_map.get(r["file"]), base_dir, fixture_cache)
+            if cases:
+                item["execution"] = cases
+                executed += len(cases)
+                failed_cases = sum(1 for c in cases if c["status"] != "pass")
+                exec_failed += failed_cases
+                if failed_cases:
+                    item["status"] = "fail"
+        if item["status"] == "fail":
             fail_count += 1
-        results.append({"file": rel, "status": status, "issues": issues})
+        items.append(item)
 
-    report = {"checked": len(results), "failed": fail_count, "items": results}
+    report = {"checked": len(items), "failed": fail_count, "executed": executed, "executionFailed": exec_failed,
+              "changedSince": args.changed_since,
+              "workers": args.workers if len(pending) >= POOL_MIN_FILES else 1,
+              "lintSeconds": round(lint_seconds, 3), "elapsedSeconds": round(time.perf_counter() - started, 3),
+              "cache": cache.stats(), "items": items}
     with open(args.out_json, "w", encoding="utf-8") as f:
         json.dump(report, f, indent=2)
-    print(json.dumps({"checked": report["checked"], "failed": report["failed"], "out": args.out_json}))
+    print(json.dumps({"checked": report["checked"], "failed": report["failed"], "executed": executed,
+                      "executionFailed": exec_failed, "cacheHitRate": report["cache"]["hitRate"],
+                      "timeSavedSeconds": report["cache"]["timeSavedSeconds"], "out": args.out_json}))
 
     sys.exit(0 if fail_count == 0 else 2)
 
@@ -0,0 +1,1824 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+kql_exec.py
+Local executor for a practical KQL subset, so detections can run against fixture data in CI without a workspace.
+
+Tables are columnar: one NumPy array per column (int64/float64/bool/datetime64[us]/timedelta64[us], object for
+string and dynamic). Operators work on whole columns; string predicates and dynamic access loop in Python.
+
+Supported
+- Statements: let name = <scalar | tabular>; the last tabular statement is the result. datatable(...)[...],
+  union [isfuzzy=true] A, (B | ...), toscalar(...)
+- Operators: where/filter, project, project-away/-keep/-rename/-reorder, extend, summarize ... by ...,
+  join kind=innerunique|inner|leftouter|rightouter|fullouter|leftanti|rightanti|leftsemi|rightsemi
+  on Col | $left.A == $right.B, union, order/sort by, top, take/limit, count, distinct, serialize, render (no-op)
+- Aggregations: count, countif, dcount, dcountif, sum, sumif, avg, avgif, min, max, minif, maxif, make_set,
+  make_set_if, make_list, make_list_if, any/take_any; aggregations may be nested in arithmetic (count() / 14.0)
+- Predicates: == != < <= > >= =~ !~, and/or, in/!in/in~/!in~ (lists, dynamic arrays, subqueries),
+  has/!has/has_cs/has_any/has_all, contains/!contains/contains_cs, startswith/endswith(_cs), matches regex,
+  between/!between
+- Functions: ago, now, bin/floor, startofday, hourofday, dayofweek, datetime_diff, iif/iff, case, coalesce,
+  isnull/isnotnull/isempty/isnotempty, not, tostring, toint/tolong, todouble/toreal, tobool, todatetime,
+  totimespan, parse_json/todynamic, dynamic(...), datetime(...), typed nulls (real(null) ...), strcat, strlen,
+  tolower, toupper, substring, split, replace_string, extract, trim, array_length, set_has_element,
+  column_ifexists, prev/next, round, abs, geo_distance_2points
+- Anything else fails with KqlExecError and the line/col of the offending token.
+
+Fixtures
+- JSON: {"Table": [{row}, ...]} or {"Table": {"columns": {"Col": "type", ...}, "rows": [[...] | {...}]}};
+  a top-level list is loaded as the table named after the file
+- CSV: one table per file (file name = table name); header cells may carry a type ("TimeGenerated:datetime")
+- Untyped columns are inferred (bool, long, real, datetime for ISO-8601 strings, dynamic for objects/arrays,
+  otherwise string)
+
+Usage
+  python kql_exec.py --query ../../labs/siem/detections/lateral-movement.kql --fixtures fixtures/security-event.json \
+      --now 2024-05-01T12:00:00Z
+Library
+  tables = load_fixtures(["fixtures/signins.json"])
+  result = execute(query_text, tables, now="2024-05-01T12:00:00Z")   # -> Table (result.rows(), result.columns)
+"""
+
+import argparse, csv, fnmatch, itertools, json, math, os, re, sys, time
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from kql_lint import Token, line_col, string_value, tokenize
+
+NAT = np.datetime64("NaT", "us")
+NAT_SPAN = np.timedelta64("NaT", "us")
+_US = {"d": 86400_000_000, "day": 86400_000_000, "days": 86400_000_000, "h": 3600_000_000, "hr": 3600_000_000,
+       "hrs": 3600_000_000, "hour": 3600_000_000, "hours": 3600_000_000, "m": 60_000_000, "min": 60_000_000,
+       "minute": 60_000_000, "minutes": 60_000_000, "s": 1_000_000, "sec": 1_000_000, "second": 1_000_000,
+       "seconds": 1_000_000, "ms": 1000, "milli": 1000, "millis": 1000, "millisecond": 1000,
+       "milliseconds": 1000, "microsecond": 1, "microseconds": 1, "tick": 0.1, "ticks": 0.1}
+_TYPE_ALIASES = {"string": "string", "guid": "string", "long": "long", "int": "long", "real": "real",
+                 "double": "real", "decimal": "real", "bool": "bool", "boolean": "bool", "datetime": "datetime",
+                 "date": "datetime", "timespan": "timespan", "time": "timespan", "dynamic": "dynamic"}
+_ISO_DT = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?(?:Z|[+-]\d{2}:?\d{2})?$")
+_EOF = Token("eof", "", -1)
+
+
+class KqlExecError(Exception):
+    def __init__(self, message: str, text: Optional[str] = None, pos: Optional[int] = None):
+        if text is not None and pos is not None and pos >= 0:
+            line, col = line_col(text, pos)
+            message = f"{line}:{col}: {message}"
+        super().__init__(message)
+
+
+# ── Values and columns ─────────────────────────────────────────────────────
+
+def parse_datetime(value: Any) -> np.datetime64:
+    if value is None or value == "":
+        return NAT
+    if isinstance(value, np.datetime64):
+        return value.astype("datetime64[us]")
+    if isinstance(value, datetime):
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return np.datetime64(value, "us")
+    if isinstance(value, date):
+        return np.datetime64(value, "us")
+    s = str(value).strip().replace(" ", "T", 1)
+    if s.lower() == "null":
+        return NAT
+    m = re.match(r"^(.*?\.\d{1,6})\d*(.*)$", s)   # Log Analytics emits 7 fractional digits
+    if m:
+        s = m.group(1) + m.group(2)
+    try:
+        dt = datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except ValueError:
+        raise KqlExecError(f"Invalid datetime '{value}'")
+    return parse_datetime(dt)
+
+
+def parse_timespan(value: Any) -> np.timedelta64:
+    if value is None or value == "":
+        return NAT_SPAN
+    if isinstance(value, np.timedelta64):
+        return value.astype("timedelta64[us]")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return np.timedelta64(int(value * 1_000_000), "us")   # bare numbers are seconds
+    s = str(value).strip()
+    m = re.match(r"^(-?\d+(?:\.\d+)?)\s*([A-Za-z]+)$", s)
+    if m and m.group(2).lower() in _US:
+        return np.timedelta64(int(round(float(m.group(1)) * _US[m.group(2).lower()])), "us")
+    m = re.match(r"^(-)?(?:(\d+)\.)?(\d{1,2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?$", s)
+    if m:
+        neg, d, h, mi, sec, frac = m.groups()
+        us = ((int(d or 0) * 24 + int(h)) * 60 + int(mi)) * 60_000_000 + int(sec or 0) * 1_000_000
+        us += int((frac or "0")[:6].ljust(6, "0"))
+        return np.timedelta64(-us if neg else us, "us")
+    raise KqlExecError(f"Invalid timespan '{value}'")
+
+
+def _isnull(v: Any) -> bool:
+    if v is None:
+        return True
+    if isinstance(v, (float, np.floating)):
+        return math.isnan(v)
+    if isinstance(v, (np.datetime64, np.timedelta64)):
+        return bool(np.isnat(v))
+    return False
+
+
+def _null_mask(a: np.ndarray) -> np.ndarray:
+    k = a.dtype.kind
+    if k == "f":
+        return np.isnan(a)
+    if k in "Mm":
+        return np.isnat(a)
+    if k == "O":
+        return np.fromiter((_isnull(v) for v in a), dtype=bool, count=len(a))
+    return np.zeros(len(a), dtype=bool)
+
+
+def _objects(values: Iterable[Any], n: int) -> np.ndarray:
+    return np.fromiter(values, dtype=object, count=n)
+
+
+def column(values: List[Any], kind: Optional[str] = None) -> np.ndarray:
+    """Python values -> one column array; kind is a KQL type name, or None to infer from the values."""
+    n = len(values)
+    if kind is None:
+        seen = {type(v) for v in values if not _isnull(v)}
+        if not seen:
+            kind = "dynamic"
+        elif seen <= {bool, np.bool_}:
+            kind = "bool"
+        elif all(issubclass(t, (int, np.integer)) and not issubclass(t, (bool, np.bool_)) for t in seen):
+            kind = "long"
+        elif all(issubclass(t, (int, float, np.integer, np.floating)) and not issubclass(t, (bool, np.bool_))
+                 for t in seen):
+            kind = "real"
+        elif seen <= {np.datetime64}:
+            kind = "datetime"
+        elif seen <= {np.timedelta64}:
+            kind = "timespan"
+        elif seen <= {str}:
+            kind = "string"
+        else:
+            kind = "dynamic"
+    if kind == "bool":
+        return np.fromiter((bool(v) if not _isnull(v) else False for v in values), dtype=bool, count=n)
+    if kind == "long":
+        if any(_isnull(v) for v in values):
+            return np.fromiter((np.nan if _isnull(v) else float(v) for v in values), dtype=np.float64, count=n)
+        return np.fromiter((int(v) for v in values), dtype=np.int64, count=n)
+    if kind == "real":
+        return np.fromiter((np.nan if _isnull(v) else float(v) for v in values), dtype=np.float64, count=n)
+    if kind == "datetime":
+        return np.array([parse_datetime(v) for v in values], dtype="datetime64[us]").reshape(n)
+    if kind == "timespan":
+        return np.array([parse_timespan(v) for v in values], dtype="timedelta64[us]").reshape(n)
+    if kind == "string":
+        return _objects(("" if _isnull(v) else v if isinstance(v, str) else _tostring(v) for v in values), n)
+    return _objects(values, n)
+
+
+def _null_like(a: np.ndarray, n: int) -> np.ndarray:
+    k = a.dtype.kind
+    if k in "iuf":
+        return np.full(n, np.nan)
+    if k == "M":
+        return np.full(n, NAT)
+    if k == "m":
+        return np.full(n, NAT_SPAN)
+    if k == "b":
+        return np.zeros(n, dtype=bool)
+    return _objects(("" if a.size and isinstance(a[0], str) else None for _ in range(n)), n)
+
+
+def _take(a: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """a[idx] where idx == -1 means a null cell (outer joins, prev/next)."""
+    missing = idx < 0
+    if not missing.any():
+        return a[idx]
+    out = a[np.where(missing, 0, idx)] if len(a) else _null_like(a, len(idx))
+    if out.dtype.kind in "iu":
+        out = out.astype(np.float64)
+    nulls = _null_like(out, int(missing.sum()))
+    if out.dtype.kind == "O":
+        out = out.copy()
+    out[missing] = nulls
+    return out
+
+
+def _dt_str(v: np.datetime64) -> str:
+    s = str(v.astype("datetime64[us]"))
+    return (s[:-7] if s.endswith(".000000") else s.rstrip("0")) + "Z"
+
+
+def _span_str(v: np.timedelta64) -> str:
+    us = int(v.astype("timedelta64[us]").astype(np.int64))
+    sign, us = ("-", -us) if us < 0 else ("", us)
+    d, rem = divmod(us, 86400_000_000)
+    h, rem = divmod(rem, 3600_000_000)
+    m, rem = divmod(rem, 60_000_000)
+    s, frac = divmod(rem, 1_000_000)
+    out = f"{sign}{str(d) + '.' if d else ''}{h:02d}:{m:02d}:{s:02d}"
+    return out + (f".{frac:06d}0" if frac else "")
+
+
+def to_python(v: Any) -> Any:
+    """Cell value -> JSON-friendly Python (datetimes as ISO-8601 'Z' strings, nulls as None)."""
+    if _isnull(v):
+        return None
+    if isinstance(v, np.datetime64):
+        return _dt_str(v)
+    if isinstance(v, np.timedelta64):
+        return _span_str(v)
+    if isinstance(v, np.bool_):
+        return bool(v)
+    if isinstance(v, np.integer):
+        return int(v)
+    if isinstance(v, np.floating):
+        return float(v)
+    if isinstance(v, list):
+        return [to_python(x) for x in v]
+    if isinstance(v, dict):
+        return {k: to_python(x) for k, x in v.items()}
+    return v
+
+
+def _tostring(v: Any) -> str:
+    if _isnull(v):
+        return ""
+    if isinstance(v, str):
+        return v
+    if isinstance(v, (bool, np.bool_)):
+        return "true" if v else "false"
+    if isinstance(v, (dict, list)):
+        return json.dumps(to_python(v), separators=(",", ":"))
+    if isinstance(v, (float, np.floating)) and float(v).is_integer():
+        return str(int(v))
+    return str(to_python(v))
+
+
+class Table:
+    """Columnar table: ordered {name: np.ndarray}, all of length n."""
+
+    def __init__(self, cols: Dict[str, np.ndarray], n: Optional[int] = None):
+        self.cols = cols
+        self.n = n if n is not None else (len(next(iter(cols.values()))) if cols else 0)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.cols)
+
+    def take(self, idx: np.ndarray) -> "Table":
+        return Table({k: _take(v, idx) for k, v in self.cols.items()}, len(idx))
+
+    def rows(self) -> List[Dict[str, Any]]:
+        cols = {k: [to_python(x) for x in v] for k, v in self.cols.items()}
+        return [{k: cols[k][i] for k in cols} for i in range(self.n)]
+
+
+def table_from_rows(rows: List[Any], schema: Optional[Any] = None) -> Table:
+    """rows: list of dicts, or of lists when schema gives the column order. schema: {col: type} or [[col, type]]."""
+    types: Dict[str, Optional[str]] = {}
+    if isinstance(schema, dict):
+        types = {k: _TYPE_ALIASES.get(str(t).lower(), "dynamic") for k, t in schema.items()}
+    elif isinstance(schema, list):
+        types = {c[0]: _TYPE_ALIASES.get(str(c[1]).lower(), "dynamic") for c in schema}
+    names = list(types)
+    for r in rows:
+        if isinstance(r, dict):
+            names.extend(k for k in r if k not in types and k not in names)
+    cols = {}
+    for j, name in enumerate(names):
+        vals = [(r.get(name) if isinstance(r, dict) else (r[j] if j < len(r) else None)) for r in rows]
+        kind = types.get(name)
+        if kind is None and vals and all(isinstance(v, str) and _ISO_DT.match(v) for v in vals if v is not None):
+            if any(v is not None for v in vals):
+                kind = "datetime"
+        cols[name] = column(vals, kind)
+    return Table(cols, len(rows))
+
+
+def _csv_cell(s: str) -> Any:
+    if s == "":
+        return None
+    low = s.lower()
+    if low in ("true", "false"):
+        return low == "true"
+    if re.match(r"^-?\d+$", s):
+        return int(s)
+    if re.match(r"^-?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$", s):
+        return float(s)
+    if s[0] in "[{":
+        try:
+            return json.loads(s)
+        except ValueError:
+            pass
+    return s
+
+
+def load_fixtures(paths: Iterable[str]) -> Dict[str, Table]:
+    tables: Dict[str, Table] = {}
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if path.lower().endswith(".csv"):
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader, [])
+                names = [h.split(":", 1)[0].strip() for h in header]
+                schema = {n: (h.split(":", 1)[1].strip() if ":" in h else None) for n, h in zip(names, header)}
+                rows = [{n: _csv_cell(c) for n, c in zip(names, r)} for r in reader]
+            typed = {k: v for k, v in schema.items() if v}
+            t = table_from_rows(rows, typed or None)
+            if typed:   # keep header order when only some columns are typed
+                t = Table({n: t.cols[n] for n in names if n in t.cols}, t.n)
+            tables[stem] = t
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        if isinstance(doc, list):
+            doc = {stem: doc}
+        for name, spec in doc.items():
+            if isinstance(spec, dict):
+                tables[name] = table_from_rows(spec.get("rows") or [], spec.get("columns"))
+            else:
+                tables[name] = table_from_rows(spec or [])
+    return tables
+
+
+# ── Parser ─────────────────────────────────────────────────────────────────
+
+_CMP_OPS = {"==", "!=", "<>", "<", "<=", ">", ">=", "=~", "!~"}
+_STR_OPS = {"has", "has_cs", "contains", "contains_cs", "startswith", "startswith_cs", "endswith",
+            "endswith_cs", "hasprefix", "hassuffix"}
+_NULLABLE_TYPES = {"long", "int", "real", "double", "decimal", "bool", "boolean", "string", "datetime",
+                   "timespan", "time", "guid", "dynamic"}
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.toks: List[Token] = []
+        for t in tokenize(text):
+            if t.kind == "comment":
+                continue
+            if t.kind == "badstring":
+                raise KqlExecError("Unterminated string literal", text, t.pos)
+            self.toks.append(t)
+        self.i = 0
+
+    def peek(self, k: int = 0) -> Token:
+        j = self.i + k
+        return self.toks[j] if j < len(self.toks) else _EOF
+
+    def next(self) -> Token:
+        t = self.peek()
+        self.i += 1
+        return t
+
+    def accept(self, value: str) -> bool:
+        if self.peek().value == value and self.peek().kind != "string":
+            self.i += 1
+            return True
+        return False
+
+    def expect(self, value: str) -> Token:
+        t = self.next()
+        if t.value != value or t.kind == "string":
+            self.error(f"Expected '{value}', found '{t.value or 'end of query'}'", t)
+        return t
+
+    def error(self, message: str, tok: Optional[Token] = None):
+        tok = tok or self.peek()
+        raise KqlExecError(message, self.text, tok.pos if tok.pos >= 0 else len(self.text))
+
+    def query(self) -> List[Tuple]:
+        stmts = []
+        while self.peek() is not _EOF:
+            if self.accept(";"):
+                continue
+            if self.peek().value == "let" and self.peek(1).kind == "ident":
+                self.next()
+                name = self.next().value
+                self.expect("=")
+                if self.peek().value == "(" and (self.peek(2).value == ":" or
+                                                 (self.peek(1).value == ")" and self.peek(2).value == "{")):
+                    self.error("User-defined functions (let f = (...) {...}) are not supported")
+                stmts.append(("let", name, self.pipeline()))
+            else:
+                stmts.append(("query", self.pipeline()))
+            if self.peek() is not _EOF:
+                self.expect(";")
+        return stmts
+
+    def pipeline(self) -> Tuple:
+        """A tabular pipeline (source | op | op ...) or, without pipes, any expression."""
+        start = self.peek()
+        node = self.expr()
+        if self.peek().value != "|":
+            return node
+        if node[0] not in ("name", "pipe", "datatable", "union"):
+            self.error("Expected a table before '|'", start)
+        ops = []
+        while self.accept("|"):
+            ops.append(self.operator())
+        return ("pipe", node, ops)
+
+    # operators
+    def operator(self) -> Tuple:
+        t = self.next()
+        op = t.value
+        if op in ("where", "filter"):
+            return ("where", self.expr())
+        if op in ("project", "extend"):
+            return (op, self.named_exprs())
+        if op in ("project-away", "project-keep", "project-reorder"):
+            return (op, self.name_list())
+        if op == "project-rename":
+            pairs = []
+            while True:
+                new = self.next().value
+                self.expect("=")
+                pairs.append((new, self.next().value))
+                if not self.accept(","):
+                    return ("project-rename", pairs)
+        if op == "summarize":
+            aggs = [] if self.peek().value == "by" else self.named_exprs()
+            keys = self.named_exprs() if self.accept("by") else []
+            return ("summarize", aggs, keys, t.pos)
+        if op in ("order", "sort"):
+            self.expect("by")
+            return ("order", self.sort_keys())
+        if op in ("take", "limit"):
+            return ("take", self.expr())
+        if op == "top":
+            n = self.expr()
+            self.expect("by")
+            return ("top", n, self.sort_keys())
+        if op == "count":
+            return ("count",)
+        if op == "distinct":
+            if self.accept("*"):
+                return ("distinct", None)
+            return ("distinct", self.named_exprs())
+        if op == "serialize":
+            return ("extend", self.named_exprs()) if self.peek().value not in ("|", ";", ")", "") else ("noop",)
+        if op == "render":
+            depth = 0
+            while self.peek() is not _EOF and not (depth == 0 and self.peek().value in ("|", ";", ")")):
+                depth += {"(": 1, ")": -1}.get(self.next().value, 0)
+            return ("noop",)
+        if op == "join":
+            opts = self.options()
+            if self.accept("("):
+                right = self.pipeline()
+                self.expect(")")
+            else:
+                right = self.postfix()
+            self.expect("on")
+            conds = []
+            while True:
+                ctok = self.peek()
+                c = self.expr()
+                if c[0] == "name":
+                    conds.append((c[1], c[1]))
+                elif c[0] == "cmp" and c[1] == "==" and all(x[0] == "member" and x[1][0] == "name" for x in c[2:4]):
+                    sides = {c[2][1][1]: c[2][2], c[3][1][1]: c[3][2]}
+                    if set(sides) != {"$left", "$right"}:
+                        self.error("Join condition must compare $left.<col> with $right.<col>", ctok)
+                    conds.append((sides["$left"], sides["$right"]))
+                else:
+                    self.error("Unsupported join condition", ctok)
+                if not self.accept(","):
+                    break
+            return ("join", opts.get("kind", "innerunique"), right, conds, t.pos)
+        if op == "union":
+            return ("union-op",) + self.union_body()[1:]
+        self.error(f"Unsupported operator '{op}'", t)
+
+    def options(self) -> Dict[str, str]:
+        opts = {}
+        while self.peek().kind == "ident" and self.peek(1).value == "=":
+            key = self.next().value
+            self.next()
+            opts[key] = self.next().value
+        return opts
+
+    def union_body(self) -> Tuple:
+        opts = self.options()
+        tabs = []
+        while True:
+            if self.accept("("):
+                tabs.append(self.pipeline())
+                self.expect(")")
+            else:
+                tok = self.next()
+                if tok.kind != "ident":
+                    self.error("Expected a table name in union", tok)
+                tabs.append(("name", tok.value, tok.pos))
+            if not self.accept(","):
+                return ("union", opts.get("isfuzzy", "false") == "true", tabs)
+
+    def named_exprs(self) -> List[Tuple[Optional[str], Tuple]]:
+        out = []
+        while True:
+            if self.peek().kind == "ident" and self.peek(1).value == "=":
+                name = self.next().value
+                self.next()
+                out.append((name, self.expr()))
+            else:
+                out.append((None, self.expr()))
+            if not self.accept(","):
+                return out
+
+    def name_list(self) -> List[str]:
+        names = []
+        while True:
+            tok = self.next()
+            name = tok.value
+            while self.peek().value == "*" and self.peek().pos == tok.pos + len(name):
+                name += self.next().value
+            names.append(name)
+            if not self.accept(","):
+                return names
+
+    def sort_keys(self) -> List[Tuple[Tuple, bool, Optional[bool]]]:
+        keys = []
+        while True:
+            e = self.expr()
+            desc = True
+            if self.accept("asc"):
+                desc = False
+            else:
+                self.accept("desc")
+            nulls_first = None
+            if self.accept("nulls"):
+                nulls_first = self.next().value == "first"
+            keys.append((e, desc, nulls_first))
+            if not self.accept(","):
+                return keys
+
+    # expressions
+    def expr(self) -> Tuple:
+        node = self.and_expr()
+        while self.accept("or"):
+            node = ("or", node, self.and_expr())
+        return node
+
+    def and_expr(self) -> Tuple:
+        node = self.predicate()
+        while self.accept("and"):
+            node = ("and", node, self.predicate())
+        return node
+
+    def predicate(self) -> Tuple:
+        lhs = self.additive()
+        tok = self.peek()
+        if tok.kind == "op" and tok.value in _CMP_OPS:
+            self.next()
+            return ("cmp", "!=" if tok.value == "<>" else tok.value, lhs, self.additive())
+        negate = False
+        if tok.value == "!" and self.peek(1).kind == "ident":
+            negate = True
+            self.next()
+            tok = self.peek()
+        if tok.kind != "ident":
+            if negate:
+                self.error("Expected an operator after '!'", tok)
+            return lhs
+        name = tok.value
+        if name == "in":
+            self.next()
+            ci = self.accept("~")
+            return ("in", negate, ci, lhs, self.paren_list(), tok.pos)
+        if name in ("has_any", "has_all"):
+            self.next()
+            return ("hasany", negate, name == "has_all", lhs, self.paren_list(), tok.pos)
+        if name in _STR_OPS:
+            self.next()
+            return ("strop", name, negate, lhs, self.additive())
+        if name == "between":
+            self.next()
+            self.expect("(")
+            lo = self.additive()
+            self.expect("..")
+            hi = self.additive()
+            self.expect(")")
+            return ("between", negate, lhs, lo, hi)
+        if name == "matches" and not negate:
+            self.next()
+            self.expect("regex")
+            return ("regex", lhs, self.additive())
+        if negate:
+            self.error(f"Unsupported operator '!{name}'", tok)
+        return lhs
+
+    def paren_list(self) -> List[Tuple]:
+        self.expect("(")
+        items = []
+        if not self.accept(")"):
+            while True:
+                items.append(self.pipeline())
+                if not self.accept(","):
+                    break
+            self.expect(")")
+        return items
+
+    def additive(self) -> Tuple:
+        node = self.multiplicative()
+        while self.peek().kind == "op" and self.peek().value in ("+", "-"):
+            node = ("arith", self.next().value, node, self.multiplicative())
+        return node
+
+    def multiplicative(self) -> Tuple:
+        node = self.unary()
+        while self.peek().kind == "op" and self.peek().value in ("*", "/", "%"):
+            node = ("arith", self.next().value, node, self.unary())
+        return node
+
+    def unary(self) -> Tuple:
+        if self.peek().kind == "op" and self.peek().value in ("-", "+"):
+            sign = self.next().value
+            operand = self.unary()
+            if operand[0] == "lit" and isinstance(operand[1], (int, float, np.timedelta64)):
+                return ("lit", -operand[1]) if sign == "-" else operand
+            return ("neg", operand) if sign == "-" else operand
+        return self.postfix()
+
+    def postfix(self) -> Tuple:
+        node = self.primary()
+        while True:
+            if self.peek().value == "." and self.peek(1).kind in ("ident", "number"):
+                self.next()
+                node = ("member", node, self.next().value)
+            elif self.peek().value == "[" and self.peek().kind == "open":
+                self.next()
+                node = ("index", node, self.expr())
+                self.expect("]")
+            else:
+                return node
+
+    def raw_parens(self) -> str:
+        """Source text between '(' and its matching ')' (datetime(2024-01-01T00:00:00Z) is not token-friendly)."""
+        open_tok = self.expect("(")
+        depth = 1
+        while True:
+            t = self.next()
+            if t is _EOF:
+                self.error("Unclosed '('", open_tok)
+            if t.kind == "open":
+                depth += 1
+            elif t.kind == "close":
+                depth -= 1
+                if depth == 0:
+                    return self.text[open_tok.pos + 1:t.pos].strip()
+
+    def primary(self) -> Tuple:
+        tok = self.next()
+        kind, value = tok.kind, tok.value
+        if kind == "number":
+            m = re.match(r"^(\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)([A-Za-z]*)$", value)
+            num, unit = m.group(1), m.group(2)
+            if unit:
+                if unit.lower() not in _US:
+                    self.error(f"Unknown timespan unit in '{value}'", tok)
+                return ("lit", parse_timespan(value))
+            return ("lit", float(num) if any(c in num for c in ".eE") else int(num))
+        if kind == "string":
+            return ("lit", string_value(value))
+        if kind == "open" and value == "(":
+            node = self.pipeline()
+            self.expect(")")
+            return node
+        if kind != "ident":
+            self.error(f"Unexpected '{value or 'end of query'}'", tok)
+        nxt = self.peek()
+        if value in ("true", "false"):
+            return ("lit", value == "true")
+        if value == "datetime" and nxt.value == "(":
+            raw = self.raw_parens()
+            return ("lit", NAT if raw in ("", "null") else parse_datetime(raw))
+        if value in ("timespan", "time") and nxt.value == "(":
+            raw = self.raw_parens()
+            return ("lit", NAT_SPAN if raw in ("", "null") else parse_timespan(raw))
+        if value == "dynamic" and nxt.value == "(":
+            self.next()
+            lit = self.dynamic_literal()
+            self.expect(")")
+            return ("lit", lit)
+        if value in _NULLABLE_TYPES and nxt.value == "(" and self.peek(1).value == "null":
+            self.next(), self.next(), self.expect(")")
+            return ("lit", {"datetime": NAT, "timespan": NAT_SPAN, "time": NAT_SPAN, "string": "",
+                            "guid": "", "dynamic": None, "bool": None, "boolean": None}.get(value, np.nan))
+        if value == "datatable" and nxt.value == "(":
+            self.next()
+            cols = []
+            while not self.accept(")"):
+                name = self.next().value
+                self.expect(":")
+                cols.append((name, _TYPE_ALIASES.get(self.next().value, "dynamic")))
+                self.accept(",")
+            self.expect("[")
+            values = []
+            while not self.accept("]"):
+                values.append(self.expr())
+                self.accept(",")
+            return ("datatable", cols, values, tok.pos)
+        if value == "union" and (nxt.kind == "ident" or nxt.value == "("):
+            return self.union_body()
+        if nxt.value == "(" and nxt.kind == "open":
+            self.next()
+            args = []
+            if not self.accept(")"):
+                while True:
+                    if self.peek().value == "*" and self.peek(1).value in (")", ","):
+                        self.next()
+                        args.append(("star",))
+                    else:
+                        args.append(self.pipeline())
+                    if not self.accept(","):
+                        break
+                self.expect(")")
+            return ("call", value, args, tok.pos)
+        return ("name", value, tok.pos)
+
+    def dynamic_literal(self) -> Any:
+        tok = self.next()
+        if tok.value == "[":
+            items = []
+            while not self.accept("]"):
+                items.append(self.dynamic_literal())
+                self.accept(",")
+            return items
+        if tok.value == "{":
+            obj = {}
+            while not self.accept("}"):
+                key = self.next()
+                self.expect(":")
+                obj[string_value(key.value) if key.kind == "string" else key.value] = self.dynamic_literal()
+                self.accept(",")
+            return obj
+        if tok.kind == "string":
+            return string_value(tok.value)
+        if tok.value in ("true", "false"):
+            return tok.value == "true"
+        if tok.value == "null":
+            return None
+        if tok.value == "-" and self.peek().kind == "number":
+            return -self.dynamic_literal()
+        if tok.kind == "number":
+            return float(tok.value) if any(c in tok.value for c in ".eE") else int(tok.value)
+        self.error(f"Unsupported dynamic literal '{tok.value}'", tok)
+
+
+def parse(text: str) -> List[Tuple]:
+    return _Parser(text).query()
+
+
+# ── Scalar helpers ─────────────────────────────────────────────────────────
+
+def _length(*args) -> Optional[int]:
+    return next((len(a) for a in args if isinstance(a, np.ndarray)), None)
+
+
+def _vec(fn: Callable, *args, kind: Optional[str] = None):
+    """Applies fn element-wise over column arguments (scalars broadcast); all-scalar calls stay scalar."""
+    n = _length(*args)
+    if n is None:
+        return fn(*args)
+    its = [a if isinstance(a, np.ndarray) else itertools.repeat(a, n) for a in args]
+    return column([fn(*xs) for xs in zip(*its)], kind)
+
+
+def _to_real(v):
+    if isinstance(v, np.ndarray):
+        if v.dtype.kind in "iufb":
+            return v.astype(np.float64)
+        if v.dtype.kind in "Mm":
+            return v
+        return _vec(_to_real, v, kind="real")
+    if _isnull(v):
+        return np.nan
+    if isinstance(v, (bool, np.bool_)):
+        return float(v)
+    if isinstance(v, (int, float, np.integer, np.floating)):
+        return float(v)
+    try:
+        return float(str(v).strip())
+    except ValueError:
+        return np.nan
+
+
+def _to_long(v):
+    r = _to_real(v)
+    if isinstance(r, np.ndarray):
+        r = np.trunc(r)
+        return r.astype(np.int64) if not np.isnan(r).any() else r
+    return np.nan if math.isnan(r) else int(r)
+
+
+def _numeric(v):
+    """Leaves numbers/datetimes/timespans alone; dynamic/string columns holding numbers become float."""
+    if isinstance(v, np.ndarray) and v.dtype.kind == "O":
+        return _to_real(v)
+    if isinstance(v, str):
+        raise KqlExecError(f"Arithmetic on string value '{v}'")
+    if v is None:
+        return np.nan
+    return v
+
+
+def _is_int(v) -> bool:
+    if isinstance(v, np.ndarray):
+        return v.dtype.kind in "iu"
+    return isinstance(v, (int, np.integer)) and not isinstance(v, (bool, np.bool_))
+
+
+def _arith(op: str, a, b):
+    a, b = _numeric(a), _numeric(b)
+    with np.errstate(all="ignore"):
+        try:
+            if op == "+":
+                return np.add(a, b)
+            if op == "-":
+                return np.subtract(a, b)
+            if op == "*":
+                return np.multiply(a, b)
+            if op == "%":
+                return np.fmod(a, b) if not (_is_int(a) and _is_int(b)) else _int_div(a, b, mod=True)
+            if _is_int(a) and _is_int(b):
+                return _int_div(a, b)
+            return np.true_divide(a, b)
+        except TypeError as e:
+            raise KqlExecError(f"Unsupported operand types for '{op}': {e}")
+
+
+def _int_div(a, b, mod: bool = False):
+    """long / long truncates toward zero; division by zero is null."""
+    af, bf = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    q = np.where(bf == 0, np.nan, np.fmod(af, bf) if mod else np.trunc(af / np.where(bf == 0, 1, bf)))
+    if np.isnan(q).any():
+        return q if q.ndim else float(q)
+    return q.astype(np.int64) if q.ndim else int(q)
+
+
+def _s(v) -> str:
+    return v if isinstance(v, str) else _tostring(v)
+
+
+def _compare(op: str, a, b):
+    if op in ("=~", "!~"):
+        eq = _vec(lambda x, y: _s(x).lower() == _s(y).lower(), a, b, kind="bool")
+        return eq if op == "=~" else np.logical_not(eq)
+    a, b = _coerce_pair(a, b)
+    fn = {"==": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal, ">": np.greater,
+          ">=": np.greater_equal}[op]
+    try:
+        with np.errstate(invalid="ignore"):
+            out = fn(a, b)
+        if isinstance(out, np.ndarray) and out.dtype != bool:
+            out = out.astype(bool)
+        return out if isinstance(out, np.ndarray) else bool(out)
+    except TypeError:
+        def safe(x, y):
+            try:
+                return bool(fn(x, y))
+            except TypeError:
+                return op == "!="
+        return _vec(safe, a, b, kind="bool")
+
+
+def _coerce_pair(a, b):
+    """datetime vs ISO string, number vs numeric dynamic: bring both sides to one comparable type."""
+    ka = a.dtype.kind if isinstance(a, np.ndarray) else None
+    kb = b.dtype.kind if isinstance(b, np.ndarray) else None
+    if (ka == "M" or isinstance(a, np.datetime64)) and isinstance(b, str):
+        return a, parse_datetime(b)
+    if (kb == "M" or isinstance(b, np.datetime64)) and isinstance(a, str):
+        return parse_datetime(a), b
+    if ka == "O" and (kb in ("i", "u", "f") or (kb is None and isinstance(b, (int, float)) and not isinstance(b, bool))):
+        if all(isinstance(x, (int, float, np.integer, np.floating)) or x is None for x in a):
+            return _to_real(a), b
+    if kb == "O" and (ka in ("i", "u", "f") or (ka is None and isinstance(a, (int, float)) and not isinstance(a, bool))):
+        if all(isinstance(x, (int, float, np.integer, np.floating)) or x is None for x in b):
+            return a, _to_real(b)
+    return a, b
+
+
+@lru_cache(maxsize=4096)
+def _term_rx(terms: Tuple[str, ...], case_sensitive: bool):
+    # A term boundary is only needed where the term itself starts/ends with a letter or digit:
+    # \Users\ matches inside C:\Users\Public, while "user" does not match "users"
+    parts = [("(?<![0-9A-Za-z])" if t[0].isalnum() else "") + re.escape(t) + ("(?![0-9A-Za-z])" if t[-1].isalnum() else "")
+             for t in terms if t]
+    if not parts:
+        return None
+    return re.compile("|".join(parts), 0 if case_sensitive else re.I)
+
+
+@lru_cache(maxsize=1024)
+def _regex(pattern: str):
+    return re.compile(pattern)
+
+
+def _string_op(name: str, a, b):
+    if name in ("has", "has_cs"):
+        if isinstance(b, np.ndarray):
+            return _vec(lambda x, y: bool(_term_rx((_s(y),), name == "has_cs") and
+                                          _term_rx((_s(y),), name == "has_cs").search(_s(x))), a, b, kind="bool")
+        rx = _term_rx((_s(b),), name == "has_cs")
+        return _vec(lambda x: bool(rx and rx.search(_s(x))), a, kind="bool")
+    if name in ("hasprefix", "hassuffix"):
+        return _vec(lambda x, y: any((w.startswith if name == "hasprefix" else w.endswith)(_s(y).lower())
+                                     for w in re.split(r"[^0-9a-z]+", _s(x).lower())), a, b, kind="bool")
+    fn = {"contains": lambda x, y: _s(y).lower() in _s(x).lower(),
+          "contains_cs": lambda x, y: _s(y) in _s(x),
+          "startswith": lambda x, y: _s(x).lower().startswith(_s(y).lower()),
+          "startswith_cs": lambda x, y: _s(x).startswith(_s(y)),
+          "endswith": lambda x, y: _s(x).lower().endswith(_s(y).lower()),
+          "endswith_cs": lambda x, y: _s(x).endswith(_s(y))}[name]
+    return _vec(fn, a, b, kind="bool")
+
+
+def _logical(fn, a, b):
+    out = fn(np.asarray(a, dtype=bool) if isinstance(a, np.ndarray) else bool(_truthy(a)),
+             np.asarray(b, dtype=bool) if isinstance(b, np.ndarray) else bool(_truthy(b)))
+    return out if isinstance(out, np.ndarray) else bool(out)
+
+
+def _truthy(v) -> bool:
+    return False if _isnull(v) else bool(v)
+
+
+def _as_mask(v, n: int) -> np.ndarray:
+    if isinstance(v, np.ndarray):
+        if v.dtype == bool:
+            return v
+        return np.fromiter((_truthy(x) for x in v), dtype=bool, count=len(v))
+    return np.full(n, _truthy(v))
+
+
+def _broadcast(v, n: int) -> np.ndarray:
+    if isinstance(v, np.ndarray):
+        return v
+    if isinstance(v, np.datetime64):
+        return np.full(n, v, dtype="datetime64[us]")
+    if isinstance(v, np.timedelta64):
+        return np.full(n, v, dtype="timedelta64[us]")
+    return column([v] * n) if not isinstance(v, (list, dict)) else _objects(itertools.repeat(v, n), n)
+
+
+def _member(base, key):
+    def get(v):
+        if isinstance(v, str) and v[:1] in "{[":
+            try:
+                v = json.loads(v)
+            except ValueError:
+                return None
+        if isinstance(v, dict):
+            return v.get(key)
+        if isinstance(v, list) and isinstance(key, (int, np.integer)) and -len(v) <= key < len(v):
+            return v[key]
+        return None
+    return _vec(get, base, kind="dynamic")
+
+
+def _dyn_column(v):
+    """Dynamic results whose elements turned out to be plain strings/numbers keep a typed column."""
+    if isinstance(v, np.ndarray) and v.dtype.kind == "O":
+        return v
+    return v
+
+
+# ── Functions ──────────────────────────────────────────────────────────────
+
+def _f_bin(x, size):
+    if isinstance(x, np.ndarray) and x.dtype.kind in "Mm" or isinstance(x, (np.datetime64, np.timedelta64)):
+        base = np.asarray(x).astype("datetime64[us]" if np.asarray(x).dtype.kind == "M" else "timedelta64[us]")
+        step = int(parse_timespan(size).astype(np.int64))
+        ints = base.view(np.int64)
+        out = (np.floor_divide(ints, step) * step).view(base.dtype)
+        out = np.where(np.isnat(base), base, out)
+        return out if isinstance(x, np.ndarray) else out[()]
+    x = _numeric(x)
+    if _is_int(x) and _is_int(size):
+        return np.floor_divide(x, size) * size
+    with np.errstate(all="ignore"):
+        return np.floor(np.true_divide(x, size)) * size
+
+
+def _f_datetime_diff(part, a, b):
+    part = str(part).lower()
+    a = np.asarray(a).astype("datetime64[us]")
+    b = np.asarray(b).astype("datetime64[us]")
+    nat = np.isnat(a) | np.isnat(b)
+    if part in ("year", "quarter", "month"):
+        ya, yb = a.astype("datetime64[Y]").astype(np.int64), b.astype("datetime64[Y]").astype(np.int64)
+        ma, mb = a.astype("datetime64[M]").astype(np.int64), b.astype("datetime64[M]").astype(np.int64)
+        out = (ya - yb) if part == "year" else (ma // 3 - mb // 3) if part == "quarter" else (ma - mb)
+    elif part == "week":   # weeks start on Sunday; 1970-01-01 was a Thursday
+        out = (a.astype("datetime64[D]").astype(np.int64) + 4) // 7 - (b.astype("datetime64[D]").astype(np.int64) + 4) // 7
+    else:
+        unit = {"day": "D", "hour": "h", "minute": "m", "second": "s", "millisecond": "ms",
+                "microsecond": "us"}.get(part)
+        if unit is None:
+            raise KqlExecError(f"datetime_diff: unsupported part '{part}'")
+        out = a.astype(f"datetime64[{unit}]").astype(np.int64) - b.astype(f"datetime64[{unit}]").astype(np.int64)
+    if nat.any():
+        out = np.where(nat, np.nan, out.astype(np.float64))
+    return out if out.ndim else out[()]
+
+
+def _f_split(s, delim, idx=None):
+    def one(x, d):
+        return _s(x).split(_s(d)) if _s(d) else [_s(x)]
+    parts = _vec(one, s, delim, kind="dynamic")
+    return parts if idx is None else _member(parts, int(idx))
+
+
+def _f_case(*args):
+    if len(args) % 2 == 0:
+        raise KqlExecError("case() needs an else value")
+    n = _length(*args)
+    if n is None:
+        for i in range(0, len(args) - 1, 2):
+            if _truthy(args[i]):
+                return args[i + 1]
+        return args[-1]
+    out = _broadcast(args[-1], n)
+    for i in range(len(args) - 3, -1, -2):
+        out = _f_iif(args[i], args[i + 1], out)
+    return out
+
+
+def _f_iif(cond, a, b):
+    n = _length(cond, a, b)
+    if n is None:
+        return a if _truthy(cond) else b
+    mask = _as_mask(cond, n)
+    a, b = _broadcast(a, n), _broadcast(b, n)
+    if a.dtype == b.dtype or (a.dtype.kind in "iuf" and b.dtype.kind in "iuf"):
+        return np.where(mask, a, b)
+    return column([x if m else y for m, x, y in zip(mask, a, b)])
+
+
+def _f_coalesce(*args):
+    def one(*xs):
+        for x in xs:
+            if not _isnull(x) and x != "":
+                return x
+        return xs[-1]
+    return _vec(one, *args)
+
+
+def _f_round(x, digits=0):
+    x = _numeric(x)
+    return np.round(np.asarray(x, dtype=np.float64), int(digits)) if isinstance(x, np.ndarray) else \
+        (np.nan if _isnull(x) else round(float(x), int(digits)))
+
+
+def _f_tostring(v):
+    return _vec(_tostring, v, kind="string")
+
+
+def _f_todatetime(v):
+    if isinstance(v, np.ndarray) and v.dtype.kind == "M":
+        return v
+
+    def one(x):
+        try:
+            return parse_datetime(x)
+        except KqlExecError:
+            return NAT
+    return _vec(one, v, kind="datetime")
+
+
+def _f_totimespan(v):
+    def one(x):
+        try:
+            return parse_timespan(x)
+        except KqlExecError:
+            return NAT_SPAN
+    return v if isinstance(v, np.ndarray) and v.dtype.kind == "m" else _vec(one, v, kind="timespan")
+
+
+def _f_parse_json(v):
+    def one(x):
+        if isinstance(x, str):
+            try:
+                return json.loads(x)
+            except ValueError:
+                return x
+        return x
+    return _vec(one, v, kind="dynamic")
+
+
+def _f_isnull(v):
+    if isinstance(v, np.ndarray):
+        return _null_mask(v) if v.dtype.kind != "O" else np.fromiter(
+            (_isnull(x) for x in v), dtype=bool, count=len(v))
+    return _isnull(v)
+
+
+def _f_isempty(v):
+    return _vec(lambda x: _isnull(x) or x == "", v, kind="bool")
+
+
+def _f_hourofday(v):
+    a = np.asarray(v).astype("datetime64[us]")
+    out = (a - a.astype("datetime64[D]")).astype("timedelta64[h]").astype(np.int64)
+    return out if out.ndim else int(out)
+
+
+def _f_dayofweek(v):
+    a = np.asarray(v).astype("datetime64[D]")
+    out = ((a.astype(np.int64) + 4) % 7).astype("timedelta64[D]").astype("timedelta64[us]")
+    return out if out.ndim else out[()]
+
+
+def _f_geo_distance(lon1, lat1, lon2, lat2):
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(_to_real(x), dtype=np.float64)) for x in (lon1, lat1, lon2, lat2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    out = 2 * 6371008.8 * np.arcsin(np.sqrt(h))
+    return out if out.ndim else float(out)
+
+
+def _f_extract(pattern, group, s):
+    rx = _regex(_s(pattern))
+
+    def one(x):
+        m = rx.search(_s(x))
+        return m.group(int(group)) if m and m.group(int(group)) is not None else ""
+    return _vec(one, s, kind="string")
+
+
+_FUNCS: Dict[str, Callable] = {
+    "bin": _f_bin, "floor": _f_bin,
+    "startofday": lambda x: _f_bin(x, np.timedelta64(86400_000_000, "us")),
+    "hourofday": _f_hourofday, "dayofweek": _f_dayofweek,
+    "datetime_diff": _f_datetime_diff,
+    "iif": _f_iif, "iff": _f_iif, "case": _f_case, "coalesce": _f_coalesce,
+    "isnull": _f_isnull, "isnotnull": lambda v: np.logical_not(_f_isnull(v)),
+    "isempty": _f_isempty, "isnotempty": lambda v: np.logical_not(_f_isempty(v)),
+    "not": lambda v: np.logical_not(_as_mask(v, _length(v) or 1)) if isinstance(v, np.ndarray) else not _truthy(v),
+    "tostring": _f_tostring,
+    "toint": _to_long, "tolong": _to_long, "todouble": _to_real, "toreal": _to_real, "todecimal": _to_real,
+    "tobool": lambda v: _vec(lambda x: _truthy(x) if not isinstance(x, str) else x.strip().lower() == "true",
+                             v, kind="bool"),
+    "todatetime": _f_todatetime, "totimespan": _f_totimespan,
+    "parse_json": _f_parse_json, "todynamic": _f_parse_json,
+    "strcat": lambda *xs: _vec(lambda *ys: "".join(_s(y) for y in ys), *xs, kind="string"),
+    "strlen": lambda s: _vec(lambda x: len(_s(x)), s, kind="long"),
+    "tolower": lambda s: _vec(lambda x: _s(x).lower(), s, kind="string"),
+    "toupper": lambda s: _vec(lambda x: _s(x).upper(), s, kind="string"),
+    "trim": lambda chars, s: _vec(lambda c, x: re.sub(rf"^(?:{c})+|(?:{c})+$", "", _s(x)), chars, s, kind="string"),
+    "substring": lambda s, start, length=None: _vec(
+        lambda x, a, n: _s(x)[int(a):(int(a) + int(n)) if n is not None else None], s, start, length, kind="string"),
+    "split": _f_split,
+    "replace_string": lambda s, a, b: _vec(lambda x, y, z: _s(x).replace(_s(y), _s(z)), s, a, b, kind="string"),
+    "extract": _f_extract,
+    "array_length": lambda v: _vec(lambda x: len(x) if isinstance(x, list) else np.nan, v, kind="real"),
+    "set_has_element": lambda v, e: _vec(lambda x, y: isinstance(x, list) and y in x, v, e, kind="bool"),
+    "round": _f_round,
+    "abs": lambda x: np.abs(_numeric(x)),
+    "geo_distance_2points": _f_geo_distance,
+}
+_AGG_NAMES = {"count": "count_", "countif": "countif_", "dcount": "dcount_{}", "dcountif": "dcountif_{}",
+              "sum": "sum_{}", "sumif": "sumif_{}", "avg": "avg_{}", "avgif": "avgif_{}", "min": "min_{}",
+              "max": "max_{}", "minif": "minif_{}", "maxif": "maxif_{}", "make_set": "set_{}",
+              "make_set_if": "set_{}", "make_list": "list_{}", "make_list_if": "list_{}", "any": "any_{}",
+              "take_any": "any_{}"}
+
+
+# ── Executor ───────────────────────────────────────────────────────────────
+
+class _Executor:
+    def __init__(self, text: str, tables: Dict[str, Table], now: np.datetime64):
+        self.text, self.tables, self.now = text, dict(tables), now
+        self.scalars: Dict[str, Any] = {}
+
+    def fail(self, message: str, pos: Optional[int] = None):
+        raise KqlExecError(message, self.text, pos)
+
+    def run(self, stmts: List[Tuple]) -> Table:
+        result = None
+        for st in stmts:
+            if st[0] == "let":
+                value = self.value(st[2])
+                if isinstance(value, Table):
+                    self.tables[st[1]] = value
+                else:
+                    self.scalars[st[1]] = value
+            else:
+                result = self.tabular(st[1])
+        if result is None:
+            self.fail("Query has no tabular statement")
+        return result
+
+    def value(self, node: Tuple):
+        if node[0] in ("pipe", "datatable", "union") or (node[0] == "name" and node[1] in self.tables
+                                                           and node[1] not in self.scalars):
+            return self.tabular(node)
+        return self.eval(node, Table({}, 1))
+
+    # tabular
+    def tabular(self, node: Tuple, fuzzy: bool = False) -> Optional[Table]:
+        kind = node[0]
+        if kind == "name":
+            t = self.tables.get(node[1])
+            if t is None:
+                if fuzzy:
+                    return None
+                self.fail(f"Failed to resolve table or column expression named '{node[1]}'", node[2])
+            return t
+        if kind == "datatable":
+            _, cols, values, pos = node
+            if cols and len(values) % len(cols):
+                self.fail("datatable: number of values is not a multiple of the number of columns", pos)
+            scal = [self.eval(v, Table({}, 1)) for v in values]
+            w = len(cols)
+            return Table({name: column([scal[i] for i in range(j, len(scal), w)], typ)
+                          for j, (name, typ) in enumerate(cols)}, len(scal) // w if w else 0)
+        if kind == "union":
+            return self.union([self.tabular(t, fuzzy=node[1]) for t in node[2]])
+        if kind == "pipe":
+            t = self.tabular(node[1])
+            for op in node[2]:
+                t = self.apply(op, t)
+            return t
+        self.fail("Expected a tabular expression")
+
+    def union(self, tables: List[Optional[Table]]) -> Table:
+        tables = [t for t in tables if t is not None]
+        names: List[str] = []
+        for t in tables:
+            names.extend(c for c in t.cols if c not in names)
+        cols = {}
+        for name in names:
+            ref = next(t.cols[name] for t in tables if name in t.cols)
+            parts = [t.cols[name] if name in t.cols else _null_like(ref, t.n) for t in tables]
+            kinds = {p.dtype.kind for p in parts if len(p)}
+            if len(kinds) > 1 and not kinds <= set("iuf"):
+                parts = [_objects(iter(p), len(p)) for p in parts]
+            cols[name] = np.concatenate(parts) if parts else ref[:0]
+        return Table(cols, sum(t.n for t in tables))
+
+    def apply(self, op: Tuple, t: Table) -> Table:
+        kind = op[0]
+        if kind == "where":
+            return t.take(np.flatnonzero(_as_mask(self.eval(op[1], t), t.n)))
+        if kind == "extend":
+            cols = dict(t.cols)
+            for i, (name, e) in enumerate(op[1]):
+                cur = Table(cols, t.n)
+                cols[name or self.auto_name(e, i, cols)] = _broadcast(self.eval(e, cur), t.n)
+            return Table(cols, t.n)
+        if kind == "project":
+            cols = {}
+            for i, (name, e) in enumerate(op[1]):
+                cols[name or self.auto_name(e, i, cols)] = _broadcast(self.eval(e, t), t.n)
+            return Table(cols, t.n)
+        if kind in ("project-away", "project-keep"):
+            hit = [c for c in t.cols if any(fnmatch.fnmatchcase(c, p) for p in op[1])]
+            keep = [c for c in t.cols if (c in hit) == (kind == "project-keep")]
+            return Table({c: t.cols[c] for c in keep}, t.n)
+        if kind == "project-reorder":
+            first = [c for p in op[1] for c in t.cols if fnmatch.fnmatchcase(c, p)]
+            first = list(dict.fromkeys(first))
+            return Table({c: t.cols[c] for c in first + [c for c in t.cols if c not in first]}, t.n)
+        if kind == "project-rename":
+            ren = {old: new for new, old in op[1]}
+            return Table({ren.get(c, c): v for c, v in t.cols.items()}, t.n)
+        if kind == "summarize":
+            return self.summarize(t, op[1], op[2], op[3])
+        if kind == "order":
+            return t.take(self.order(t, op[1]))
+        if kind == "take":
+            return t.take(np.arange(min(int(self.eval(op[1], t)), t.n)))
+        if kind == "top":
+            idx = self.order(t, op[2])
+            return t.take(idx[:int(self.eval(op[1], t))])
+        if kind == "count":
+            return Table({"Count": np.array([t.n], dtype=np.int64)}, 1)
+        if kind == "distinct":
+            if op[1] is None:
+                return self.summarize(t, [], [(c, ("name", c, -1)) for c in t.cols], -1)
+            return self.summarize(t, [], op[1], -1)
+        if kind == "join":
+            return self.join(t, op)
+        if kind == "union-op":
+            return self.union([t] + [self.tabular(x, fuzzy=op[1]) for x in op[2]])
+        if kind == "noop":
+            return t
+        self.fail(f"Unsupported operator '{kind}'")
+
+    def auto_name(self, e: Tuple, i: int, taken) -> str:
+        if e[0] == "name":
+            return e[1]
+        if e[0] == "member":
+            parts = []
+            while e[0] == "member":
+                parts.append(str(e[2]))
+                e = e[1]
+            if e[0] == "name":
+                return "_".join([e[1]] + parts[::-1])
+        if e[0] == "call" and e[1] in ("bin", "floor") and e[2] and e[2][0][0] == "name":
+            return e[2][0][1]
+        if e[0] == "call" and e[1] in _AGG_NAMES:
+            arg = e[2][0] if e[2] and e[2][0][0] != "star" else None
+            base = arg[1] if arg is not None and arg[0] == "name" else ""
+            name = _AGG_NAMES[e[1]].format(base)
+            return name
+        j = i + 1
+        while f"Column{j}" in taken:
+            j += 1
+        return f"Column{j}"
+
+    def order(self, t: Table, keys) -> np.ndarray:
+        if t.n == 0:
+            return np.arange(0)
+        sort_keys = []
+        for e, desc, nulls_first in keys:
+            v = _broadcast(self.eval(e, t), t.n)
+            nulls = _null_mask(v)
+            if v.dtype.kind in "Mm":
+                k = v.view(np.int64).astype(np.float64)
+            elif v.dtype.kind in "iufb":
+                k = v.astype(np.float64)
+            else:   # rank strings/dynamic values; mixed types order by type name first
+                distinct = sorted({(type(x).__name__, x if isinstance(x, (str, int, float)) else _tostring(x))
+                                   for x, nl in zip(v, nulls) if not nl})
+                rank = {key: r for r, key in enumerate(distinct)}
+                k = np.fromiter((np.nan if nl else rank[(type(x).__name__, x if isinstance(x, (str, int, float))
+                                                         else _tostring(x))]
+                                 for x, nl in zip(v, nulls)), dtype=np.float64, count=t.n)
+            k = -k if desc else k.copy()
+            first = (not desc) if nulls_first is None else nulls_first
+            k[nulls] = -np.inf if first else np.inf
+            sort_keys.append(k)
+        return np.lexsort(sort_keys[::-1])
+
+    def summarize(self, t: Table, aggs, keys, pos: int) -> Table:
+        key_cols = []
+        for i, (name, e) in enumerate(keys):
+            key_cols.append((name or self.auto_name(e, i, [k for k, _ in key_cols]), _broadcast(self.eval(e, t), t.n)))
+        if key_cols:
+            index: Dict[Tuple, int] = {}
+            hashable = [self._hashable(c) for _, c in key_cols]
+            gid = np.fromiter((index.setdefault(k, len(index)) for k in zip(*hashable)), dtype=np.int64, count=t.n)
+            ng = len(index)
+            _, first = np.unique(gid, return_index=True)
+        else:
+            gid, ng, first = np.zeros(t.n, dtype=np.int64), 1, None
+        out: Dict[str, np.ndarray] = {}
+        for name, col in key_cols:
+            out[name] = col[first] if ng else col[:0]
+        group_table = Table(dict(out), ng)
+        for i, (name, e) in enumerate(aggs):
+            over: Dict[int, Any] = {}
+            self.collect_aggs(e, t, gid, ng, over)
+            if not over:
+                self.fail("summarize expression has no aggregation function", pos)
+            value = _broadcast(self.eval(e, group_table, over), ng)
+            out[name or self.auto_name(e, i, out)] = value
+            group_table = Table(dict(out), ng)
+        return Table(out, ng)
+
+    @staticmethod
+    def _hashable(col: np.ndarray) -> List[Any]:
+        if col.dtype.kind == "O":
+            return [json.dumps(to_python(v), sort_keys=True) if isinstance(v, (list, dict)) else v for v in col]
+        if col.dtype.kind in "Mm":
+            return col.view(np.int64).tolist()
+        if col.dtype.kind == "f":
+            return [None if math.isnan(v) else v for v in col.tolist()]
+        return col.tolist()
+
+    def collect_aggs(self, e: Tuple, t: Table, gid: np.ndarray, ng: int, over: Dict[int, Any]) -> None:
+        if not isinstance(e, tuple) or not e:
+            return
+        if e[0] == "call" and e[1] in _AGG_NAMES:
+            over[id(e)] = self.aggregate(e, t, gid, ng)
+            return
+        for child in e[1:]:
+            if isinstance(child, tuple):
+                self.collect_aggs(child, t, gid, ng, over)
+            elif isinstance(child, list):
+                for c in child:
+                    self.collect_aggs(c, t, gid, ng, over)
+
+    def aggregate(self, e: Tuple, t: Table, gid: np.ndarray, ng: int) -> np.ndarray:
+        _, fn, args, pos = e
+        vals = [_broadcast(self.eval(a, t), t.n) if a[0] != "star" else None for a in args]
+        cond = None
+        if fn in ("countif", "dcountif", "sumif", "avgif", "minif", "maxif", "make_set_if", "make_list_if"):
+            if len(vals) < (1 if fn == "countif" else 2):
+                self.fail(f"{fn}() is missing its predicate", pos)
+            cond = _as_mask(vals[0] if fn == "countif" else vals[1], t.n)
+        if fn in ("count", "countif"):
+            g = gid if cond is None else gid[cond]
+            return np.bincount(g, minlength=ng).astype(np.int64)
+        if not vals or vals[0] is None:
+            self.fail(f"{fn}() needs an argument", pos)
+        x = vals[0]
+        sel = np.ones(t.n, dtype=bool) if cond is None else cond.copy()
+        sel &= ~_null_mask(x)
+        if fn in ("sum", "sumif", "avg", "avgif"):
+            if x.dtype.kind == "M":
+                self.fail(f"{fn}(): datetime arguments are not supported", pos)
+            if x.dtype.kind == "m":
+                xn = x.view(np.int64).astype(np.float64)
+            else:
+                xn = _to_real(x) if x.dtype.kind not in "iufb" else x.astype(np.float64)
+            sel &= ~np.isnan(xn)
+            sums = np.bincount(gid[sel], weights=xn[sel], minlength=ng)
+            if fn.startswith("avg"):
+                cnt = np.bincount(gid[sel], minlength=ng)
+                with np.errstate(all="ignore"):
+                    sums = np.where(cnt > 0, sums / np.maximum(cnt, 1), np.nan)
+                if x.dtype.kind != "m":
+                    return sums
+            if x.dtype.kind == "m":
+                spans = np.round(np.nan_to_num(sums)).astype(np.int64).view("timedelta64[us]")
+                return np.where(np.isnan(sums), NAT_SPAN, spans)
+            return sums.astype(np.int64) if x.dtype.kind in "iub" else sums
+        if fn in ("min", "max", "minif", "maxif"):
+            better = (lambda a, b: a < b) if fn.startswith("min") else (lambda a, b: a > b)
+            best: List[Any] = [None] * ng
+            for g, v in zip(gid[sel], x[sel]):
+                if best[g] is None or better(v, best[g]):
+                    best[g] = v
+            if x.dtype.kind in "Mm":
+                return np.array([NAT if b is None else b for b in best], dtype=x.dtype).reshape(ng)
+            return column(best, "real" if x.dtype.kind in "f" else "long" if x.dtype.kind in "iu" else None)
+        if fn in ("dcount", "dcountif"):
+            seen = [set() for _ in range(ng)]
+            for g, v in zip(gid[sel], self._hashable(x[sel])):
+                seen[g].add(v)
+            return np.array([len(s) for s in seen], dtype=np.int64)
+        if fn in ("make_set", "make_set_if", "make_list", "make_list_if"):
+            limit_arg = vals[1] if fn in ("make_set", "make_list") and len(vals) > 1 else \
+                vals[2] if len(vals) > 2 else None
+            limit = int(limit_arg[0]) if limit_arg is not None and len(limit_arg) else 1048576
+            lists: List[List[Any]] = [[] for _ in range(ng)]
+            seen_keys = [set() for _ in range(ng)]
+            unique = fn.startswith("make_set")
+            for g, v in zip(gid[sel], x[sel]):
+                if len(lists[g]) >= limit:
+                    continue
+                pv = to_python(v)
+                if unique:
+                    key = json.dumps(pv, sort_keys=True)
+                    if key in seen_keys[g]:
+                        continue
+                    seen_keys[g].add(key)
+                lists[g].append(pv)
+            return _objects(iter(lists), ng)
+        if fn in ("any", "take_any"):
+            idx = np.full(ng, -1, dtype=np.int64)
+            rows = np.flatnonzero(sel)
+            for g, r in zip(gid[rows][::-1], rows[::-1]):
+                idx[g] = r
+            return _take(x, idx)
+        self.fail(f"Unsupported aggregation '{fn}'", pos)
+
+    def join(self, left: Table, op: Tuple) -> Table:
+        _, kind, right_node, conds, pos = op
+        right = self.tabular(right_node)
+        for lc, rc in conds:
+            if lc not in left.cols:
+                self.fail(f"join: left side has no column '{lc}'", pos)
+            if rc not in right.cols:
+                self.fail(f"join: right side has no column '{rc}'", pos)
+        lkeys = list(zip(*[self._hashable(left.cols[c]) for c, _ in conds])) if conds else [()] * left.n
+        rkeys = list(zip(*[self._hashable(right.cols[c]) for _, c in conds])) if conds else [()] * right.n
+        if kind not in ("innerunique", "inner", "leftouter", "rightouter", "fullouter", "leftanti", "rightanti",
+                        "leftsemi", "rightsemi", "anti", "semi"):
+            self.fail(f"join kind '{kind}' is not supported", pos)
+        kind = {"anti": "leftanti", "semi": "leftsemi"}.get(kind, kind)
+        lrows = range(left.n)
+        if kind == "innerunique":
+            firsts: Dict[Tuple, int] = {}
+            for i, k in enumerate(lkeys):
+                firsts.setdefault(k, i)
+            lrows = sorted(firsts.values())
+        rindex: Dict[Tuple, List[int]] = {}
+        for j, k in enumerate(rkeys):
+            rindex.setdefault(k, []).append(j)
+        if kind in ("leftanti", "leftsemi"):
+            keep = [i for i in lrows if (lkeys[i] in rindex) == (kind == "leftsemi")]
+            return left.take(np.array(keep, dtype=np.int64))
+        if kind in ("rightanti", "rightsemi"):
+            lset = set(lkeys)
+            keep = [j for j in range(right.n) if (rkeys[j] in lset) == (kind == "rightsemi")]
+            return right.take(np.array(keep, dtype=np.int64))
+        li: List[int] = []
+        ri: List[int] = []
+        matched_right = set()
+        for i in lrows:
+            hits = rindex.get(lkeys[i])
+            if hits:
+                li.extend([i] * len(hits))
+                ri.extend(hits)
+                matched_right.update(hits)
+            elif kind in ("leftouter", "fullouter"):
+                li.append(i)
+                ri.append(-1)
+        if kind in ("rightouter", "fullouter"):
+            for j in range(right.n):
+                if j not in matched_right:
+                    li.append(-1)
+                    ri.append(j)
+        lidx, ridx = np.array(li, dtype=np.int64), np.array(ri, dtype=np.int64)
+        cols = {c: _take(v, lidx) for c, v in left.cols.items()}
+        for c, v in right.cols.items():
+            name = c
+            k = 1
+            while name in cols:
+                name = f"{c}{k}"
+                k += 1
+            cols[name] = _take(v, ridx)
+        return Table(cols, len(lidx))
+
+    # scalar
+    def eval(self, node: Tuple, t: Table, over: Optional[Dict[int, Any]] = None):
+        kind = node[0]
+        if kind == "lit":
+            return node[1]
+        if kind == "name":
+            name = node[1]
+            if name in t.cols:
+                return t.cols[name]
+            if name in self.scalars:
+                return self.scalars[name]
+            if name in self.tables:
+                return self.tables[name]
+            self.fail(f"Failed to resolve scalar expression named '{name}'", node[2])
+        if kind == "call":
+            if over is not None and id(node) in over:
+                return over[id(node)]
+            return self.call(node, t, over)
+        if kind == "member":
+            return _member(self.eval(node[1], t, over), node[2])
+        if kind == "index":
+            return _member(self.eval(node[1], t, over), to_python(self.eval(node[2], t, over)))
+        if kind == "neg":
+            return np.negative(_numeric(self.eval(node[1], t, over)))
+        if kind == "arith":
+            return _arith(node[1], self.eval(node[2], t, over), self.eval(node[3], t, over))
+        if kind == "cmp":
+            return _compare(node[1], self.eval(node[2], t, over), self.eval(node[3], t, over))
+        if kind == "and":
+            return _logical(np.logical_and, self.eval(node[1], t, over), self.eval(node[2], t, over))
+        if kind == "or":
+            return _logical(np.logical_or, self.eval(node[1], t, over), self.eval(node[2], t, over))
+        if kind == "strop":
+            out = _string_op(node[1], self.eval(node[3], t, over), self.eval(node[4], t, over))
+            return np.logical_not(out) if node[2] else out
+        if kind == "in":
+            return self.eval_in(node, t, over)
+        if kind == "hasany":
+            _, negate, all_, lhs, items, pos = node
+            terms = tuple(_s(x) for x in self.flatten(items, t, over, pos))
+            lhs_v = self.eval(lhs, t, over)
+            if all_:
+                rxs = [_term_rx((term,), False) for term in terms]
+                out = _vec(lambda x: all(r.search(_s(x)) for r in rxs if r), lhs_v, kind="bool")
+            else:
+                rx = _term_rx(terms, False)
+                out = _vec(lambda x: bool(rx and rx.search(_s(x))), lhs_v, kind="bool")
+            return np.logical_not(out) if negate else out
+        if kind == "between":
+            _, negate, lhs, lo, hi = node
+            x = self.eval(lhs, t, over)
+            out = _logical(np.logical_and, _compare(">=", x, self.eval(lo, t, over)),
+                           _compare("<=", x, self.eval(hi, t, over)))
+            return np.logical_not(out) if negate else out
+        if kind == "regex":
+            rx = _regex(_s(self.eval(node[2], t, over)))
+            return _vec(lambda x: bool(rx.search(_s(x))), self.eval(node[1], t, over), kind="bool")
+        if kind in ("pipe", "datatable", "union"):
+            return self.tabular(node)
+        self.fail(f"Unsupported expression '{kind}'")
+
+    def flatten(self, items, t: Table, over, pos) -> List[Any]:
+        out: List[Any] = []
+        for item in items:
+            v = self.eval(item, t, over) if item[0] not in ("pipe", "datatable", "union") else self.tabular(item)
+            if isinstance(v, Table):
+                out.extend(to_python(x) for x in (next(iter(v.cols.values())) if v.cols else []))
+            elif isinstance(v, list):
+                out.extend(v)
+            elif isinstance(v, np.ndarray):
+                self.fail("Expected a constant list here", pos)
+            else:
+                out.append(v)
+        return out
+
+    def eval_in(self, node: Tuple, t: Table, over):
+        _, negate, ci, lhs, items, pos = node
+        static: List[Any] = []
+        per_row: List[np.ndarray] = []
+        for item in items:
+            v = self.eval(item, t, over) if item[0] not in ("pipe", "datatable", "union") else self.tabular(item)
+            if isinstance(v, Table):
+                static.extend(next(iter(v.cols.values())) if v.cols else [])
+            elif isinstance(v, list):
+                static.extend(v)
+            elif isinstance(v, np.ndarray):
+                per_row.append(v)   # e.g. x in (SetColumn): membership in this row's array
+            else:
+                static.append(v)
+        norm = (lambda x: _s(x).lower()) if ci else (lambda x: to_python(x))
+        lookup = {norm(x) for x in static if not isinstance(x, (list, dict))}
+        lhs_v = self.eval(lhs, t, over)
+        if not per_row:
+            out = _vec(lambda x: norm(x) in lookup, lhs_v, kind="bool")
+        else:
+            def one(x, *rows):
+                k = norm(x)
+                if k in lookup:
+                    return True
+                for r in rows:
+                    vals = r if isinstance(r, list) else [r]
+                    if any(norm(y) == k for y in vals):
+                        return True
+                return False
+            out = _vec(one, lhs_v, *per_row, kind="bool")
+        return np.logical_not(out) if negate else out
+
+    def call(self, node: Tuple, t: Table, over):
+        _, name, args, pos = node
+        if name in _AGG_NAMES:
+            self.fail(f"Aggregation '{name}()' can only be used in summarize", pos)
+        if name == "ago":
+            return self.now - parse_timespan(self.eval(args[0], t, over))
+        if name == "now":
+            return self.now + (parse_timespan(self.eval(args[0], t, over)) if args else np.timedelta64(0, "us"))
+        if name == "column_ifexists":
+            col = self.eval(args[0], t, over)
+            if isinstance(col, str) and col in t.cols:
+                return t.cols[col]
+            return self.eval(args[1], t, over)
+        if name in ("toscalar", "materialize"):
+            v = self.tabular(args[0]) if args[0][0] in ("pipe", "datatable", "union", "name") else None
+            if v is None:
+                return self.eval(args[0], t, over)
+            if name == "materialize":
+                return v
+            first = next(iter(v.cols.values()), None)
+            return first[0] if first is not None and len(first) else None
+        if name in ("prev", "next"):
+            v = _broadcast(self.eval(args[0], t, over), t.n)
+            off = int(self.eval(args[1], t, over)) if len(args) > 1 else 1
+            idx = np.arange(t.n) - off if name == "prev" else np.arange(t.n) + off
+            idx[(idx < 0) | (idx >= t.n)] = -1
+            out = _take(v, idx)
+            if len(args) > 2:
+                default = self.eval(args[2], t, over)
+                out = _f_iif(idx < 0, default, out)
+            return out
+        fn = _FUNCS.get(name)
+        if fn is None:
+            self.fail(f"Unsupported function '{name}()'", pos)
+        try:
+            return fn(*[self.eval(a, t, over) for a in args])
+        except TypeError as e:
+            self.fail(f"{name}(): {e}", pos)
+
+
+def execute(text: str, tables: Dict[str, Table], now: Any = None) -> Table:
+    """Parses and runs a KQL query against in-memory tables; now pins ago()/now() (default: current UTC time)."""
+    now_dt = parse_datetime(now) if now is not None else np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "us")
+    return _Executor(text, tables, now_dt).run(parse(text))
+
+
+# ── Test cases ─────────────────────────────────────────────────────────────
+
+def _same(actual: Any, expected: Any) -> bool:
+    if isinstance(expected, (datetime, date)):
+        expected = _dt_str(parse_datetime(expected))
+    if isinstance(expected, str) and isinstance(actual, str) and expected != actual and _ISO_DT.match(expected) \
+            and _ISO_DT.match(actual):
+        try:
+            return parse_datetime(expected) == parse_datetime(actual)
+        except KqlExecError:
+            return False
+    if expected is None:
+        return actual is None or actual == ""
+    if isinstance(expected, bool) or isinstance(actual, bool):
+        return actual == expected
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9)
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return False
+        remaining = list(actual)
+        for e in expected:
+            hit = next((k for k, a in enumerate(remaining) if _same(a, e)), None)
+            if hit is None:
+                return False
+            remaining.pop(hit)
+        return True
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        return expected.keys() == actual.keys() and all(_same(actual[k], expected[k]) for k in expected)
+    return actual == expected
+
+
+def check_result(result: Table, case: Dict[str, Any]) -> List[str]:
+    """Assertions of one test case against a result table; returns failure messages."""
+    errors = []
+    rows = result.rows()
+    if "expect_columns" in case and list(case["expect_columns"]) != result.columns:
+        errors.append(f"Expected columns {case['expect_columns']}, got {result.columns}")
+    if "expect_count" in case and int(case["expect_count"]) != len(rows):
+        errors.append(f"Expected {case['expect_count']} row(s), got {len(rows)}")
+    expected_rows = case.get("expect_rows") or []
+    if case.get("ordered"):
+        for k, exp in enumerate(expected_rows):
+            if k >= len(rows):
+                errors.append(f"Expected row {k} {exp}, but the result has only {len(rows)} row(s)")
+            elif not all(c in rows[k] and _same(rows[k][c], v) for c, v in exp.items()):
+                errors.append(f"Row {k} {json.dumps(rows[k], default=str)} does not match {exp}")
+    else:
+        free = list(range(len(rows)))
+        for exp in expected_rows:
+            hit = next((k for k in free if all(c in rows[k] and _same(rows[k][c], v) for c, v in exp.items())), None)
+            if hit is None:
+                errors.append(f"No result row matches {exp}")
+            else:
+                free.remove(hit)
+    return errors
+
+
+def run_case(text: str, case: Dict[str, Any], base_dir: str = ".",
+             fixture_cache: Optional[Dict[str, Dict[str, Table]]] = None) -> Dict[str, Any]:
+    """Loads the case's fixtures, executes the query (timed), and checks the expectations."""
+    fixture_cache = {} if fixture_cache is None else fixture_cache
+    fixtures = case.get("fixtures") or []
+    if isinstance(fixtures, str):
+        fixtures = [fixtures]
+    out: Dict[str, Any] = {"name": case.get("name", "default"), "status": "pass", "ms": None, "rows": None,
+                           "errors": []}
+    tables: Dict[str, Table] = {}
+    try:
+        for fx in fixtures:
+            path = os.path.normpath(os.path.join(base_dir, fx))
+            if path not in fixture_cache:
+                fixture_cache[path] = load_fixtures([path])
+            tables.update(fixture_cache[path])
+    except (OSError, ValueError, KqlExecError) as e:
+        out.update(status="fail", errors=[f"Fixture error: {e}"])
+        return out
+    started = time.perf_counter()
+    try:
+        result = execute(text, tables, case.get("now"))
+    except KqlExecError as e:
+        out["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        out.update(status="fail", errors=[f"Execution error: {e}"])
+        return out
+    except Exception as e:  # an executor gap must fail this case, not the whole run
+        out["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        out.update(status="fail", errors=[f"Execution error ({type(e).__name__}): {e}"])
+        return out
+    out["ms"] = round((time.perf_counter() - started) * 1000, 3)
+    out["rows"] = result.n
+    out["errors"] = check_result(result, case)
+    if case.get("max_ms") is not None and out["ms"] > float(case["max_ms"]):
+        out["errors"].append(f"Execution took {out['ms']} ms (max_ms {case['max_ms']})")
+    if out["errors"]:
+        out["status"] = "fail"
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--query", required=True, help="KQL file to run")
+    ap.add_argument("--fixtures", nargs="*", default=[], help="JSON/CSV fixture files")
+    ap.add_argument("--now", help="Pin now()/ago() (ISO-8601); default current UTC time")
+    ap.add_argument("--out-json", help="Write the result here instead of stdout")
+    args = ap.parse_args()
+
+    with open(args.query, "r", encoding="utf-8") as f:
+        text = f.read()
+    tables = load_fixtures(args.fixtures)
+    started = time.perf_counter()
+    try:
+        result = execute(text, tables, args.now)
+    except KqlExecError as e:
+        print(json.dumps({"query": args.query, "error": str(e)}), file=sys.stderr)
+        sys.exit(1)
+    doc = {"query": args.query, "ms": round((time.perf_counter() - started) * 1000, 3), "rowCount": result.n,
+           "columns": result.columns, "rows": result.rows()}
+    if args.out_json:
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        print(json.dumps({"rowCount": doc["rowCount"], "ms": doc["ms"], "out": args.out_json}))
+    else:
+        print(json.dumps(doc, indent=2))
+
+
+if __name__ == "__main__":
+    main()
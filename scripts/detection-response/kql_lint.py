@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+kql_lint.py
+KQL tokenizer and single-pass lint engine used by kql-lint-and-test.py.
+
+- tokenize(): one compiled scanner for comments (//), strings ('..', "..", verbatim @'..' / @"..",
+  obfuscated h'..', multi-line ```..```), identifiers (incl. project-away, mv-expand, ...), numbers/timespans,
+  brackets and operators. Brackets inside strings and comments are not code, so they no longer upset the
+  balance check.
+- KqlLinter: rule and test regexes are compiled once per run; lint() walks the token stream once and runs
+  every rule from that walk (bracket balance, banned operator sequences, TODO/FIXME in comments, required
+  TimeGenerated, per-file YAML tests). Each Issue carries its line/column (1-based) when it has a position.
+
+Usage (library):
+  linter = KqlLinter(tests=yaml.safe_load(open("kql-tests.yml")))
+  for issue in linter.lint(text, "rules/foo.kql"):
+      print(issue.line, issue.col, issue.rule, issue.message)
+"""
+
+import re
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+REQUIRED_TIME_FIELD = "TimeGenerated"
+
+# Banned code-token sequences (identifiers compared lower-case). Matched on tokens, so text inside strings
+# and comments is never flagged.
+BANNED_SEQUENCES = [
+    (("contains",), "Prefer 'contains_cs' or 'has' where possible."),
+    (("isnotnull", "(", ")"), "Use 'isnotempty()' / 'isnotnull(Column)' correctly."),
+    (("where", "true"), "Avoid no-op filters."),
+]
+
+# Leading \s* lets one match consume the whitespace before a token (much cheaper than finditer retrying
+# every alternative at each blank); token offsets come from m.start(m.lastgroup).
+_TOKEN_RX = re.compile(r"""\s*(?:
+    (?P<comment>//[^\n]*)
+  | (?P<string>[hH]?(?:@'(?:[^'\n]|'')*'|@"(?:[^"\n]|"")*"|'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|(?s:```.*?```)))
+  | (?P<badstring>[hH]?@?['"][^\n]*|```)
+  | (?P<ident>(?:project-(?:away|keep|rename|reorder)|mv-(?:expand|apply)|make-series|parse-(?:where|kv)
+               |top-(?:nested|hitters))\b|[A-Za-z_$][\w$]*)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?[A-Za-z]*)
+  | (?P<open>[(\[{])
+  | (?P<close>[)\]}])
+  | (?P<op>==|!=|<=|>=|=~|!~|<>|=>|\.\.|[^\s\w])
+  | (?P<other>\S)
+)""", re.X)
+_TODO_RX = re.compile(r"\b(TODO|FIXME)\b")
+_PAIRS = {"(": ")", "[": "]", "{": "}"}
+
+
+class Token(NamedTuple):
+    kind: str   # comment | string | badstring | ident | number | open | close | op | other
+    value: str
+    pos: int    # offset into the source text
+
+
+class Issue(NamedTuple):
+    rule: str
+    message: str
+    line: Optional[int] = None
+    col: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"rule": self.rule, "line": self.line, "col": self.col, "message": self.message}
+
+    def __str__(self) -> str:
+        return f"{self.line}:{self.col}: {self.message}" if self.line else self.message
+
+
+def tokenize(text: str) -> Iterator[Token]:
+    """Yields tokens in source order; whitespace is skipped."""
+    for m in _TOKEN_RX.finditer(text):
+        kind = m.lastgroup
+        yield Token(kind, m[kind], m.start(kind))
+
+
+def line_col(text: str, pos: int) -> Tuple[int, int]:
+    return text.count("\n", 0, pos) + 1, pos - text.rfind("\n", 0, pos)
+
+
+def string_value(literal: str) -> str:
+    """Decoded value of a string token ('a\\'b' -> a'b, @"x""y" -> x"y, ```..``` -> ..)."""
+    s = literal[1:] if literal[:1] in "hH" else literal
+    if s.startswith("```"):
+        return s[3:-3]
+    if s.startswith("@"):
+        q = s[1]
+        return s[2:-1].replace(q + q, q)
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t", "r": "\r"}.get(m.group(1), m.group(1)), s[1:-1])
+
+
+def compile_tests(test_map: Dict[str, Any]) -> Dict[str, Tuple[List[str], List[str], List[Tuple[str, Any]]]]:
+    """YAML test map -> {relpath: (tables, columns, [(pattern, compiled)])}; each distinct regex compiled once."""
+    compiled: Dict[str, Any] = {}
+    out = {}
+    for rel, tdef in (test_map or {}).items():
+        if not isinstance(tdef, dict):
+            continue
+        forbid = []
+        for pattern in tdef.get("forbid_regex") or []:
+            if pattern not in compiled:
+                compiled[pattern] = re.compile(pattern, re.I)
+            forbid.append((pattern, compiled[pattern]))
+        out[rel] = (list(tdef.get("contains_table") or []), list(tdef.get("contains_columns") or []), forbid)
+    return out
+
+
+class KqlLinter:
+    def __init__(self, tests: Optional[Dict[str, Any]] = None, banned=BANNED_SEQUENCES,
+                 required_time_field: str = REQUIRED_TIME_FIELD):
+        self.tests = compile_tests(tests) if isinstance(tests, dict) else {}
+        self.required_time_field = required_time_field
+        # Index banned sequences by their last token so each code token costs one dict lookup.
+        self._banned: Dict[str, List[Tuple[List[str], str]]] = {}
+        for seq, msg in banned:
+            self._banned.setdefault(seq[-1], []).append((list(seq), msg))
+
+    def lint(self, text: str, rel: Optional[str] = None) -> List[Issue]:
+        found: List[Tuple[int, str, str]] = []   # (pos or -1, rule, message); line/col resolved at the end
+        idents = set()
+        stack: List[Tuple[str, int]] = []
+        values: List[str] = []           # code-token values (identifiers lower-cased) and their offsets,
+        starts: List[int] = []           # for matching banned sequences backwards from their last token
+        banned = self._banned
+
+        for m in _TOKEN_RX.finditer(text):
+            kind = m.lastgroup
+            value = m[kind]
+            pos = m.start(kind)
+            if kind == "ident":
+                value = value.lower()
+                idents.add(value)
+            elif kind == "comment":
+                if _TODO_RX.search(value):
+                    found.append((pos, "todo", "Contains TODO/FIXME comments"))
+                continue
+            elif kind == "open":
+                stack.append((value, pos))
+            elif kind == "close":
+                if not stack:
+                    found.append((pos, "balance", f"Unmatched closing '{value}'"))
+                else:
+                    op, _ = stack.pop()
+                    if _PAIRS[op] != value:
+                        found.append((pos, "balance", f"Mismatched '{op}' vs '{value}'"))
+            elif kind == "string":
+                if values and values[-1] == "[":   # ['Column Name'] is an identifier reference
+                    idents.add(string_value(value).lower())
+            elif kind == "badstring":
+                found.append((pos, "syntax", "Unterminated string literal"))
+            values.append(value)
+            starts.append(pos)
+            if value in banned:
+                for seq, msg in banned[value]:
+                    if values[-len(seq):] == seq:
+                        found.append((starts[-len(seq)], "banned", f"Banned/anti-pattern: {msg}"))
+
+        for op, pos in stack:
+            found.append((pos, "balance", f"Unclosed delimiter '{op}'"))
+        if "datatable" not in idents and self.required_time_field.lower() not in idents:
+            found.append((-1, "required-field", f"Missing recommended field '{self.required_time_field}'"))
+
+        tdef = self.tests.get(rel) if rel is not None else None
+        if tdef:
+            tables, columns, forbid = tdef
+            for t in tables:
+                if t.lower() not in idents:
+                    found.append((-1, "test", f"Expected reference to table '{t}'"))
+            for c in columns:
+                if c.lower() not in idents:
+                    found.append((-1, "test", f"Expected reference to column '{c}'"))
+            for pattern, rx in forbid:
+                hit = rx.search(text)
+                if hit:
+                    found.append((hit.start(), "test", f"Matched forbidden pattern: {pattern}"))
+
+        issues = []
+        for pos, rule, msg in sorted(found, key=lambda f: f[0] if f[0] >= 0 else len(text)):
+            if pos < 0:
+                issues.append(Issue(rule, msg))
+            else:
+                issues.append(Issue(rule, msg, *line_col(text, pos)))
+        return issues
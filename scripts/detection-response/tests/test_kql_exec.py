@@ -0,0 +1,75 @@
+"""Lab detections against fixtures, plus executor spot checks (run: python3 -m pytest tests/test_kql_exec.py)."""
+
+import os
+import sys
+
+import pytest
+import yaml
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LABS = os.path.normpath(os.path.join(HERE, "..", "..", "..", "labs"))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import kql_exec  # noqa: E402
+from kql_exec import KqlExecError, execute, run_case, table_from_rows  # noqa: E402
+
+with open(os.path.join(HERE, "kql-tests.yml"), encoding="utf-8") as fh:
+    TESTS = yaml.safe_load(fh)
+
+CASES = [(rel, case) for rel, tdef in TESTS.items()
+         for case in ([tdef["run"]] if isinstance(tdef["run"], dict) else tdef["run"])]
+_FIXTURES = {}
+
+
+@pytest.mark.parametrize("rel,case", CASES, ids=[f"{rel}::{case.get('name', 'default')}" for rel, case in CASES])
+def test_lab_detection(rel, case):
+    with open(os.path.join(LABS, rel), encoding="utf-8") as fh:
+        text = fh.read()
+    out = run_case(text, case, HERE, _FIXTURES)
+    assert out["status"] == "pass", out["errors"]
+
+
+def _logons():
+    return {"Logons": table_from_rows([
+        {"TimeGenerated": "2024-05-01T10:00:00Z", "User": "bob", "Path": r"C:\Users\Public\a.exe", "Bytes": 10},
+        {"TimeGenerated": "2024-05-01T10:01:00Z", "User": "bob", "Path": r"C:\Windows\b.exe", "Bytes": 30},
+        {"TimeGenerated": "2024-05-01T10:02:00Z", "User": "amy", "Path": r"C:\users2\c.exe", "Bytes": 5},
+    ]), "Users": table_from_rows([{"User": "bob", "Dept": "IT"}, {"User": "eve", "Dept": "HR"}])}
+
+
+def test_summarize_default_column_names():
+    result = execute("Logons | summarize count(), sum(Bytes) by User | order by User asc", _logons())
+    assert result.columns == ["User", "count_", "sum_Bytes"]
+    assert result.rows() == [{"User": "amy", "count_": 1, "sum_Bytes": 5}, {"User": "bob", "count_": 2, "sum_Bytes": 40}]
+
+
+@pytest.mark.parametrize("kind,users", [("inner", ["bob", "bob"]), ("leftouter", ["amy", "bob", "bob"]),
+                                        ("leftanti", ["amy"]), ("innerunique", ["bob"])])
+def test_join_kinds(kind, users):
+    # innerunique (the Kusto default) keeps one left row per key before joining
+    result = execute(f"Logons | join kind={kind} (Users) on User | order by User asc", _logons())
+    assert [r["User"] for r in result.rows()] == users
+
+
+def test_has_matches_whole_terms_only():
+    tables = _logons()
+    assert execute(r"Logons | where Path has @'\Users\' | project Bytes", tables).rows() == [{"Bytes": 10}]
+    assert execute("Logons | where Path has 'user'", tables).n == 0
+
+
+def test_errors_carry_line_and_column():
+    with pytest.raises(KqlExecError, match=r"^2:\d+: "):
+        execute("Logons\n| where NoSuchColumn > 1", _logons())
+
+
+def test_unsupported_aggregate_fails_only_its_case(monkeypatch):
+    case = {"name": "avg datetime", "fixtures": ["fixtures/security-event.json"]}
+    out = run_case("SecurityEvent | summarize avg(TimeGenerated)", case, HERE, _FIXTURES)
+    assert out["status"] == "fail" and "datetime" in out["errors"][0]
+
+    def boom(*_args, **_kwargs):
+        raise TypeError("executor gap")
+
+    monkeypatch.setattr(kql_exec, "execute", boom)
+    out = run_case("Logons", {"name": "gap"}, fixture_cache={})
+    assert out["status"] == "fail" and out["errors"] == ["Execution error (TypeError): executor gap"]
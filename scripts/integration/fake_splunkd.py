@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fake_splunkd.py
+Local stand-in for the splunkd REST endpoints used by splunk-risk-list-sync.py, for tests without a Splunk instance.
+
+- KV store: GET/DELETE /servicesNS/<owner>/<app>/storage/collections/data/<collection>[/<key>]
+  (fields, limit, skip and JSON query with _key / $or), POST .../<collection>/batch_save (max 1000 docs)
+- POST /services/search/jobs/export with "| inputlookup <collection>" -> JSON lines {"result": {...}}, streamed
+  with chunked transfer encoding
+- Async jobs: POST /services/search/jobs -> {"sid"}, GET .../jobs/<sid> (dispatchState, resultCount; DONE after
+  --job-delay-ms), GET .../jobs/<sid>/results?offset=&count= (count capped at 50000), DELETE .../jobs/<sid>
+- Bearer token check (401 on mismatch)
+- GET /_stats -> request counts, documents saved/deleted and request bytes received
+
+Usage:
+  python3 fake_splunkd.py --port 8089 --token dev-token [--seed sentinel_ti_risk=1000000]
+  SPLUNK_TOKEN=dev-token python3 splunk-risk-list-sync.py --splunk-url http://127.0.0.1:8089 ...
+Library:
+  with FakeSplunkd(token="dev-token") as sp:   # sp.url, sp.collections["name"] -> {_key: doc}
+      ...
+"""
+
+import argparse, json, re, threading, time, uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+MAX_BATCH_SAVE = 1000
+MAX_RESULT_ROWS = 50000  # limits.conf [restapi] maxresultrows
+EXPORT_LINES_PER_CHUNK = 1000
+_KV_PATH = re.compile(r"^/servicesNS/[^/]+/[^/]+/storage/collections/data/([^/]+)(?:/([^/]+))?$")
+
+
+def _match(doc: Dict, query: Dict) -> bool:
+    """Tiny subset of the KV store query language: field equality and $or."""
+    for k, v in query.items():
+        if k == "$or":
+            if not any(_match(doc, q) for q in v):
+                return False
+        elif doc.get(k) != v:
+            return False
+    return True
+
+
+class FakeSplunkd:
+    def __init__(self, token: str = "dev-token", host: str = "127.0.0.1", port: int = 0, job_delay_ms: float = 0):
+        self.token = token
+        self.collections: Dict[str, Dict[str, Dict]] = {}
+        self.jobs: Dict[str, Dict] = {}
+        self.job_delay = job_delay_ms / 1000.0
+        self.stats: Counter = Counter()
+        self._lock = threading.Lock()
+        sp = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body, content_type: str = "application/json") -> None:
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self) -> bytes:
+                n = int(self.headers.get("Content-Length") or 0)
+                data = self.rfile.read(n) if n else b""
+                sp.stats["bytesIn"] += len(data)
+                return data
+
+            def _authorized(self) -> bool:
+                if self.headers.get("Authorization") == f"Bearer {sp.token}":
+                    return True
+                self._send(401, {"messages": [{"type": "ERROR", "text": "Unauthorized"}]})
+                return False
+
+            def _route(self, method: str):
+                url = urlparse(self.path)
+                if url.path == "/_stats":
+                    return self._send(200, dict(sp.stats))
+                body = self._body()
+                if not self._authorized():
+                    return
+                m = _KV_PATH.match(url.path)
+                if m:
+                    return self._kv(method, unquote(m.group(1)), unquote(m.group(2) or ""), parse_qs(url.query), body)
+                if method == "POST" and url.path == "/services/search/jobs/export":
+                    return self._export(parse_qs(body.decode()))
+                if url.path.startswith("/services/search/jobs"):
+                    return self._jobs(method, url.path[len("/services/search/jobs"):].strip("/").split("/"),
+                                      parse_qs(url.query), parse_qs(body.decode()))
+                self._send(404, {"messages": [{"type": "ERROR", "text": f"Not found: {url.path}"}]})
+
+            def _kv(self, method: str, collection: str, key: str, qs: Dict, body: bytes):
+                with sp._lock:
+                    coll = sp.collections.setdefault(collection, {})
+                    if method == "POST" and key == "batch_save":
+                        docs = json.loads(body or b"[]")
+                        if len(docs) > MAX_BATCH_SAVE:
+                            return self._send(400, {"messages": [{"type": "ERROR",
+                                                                  "text": f"batch_save limit is {MAX_BATCH_SAVE}"}]})
+                        keys = []
+                        for d in docs:
+                            k = d.get("_key") or f"auto-{len(coll)}"
+                            coll[k] = dict(d, _key=k)
+                            keys.append(k)
+                        sp.stats["batch_save"] += 1
+                        sp.stats["saved"] += len(keys)
+                        return self._send(200, keys)
+                    if method == "GET":
+                        sp.stats["get"] += 1
+                        docs = list(coll.values()) if not key else [coll[key]] if key in coll else []
+                        if "query" in qs:
+                            q = json.loads(qs["query"][0])
+                            docs = [d for d in docs if _match(d, q)]
+                        skip = int(qs.get("skip", ["0"])[0])
+                        limit = int(qs.get("limit", ["0"])[0])
+                        docs = docs[skip:skip + limit] if limit else docs[skip:]
+                        if "fields" in qs:
+                            fields = qs["fields"][0].split(",")
+                            docs = [{f: d[f] for f in fields if f in d} for d in docs]
+                        if key and not docs:
+                            return self._send(404, {"messages": [{"type": "ERROR", "text": "Not found"}]})
+                        return self._send(200, docs[0] if key else docs)
+                    if method == "DELETE":
+                        sp.stats["delete"] += 1
+                        if key:
+                            gone = [key] if coll.pop(key, None) is not None else []
+                        else:
+                            q = json.loads(qs["query"][0]) if "query" in qs else {}
+                            gone = [k for k, d in coll.items() if _match(d, q)]
+                            for k in gone:
+                                del coll[k]
+                        sp.stats["deleted"] += len(gone)
+                        self.send_response(200)
+                        self.send_header("Content-Length", "0")
+                        return self.end_headers()
+                self._send(405, {"messages": [{"type": "ERROR", "text": "Method not allowed"}]})
+
+            def _export(self, form: Dict):
+                sp.stats["export"] += 1
+                docs = sp._lookup(form.get("search", [""])[0])
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(docs), EXPORT_LINES_PER_CHUNK):
+                    chunk = b"".join(json.dumps({"preview": False, "offset": i + j, "result": d}).encode() + b"\n"
+                                     for j, d in enumerate(docs[i:i + EXPORT_LINES_PER_CHUNK]))
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _jobs(self, method: str, parts: list, qs: Dict, form: Dict):
+                sid = parts[0] if parts and parts[0] else ""
+                if method == "POST" and not sid:
+                    sid = uuid.uuid4().hex[:16]
+                    docs = sp._lookup(form.get("search", [""])[0])
+                    with sp._lock:
+                        sp.jobs[sid] = {"docs": docs, "done_at": time.monotonic() + sp.job_delay}
+                        sp.stats["jobs"] += 1
+                    return self._send(201, {"sid": sid})
+                job = sp.jobs.get(sid)
+                if job is None:
+                    return self._send(404, {"messages": [{"type": "ERROR", "text": f"Unknown sid: {sid}"}]})
+                done = time.monotonic() >= job["done_at"]
+                if method == "DELETE":
+                    sp.jobs.pop(sid, None)
+                    return self._send(200, {"messages": []})
+                if len(parts) == 1:
+                    sp.stats["job_status"] += 1
+                    content = {"sid": sid, "dispatchState": "DONE" if done else "RUNNING", "isDone": done,
+                               "resultCount": len(job["docs"]) if done else 0}
+                    return self._send(200, {"entry": [{"name": sid, "content": content}]})
+                if parts[1] == "results":
+                    if not done:
+                        return self._send(204, b"")
+                    offset = int(qs.get("offset", ["0"])[0])
+                    count = int(qs.get("count", [str(MAX_RESULT_ROWS)])[0]) or MAX_RESULT_ROWS
+                    count = min(count, MAX_RESULT_ROWS)
+                    sp.stats["results"] += 1
+                    return self._send(200, {"init_offset": offset, "results": job["docs"][offset:offset + count]})
+                self._send(404, {"messages": [{"type": "ERROR", "text": "Not found"}]})
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+            def do_DELETE(self):
+                self._route("DELETE")
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread: Optional[threading.Thread] = None
+
+    def _lookup(self, search: str) -> list:
+        m = re.search(r"inputlookup\s+(\S+)", search)
+        with self._lock:
+            return list(self.collections.get(m.group(1), {}).values()) if m else []
+
+    def seed(self, collection: str, n: int) -> None:
+        """Fill a collection with n risk-list style documents."""
+        types = ("ip", "domain", "url", "filehash")
+        coll = self.collections.setdefault(collection, {})
+        for i in range(n):
+            k = f"{i:024x}"
+            coll[k] = {"_key": k, "indicator": f"ioc-{i}.example", "type": types[i % 4], "confidence": i % 100,
+                       "expires": "2030-01-01T00:00:00+00:00", "updated": "2025-01-01T00:00:00+00:00"}
+
+    def start(self) -> "FakeSplunkd":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeSplunkd":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--token", default="dev-token")
+    ap.add_argument("--job-delay-ms", type=float, default=0.0, help="Time before async search jobs report DONE")
+    ap.add_argument("--seed", action="append", default=[], metavar="COLLECTION=N")
+    args = ap.parse_args()
+    sp = FakeSplunkd(args.token, args.host, args.port, args.job_delay_ms)
+    for spec in args.seed:
+        name, n = spec.split("=", 1)
+        sp.seed(name, int(n))
+    print(f"Fake splunkd on {sp.url}. Ctrl+C to stop.")
+    try:
+        sp.server.serve_forever()
+    except KeyboardInterrupt:
+        sp.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+splunk-export-benchmark.py
+Throughput and memory benchmark for the Splunk risk-list readers in splunk-risk-list-sync.py, against a
+local fake_splunkd.py seeded with N lookup rows (no real Splunk needed).
+
+Readers compared (each runs in its own subprocess so peak RSS is per reader):
+- buffered: the previous implementation (r.text, splitlines(), json.loads per line, list of all rows)
+- export:   streaming /jobs/export (stream=True + iter_lines, generator)
+- jobs:     async search job + paged /results, --concurrency pages in flight
+
+Output: JSON with rows, seconds, rows/s, baseline and peak RSS (MB) and the RSS growth per reader.
+Exit code 1 if any reader returned a different row count.
+
+Usage:
+  python3 splunk-export-benchmark.py --rows 500000
+  python3 splunk-export-benchmark.py --rows 2000000 --page-size 50000 --concurrency 4 --readers export,jobs
+"""
+
+import argparse, importlib.util, json, os, resource, subprocess, sys, time
+from typing import Dict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COLLECTION = "bench_risk_list"
+
+
+def _rss_mb() -> float:
+    """Peak RSS of this process. VmHWM resets on exec; ru_maxrss can carry the forking parent's peak."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # KiB on Linux
+
+
+def _load_sync():
+    spec = importlib.util.spec_from_file_location("splunk_risk_list_sync", os.path.join(HERE, "splunk-risk-list-sync.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _buffered(url: str, token: str, search: str):
+    """The pre-streaming reader, kept here as the baseline."""
+    import requests
+    r = requests.post(f"{url}/services/search/jobs/export", headers={"Authorization": f"Bearer {token}"},
+                      data={"search": search, "output_mode": "json"}, timeout=600)
+    r.raise_for_status()
+    events = []
+    for line in r.text.splitlines():
+        if not line.strip(): continue
+        obj = json.loads(line)
+        if "result" in obj: events.append(obj["result"])
+    return events
+
+
+def child(args) -> None:
+    sync = _load_sync()
+    search = f"| inputlookup {COLLECTION}"
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    if args.child == "buffered":
+        n = len(_buffered(args.url, args.token, search))
+    elif args.child == "export":
+        n = sum(1 for _ in sync.splunk_search(args.url, args.token, search))
+    else:
+        n = sum(1 for _ in sync.splunk_search_jobs(args.url, args.token, search, args.page_size, args.concurrency,
+                                                    poll=0.05))
+    secs = time.perf_counter() - started
+    peak = _rss_mb()
+    print(json.dumps({"reader": args.child, "rows": n, "seconds": round(secs, 2),
+                      "rowsPerSecond": round(n / secs) if secs else None,
+                      "baselineRssMb": round(baseline, 1), "peakRssMb": round(peak, 1),
+                      "rssGrowthMb": round(peak - baseline, 1)}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200000)
+    ap.add_argument("--readers", default="buffered,export,jobs")
+    ap.add_argument("--page-size", type=int, default=50000)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--url", help=argparse.SUPPRESS)
+    ap.add_argument("--token", default="bench-token", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return child(args)
+
+    sys.path.insert(0, HERE)
+    from fake_splunkd import FakeSplunkd
+    report: Dict = {"rows": args.rows, "pageSize": args.page_size, "concurrency": args.concurrency, "readers": []}
+    with FakeSplunkd(token=args.token) as sp:
+        sp.seed(COLLECTION, args.rows)
+        for reader in [r.strip() for r in args.readers.split(",") if r.strip()]:
+            cmd = [sys.executable, os.path.abspath(__file__), "--child", reader, "--url", sp.url, "--token", args.token,
+                   "--page-size", str(args.page_size), "--concurrency", str(args.concurrency)]
+            out = subprocess.run(cmd, capture_output=True, text=True)
+            if out.returncode != 0:
+                report["readers"].append({"reader": reader, "error": out.stderr.strip()[-500:]})
+                continue
+            report["readers"].append(json.loads(out.stdout))
+    print(json.dumps(report, indent=2))
+    if any(r.get("rows") != args.rows for r in report["readers"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,61 +7,145 @@ Sync IOCs between Microsoft Sentinel Threat Intelligence (via Log Analytics) and
 - Dedupe by IOC value and type
 - No plaintext secrets: tokens via env vars
 
+Delta sync (sentinel->splunk, default --mode delta)
+- Queries only indicators whose TimeGenerated is past the last high-water mark (minus --overlap-minutes
+  for late ingestion); the first run, or --full-resync, looks back --initial-lookback-days
+- Keeps a local content-hash index (--state-file) of what the Splunk KV store collection holds, so
+  unchanged indicators are never re-sent
+- Pushes only adds/changes (KV store batch_save, 1000 docs per request) and removals (inactive or
+  expired indicators; batched DELETE by _key); state is saved only after Splunk accepted the changes
+- --full-resync also deletes KV documents that are no longer in Sentinel
+- --mode lookup keeps the old behaviour of rewriting a CSV lookup
+
+Reading the Splunk risk list (splunk->sentinel)
+- --splunk-read export (default): /services/search/jobs/export read with stream=True, one JSON line at a
+  time; results are yielded as they arrive, so a slow consumer simply stops reading the socket
+- --splunk-read jobs: async search job, then /results pages (offset/count, --page-size) fetched
+  --splunk-concurrency at a time, at most that many pages buffered; for very large lookups
+- splunk-export-benchmark.py compares both against the old read-everything approach on fake_splunkd.py
+
 Credentials
 - Azure: DefaultAzureCredential or LA workspace SharedKey (HTTP Data Collector not needed for reads)
 - Splunk: HEC or REST token via env SPLUNK_TOKEN; SPLUNK_URL base (https://splunk:8089)
 
+TI pulls go through ../common/la_query.py: the time range is split into --slice-hours slices that are
+bisected when they hit the Log Analytics result limits, run --la-concurrency at a time within
+--la-per-minute requests, and parsed incrementally into row tuples (buffered per slice, at most the
+client's row_limit rows each, until the slice's response is complete).
+
+Local testing
+  python3 fake_splunkd.py --port 8089 --token dev-token   (KV store + export stand-in)
+  python3 ../common/fake_log_analytics.py --port 8090     (Log Analytics stand-in; set LA_ENDPOINT)
+
 Dependencies
   pip install requests azure-identity azure-monitor-query
 """
 
-import argparse, json, os, sys, time, requests
-from typing import List, Dict, Tuple
+import argparse, csv, hashlib, io, json, os, sys, time, requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from la_query import LAQueryClient, QueryStream
+
+DEFAULT_STATE_FILE = os.getenv("SYNC_STATE_FILE", "/tmp/splunk-risk-list-sync-state.json")
+KV_BATCH_SAVE_MAX = 1000  # splunkd default max_documents_per_batch_save
+KV_DELETE_CHUNK = 200     # _key clauses per DELETE query (keeps the URL short)
+KV_PAGE = 10000
+SPLUNK_PAGE = 50000        # limits.conf [restapi] maxresultrows default
+SPLUNK_READ_CHUNK = 1 << 16
 
 # ---------- Azure (Sentinel TI via Log Analytics Query) ----------
-def query_sentinel_ti(workspace_id: str, kusto: str, az_token: str = None) -> List[Dict]:
+def query_sentinel_ti(workspace_id: str, kusto: str, az_token: str = None, start: datetime = None,
+                      end: datetime = None, slice_hours: float = 6, **client_opts) -> QueryStream:
     """
-    Query LA using the Azure Monitor Logs endpoint (AAD token preferred).
-    For brevity, this function assumes an access token is provided via env AZ_TOKEN
-    (e.g., obtained in CI), or a Managed Identity is used and a pre-created token.
+    Stream TI rows (tuples; see .schema) over [start, end), default the last 7 days.
+    AZ_TOKEN (e.g. from OIDC in CI) is used when given, otherwise DefaultAzureCredential.
     """
-    endpoint = f"https://api.loganalytics.io/v1/workspaces/{workspace_id}/query"
-    headers = {"Content-Type": "application/json"}
-    if az_token:
-      headers["Authorization"] = f"Bearer {az_token}"
-    payload = {"query": kusto, "timespan": "P7D"}
-    resp = requests.post(endpoint, headers=headers, json=payload, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-    cols = [c["name"] for c in data["tables"][0]["columns"]]
-    out = []
-    for row in data["tables"][0]["rows"]:
-        out.append(dict(zip(cols, row)))
-    return out
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=7)
+    client = LAQueryClient(workspace_id, az_token, **client_opts)
+    return client.stream(kusto, start, end, timedelta(hours=slice_hours))
 
 # ---------- Splunk Risk List helpers (using Splunkd REST, not HEC) ----------
-def splunk_get_risk_list(base_url: str, token: str, lookup: str) -> List[Dict]:
+def splunk_get_risk_list(base_url: str, token: str, lookup: str, read: str = "export", **opts) -> Iterator[Dict]:
     """
-    Retrieve risk list (lookup) as JSON via REST.
+    Retrieve risk list (lookup) as JSON via REST, as a generator of result dicts.
     For Enterprise Security, risk list is a KV store or lookup file. Here we use /services/data/lookup/lookup-table-files
     You may adapt to KV store collections if used in your environment.
     """
     # Fallback generic: GET search results from a saved search exporting risk list (simplified)
     search = f'| inputlookup {lookup}'
+    if read == "jobs":
+        return splunk_search_jobs(base_url, token, search, **opts)
     return splunk_search(base_url, token, search)
 
-def splunk_search(base_url: str, token: str, search: str) -> List[Dict]:
-    r = requests.post(f"{base_url}/services/search/jobs/export",
-                      headers={"Authorization": f"Bearer {token}"},
-                      data={"search": f"search {search}", "output_mode":"json"},
-                      timeout=60, verify=True)
+def _spl(search: str) -> str:
+    """Generating searches ("| inputlookup ...") must not get the implicit "search" prefix."""
+    search = search.strip()
+    return search if search.startswith("|") or search.startswith("search ") else f"search {search}"
+
+def splunk_search(base_url: str, token: str, search: str) -> Iterator[Dict]:
+    """Streams /jobs/export line by line; nothing beyond the current read chunk is held in memory."""
+    with requests.post(f"{base_url}/services/search/jobs/export",
+                       headers={"Authorization": f"Bearer {token}"},
+                       data={"search": _spl(search), "output_mode":"json"},
+                       timeout=60, verify=True, stream=True) as r:
+        r.raise_for_status()
+        for line in r.iter_lines(chunk_size=SPLUNK_READ_CHUNK):
+            if not line: continue
+            obj = json.loads(line)
+            if "result" in obj and not obj.get("preview"): yield obj["result"]
+
+def splunk_search_jobs(base_url: str, token: str, search: str, page_size: int = SPLUNK_PAGE,
+                       concurrency: int = 4, poll: float = 1.0, timeout: float = 3600) -> Iterator[Dict]:
+    """
+    Runs the search as an async job, then fetches /results pages concurrently. Pages are yielded in order
+    and at most `concurrency` of them are in flight or buffered (backpressure on the consumer's pace).
+    The job is deleted afterwards, including when the consumer stops early.
+    """
+    s = requests.Session()
+    s.headers.update({"Authorization": f"Bearer {token}"})
+    jobs = f"{base_url.rstrip('/')}/services/search/jobs"
+    r = s.post(jobs, data={"search": _spl(search), "exec_mode": "normal", "output_mode": "json"}, timeout=60)
     r.raise_for_status()
-    events = []
-    for line in r.text.splitlines():
-        if not line.strip(): continue
-        obj = json.loads(line)
-        if "result" in obj: events.append(obj["result"])
-    return events
+    sid = r.json()["sid"]
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            content = s.get(f"{jobs}/{sid}", params={"output_mode": "json"}, timeout=60).json()["entry"][0]["content"]
+            if content.get("dispatchState") == "FAILED":
+                raise RuntimeError(f"Splunk search job {sid} failed: {content.get('messages')}")
+            if content.get("isDone"):
+                total = int(content.get("resultCount", 0))
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Splunk search job {sid} not done after {timeout}s")
+            time.sleep(poll)
+
+        def fetch(offset: int) -> List[Dict]:
+            p = s.get(f"{jobs}/{sid}/results", params={"output_mode": "json", "offset": offset, "count": page_size},
+                      timeout=120)
+            p.raise_for_status()
+            return p.json().get("results", [])
+
+        offsets = iter(range(0, total, page_size))
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            window = deque(pool.submit(fetch, o) for o in islice(offsets, max(1, concurrency)))
+            while window:
+                results = window.popleft().result()
+                nxt = next(offsets, None)
+                if nxt is not None:
+                    window.append(pool.submit(fetch, nxt))
+                yield from results
+    finally:
+        try:
+            s.delete(f"{jobs}/{sid}", timeout=30)
+        except requests.RequestException:
+            pass  # job expires on its own (dispatch TTL)
 
 def splunk_replace_lookup(base_url: str, token: str, lookup: str, rows: List[Dict]):
     """
@@ -70,11 +154,13 @@ def splunk_replace_lookup(base_url: str, token: str, lookup: str, rows: List[Dic
     """
     if not rows:
         return
-    # Build CSV
+    # Build CSV in one buffer (quoting values that contain commas/quotes)
     keys = sorted({k for r in rows for k in r.keys()})
-    csv_data = ",".join(keys) + "\n"
-    for r in rows:
-        csv_data += ",".join([str(r.get(k,"")) for k in keys]) + "\n"
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=keys, restval="", lineterminator="\n")
+    w.writeheader()
+    w.writerows(rows)
+    csv_data = buf.getvalue()
     # Store into Splunk via a custom endpoint or CLI; here we demonstrate via | inputcsv trick (simplified)
     payload = {
         "search": f"| inputcsv append=t {lookup} | fields * | outputlookup {lookup}",
@@ -84,6 +170,204 @@ def splunk_replace_lookup(base_url: str, token: str, lookup: str, rows: List[Dic
     requests.post(f"{base_url}/services/search/jobs/export",
                   headers={"Authorization": f"Bearer {token}"},
                   data=payload, timeout=60, verify=True)
+    return csv_data
+
+# ---------- Splunk KV store (delta sync target) ----------
+class SplunkKV:
+    """KV store collection REST client: paged key listing, batch_save and batched deletes."""
+    def __init__(self, base_url: str, token: str, app: str, collection: str, owner: str = "nobody",
+                 retries: int = 3, backoff: float = 2.0):
+        self.url = f"{base_url.rstrip('/')}/servicesNS/{owner}/{app}/storage/collections/data/{collection}"
+        self.s = requests.Session()
+        self.s.headers.update({"Authorization": f"Bearer {token}"})
+        self.retries, self.backoff = retries, backoff
+        self.requests = 0
+
+    def _call(self, method: str, url: str, **kw) -> requests.Response:
+        for attempt in range(1, self.retries + 1):
+            self.requests += 1
+            r = self.s.request(method, url, timeout=60, **kw)
+            if r.status_code not in (429, 500, 502, 503, 504) or attempt == self.retries:
+                r.raise_for_status()
+                return r
+            time.sleep(self.backoff * attempt)
+
+    def iter_keys(self, page: int = KV_PAGE) -> Iterable[str]:
+        skip = 0
+        while True:
+            docs = self._call("GET", self.url, params={"fields": "_key", "limit": page, "skip": skip}).json()
+            for d in docs:
+                yield d["_key"]
+            if len(docs) < page:
+                return
+            skip += page
+
+    def batch_save(self, docs: List[Dict], size: int = KV_BATCH_SAVE_MAX) -> int:
+        for i in range(0, len(docs), size):
+            self._call("POST", f"{self.url}/batch_save", data=json.dumps(docs[i:i+size]),
+                       headers={"Content-Type": "application/json"})
+        return len(docs)
+
+    def delete_keys(self, keys: List[str], size: int = KV_DELETE_CHUNK) -> int:
+        for i in range(0, len(keys), size):
+            q = {"$or": [{"_key": k} for k in keys[i:i+size]]}
+            self._call("DELETE", self.url, params={"query": json.dumps(q, separators=(",", ":"))})
+        return len(keys)
+
+# ---------- Delta sync state: TimeGenerated watermark + content-hash index ----------
+def parse_ts(v) -> Optional[datetime]:
+    """LA timestamps (up to 7 fractional digits, trailing Z) -> aware datetime."""
+    if not v:
+        return None
+    if len(v) == 28 and v[19] == "." and v[-1] == "Z":  # fast path: 2024-01-01T00:00:00.1234567Z
+        try:
+            return datetime.fromisoformat(v[:26] + "+00:00")
+        except ValueError:
+            pass
+    s = str(v).replace("Z", "+00:00")
+    if "." in s:
+        head, _, frac = s.partition(".")
+        digits = "".join(c for c in frac if c.isdigit())
+        s = f"{head}.{digits[:6]}{frac[len(digits):]}"
+    try:
+        dt = datetime.fromisoformat(s)
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def ioc_key(value: str, itype: str) -> str:
+    """Stable KV _key for an indicator (same normalisation as dedupe)."""
+    return hashlib.sha1(f"{itype}\x1f{value}".encode("utf-8")).hexdigest()[:24]
+
+def content_hash(doc: Dict) -> str:
+    return hashlib.sha1(json.dumps(doc, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()[:16]
+
+class SyncState:
+    """{"watermark": ISO, "index": {_key: [content_hash, expiry_epoch_or_0]}} persisted atomically."""
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        self.watermark = parse_ts(data.get("watermark"))
+        self.index: Dict[str, list] = data.get("index", {})
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"watermark": self.watermark.isoformat() if self.watermark else None,
+                       "index": self.index}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+def delta_kql(since: datetime) -> str:
+    return f"""
+        ThreatIntelligenceIndicator
+        | where TimeGenerated > datetime({since.strftime('%Y-%m-%dT%H:%M:%S.%fZ')})
+        | project TimeGenerated, IndicatorType, IndicatorValue = tostring(ioc), SourceSystem,
+                  Active, ExpirationDateTime, ConfidenceScore
+        | where isnotempty(IndicatorValue)
+        | summarize arg_max(TimeGenerated, Active, ExpirationDateTime, ConfidenceScore) by IndicatorType, IndicatorValue
+        """
+
+TI_FIELDS = ("TimeGenerated", "IndicatorType", "IndicatorValue", "Active", "ExpirationDateTime", "ConfidenceScore")
+
+def plan_delta(ti: QueryStream, state: SyncState, now: datetime, seen: Optional[set] = None) -> Tuple[List[Dict], List[str], int, Optional[datetime], int]:
+    """
+    Compare fetched indicators with the index. Returns (upserts, deletes, unchanged, new_watermark, fetched)
+    and updates state.index in place (callers save it only after Splunk accepted the changes).
+    seen, if given, collects the keys of live (active, unexpired) indicators; a full resync deletes every
+    other KV key.
+    """
+    latest: Dict[str, tuple] = {}
+    newest, fetched = "", 0
+    get = ti.schema.getter(*TI_FIELDS) if ti.schema.names else None
+    for row in ti:
+        fetched += 1
+        tg, t, v, active, exp, conf = get(row)
+        v = (v or "").strip()
+        if not v:
+            continue
+        t = (t or "unknown").strip().lower()
+        # LA returns TimeGenerated in one fixed ISO format, so string order is time order
+        tg = tg or ""
+        if tg > newest:
+            newest = tg
+        k = ioc_key(v, t)
+        prev = latest.get(k)
+        if prev is None or tg >= prev[0]:
+            latest[k] = (tg, v, t, active, exp, conf)
+    watermark = state.watermark
+    ts_newest = parse_ts(newest)
+    if ts_newest and (watermark is None or ts_newest > watermark):
+        watermark = ts_newest
+
+    upserts, deletes, unchanged = [], [], 0
+    now_epoch = now.timestamp()
+    for k, (tg, v, t, active, exp, conf) in latest.items():
+        ts = parse_ts(tg) or now
+        exp = parse_ts(exp)
+        exp_epoch = exp.timestamp() if exp else 0
+        active = active not in (False, "false", "False", 0)
+        if not active or (exp_epoch and exp_epoch <= now_epoch):
+            if k in state.index:
+                deletes.append(k)
+                del state.index[k]
+            continue
+        if seen is not None:
+            seen.add(k)
+        doc = {"indicator": v, "type": t, "confidence": conf,
+               "expires": exp.isoformat() if exp else None}
+        h = content_hash(doc)
+        prev = state.index.get(k)
+        if prev and prev[0] == h:
+            unchanged += 1
+            continue
+        upserts.append(dict(doc, _key=k, updated=ts.isoformat()))
+        state.index[k] = [h, exp_epoch]
+
+    # Expiry sweep: indicators that lapsed since they were pushed, without a newer TI record
+    upserted = {d["_key"] for d in upserts}
+    for k, (_, exp_epoch) in list(state.index.items()):
+        if exp_epoch and exp_epoch <= now_epoch and k not in upserted:
+            deletes.append(k)
+            del state.index[k]
+    return upserts, deletes, unchanged, watermark, fetched
+
+def sync_delta(args, splunk_token: str, az_token: Optional[str]) -> Dict:
+    state = SyncState(args.state_file)
+    now = datetime.now(timezone.utc)
+    full = args.full_resync or state.watermark is None
+    if full:
+        since = now - timedelta(days=args.initial_lookback_days)
+        if args.full_resync:
+            state.index = {}
+    else:
+        since = state.watermark - timedelta(minutes=args.overlap_minutes)
+
+    started = time.monotonic()
+    ti = query_sentinel_ti(args.workspace_id, delta_kql(since), az_token, since, now, args.slice_hours,
+                           concurrency=args.la_concurrency, per_minute=args.la_per_minute)
+    seen = set() if args.full_resync else None
+    upserts, deletes, unchanged, watermark, fetched = plan_delta(ti, state, now, seen)
+    query_seconds = time.monotonic() - started
+
+    kv = SplunkKV(args.splunk_url, splunk_token, args.app, args.collection)
+    if args.full_resync:
+        # Anything in Splunk that Sentinel no longer returns as live (missing, inactive, expired) is stale
+        gone = set(deletes)
+        deletes += [k for k in kv.iter_keys() if k not in seen and k not in gone]
+    kv.batch_save(upserts)
+    kv.delete_keys(deletes)
+    state.watermark = watermark
+    state.save()
+    return {"direction": args.direction, "mode": "full-resync" if args.full_resync else "delta",
+            "since": since.isoformat(), "fetched": fetched, "upserts": len(upserts), "deletes": len(deletes),
+            "unchanged": unchanged, "indexed": len(state.index),
+            "watermark": watermark.isoformat() if watermark else None,
+            "query": ti.client.stats, "splunkRequests": kv.requests, "querySeconds": round(query_seconds, 2),
+            "totalSeconds": round(time.monotonic() - started, 2)}
 
 # ---------- Dedupe & Normalize ----------
 def norm_indicator(i: Dict) -> Tuple[str,str]:
@@ -91,7 +375,7 @@ def norm_indicator(i: Dict) -> Tuple[str,str]:
     t = (i.get("IndicatorType") or i.get("type") or "unknown").strip().lower()
     return v, t
 
-def dedupe(rows: List[Dict]) -> List[Dict]:
+def dedupe(rows: Iterable[Dict]) -> List[Dict]:
     seen = set(); out=[]
     for r in rows:
         k = norm_indicator(r)
@@ -106,6 +390,21 @@ def main():
     ap.add_argument("--splunk-url", required=True, help="Splunkd base URL, e.g. https://splunk:8089")
     ap.add_argument("--splunk-token-env", default="SPLUNK_TOKEN")
     ap.add_argument("--lookup-name", default="risk_lookup.csv", help="Splunk lookup used as risk list")
+    ap.add_argument("--mode", choices=["delta","lookup"], default="delta",
+                    help="delta: watermark + KV store batch_save (default); lookup: rewrite the whole CSV lookup")
+    ap.add_argument("--app", default="search", help="Splunk app that owns the KV store collection")
+    ap.add_argument("--collection", default="sentinel_ti_risk", help="KV store collection backing the risk list")
+    ap.add_argument("--state-file", default=DEFAULT_STATE_FILE, help="Watermark + content-hash index")
+    ap.add_argument("--overlap-minutes", type=float, default=15, help="Re-read this much before the watermark (late ingestion)")
+    ap.add_argument("--initial-lookback-days", type=float, default=7)
+    ap.add_argument("--full-resync", action="store_true", help="Ignore the watermark, re-push everything and prune stale KV docs")
+    ap.add_argument("--slice-hours", type=float, default=6, help="Initial LA query time slice (bisected on limits)")
+    ap.add_argument("--la-concurrency", type=int, default=4, help="Concurrent LA query slices")
+    ap.add_argument("--la-per-minute", type=float, default=60, help="LA request budget per minute")
+    ap.add_argument("--splunk-read", choices=["export","jobs"], default="export",
+                    help="splunk->sentinel: streaming export (default) or async job with paged /results")
+    ap.add_argument("--page-size", type=int, default=SPLUNK_PAGE, help="Rows per /results page (jobs read)")
+    ap.add_argument("--splunk-concurrency", type=int, default=4, help="Concurrent /results pages (jobs read)")
     args = ap.parse_args()
 
     splunk_token = os.getenv(args.splunk_token_env)
@@ -115,6 +414,10 @@ def main():
     if args.direction == "sentinel->splunk":
         if not args.workspace_id:
             print(json.dumps({"error":"--workspace-id required"})); sys.exit(1)
+        az_token = os.getenv("AZ_TOKEN")  # Provide via OIDC/MI in CI
+        if args.mode == "delta":
+            print(json.dumps(sync_delta(args, splunk_token, az_token)))
+            return
         # Simple TI query from ThreatIntelligenceIndicator table (Sentinel TI providers)
         kql = """
         ThreatIntelligenceIndicator
@@ -122,16 +425,17 @@ def main():
         | where isnotempty(IndicatorValue)
         | summarize by IndicatorType, IndicatorValue
         """
-        az_token = os.getenv("AZ_TOKEN")  # Provide via OIDC/MI in CI
-        ti = query_sentinel_ti(args.workspace_id, kql, az_token)
-        rows = [{"indicator": r["IndicatorValue"], "type": r["IndicatorType"]} for r in ti]
-        rows = dedupe(rows)
+        ti = query_sentinel_ti(args.workspace_id, kql, az_token, slice_hours=args.slice_hours,
+                               concurrency=args.la_concurrency, per_minute=args.la_per_minute)
+        get = ti.schema.getter("IndicatorValue", "IndicatorType") if ti.schema.names else None
+        rows = dedupe({"indicator": v, "type": t} for v, t in map(get, ti))
         splunk_replace_lookup(args.splunk_url, splunk_token, args.lookup_name, rows)
         print(json.dumps({"direction": args.direction, "count": len(rows)}))
     else:
         # Pull from Splunk risk list and (illustratively) print what would be posted to Sentinel TI
         # (posting to Sentinel TI requires the Graph TI API or LA ingestion to a custom table; omitted for brevity)
-        rows = splunk_get_risk_list(args.splunk_url, splunk_token, args.lookup_name)
+        opts = {"page_size": args.page_size, "concurrency": args.splunk_concurrency} if args.splunk_read == "jobs" else {}
+        rows = splunk_get_risk_list(args.splunk_url, splunk_token, args.lookup_name, args.splunk_read, **opts)
         rows = dedupe(rows)
         print(json.dumps({"direction": args.direction, "count": len(rows), "preview": rows[:5]}))
 
@@ -6,21 +6,18 @@ Verify Sentinel connector health by checking ingestion in the last N minutes per
 
 - Queries LA for record counts and latest TimeGenerated
 - Emits JSON with status=ok/warn/critical based on thresholds
+- Tables are checked concurrently through ../common/la_query.py (--concurrency, shared rate budget)
 - No plaintext secrets: use AZ_TOKEN (AAD) or Managed Identity in CI where applicable
 
 Requires:
   pip install requests
 """
 
-import argparse, json, os, sys, time, requests
-from datetime import datetime, timedelta
+import argparse, json, os, sys
+from datetime import datetime, timezone
 
-def la_query(workspace_id: str, kql: str, token: str) -> dict:
-    url = f"https://api.loganalytics.io/v1/workspaces/{workspace_id}/query"
-    headers = {"Content-Type":"application/json","Authorization": f"Bearer {token}"}
-    r = requests.post(url, headers=headers, json={"query": kql}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from la_query import LAQueryClient
 
 def main():
     ap = argparse.ArgumentParser()
@@ -28,6 +25,7 @@ def main():
     ap.add_argument("--tables", nargs="+", required=True, help="Tables to check, e.g., SecurityEvent OfficeActivity")
     ap.add_argument("--lookback-min", type=int, default=60)
     ap.add_argument("--critical-minutes", type=int, default=30, help="If last event older than this, critical")
+    ap.add_argument("--concurrency", type=int, default=4, help="Tables queried in parallel")
     args = ap.parse_args()
 
     token = os.getenv("AZ_TOKEN")
@@ -35,17 +33,16 @@ def main():
         print(json.dumps({"error":"AZ_TOKEN not set"})); sys.exit(1)
 
     report = {"workspace": args.workspace_id, "lookback": args.lookback_min, "items": []}
-    now = datetime.utcnow()
+    now = datetime.now(timezone.utc)
 
-    for tbl in args.tables:
-        kql = f"{tbl} | where TimeGenerated > ago({args.lookback_min}m) | summarize count(), max(TimeGenerated)"
-        data = la_query(args.workspace_id, kql, token)
-        if not data.get("tables"):
+    client = LAQueryClient(args.workspace_id, token, concurrency=args.concurrency)
+    kqls = [f"{tbl} | where TimeGenerated > ago({args.lookback_min}m) | summarize count(), max(TimeGenerated)"
+            for tbl in args.tables]
+    for tbl, (schema, rows) in zip(args.tables, client.query_many(kqls)):
+        if not schema.names:
             report["items"].append({"table": tbl, "status":"warn", "detail":"no result"})
             continue
-        cols = [c["name"] for c in data["tables"][0]["columns"]]
-        rows = data["tables"][0]["rows"]
-        if not rows:
+        if not rows or not rows[0][1]:
             report["items"].append({"table": tbl, "status":"warn", "count": 0})
             continue
         cnt, last = rows[0]
@@ -11,15 +11,10 @@ Usage:
   python log-lag-monitor.py --table SecurityEvent --window-min 15
 """
 
-import argparse, json, os, sys, requests
-from datetime import datetime
+import argparse, json, os, sys
 
-def la_query(workspace_id: str, kql: str, token: str) -> dict:
-    url = f"https://api.loganalytics.io/v1/workspaces/{workspace_id}/query"
-    headers = {"Content-Type":"application/json","Authorization": f"Bearer {token}"}
-    r = requests.post(url, headers=headers, json={"query": kql}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from la_query import LAQueryClient
 
 def main():
     ap = argparse.ArgumentParser()
@@ -39,10 +34,10 @@ def main():
     | extend LagMin = datetime_diff('minute', Ingested, TimeGenerated) * -1
     | summarize avg(LagMin), max(LagMin), min(LagMin)
     """
-    data = la_query(args.workspace_id, kql, token)
-    if not data.get("tables") or not data["tables"][0]["rows"]:
+    _, rows = LAQueryClient(args.workspace_id, token).query(kql)
+    if not rows:
         print(json.dumps({"table": args.table, "error":"no data"})); sys.exit(1)
-    avg_lag, max_lag, min_lag = data["tables"][0]["rows"][0]
+    avg_lag, max_lag, min_lag = rows[0]
     print(json.dumps({"table": args.table, "avg_min": avg_lag, "max_min": max_lag, "min_min": min_lag}))
 
 if __name__ == "__main__":